@@ -0,0 +1,596 @@
+"""
+Mide el tiempo de cada función pública de db/database.py sobre bases de datos
+sintéticas de distintos tamaños (benchmarks/dataset.py) y guarda los resultados
+en JSON, para comparar una versión con otra.
+
+Cada tamaño se genera una vez (o se reutiliza de --data-dir) y las pruebas se
+hacen sobre una copia (en memoria con --memory), porque las funciones de
+escritura la modifican. La caché
+de db.cache se vacía antes de cada llamada: se mide la consulta, no la caché.
+
+Uso:
+    python -m benchmarks.bench_database [--sizes 1000 10000] [--output resultados.json]
+    python -m benchmarks.bench_database --sizes 10000 --compare anterior.json
+"""
+
+import argparse
+import inspect
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+from collections import deque
+from datetime import datetime
+from time import perf_counter
+from db.backup import copy_database
+from db.cache import invalidate
+from db.connection import configure_pool, close_pool, MEMORY
+from db import database, reports
+from benchmarks.dataset import (generate_dataset, DatasetInfo, table_sizes, student_name, class_name,
+                                REFERENCE_DATE)
+
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000]
+
+# Funciones públicas que no se miden, con el motivo
+NOT_BENCHMARKED = {}
+
+# Nombre de la prueba -> prepare(info, i), que devuelve la llamada que se mide en la repetición i.
+# El nombre es el de la función de db.database, con la variante entre corchetes si hay varias.
+# Van primero las lecturas, para que las escrituras no cambien los datos que leen.
+CASES = {}
+
+
+def case(name):
+    def decorator(prepare):
+        CASES[name] = prepare
+        return prepare
+    return decorator
+
+
+def function_name(case_name):
+    """Función de db.database que mide una prueba ("fetch_payments_page[fechas]" -> "fetch_payments_page")"""
+    return case_name.split("[", 1)[0]
+
+
+def _consume(iterator):
+    deque(iterator, maxlen=0)
+
+
+# ---------- Esquema ----------
+
+@case("connect_db")
+def _(info, i):
+    return lambda: database.connect_db().close()
+
+@case("ensure_schema")
+def _(info, i):
+    return database.ensure_schema
+
+@case("create_tables")
+def _(info, i):
+    return database.create_tables
+
+@case("init_levels")
+def _(info, i):
+    return database.init_levels
+
+# ---------- Lecturas ----------
+
+@case("fetch_users")
+def _(info, i):
+    return database.fetch_users
+
+@case("fetch_user")
+def _(info, i):
+    return lambda: database.fetch_user(i % info.users + 1)
+
+@case("fetch_students")
+def _(info, i):
+    return database.fetch_students
+
+@case("fetch_students[página]")
+def _(info, i):
+    return lambda: database.fetch_students(offset=info.students // 2, limit=100)
+
+@case("fetch_student")
+def _(info, i):
+    return lambda: database.fetch_student(i % info.students + 1)
+
+@case("student_name_exists")
+def _(info, i):
+    return lambda: database.student_name_exists(student_name(info.students // 2 + i % 10))
+
+@case("search_students")
+def _(info, i):
+    return lambda: database.search_students("lucia garc")
+
+@case("search_students[página]")
+def _(info, i):
+    return lambda: database.search_students("lucia", limit=100)
+
+@case("fetch_students_after")
+def _(info, i):
+    return lambda: database.fetch_students_after()
+
+@case("fetch_students_after[última página]")
+def _(info, i):
+    last = database.fetch_students_after(limit=max(info.students - 100, 1))[-1:]
+    return lambda: database.fetch_students_after(last[0] if last else None)
+
+@case("iter_students")
+def _(info, i):
+    return lambda: _consume(database.iter_students())
+
+@case("get_students")
+def _(info, i):
+    return database.get_students
+
+@case("fetch_levels")
+def _(info, i):
+    return database.fetch_levels
+
+@case("fetch_level")
+def _(info, i):
+    return lambda: database.fetch_level(i % 12 + 1)
+
+@case("level_name_exists")
+def _(info, i):
+    return lambda: database.level_name_exists("b2_ad")
+
+@case("fetch_classes")
+def _(info, i):
+    return database.fetch_classes
+
+@case("iter_classes")
+def _(info, i):
+    return lambda: _consume(database.iter_classes())
+
+@case("fetch_classes_between")
+def _(info, i):
+    return lambda: database.fetch_classes_between("2024-03-01", "2024-03-31")
+
+@case("fetch_classes_this_week")
+def _(info, i):
+    return lambda: database.fetch_classes_this_week(REFERENCE_DATE)
+
+@case("fetch_class")
+def _(info, i):
+    return lambda: database.fetch_class(i % info.classes + 1)
+
+@case("class_name_exists")
+def _(info, i):
+    return lambda: database.class_name_exists(class_name(info.classes))
+
+@case("fetch_payments")
+def _(info, i):
+    return database.fetch_payments
+
+@case("count_payments")
+def _(info, i):
+    return database.count_payments
+
+@case("count_payments[alumno]")
+def _(info, i):
+    return lambda: database.count_payments(student_filter="sofia")
+
+@case("fetch_payments_filtered")
+def _(info, i):
+    return lambda: database.fetch_payments_filtered(limit=100)
+
+@case("fetch_payments_filtered[todos]")
+def _(info, i):
+    return database.fetch_payments_filtered
+
+@case("iter_payments_filtered")
+def _(info, i):
+    return lambda: _consume(database.iter_payments_filtered())
+
+@case("fetch_payments_page")
+def _(info, i):
+    return lambda: database.fetch_payments_page()[0]
+
+@case("fetch_payments_page[última página]")
+def _(info, i):
+    return lambda: database.fetch_payments_page(offset=max(info.payments - 100, 0))[0]
+
+@case("fetch_payments_page[alumno]")
+def _(info, i):
+    return lambda: database.fetch_payments_page(student_filter="sofia garc")[0]
+
+@case("fetch_payments_page[notas]")
+def _(info, i):
+    return lambda: database.fetch_payments_page(notes_filter="matri")[0]
+
+@case("fetch_payments_page[fechas]")
+def _(info, i):
+    return lambda: database.fetch_payments_page(date_range=("2024-03-01", "2024-03-31"))[0]
+
+@case("fetch_payments_page[orden por importe]")
+def _(info, i):
+    return lambda: database.fetch_payments_page(order_by="amount")[0]
+
+@case("fetch_payments_between")
+def _(info, i):
+    return lambda: database.fetch_payments_between("2024-03-01", "2024-03-31")
+
+@case("payment_totals_by_month")
+def _(info, i):
+    return database.payment_totals_by_month
+
+@case("payment_totals_by_month[un año]")
+def _(info, i):
+    return lambda: database.payment_totals_by_month("2024-01-01", "2024-12-31")
+
+# Los informes leen las tablas resumen (db/reports.py): su tiempo no debería crecer con los pagos
+@case("reports.revenue_by_month")
+def _(info, i):
+    return reports.revenue_by_month
+
+@case("reports.revenue_by_method")
+def _(info, i):
+    return reports.revenue_by_method
+
+@case("reports.revenue_by_level")
+def _(info, i):
+    return reports.revenue_by_level
+
+@case("reports.revenue_by_student[primeros 100]")
+def _(info, i):
+    return lambda: reports.revenue_by_student(limit=100)
+
+@case("reports.revenue_totals")
+def _(info, i):
+    return reports.revenue_totals
+
+@case("fetch_payments_after")
+def _(info, i):
+    return lambda: database.fetch_payments_after()
+
+@case("fetch_payments_after[última página]")
+def _(info, i):
+    last = database.fetch_payments_filtered(offset=max(info.payments - 101, 0), limit=1)
+    return lambda: database.fetch_payments_after(last[0] if last else None)
+
+@case("fetch_payments_after[orden por alumno]")
+def _(info, i):
+    return lambda: database.fetch_payments_after(order_by="student", descending=False)
+
+@case("fetch_payment")
+def _(info, i):
+    return lambda: database.fetch_payment(i % info.payments + 1)
+
+@case("fetch_rewards")
+def _(info, i):
+    return database.fetch_rewards
+
+@case("search_rewards")
+def _(info, i):
+    return lambda: database.search_rewards(recommender="martin", reward_name="usa")
+
+@case("iter_rewards")
+def _(info, i):
+    return lambda: _consume(database.iter_rewards())
+
+@case("fetch_rewards_after")
+def _(info, i):
+    return lambda: database.fetch_rewards_after()
+
+@case("fetch_reward")
+def _(info, i):
+    return lambda: database.fetch_reward(i % max(info.rewards, 1) + 1)
+
+@case("reward_already_granted")
+def _(info, i):
+    return lambda: database.reward_already_granted(i % info.students + 1)
+
+@case("is_student_under_bonus")
+def _(info, i):
+    return lambda: database.is_student_under_bonus(i % info.students + 1, REFERENCE_DATE)
+
+@case("students_under_bonus")
+def _(info, i):
+    return lambda: database.students_under_bonus(on_date=REFERENCE_DATE)
+
+@case("get_students_with_expiring_bonus")
+def _(info, i):
+    return lambda: database.get_students_with_expiring_bonus(30, REFERENCE_DATE)
+
+# ---------- Escrituras ----------
+# Cada repetición trabaja con filas distintas: las que inserta o las que le corresponden por el número i.
+# delete_student borra los últimos alumnos, así que los pagos nuevos van a la primera mitad.
+
+@case("insert_user")
+def _(info, i):
+    return lambda: database.insert_user(f"bench{i}", "benchmark", "user")
+
+@case("update_user")
+def _(info, i):
+    return lambda: database.update_user(i % info.users + 1, f"renombrado{i}", "user")
+
+@case("delete_user")
+def _(info, i):
+    return lambda: database.delete_user(f"bench{i}")  # Los que ha creado insert_user
+
+@case("delete_user_by_id")
+def _(info, i):
+    user_id = database.insert_user(f"bench id {i}", "benchmark", "user")
+    return lambda: database.delete_user_by_id(user_id)
+
+@case("insert_student")
+def _(info, i):
+    return lambda: database.insert_student(f"Nuevo Alumno {i}", 30, "B1")
+
+@case("insert_students_bulk")
+def _(info, i):
+    return lambda: database.insert_students_bulk([(f"Lote {i} {n}", 20, "A2") for n in range(1000)])
+
+@case("update_student")
+def _(info, i):
+    student_id = info.students // 3 + i
+    return lambda: database.update_student(student_name(student_id), f"{student_name(student_id)} bis", 40, "C1")
+
+@case("update_student_by_id")
+def _(info, i):
+    student_id = info.students // 3 + i
+    return lambda: database.update_student_by_id(student_id, f"{student_name(student_id)} por id", 41, "C2")
+
+@case("delete_student")
+def _(info, i):
+    return lambda: database.delete_student(student_name(info.students - i))
+
+@case("delete_student_by_id")
+def _(info, i):
+    return lambda: database.delete_student_by_id(info.students * 3 // 4 - i)
+
+@case("insert_level")
+def _(info, i):
+    return lambda: database.insert_level(f"Nivel {i}")
+
+@case("update_level")
+def _(info, i):
+    return lambda: database.update_level(f"Nivel {i}", f"Nivel {i} bis")
+
+@case("delete_level")
+def _(info, i):
+    return lambda: database.delete_level(f"Nivel {i} bis")
+
+@case("update_level_by_id")
+def _(info, i):
+    level_id = database.insert_level(f"Nivel por id {i}")
+    return lambda: database.update_level_by_id(level_id, f"Nivel por id {i} bis")
+
+@case("delete_level_by_id")
+def _(info, i):
+    level_id = database.insert_level(f"Nivel borrado {i}")
+    return lambda: database.delete_level_by_id(level_id)
+
+@case("insert_class")
+def _(info, i):
+    return lambda: database.insert_class(f"Clase nueva {i}", REFERENCE_DATE, "Mary")
+
+@case("update_class")
+def _(info, i):
+    return lambda: database.update_class(class_name(i % info.classes + 1), f"Clase cambiada {i}", REFERENCE_DATE,
+                                         "John")
+
+@case("update_class_by_id")
+def _(info, i):
+    return lambda: database.update_class_by_id(i % info.classes + 1, f"Clase por id {i}", REFERENCE_DATE, "Emma")
+
+@case("delete_class")
+def _(info, i):
+    return lambda: database.delete_class(f"Clase nueva {i}")
+
+@case("delete_class_by_id")
+def _(info, i):
+    class_id = database.insert_class(f"Clase borrada {i}", REFERENCE_DATE, "Mary")
+    return lambda: database.delete_class_by_id(class_id)
+
+@case("insert_payment")
+def _(info, i):
+    return lambda: database.insert_payment(i % (info.students // 2) + 1, 60.0, REFERENCE_DATE, "tarjeta",
+                                           "mensualidad junio")
+
+@case("insert_payments_bulk")
+def _(info, i):
+    return lambda: database.insert_payments_bulk(
+        [(n % (info.students // 2) + 1, 45.0, REFERENCE_DATE, "efectivo", f"lote {i}") for n in range(1000)])
+
+@case("update_payment")
+def _(info, i):
+    return lambda: database.update_payment(i % info.payments + 1, 75.0, REFERENCE_DATE, "bizum", "corregido")
+
+@case("delete_payment")
+def _(info, i):
+    return lambda: database.delete_payment(info.payments // 2 + i)
+
+@case("insert_reward")
+def _(info, i):
+    return lambda: database.insert_reward(1, info.students // 4 + i, 3, REFERENCE_DATE)
+
+@case("delete_reward")
+def _(info, i):
+    return lambda: database.delete_reward(student_name(1), student_name(info.students // 4 + i))
+
+@case("delete_reward_by_id")
+def _(info, i):
+    return lambda: database.delete_reward_by_id(info.rewards // 2 + i)
+
+
+def missing_cases():
+    """Funciones públicas de db.database que no tienen prueba (ni motivo en NOT_BENCHMARKED)"""
+    covered = {function_name(name) for name in CASES} | set(NOT_BENCHMARKED)
+    return sorted(name for name, value in vars(database).items()
+                  if inspect.isfunction(value) and value.__module__ == database.__name__
+                  and not name.startswith("_") and name not in covered)
+
+
+def time_case(prepare, info, repeat, budget):
+    """
+    Mide una prueba hasta `repeat` veces (menos si se pasa de `budget` segundos).
+
+    Returns:
+        dict: runs, min_ms, median_ms, mean_ms y rows (filas de la lista devuelta, o None).
+    """
+    times = []
+    rows = None
+    for i in range(repeat):
+        invalidate()
+        call = prepare(info, i)
+        start = perf_counter()
+        result = call()
+        times.append(perf_counter() - start)
+        if isinstance(result, (list, set)):
+            rows = len(result)
+        if sum(times) >= budget:
+            break
+    return {"runs": len(times), "min_ms": min(times) * 1000, "median_ms": statistics.median(times) * 1000,
+            "mean_ms": statistics.fmean(times) * 1000, "rows": rows}
+
+
+def prepare_dataset(size, seed, folder):
+    """
+    Devuelve la ruta de la base de datos generada para el tamaño y la semilla, y
+    sus tamaños; si ya existe en la carpeta, se reutiliza.
+
+    Returns:
+        tuple: (ruta, DatasetInfo, segundos que tardó en generarse o None si se reutilizó)
+    """
+    path = os.path.join(folder, f"dataset_{size}_s{seed}.db")
+    if os.path.exists(path):
+        with sqlite3.connect(path) as conn:
+            rewards = conn.execute("SELECT COUNT(*) FROM rewards").fetchone()[0]
+        conn.close()
+        sizes = table_sizes(size)
+        return path, DatasetInfo(size, seed, sizes["users"], sizes["students"], sizes["classes"], size, rewards), None
+
+    start = perf_counter()
+    configure_pool(path)
+    try:
+        info = generate_dataset(size, seed)
+    finally:
+        close_pool()
+    return path, info, perf_counter() - start
+
+
+def run_size(size, seed=0, repeat=5, budget=2.0, data_dir=None, cases=None, memory=False, report=print):
+    """
+    Genera (o reutiliza) la base de datos de un tamaño y mide las pruebas sobre una copia.
+
+    Args:
+        size (int): Número de pagos.
+        seed (int): Semilla del generador.
+        repeat (int): Repeticiones máximas de cada prueba.
+        budget (float): Segundos tras los que una prueba deja de repetirse.
+        data_dir (str, optional): Carpeta donde se guardan las bases de datos generadas para
+            reutilizarlas; por defecto, una temporal.
+        cases (list, optional): Nombres de las pruebas que se ejecutan; por defecto, todas.
+        memory (bool): Hacer las pruebas sobre una copia en memoria en lugar de en un fichero.
+        report (callable): Recibe una línea de texto por prueba terminada.
+
+    Returns:
+        dict: {"dataset": tamaños y segundos de generación, "functions": {prueba: tiempos}}
+    """
+    with tempfile.TemporaryDirectory() as folder:
+        template, info, generated = prepare_dataset(size, seed, data_dir or folder)
+        configure_pool(MEMORY if memory else os.path.join(folder, "bench.db"))
+        try:
+            copy_database(template)
+            results = {}
+            for name, prepare in CASES.items():
+                if cases is not None and name not in cases:
+                    continue
+                results[name] = time_case(prepare, info, repeat, budget)
+                report(f"{size:>9}  {name:<42}{results[name]['median_ms']:>12.3f} ms")
+        finally:
+            close_pool()
+
+    dataset = info._asdict()
+    dataset["generate_s"] = generated
+    return {"dataset": dataset, "functions": results}
+
+
+def compare(previous, current, threshold=0.2):
+    """
+    Compara dos resultados (con el formato del JSON) por la mediana de cada prueba.
+
+    Returns:
+        list of tuples: (tamaño, prueba, mediana anterior, mediana actual, cociente), de las
+            pruebas que están en los dos y son más de un `threshold` más lentas.
+    """
+    regressions = []
+    for size, result in current["results"].items():
+        before = previous["results"].get(size)
+        if before is None:
+            continue
+        for name, timing in result["functions"].items():
+            old = before["functions"].get(name)
+            if old is None or old["median_ms"] <= 0:
+                continue
+            ratio = timing["median_ms"] / old["median_ms"]
+            if ratio > 1 + threshold:
+                regressions.append((size, name, old["median_ms"], timing["median_ms"], ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Tamaños (número de pagos)")
+    parser.add_argument("--seed", type=int, default=0, help="Semilla del generador de datos")
+    parser.add_argument("--repeat", type=int, default=5, help="Repeticiones máximas de cada prueba")
+    parser.add_argument("--budget", type=float, default=2.0, help="Segundos máximos que se repite cada prueba")
+    parser.add_argument("--case", action="append", dest="cases", help="Ejecuta solo esta prueba (repetible)")
+    parser.add_argument("--data-dir", help="Carpeta donde guardar y reutilizar las bases de datos generadas")
+    parser.add_argument("--memory", action="store_true", help="Hacer las pruebas sobre una copia en memoria")
+    parser.add_argument("--label", default="", help="Etiqueta de la versión medida (se guarda en el JSON)")
+    parser.add_argument("--output", default=f"benchmarks/results/{datetime.now():%Y%m%d-%H%M%S}.json",
+                        help="Fichero JSON de resultados")
+    parser.add_argument("--compare", help="JSON de una ejecución anterior con el que comparar")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Cuánto más lenta (0.2 = un 20%%) tiene que ser una prueba para avisar")
+    args = parser.parse_args()
+
+    missing = missing_cases()
+    if missing:
+        print(f"Aviso: funciones sin prueba de rendimiento: {', '.join(missing)}")
+    if args.cases:
+        unknown = set(args.cases) - set(CASES)
+        if unknown:
+            parser.error(f"pruebas desconocidas: {', '.join(sorted(unknown))}")
+    if args.data_dir:
+        os.makedirs(args.data_dir, exist_ok=True)
+
+    output = {
+        "label": args.label,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "seed": args.seed,
+        "memory": args.memory,
+        "results": {},
+    }
+    for size in args.sizes:
+        output["results"][str(size)] = run_size(size, args.seed, args.repeat, args.budget, args.data_dir,
+                                                args.cases, args.memory)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(output, file, indent=2, ensure_ascii=False)
+    print(f"Resultados guardados en {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            previous = json.load(file)
+        regressions = compare(previous, output, args.threshold)
+        for size, name, before, after, ratio in regressions:
+            print(f"Más lenta: {size:>9}  {name:<42}{before:>10.3f} ms -> {after:>10.3f} ms ({ratio:.2f}x)")
+        if regressions:
+            sys.exit(1)
+        print("Ninguna prueba es más lenta que en la ejecución anterior")
+
+
+if __name__ == "__main__":
+    main()
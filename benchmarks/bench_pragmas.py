@@ -0,0 +1,85 @@
+"""
+Compara el rendimiento de la base de datos con la configuración por defecto de
+SQLite (journal en modo DELETE, synchronous=FULL) y con el perfil de
+db/settings.py (WAL, synchronous=NORMAL, caché...).
+
+Uso:
+    python -m benchmarks.bench_pragmas [--payments 2000]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from db.connection import configure_pool, close_pool, get_connection
+from db.settings import load_pragmas
+from db import database
+
+# Configuración de fábrica de SQLite (la que había antes de db/settings.py)
+SQLITE_DEFAULTS = {"journal_mode": "DELETE", "synchronous": "FULL", "foreign_keys": "OFF"}
+
+
+def _timed(function):
+    """Ejecuta la función y devuelve los segundos que ha tardado"""
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def run_profile(pragmas, payments):
+    """
+    Mide inserciones y lecturas sobre una base de datos nueva con el perfil indicado.
+
+    Returns:
+        dict: Operaciones por segundo de cada prueba.
+    """
+    with tempfile.TemporaryDirectory() as folder:
+        configure_pool(os.path.join(folder, "bench.db"), pragmas=pragmas)
+        try:
+            return _run_tests(payments)
+        finally:
+            close_pool()
+
+
+def _run_tests(payments):
+    """Pruebas que se ejecutan sobre el pool ya configurado"""
+    database.create_tables()
+    for i in range(50):
+        database.insert_student(f"Alumno {i}", 20, "B1")
+
+    def insert_each():
+        # Cada inserción en su propia transacción, como hace la interfaz
+        for i in range(payments):
+            database.insert_payment(i % 50 + 1, 10.0, f"2025-01-{i % 28 + 1:02d}", "efectivo", f"pago {i}")
+
+    def insert_batch():
+        with get_connection():  # Todas las inserciones en una única transacción
+            for i in range(payments):
+                database.insert_payment(i % 50 + 1, 10.0, f"2025-02-{i % 28 + 1:02d}", "efectivo", f"pago {i}")
+
+    def read_pages():
+        for offset in range(0, payments, 100):
+            database.fetch_payments_page(offset=offset, limit=100)
+
+    return {
+        "insert (1 transacción por pago)": payments / _timed(insert_each),
+        "insert (1 transacción en total)": payments / _timed(insert_batch),
+        "lectura de páginas de 100": (payments // 100) / _timed(read_pages),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--payments", type=int, default=2000, help="Número de pagos insertados en cada prueba")
+    args = parser.parse_args()
+
+    before = run_profile(SQLITE_DEFAULTS, args.payments)
+    after = run_profile(load_pragmas(), args.payments)
+
+    print(f"{'Prueba':<34}{'Por defecto':>14}{'Perfil':>14}{'Mejora':>10}")
+    for test in before:
+        print(f"{test:<34}{before[test]:>12.0f}/s{after[test]:>12.0f}/s{after[test] / before[test]:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
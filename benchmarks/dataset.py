@@ -0,0 +1,186 @@
+"""
+Genera una base de datos sintética y reproducible para las pruebas de
+rendimiento: alumnos, niveles, clases, usuarios, pagos repartidos en varios
+años y recompensas que forman cadenas de recomendaciones (un alumno trae a
+otro, que a su vez trae a otro...).
+
+El tamaño es el número de pagos; el resto de tablas crece en proporción. Con la
+misma semilla se obtienen siempre los mismos datos, y los ids empiezan en 1, así
+que las pruebas pueden calcular nombres e ids sin consultarlos.
+
+Uso:
+    python -m benchmarks.dataset 100000 datos.db [--seed 0]
+"""
+
+import argparse
+import os
+import random
+from contextlib import nullcontext
+from datetime import date
+from typing import NamedTuple
+from db.auth import hash_password
+from db.connection import configure_pool, close_pool, get_connection
+from db.migrations import deferred_search_index, deferred_revenue_summaries
+from db import database
+
+# Filas que se envían en cada executemany
+BATCH_SIZE = 10000
+
+# Fecha en la que se consultan los bonos: los datos cubren de 2019 a 2025
+REFERENCE_DATE = "2025-06-15"
+FIRST_DAY = date(2019, 1, 1).toordinal()
+LAST_DAY = date(2025, 12, 31).toordinal()
+
+FIRST_NAMES = ["Íñigo", "Lucía", "Martín", "Sofía", "Hugo", "Martina", "Pablo", "Valeria", "Álvaro", "Noelia",
+               "Mateo", "Julia", "Adrián", "Paula", "Sergio", "Irene", "Jesús", "Elena", "Óscar", "Nuria"]
+LAST_NAMES = ["García", "Fernández", "González", "Rodríguez", "López", "Martínez", "Sánchez", "Pérez", "Gómez",
+              "Martín", "Jiménez", "Ruiz", "Hernández", "Díaz", "Moreno", "Muñoz", "Álvarez", "Romero"]
+LEVELS = ["A1", "A2", "B1", "B2", "C1", "C2", "A1_Ad", "A2_Ad", "B1_Ad", "B2_Ad", "C1_Ad", "C2_Ad"]
+PROFESSORS = ["Mary", "John", "Sarah", "Patrick", "Emma"]
+METHODS = ["efectivo", "tarjeta", "transferencia", "bizum", None]
+MONTHS = ["enero", "febrero", "marzo", "abril", "mayo", "junio", "julio", "agosto", "septiembre", "octubre",
+          "noviembre", "diciembre"]
+AMOUNTS = [45.0, 60.0, 75.0, 90.0, 120.0]
+# Nombre de cada recompensa según los meses premiados (como en insert_reward)
+REWARD_NAMES = {1: "Eire", 3: "Canada", 6: "USA"}
+# Parte de los alumnos que llega recomendada por otro, y de esos, cuántos siguen la cadena
+REFERRED_SHARE = 0.2
+CHAIN_SHARE = 0.5
+
+
+class DatasetInfo(NamedTuple):
+    """Tamaño de cada tabla de una base de datos generada"""
+    size: int
+    seed: int
+    users: int
+    students: int
+    classes: int
+    payments: int
+    rewards: int
+
+
+def table_sizes(size):
+    """Número de usuarios, alumnos, clases y pagos para un tamaño (pagos)"""
+    return {"users": 5, "students": max(size // 10, 10), "classes": max(size // 100, 5), "payments": size}
+
+
+def student_name(student_id):
+    """Nombre del alumno con ese id (únicos y con acentos, como los reales)"""
+    first = FIRST_NAMES[student_id % len(FIRST_NAMES)]
+    last = LAST_NAMES[(student_id // len(FIRST_NAMES)) % len(LAST_NAMES)]
+    return f"{first} {last} {student_id}"
+
+
+def class_name(class_id):
+    return f"Clase {class_id}"
+
+
+def username(user_id):
+    return f"usuario{user_id}"
+
+
+def _random_day(rng):
+    return date.fromordinal(rng.randint(FIRST_DAY, LAST_DAY)).isoformat()
+
+
+def _batches(rows):
+    """Agrupa un generador de filas en listas de BATCH_SIZE"""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _insert(conn, sql, rows, table=None):
+    """
+    Inserta las filas por bloques; el índice de búsqueda de la tabla (y, en los
+    pagos, las tablas resumen de ingresos) se rellena al final
+    """
+    cursor = conn.cursor()
+    if table is None:
+        for batch in _batches(rows):
+            cursor.executemany(sql, batch)
+        return
+    summaries = deferred_revenue_summaries(conn) if table == "payments" else nullcontext()
+    with deferred_search_index(conn, table), summaries:
+        for batch in _batches(rows):
+            cursor.executemany(sql, batch)
+
+
+def generate_dataset(size, seed=0):
+    """
+    Llena la base de datos del pool (que debe estar vacía) con datos sintéticos.
+
+    Args:
+        size (int): Número de pagos; alumnos, clases y recompensas crecen en proporción.
+        seed (int): Semilla de los datos aleatorios.
+
+    Returns:
+        DatasetInfo: Filas generadas en cada tabla.
+    """
+    rng = random.Random(seed)
+    sizes = table_sizes(size)
+    students = sizes["students"]
+    database.create_tables()
+    database.init_levels()
+    password = hash_password("benchmark")  # Un solo hash para todos: es lento a propósito
+
+    with get_connection() as conn:
+        _insert(conn, "INSERT INTO users (id, username, password, role) VALUES (?, ?, ?, ?)",
+                ((i, username(i), password, "admin" if i == 1 else "user") for i in range(1, sizes["users"] + 1)))
+        _insert(conn, "INSERT INTO students (id, name, age, level, user_id) VALUES (?, ?, ?, ?, ?)",
+                ((i, student_name(i), rng.randint(6, 70), rng.choice(LEVELS),
+                  rng.randint(1, sizes["users"]) if rng.random() < 0.05 else None)
+                 for i in range(1, students + 1)), "students")
+        _insert(conn, "INSERT INTO classes (id, name, date, professor) VALUES (?, ?, ?, ?)",
+                ((i, class_name(i), _random_day(rng), rng.choice(PROFESSORS))
+                 for i in range(1, sizes["classes"] + 1)))
+        _insert(conn, "INSERT INTO payments (id, student_id, amount, date, method, notes) VALUES (?, ?, ?, ?, ?, ?)",
+                ((i, rng.randint(1, students), rng.choice(AMOUNTS), day, rng.choice(METHODS),
+                  f"mensualidad {MONTHS[int(day[5:7]) - 1]}" if rng.random() < 0.8 else rng.choice(
+                      ["matrícula", "material", "clase suelta", None]))
+                 for i, day in ((i, _random_day(rng)) for i in range(1, size + 1))), "payments")
+        _insert(conn, '''INSERT INTO rewards (recommender_id, new_student_id, reward_name, months_rewarded,
+                                              date_awarded) VALUES (?, ?, ?, ?, ?)''',
+                _rewards(rng, students), "rewards")
+        rewards = conn.execute("SELECT COUNT(*) FROM rewards").fetchone()[0]
+
+    return DatasetInfo(size, seed, sizes["users"], students, sizes["classes"], size, rewards)
+
+
+def _rewards(rng, students):
+    """Recompensas: cada alumno recomendado tiene una; la mitad las da el alumno anterior (cadenas)"""
+    for new_student in range(2, students + 1):
+        if rng.random() >= REFERRED_SHARE:
+            continue
+        if rng.random() < CHAIN_SHARE:
+            recommender = new_student - 1
+        else:
+            recommender = rng.randint(1, new_student - 1)
+        months = rng.choice(list(REWARD_NAMES))
+        yield recommender, new_student, REWARD_NAMES[months], months, _random_day(rng)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("size", type=int, help="Número de pagos")
+    parser.add_argument("path", help="Fichero de base de datos que se crea (no debe existir)")
+    parser.add_argument("--seed", type=int, default=0, help="Semilla de los datos aleatorios")
+    args = parser.parse_args()
+    if os.path.exists(args.path):
+        parser.error(f"{args.path} ya existe")
+
+    configure_pool(args.path)
+    try:
+        info = generate_dataset(args.size, args.seed)
+    finally:
+        close_pool()
+    print(", ".join(f"{field}: {value}" for field, value in info._asdict().items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+# ==============================
+# AUTENTICACIÓN Y CONTRASEÑAS
+# ==============================
+# Las contraseñas se guardan como un hash con sal calculado con una función de
+# derivación de claves deliberadamente costosa (scrypt, o PBKDF2-SHA256 si el
+# Python instalado no trae scrypt). El texto guardado incluye el algoritmo y sus
+# parámetros, así que se pueden endurecer más adelante sin invalidar los hashes
+# existentes: al iniciar sesión se vuelven a calcular con los parámetros nuevos.
+#
+#   scrypt$16384$8$1$<sal en base64>$<hash en base64>
+#   pbkdf2_sha256$600000$<sal en base64>$<hash en base64>
+
+import base64
+import hashlib
+import hmac
+import os
+from functools import lru_cache
+from db.connection import get_connection
+from db.events import publish, UPDATE
+
+# Parámetros de scrypt: n (coste de CPU y memoria, potencia de 2), r (tamaño de bloque) y p (paralelismo).
+# Con estos valores cada comprobación tarda unas decenas de milisegundos y usa 16 MB.
+SCRYPT_PARAMS = {"n": 2 ** 14, "r": 8, "p": 1}
+
+# Iteraciones de PBKDF2-SHA256, solo si hashlib no tiene scrypt (OpenSSL antiguo)
+PBKDF2_ITERATIONS = 600000
+
+SALT_BYTES = 16
+HASH_BYTES = 32
+
+# Algoritmo con el que se calculan los hashes nuevos
+DEFAULT_ALGORITHM = "scrypt" if hasattr(hashlib, "scrypt") else "pbkdf2_sha256"
+
+
+def _b64encode(data):
+    return base64.b64encode(data).decode("ascii")
+
+
+def _derive(algorithm, password, salt, params):
+    """Calcula el hash de la contraseña con el algoritmo y los parámetros indicados"""
+    if algorithm == "scrypt":
+        n, r, p = params
+        return hashlib.scrypt(password.encode("utf-8"), salt=salt, n=n, r=r, p=p,
+                              maxmem=128 * r * n * 2, dklen=HASH_BYTES)
+    (iterations,) = params
+    return hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations, dklen=HASH_BYTES)
+
+
+def _current_params(algorithm):
+    if algorithm == "scrypt":
+        return [SCRYPT_PARAMS["n"], SCRYPT_PARAMS["r"], SCRYPT_PARAMS["p"]]
+    return [PBKDF2_ITERATIONS]
+
+
+def hash_password(password, algorithm=DEFAULT_ALGORITHM):
+    """
+    Calcula el hash con sal aleatoria de una contraseña, listo para guardarlo en users.password.
+
+    Args:
+        password (str): Contraseña en claro.
+        algorithm (str): "scrypt" o "pbkdf2_sha256".
+
+    Returns:
+        str: Algoritmo, parámetros, sal y hash separados por '$'.
+    """
+    salt = os.urandom(SALT_BYTES)
+    params = _current_params(algorithm)
+    digest = _derive(algorithm, password, salt, params)
+    return "$".join([algorithm] + [str(value) for value in params] + [_b64encode(salt), _b64encode(digest)])
+
+
+def _parse(stored):
+    """Separa un hash guardado en (algoritmo, parámetros, sal, hash); None si no es un hash reconocido"""
+    parts = (stored or "").split("$")
+    expected = {"scrypt": 6, "pbkdf2_sha256": 4}.get(parts[0])
+    if expected is None or len(parts) != expected:
+        return None
+    try:
+        params = [int(value) for value in parts[1:-2]]
+        return parts[0], params, base64.b64decode(parts[-2]), base64.b64decode(parts[-1])
+    except ValueError:
+        return None
+
+
+def is_hashed(stored):
+    """Indica si el valor guardado es un hash de este módulo (y no una contraseña antigua en claro)"""
+    return _parse(stored) is not None
+
+
+def verify_password(password, stored):
+    """
+    Comprueba una contraseña contra el valor guardado, en tiempo constante.
+
+    Un valor que no es un hash reconocido (por ejemplo, una contraseña en claro)
+    nunca se acepta: la migración 5 convierte las antiguas, también al restaurar
+    una copia anterior (db.backup.restore_database aplica las migraciones).
+
+    Returns:
+        bool: True si la contraseña es correcta.
+    """
+    parsed = _parse(stored)
+    if parsed is None:
+        return False
+    algorithm, params, salt, digest = parsed
+    if algorithm == "scrypt" and not hasattr(hashlib, "scrypt"):
+        return False
+    return hmac.compare_digest(_derive(algorithm, password, salt, params), digest)
+
+
+def needs_rehash(stored):
+    """Indica si el valor guardado no es un hash o usa otro algoritmo o parámetros distintos de los actuales"""
+    parsed = _parse(stored)
+    return parsed is None or parsed[0] != DEFAULT_ALGORITHM or parsed[1] != _current_params(DEFAULT_ALGORITHM)
+
+
+@lru_cache(maxsize=1)
+def _dummy_hash():
+    """Hash con el que se comparan los usuarios que no existen, para que tarden lo mismo que los que sí"""
+    return hash_password("usuario-inexistente")
+
+
+def authenticate(username, password):
+    """
+    Comprueba las credenciales con una sola consulta por nombre de usuario.
+
+    El cálculo del hash es costoso a propósito: desde la interfaz se llama en un
+    hilo aparte (ui/auth_worker.py). Si la contraseña es correcta pero el hash usa
+    un algoritmo o parámetros antiguos, se guarda de nuevo con los actuales.
+
+    Args:
+        username (str): Nombre de usuario.
+        password (str): Contraseña en claro.
+
+    Returns:
+        tuple: (username, role) si las credenciales son correctas; None en caso contrario.
+    """
+    with get_connection() as conn:
+        row = conn.execute("SELECT id, username, password, role FROM users WHERE username = ?",
+                           (username,)).fetchone()
+
+    if row is None:
+        verify_password(password, _dummy_hash())
+        return None
+
+    user_id, username, stored, role = row
+    if not verify_password(password, stored):
+        return None
+
+    if needs_rehash(stored):
+        with get_connection() as conn:
+            conn.execute("UPDATE users SET password = ? WHERE id = ?", (hash_password(password), user_id))
+            publish("users", UPDATE, user_id)
+    return username, role
+
+
+def hash_plaintext_passwords(conn):
+    """
+    Sustituye por su hash las contraseñas guardadas en claro (paso de migración).
+
+    Las vacías o NULL se dejan como están: no son un hash, así que verify_password
+    las rechaza y esos usuarios no pueden entrar hasta que se les asigne una.
+
+    Args:
+        conn (sqlite3.Connection): Conexión en la que se aplica la migración.
+
+    Returns:
+        int: Número de contraseñas convertidas.
+    """
+    rows = conn.execute("SELECT id, password FROM users").fetchall()
+    plaintext = [(hash_password(password), user_id) for user_id, password in rows
+                 if password and not is_hashed(password)]
+    conn.executemany("UPDATE users SET password = ? WHERE id = ?", plaintext)
+    return len(plaintext)
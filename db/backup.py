@@ -0,0 +1,207 @@
+# ==============================
+# COPIAS DE SEGURIDAD EN CALIENTE
+# ==============================
+# Las copias se hacen con la API de backup de SQLite (sqlite3.Connection.backup),
+# que copia la base de datos por bloques de páginas mientras la aplicación sigue
+# usándola: entre bloque y bloque se libera el bloqueo, así que las escrituras de
+# otras conexiones no se quedan esperando a que termine la copia, y si alguna
+# modifica la base de datos SQLite rehace la copia para que sea coherente.
+
+import gzip
+import os
+import shutil
+import sqlite3
+import tempfile
+from db.cache import invalidate
+from db.events import publish, RELOAD
+from db.connection import get_connection, get_pool
+from db.migrations import get_schema_version, latest_version, MigrationError
+from db.settings import apply_pragmas
+
+# Páginas que se copian en cada paso (con páginas de 4 KB, 1 MB por paso)
+BACKUP_PAGES_PER_STEP = 256
+
+# Extensión de las copias comprimidas
+COMPRESSED_SUFFIX = ".gz"
+
+
+class BackupError(Exception):
+    """Error al crear, verificar o restaurar una copia de seguridad"""
+
+
+def is_compressed(path):
+    """Indica si la ruta corresponde a una copia comprimida con gzip"""
+    return path.lower().endswith(COMPRESSED_SUFFIX)
+
+
+def _progress_callback(progress):
+    """Adapta el callback de sqlite3 (status, remaining, total) a progress(copiadas, total)"""
+    if progress is None:
+        return None
+    return lambda status, remaining, total: progress(total - remaining, total)
+
+
+def temp_path_next_to(path):
+    """Reserva un fichero temporal en la misma carpeta que path (para poder moverlo después)"""
+    fd, temp = tempfile.mkstemp(suffix=".db", dir=os.path.dirname(os.path.abspath(path)))
+    os.close(fd)
+    return temp
+
+
+def verify_backup(path):
+    """
+    Comprueba una copia con PRAGMA integrity_check.
+
+    Args:
+        path (str): Ruta de la copia (sin comprimir).
+
+    Raises:
+        BackupError: Si el fichero no es una base de datos válida o está dañado.
+    """
+    try:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            result = [row[0] for row in conn.execute("PRAGMA integrity_check")]
+        finally:
+            conn.close()
+    except sqlite3.DatabaseError as e:
+        raise BackupError(f"El archivo no es una base de datos válida: {e}") from e
+
+    if result != ["ok"]:
+        raise BackupError("La copia está dañada:\n" + "\n".join(result[:10]))
+
+
+def backup_database(dest_path, compress=None, progress=None, pages=BACKUP_PAGES_PER_STEP):
+    """
+    Hace una copia coherente de la base de datos en uso sin detener la aplicación.
+
+    La copia se escribe primero en un fichero temporal, se verifica con
+    integrity_check y solo entonces se mueve (o se comprime) a su destino, así
+    que nunca queda un backup a medias con el nombre definitivo.
+
+    Args:
+        dest_path (str): Ruta del fichero de backup.
+        compress (bool, optional): Comprimir con gzip. Por defecto, si la ruta termina en .gz.
+        progress (callable, optional): Recibe (páginas copiadas, páginas totales) tras cada paso.
+        pages (int): Páginas copiadas en cada paso.
+
+    Returns:
+        str: Ruta del backup creado.
+    """
+    if compress is None:
+        compress = is_compressed(dest_path)
+
+    temp = temp_path_next_to(dest_path)
+    try:
+        target = sqlite3.connect(temp)
+        try:
+            with get_connection() as conn:
+                conn.backup(target, pages=pages, progress=_progress_callback(progress))
+            # La copia hereda el modo WAL: un backup es un único fichero, sin -wal ni -shm al abrirlo
+            target.execute("PRAGMA journal_mode = DELETE")
+        finally:
+            target.close()
+
+        verify_backup(temp)
+
+        if compress:
+            with open(temp, "rb") as source, gzip.open(dest_path, "wb") as output:
+                shutil.copyfileobj(source, output)
+        else:
+            os.replace(temp, dest_path)
+    finally:
+        if os.path.exists(temp):
+            os.remove(temp)
+
+    return dest_path
+
+
+def restore_database(backup_path, progress=None, pages=BACKUP_PAGES_PER_STEP):
+    """
+    Sustituye el contenido de la base de datos en uso por el de un backup, sin reiniciar.
+
+    La base de datos en uso no se toca hasta que el backup está listo: se copia
+    a un fichero temporal, se verifica, se le aplican las migraciones pendientes
+    (por si es de una versión anterior) y se vuelve a verificar. Si algo falla,
+    se descarta la copia. Solo entonces se copia sobre la base de datos en uso
+    con la misma API de backup en sentido inverso, a través de una conexión del
+    pool, así que el resto de conexiones ven los datos restaurados en su
+    siguiente consulta.
+
+    Args:
+        backup_path (str): Ruta del backup (.db o .db.gz).
+        progress (callable, optional): Recibe (páginas copiadas, páginas totales) tras cada paso.
+        pages (int): Páginas copiadas en cada paso.
+
+    Raises:
+        BackupError: Si el backup está dañado, es de una versión más nueva de la aplicación
+            o no se puede actualizar al esquema actual.
+    """
+    from db.database import create_tables  # Import diferido: database no depende de este módulo
+
+    temp = temp_path_next_to(backup_path)
+    try:
+        if is_compressed(backup_path):
+            with gzip.open(backup_path, "rb") as source, open(temp, "wb") as output:
+                shutil.copyfileobj(source, output)
+        else:
+            shutil.copyfile(backup_path, temp)  # Un backup es un fichero completo: no hace falta la API de backup
+
+        prepared = sqlite3.connect(temp)
+        try:
+            # La copia hereda el modo WAL del backup: se pasa a journal normal para que ni la verificación
+            # (de solo lectura) ni las migraciones dejen ficheros -wal y -shm junto a la copia temporal
+            try:
+                prepared.execute("PRAGMA journal_mode = DELETE")
+            except sqlite3.DatabaseError as e:
+                raise BackupError(f"El archivo no es una base de datos válida: {e}") from e
+            verify_backup(temp)
+
+            version = get_schema_version(prepared)
+            if version > latest_version():
+                raise BackupError(
+                    f"El backup es de una versión más nueva de la aplicación (esquema {version})")
+            # Las migraciones, con las mismas comprobaciones (claves foráneas...) que en la base de datos en uso
+            apply_pragmas(prepared, dict(get_pool().pragmas, journal_mode="DELETE"))
+            create_tables(prepared)  # Pone al día el esquema si el backup es de una versión anterior
+        except MigrationError as e:
+            raise BackupError(f"No se pudo actualizar el backup al esquema actual: {e}") from e
+        finally:
+            prepared.close()
+        verify_backup(temp)
+
+        source = sqlite3.connect(temp)
+        try:
+            with get_connection() as conn:
+                source.backup(conn, pages=pages, progress=_progress_callback(progress))
+        finally:
+            source.close()
+    except (OSError, EOFError) as e:
+        raise BackupError(f"No se pudo leer el backup: {e}") from e
+    finally:
+        if os.path.exists(temp):
+            os.remove(temp)
+
+    publish(None, RELOAD)  # Han cambiado todos los datos: se vacía la caché y se avisa a las ventanas
+
+
+def copy_database(source_path, pages=-1):
+    """
+    Copia de una vez una base de datos (por ejemplo, una plantilla ya preparada)
+    sobre la del pool, con la API de backup. Es mucho más rápido que crear las
+    tablas y aplicar las migraciones, y sirve también con bases de datos en memoria.
+
+    A diferencia de restore_database no verifica el origen ni avisa a las
+    ventanas: es para pruebas y herramientas que preparan una base de datos nueva.
+
+    Args:
+        source_path (str): Ruta del fichero o URI de SQLite (file:...) de origen.
+        pages (int): Páginas copiadas en cada paso (-1, todas de una vez).
+    """
+    source = sqlite3.connect(source_path, uri=source_path.startswith("file:"))
+    try:
+        with get_connection() as conn:
+            source.backup(conn, pages=pages)
+    finally:
+        source.close()
+    invalidate()  # Lo que hubiera en la caché era de la base de datos anterior
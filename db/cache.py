@@ -0,0 +1,138 @@
+# ==============================
+# CACHÉ DE DATOS DE REFERENCIA
+# ==============================
+# Alumnos, niveles y usuarios cambian poco pero se leen cada vez que se abre una
+# ventana (para rellenar los desplegables). Esta caché guarda en memoria el
+# resultado de esas consultas y lo descarta cuando las funciones de escritura de
+# db.database avisan de que una tabla ha cambiado: cada tabla tiene un número de
+# versión y una entrada solo vale mientras la versión no cambie.
+#
+# Todas las funciones de escritura avisan, también las de tablas que no se
+# guardan en caché (pagos, clases, recompensas), así que las versiones sirven
+# además de contador de cambios: las ventanas comparan las de sus tablas para
+# saber si tienen que recargar algo (ui/window_registry.py).
+
+import threading
+from functools import wraps
+from db.connection import get_pool, on_transaction_end
+
+
+class ReferenceCache:
+    """Resultados de consultas agrupados por tabla, con invalidación por versión y contadores"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions = {}  # tabla -> versión actual
+        self._generation = 0  # Sube al descartar todas las tablas a la vez
+        self._entries = {}  # (tabla, clave) -> (versión, valor)
+        self._pool = None  # Pool (base de datos) al que pertenecen las entradas
+        self.hits = 0
+        self.misses = 0
+
+    def _check_pool(self, pool):
+        """Si se ha cambiado de base de datos (configure_pool, pruebas...) lo guardado ya no sirve"""
+        if pool is not self._pool:
+            self._generation += 1
+            self._entries.clear()
+            self._pool = pool
+
+    def _version(self, table):
+        """Versión de la tabla (se llama con el lock cogido)"""
+        return self._generation, self._versions.get(table, 0)
+
+    def get(self, table, key, load):
+        """
+        Devuelve el valor guardado para la clave o lo calcula con load() y lo guarda.
+
+        Args:
+            table (str): Tabla de la que depende el valor.
+            key (hashable): Identifica la consulta (función y argumentos).
+            load (callable): Lee el valor de la base de datos si no está en caché.
+        """
+        pool = get_pool()
+        with self._lock:
+            self._check_pool(pool)
+            version = self._version(table)
+            entry = self._entries.get((table, key))
+            if entry is not None and entry[0] == version:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        value = load()
+
+        with self._lock:
+            # Si la tabla cambió mientras se leía, el valor puede estar desfasado: no se guarda
+            if self._version(table) == version and self._pool is pool:
+                self._entries[(table, key)] = (version, value)
+        return value
+
+    def invalidate(self, *tables):
+        """Descarta lo guardado de las tablas indicadas (de todas si no se indica ninguna)"""
+        with self._lock:
+            if not tables:
+                self._generation += 1
+                self._entries.clear()
+                return
+            self._entries = {key: entry for key, entry in self._entries.items() if key[0] not in tables}
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+
+    def versions(self, tables):
+        """Devuelve la versión actual de cada tabla (cambia con cualquier escritura en ella)"""
+        pool = get_pool()
+        with self._lock:
+            self._check_pool(pool)
+            return tuple(self._version(table) for table in tables)
+
+    def stats(self):
+        """Devuelve los aciertos, fallos y entradas guardadas"""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+
+# Caché compartida por toda la aplicación
+_cache = ReferenceCache()
+
+
+def cached(table):
+    """
+    Decorador para funciones de lectura cuyo resultado depende solo de la tabla
+    indicada y de sus argumentos. Las listas se devuelven copiadas para que quien
+    las reciba pueda modificarlas sin tocar la caché.
+    """
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            key = (function.__name__, args, tuple(sorted(kwargs.items())))
+            value = _cache.get(table, key, lambda: function(*args, **kwargs))
+            return list(value) if isinstance(value, list) else value
+        return wrapper
+    return decorator
+
+
+def invalidate(*tables):
+    """
+    Avisa de que las tablas han cambiado (o todas, si no se indica ninguna).
+
+    Se descartan ya, para que la propia transacción lea sus cambios, y otra vez
+    al confirmarse o deshacerse la transacción: así no queda guardado lo que otro
+    hilo haya leído mientras tanto de la versión anterior.
+    """
+    _cache.invalidate(*tables)
+    on_transaction_end(lambda: _cache.invalidate(*tables))
+
+
+def table_versions(tables):
+    """
+    Devuelve un valor que cambia cada vez que se escribe en alguna de las tablas.
+
+    Args:
+        tables (iterable): Nombres de las tablas.
+    """
+    return _cache.versions(tables)
+
+
+def cache_stats():
+    """Devuelve los contadores de la caché: {"hits", "misses", "entries"}"""
+    return _cache.stats()
@@ -0,0 +1,297 @@
+import itertools
+import os
+import sqlite3
+import threading
+import queue
+from contextlib import contextmanager
+from urllib.parse import urlsplit, parse_qs, unquote
+from db.settings import PROJECT_DIR, SETTINGS_PATH, load_pragmas, apply_pragmas, load_database_path
+
+# Ruta por defecto de la base de datos (junto al código, se lance desde donde se lance)
+DB_PATH = os.path.join(PROJECT_DIR, 'db', 'el_escondite_ingles.db')
+
+# Variable de entorno con la ubicación de la base de datos (más prioritaria que settings.ini)
+DB_ENV_VAR = 'ESCONDITE_DB'
+
+# Base de datos en memoria: se pierde al cerrar el pool (pruebas y herramientas)
+MEMORY = ':memory:'
+
+# Número máximo de conexiones ociosas que se guardan para reutilizar
+DEFAULT_POOL_SIZE = 4
+
+# Medidor de sentencias (db/profiling.py); None mientras la medición está desactivada
+_tracer = None
+
+# Numeración de las bases de datos en memoria, para que cada pool tenga la suya
+_memory_ids = itertools.count(1)
+
+
+def resolve_db_path(path=None, settings_path=SETTINGS_PATH):
+    """
+    Decide qué base de datos se usa, por orden de prioridad: la ruta indicada
+    (por ejemplo, la opción --db), la variable de entorno ESCONDITE_DB, la opción
+    path de la sección [database] de settings.ini y, si no hay ninguna, DB_PATH.
+
+    Args:
+        path (str, optional): Ruta de fichero, ':memory:' o URI de SQLite (file:...).
+        settings_path (str): Fichero de configuración del que se lee la sección [database].
+
+    Returns:
+        str: La ubicación elegida; las rutas relativas se devuelven absolutas.
+    """
+    location = path or os.environ.get(DB_ENV_VAR) or load_database_path(settings_path) or DB_PATH
+    if location == MEMORY or location.startswith("file:"):
+        return location
+    return os.path.abspath(os.path.expanduser(location))
+
+
+class ConnectionPool:
+    """
+    Pool de conexiones SQLite de larga duración.
+
+    Cada hilo obtiene una conexión del pool y la reutiliza mientras dure la
+    operación; si dentro de ella se llama a otra función de la base de datos,
+    se reaprovecha la misma conexión (y la misma transacción). Al terminar, la
+    conexión vuelve al pool en lugar de cerrarse.
+
+    La base de datos puede ser un fichero, ':memory:' o una URI de SQLite
+    (file:...?mode=memory&cache=shared, por ejemplo). Con ':memory:' cada
+    conexión tendría su propia base de datos vacía, así que se sustituye por una
+    en memoria con nombre y caché compartida. Las bases de datos en memoria se
+    mantienen vivas con una conexión propia del pool hasta que se cierra.
+    """
+
+    def __init__(self, path=None, size=DEFAULT_POOL_SIZE, pragmas=None):
+        path = resolve_db_path(path)
+        if path == MEMORY:
+            path = f"file:el_escondite_ingles_{next(_memory_ids)}?mode=memory&cache=shared"
+        self.path = path
+        self.uri = path.startswith("file:")
+        self.size = size
+        self.pragmas = load_pragmas() if pragmas is None else pragmas  # Perfil aplicado a cada conexión
+        self._idle = queue.LifoQueue(maxsize=size)  # Conexiones libres (la más reciente primero)
+        self._local = threading.local()  # Conexión en uso por cada hilo
+        self._lock = threading.Lock()
+        self._closed = False
+        self._keepalive = self.open_connection() if self.in_memory else None
+
+    @property
+    def in_memory(self):
+        """Indica si la base de datos está en memoria (se pierde al cerrar el pool)"""
+        if not self.uri:
+            return False
+        parts = urlsplit(self.path)
+        return parts.path == MEMORY or parse_qs(parts.query).get("mode") == ["memory"]
+
+    @property
+    def file_path(self):
+        """Ruta del fichero de la base de datos (también si se indicó como URI); None si está en memoria"""
+        if self.in_memory:
+            return None
+        if self.uri:
+            return os.path.abspath(unquote(urlsplit(self.path).path))
+        return self.path
+
+    def open_connection(self):
+        """
+        Abre una conexión nueva a la base de datos del pool con su perfil de PRAGMAs.
+        Las que entrega el pool se abren así; también sirve para una conexión
+        independiente que no vuelve al pool (scripts, db.database.connect_db).
+        """
+        # check_same_thread=False: una conexión ociosa puede acabar en otro hilo,
+        # pero nunca la usan dos hilos a la vez porque solo se entrega desde el pool
+        conn = sqlite3.connect(self.path, check_same_thread=False, uri=self.uri)
+        apply_pragmas(conn, self.pragmas)
+        return conn
+
+    @staticmethod
+    def _is_healthy(conn):
+        """Comprueba que una conexión reutilizada sigue siendo válida"""
+        try:
+            conn.execute("SELECT 1")
+            return not conn.in_transaction
+        except sqlite3.Error:
+            return False
+
+    def acquire(self):
+        """Entrega una conexión sana, reutilizando una ociosa si la hay"""
+        with self._lock:
+            if self._closed:
+                raise sqlite3.ProgrammingError("El pool de conexiones está cerrado")
+
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return self.open_connection()
+
+            if self._is_healthy(conn):
+                return conn
+            conn.close()  # Conexión rota: se descarta y se prueba con la siguiente
+
+    def release(self, conn):
+        """Devuelve una conexión al pool (o la cierra si el pool está lleno o cerrado)"""
+        if conn.in_transaction:
+            conn.rollback()
+
+        with self._lock:
+            if not self._closed:
+                try:
+                    self._idle.put_nowait(conn)
+                    return
+                except queue.Full:
+                    pass
+        conn.close()
+
+    @contextmanager
+    def connection(self):
+        """
+        Context manager que entrega la conexión del hilo actual.
+
+        Hace commit al salir del bloque más externo, o rollback si se produce
+        una excepción. Los bloques anidados comparten conexión y transacción.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            # Llamada anidada: reutilizamos la conexión del bloque exterior
+            self._local.depth += 1
+            try:
+                yield conn
+            finally:
+                self._local.depth -= 1
+            return
+
+        conn = self.acquire()
+        tracer = _tracer
+        if tracer is not None:
+            conn.set_trace_callback(tracer.trace)
+        self._local.conn = conn
+        self._local.depth = 1
+        self._local.callbacks = []
+        self._local.commit_callbacks = []
+        committed = False
+        try:
+            yield conn
+            conn.commit()
+            committed = True
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            callbacks = self._local.callbacks
+            if committed:
+                callbacks += self._local.commit_callbacks  # Después de los de fin de transacción
+            self._local.conn = None
+            self._local.depth = 0
+            self._local.callbacks = []
+            self._local.commit_callbacks = []
+            self.release(conn)
+            if tracer is not None:
+                tracer.block_ended()
+            for callback in callbacks:
+                callback()
+
+    def on_transaction_end(self, callback):
+        """
+        Ejecuta callback cuando termine (con commit o rollback) el bloque más
+        externo del hilo actual; si no hay ningún bloque abierto, en el momento.
+        """
+        if getattr(self._local, "conn", None) is None:
+            callback()
+        else:
+            self._local.callbacks.append(callback)
+
+    def on_commit(self, callback):
+        """
+        Ejecuta callback cuando se confirme el bloque más externo del hilo actual;
+        si se deshace, no se llama nunca. Sin ningún bloque abierto, en el momento.
+        """
+        if getattr(self._local, "conn", None) is None:
+            callback()
+        else:
+            self._local.commit_callbacks.append(callback)
+
+    def idle_count(self):
+        """Número de conexiones ociosas disponibles en el pool"""
+        return self._idle.qsize()
+
+    def close(self):
+        """Cierra todas las conexiones ociosas y no admite más peticiones"""
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+        if self._keepalive is not None:
+            self._keepalive.close()  # Con la última conexión desaparece la base de datos en memoria
+            self._keepalive = None
+
+
+# Pool compartido por toda la aplicación
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def configure_pool(path=None, size=DEFAULT_POOL_SIZE, pragmas=None):
+    """
+    Sustituye el pool global por uno nuevo con la ruta y tamaño indicados.
+
+    Args:
+        path (str, optional): Ruta del fichero, ':memory:' o URI de SQLite; por
+            defecto, la que indique resolve_db_path().
+        size (int): Número máximo de conexiones ociosas reutilizables.
+        pragmas (dict, optional): Perfil de PRAGMAs; por defecto, el de settings.ini.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+        _pool = ConnectionPool(path, size, pragmas)
+    return _pool
+
+
+def get_pool():
+    """Devuelve el pool global, creándolo la primera vez que se necesita (en resolve_db_path())"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool()
+        return _pool
+
+
+def get_connection():
+    """Atajo para `with get_connection() as conn:` sobre el pool global"""
+    return get_pool().connection()
+
+
+def set_tracer(tracer):
+    """
+    Instala el medidor de sentencias: cada conexión entregada le pasa sus
+    sentencias (set_trace_callback) y le avisa al terminar el bloque más externo.
+
+    Args:
+        tracer (object, optional): Con métodos trace(sql) y block_ended(); None lo desinstala.
+    """
+    global _tracer
+    _tracer = tracer
+
+
+def on_transaction_end(callback):
+    """Atajo para ConnectionPool.on_transaction_end sobre el pool global"""
+    get_pool().on_transaction_end(callback)
+
+
+def on_commit(callback):
+    """Atajo para ConnectionPool.on_commit sobre el pool global"""
+    get_pool().on_commit(callback)
+
+
+def close_pool():
+    """Cierra el pool global. Se llama al salir de la aplicación."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
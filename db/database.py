@@ -1,88 +1,252 @@
-import sqlite3
-from datetime import datetime
-from dateutil.relativedelta import relativedelta
+import re
+from contextlib import nullcontext
+from db.connection import get_connection, get_pool
+from db.cache import cached
+from db.events import publish, publish_rows, INSERT, UPDATE, DELETE
+from db.auth import hash_password
+from db.migrations import (migrate, deferred_search_index, deferred_revenue_summaries, get_schema_version,
+                           latest_version)
+from db.dates import iso_date, today, week_range
+from db.rows import (User, Student, StudentWithUser, Level, ClassSession, Payment, Reward, ExpiringBonus,
+                     MonthlyTotal, row_factory)
+
+# Filas que se leen del cursor en cada bloque al recorrer consultas grandes (exportaciones)
+EXPORT_BATCH_SIZE = 500
 
 # Conectar a la base de datos (o crearla si no existe)
 def connect_db():
-    """Conecta a la base de datos"""
-    conn = sqlite3.connect('db/el_escondite_ingles.db')  # Ruta de la base de datos
-    return conn
+    """
+    Abre una conexión independiente a la base de datos.
+
+    Las funciones de este módulo usan el pool de db.connection; esta función
+    queda para scripts y pruebas que gestionan su propia conexión. Abre la misma
+    base de datos que el pool (ver db.connection.resolve_db_path), con su perfil
+    de PRAGMAs.
+    """
+    return get_pool().open_connection()
 
 # Crear tablas
-def create_tables():
-    """Crea las tablas necesarias en la base de datos"""
-    conn = connect_db()
-    cursor = conn.cursor()
+def create_tables(conn=None):
+    """
+    Crea las tablas necesarias en la base de datos y aplica las migraciones pendientes.
 
-    # Crear tabla de usuarios
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS users (
-        id INTEGER PRIMARY KEY,
-        username TEXT NOT NULL,
-        password TEXT NOT NULL,
-        role TEXT NOT NULL
-    )
-    ''')
-
-    # Crear tabla de estudiantes
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS students (
-        id INTEGER PRIMARY KEY,
-        name TEXT NOT NULL,
-        age INTEGER NOT NULL,
-        level TEXT NOT NULL,
-        user_id INTEGER,
-        FOREIGN KEY(user_id) REFERENCES users(id)
-    )
-    ''')
-
-    # Crear tabla de niveles
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS levels (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL UNIQUE
-    )
-    ''')
-
-    # Crear tabla de clases si no existe
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS classes (
-        id INTEGER PRIMARY KEY,
-        name TEXT NOT NULL,
-        date TEXT NOT NULL,
-        professor TEXT NOT NULL
-    )
-    ''')
-
-    # Crear tabla de pagos si no existe
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS payments (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,   
-            student_id INTEGER NOT NULL,            
-            amount REAL NOT NULL,                   
-            date TEXT NOT NULL,                     
-            method TEXT,                            
-            notes TEXT,                             
-            FOREIGN KEY(student_id) REFERENCES students(id)  
+    Args:
+        conn (sqlite3.Connection, optional): Conexión en la que crearlas (por ejemplo, la
+            copia de un backup antes de restaurarlo). Por defecto, la base de datos del pool.
+
+    Raises:
+        MigrationError: Si falla alguna migración.
+    """
+    with (nullcontext(conn) if conn is not None else get_connection()) as conn:
+        cursor = conn.cursor()
+
+        # Crear tabla de usuarios
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY,
+            username TEXT NOT NULL,
+            password TEXT NOT NULL,
+            role TEXT NOT NULL
         )
-    ''')
+        ''')
 
-    # Crear tabla de recompensas si no existe
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS rewards (
+        # Crear tabla de estudiantes
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS students (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            age INTEGER NOT NULL,
+            level TEXT NOT NULL,
+            user_id INTEGER,
+            FOREIGN KEY(user_id) REFERENCES users(id)
+        )
+        ''')
+
+        # Crear tabla de niveles
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS levels (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
-            recommender_id INTEGER NOT NULL,
-            new_student_id INTEGER NOT NULL,
-            reward_name TEXT NOT NULL,
-            months_rewarded INTEGER NOT NULL,
-            date_awarded TEXT NOT NULL,
-            FOREIGN KEY (recommender_id) REFERENCES students(id),
-            FOREIGN KEY (new_student_id) REFERENCES students(id)
+            name TEXT NOT NULL UNIQUE
+        )
+        ''')
+
+        # Crear tabla de clases si no existe
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS classes (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            date TEXT NOT NULL,
+            professor TEXT NOT NULL
         )
         ''')
 
-    conn.commit()
-    conn.close()
+        # Crear tabla de pagos si no existe
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS payments (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,   
+                student_id INTEGER NOT NULL,            
+                amount REAL NOT NULL,                   
+                date TEXT NOT NULL,                     
+                method TEXT,                            
+                notes TEXT,                             
+                FOREIGN KEY(student_id) REFERENCES students(id)  
+            )
+        ''')
+
+        # Crear tabla de recompensas si no existe
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS rewards (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                recommender_id INTEGER NOT NULL,
+                new_student_id INTEGER NOT NULL,
+                reward_name TEXT NOT NULL,
+                months_rewarded INTEGER NOT NULL,
+                date_awarded TEXT NOT NULL,
+                FOREIGN KEY (recommender_id) REFERENCES students(id),
+                FOREIGN KEY (new_student_id) REFERENCES students(id)
+            )
+            ''')
+
+        # Actualizar el esquema (índices, columnas nuevas...) a la última versión
+        migrate(conn)
+
+def ensure_schema():
+    """
+    Prepara la base de datos al arrancar la aplicación: crea las tablas, aplica
+    las migraciones e inserta los niveles por defecto, pero solo si el esquema
+    no está ya en la última versión (PRAGMA user_version). En el arranque normal
+    es una única consulta.
+
+    Returns:
+        bool: True si hubo que preparar el esquema, False si ya estaba al día.
+    """
+    with get_connection() as conn:
+        if get_schema_version(conn) == latest_version():
+            return False
+
+    create_tables()
+    init_levels()
+    return True
+
+def _id_by_name(cursor, table, name):
+    """
+    id de la fila con ese nombre (sin distinguir mayúsculas), o None. Los nombres
+    de alumnos, clases y niveles son únicos: es una búsqueda en su índice.
+    """
+    row = cursor.execute(f"SELECT id FROM {table} WHERE name = ? COLLATE NOCASE", (name,)).fetchone()
+    return row[0] if row is not None else None
+
+def _name_exists(table, name):
+    """Comprueba si existe una fila con ese nombre en la tabla indicada, sin distinguir mayúsculas"""
+    with get_connection() as conn:
+        return _id_by_name(conn.cursor(), table, name) is not None
+
+def _page_params(offset, limit):
+    """Parámetros para 'LIMIT ? OFFSET ?' (en SQLite, LIMIT -1 significa sin límite)"""
+    return (-1 if limit is None else limit, offset)
+
+def _keyset(sort_columns, order_by, descending, id_column, after):
+    """
+    Orden y condición de la paginación por clave (keyset): en lugar de saltarse
+    OFFSET filas, cada página empieza justo después de la última fila de la
+    anterior, (columna, id) < (?, ?), así que con un índice sobre la columna (el
+    id va implícito al final de cada índice) cualquier página cuesta lo mismo
+    que la primera.
+
+    Args:
+        sort_columns (dict): Nombre de la columna -> expresión SQL por la que se ordena.
+        order_by (str): Columna de ordenación (clave de sort_columns, igual al campo de la fila).
+        descending (bool): True para orden descendente.
+        id_column (str): Expresión SQL del id, que desempata.
+        after (NamedTuple, optional): Última fila de la página anterior; None para la primera.
+
+    Returns:
+        tuple: (condición o None, parámetros de la condición, cláusula ORDER BY)
+
+    Raises:
+        ValueError: Si no se puede ordenar por esa columna.
+    """
+    if order_by not in sort_columns:
+        raise ValueError(f"Columna de ordenación no válida: {order_by}")
+
+    column = sort_columns[order_by]
+    direction, operator = ("DESC", "<") if descending else ("ASC", ">")
+    order = f"ORDER BY {column} {direction}, {id_column} {direction}"
+    if after is None:
+        return None, [], order
+    if column == id_column:
+        return f"{id_column} {operator} ?", [after.id], order
+    value = getattr(after, order_by)
+    # La primera condición es redundante, pero el planificador la usa como rango en el índice de la
+    # columna aunque esta y el id sean de tablas distintas (alumno de un pago), y con la fila no puede
+    return f"{column} {operator}= ? AND ({column}, {id_column}) {operator} (?, ?)", [value, value, after.id], order
+
+def _ids_where(cursor, table, condition, params):
+    """ids de las filas que cumplen la condición, para avisar de cuáles se van a modificar (db.events)"""
+    cursor.execute(f"SELECT id FROM {table} WHERE {condition}", params)
+    return [row[0] for row in cursor.fetchall()]
+
+def _typed_cursor(conn, row_type):
+    """Cursor cuyas filas salen ya como row_type (ver db.rows)"""
+    cursor = conn.cursor()
+    cursor.row_factory = row_factory(row_type)
+    return cursor
+
+def _iter_query(build_query, row_type, batch_size):
+    """
+    Ejecuta una consulta y va entregando sus filas leyéndolas del cursor con
+    fetchmany, de modo que nunca hay más de un bloque en memoria.
+
+    Args:
+        build_query (callable): Recibe el cursor y devuelve (sql, parámetros).
+        row_type (type): Tipo de las filas (db.rows).
+        batch_size (int): Filas que se leen del cursor en cada bloque.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        sql, params = build_query(cursor)
+        cursor.row_factory = row_factory(row_type)  # Después de build_query, que hace sus propias consultas
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+
+def _like_pattern(text):
+    """Convierte un texto de búsqueda en un patrón LIKE, escapando los comodines % y _"""
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+def _fts_query(text):
+    """
+    Convierte el texto del usuario en una consulta FTS5 por prefijos.
+    Por ejemplo, 'ini per' -> '"ini"* "per"*' (todas las palabras deben aparecer).
+    Devuelve None si el texto no contiene ninguna palabra.
+    """
+    words = re.findall(r"\w+", text)
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words)
+
+def _has_search_index(cursor, fts_table):
+    """Indica si existe el índice FTS5 (no existe si el SQLite instalado no soporta FTS5)"""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (fts_table,))
+    return cursor.fetchone() is not None
+
+def _text_condition(cursor, fts_table, id_column, text_column, text):
+    """
+    Devuelve (condición SQL, parámetro) para buscar un texto en una columna.
+
+    Usa el índice FTS5 de la tabla si existe (búsqueda por prefijo, sin acentos)
+    y, si no, un LIKE sobre la columna. Devuelve (None, None) si no hay nada que buscar.
+    """
+    if _has_search_index(cursor, fts_table):
+        query = _fts_query(text)
+        if query is None:
+            return None, None
+        return f"{id_column} IN (SELECT rowid FROM {fts_table} WHERE {fts_table} MATCH ?)", query
+    return f"{text_column} LIKE ? ESCAPE '\\'", _like_pattern(text)
 
 # =============================
 # FUNCIONES PARA LA GESTIÓN DE USUARIOS
@@ -90,52 +254,102 @@ def create_tables():
 
 # Insertar usuario
 def insert_user(username, password, role):
-    """Añade un nuevo usuario a la base de datos"""
-    conn = connect_db()
-    cursor = conn.cursor()
+    """
+    Añade un nuevo usuario a la base de datos. La contraseña se guarda como hash (db.auth).
 
-    cursor.execute('''
-    INSERT INTO users (username, password, role)
-    VALUES (?, ?, ?)
-    ''', (username, password, role))
+    Returns:
+        int: id del usuario nuevo.
 
-    conn.commit()
-    conn.close()
+    Raises:
+        sqlite3.IntegrityError: Si ya existe un usuario con ese nombre.
+    """
+    password_hash = hash_password(password)  # Costoso a propósito: fuera de la transacción
+    with get_connection() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute('''
+        INSERT INTO users (username, password, role)
+        VALUES (?, ?, ?)
+        ''', (username, password_hash, role))
+        publish("users", INSERT, cursor.lastrowid)
+        return cursor.lastrowid
+
+@cached("users")
+def fetch_users(offset=0, limit=None):
+    """
+    Recupera los usuarios desde la base de datos (todos, o un bloque si se indica limit).
+    El resultado se guarda en la caché de db.cache hasta que cambie la tabla.
 
-def fetch_users():
-    """Recupera todos los usuarios desde la base de datos."""
-    conn = connect_db()
-    cursor = conn.cursor()
+    Returns:
+        list of User: Usuarios ordenados por id.
+    """
+    with get_connection() as conn:
+        cursor = _typed_cursor(conn, User)
 
-    cursor.execute("SELECT id, username, password, role FROM users")
-    users = cursor.fetchall()
+        cursor.execute("SELECT id, username, password, role FROM users ORDER BY id LIMIT ? OFFSET ?",
+                       _page_params(offset, limit))
+        users = cursor.fetchall()
 
-    conn.close()
     return users
 
-def update_user(user_id, new_username, new_role):
-    """Actualiza el nombre de usuario y rol de un usuario existente."""
-    conn = connect_db()
-    cursor = conn.cursor()
+def fetch_user(user_id):
+    """Devuelve un usuario por su id, con el formato de fetch_users (None si no existe)"""
+    with get_connection() as conn:
+        row = _typed_cursor(conn, User).execute("SELECT id, username, password, role FROM users WHERE id = ?",
+                                                (user_id,)).fetchone()
+    return row
 
-    cursor.execute('''
-        UPDATE users
-        SET username = ?, role = ?
-        WHERE id = ?
-    ''', (new_username, new_role, user_id))
+def update_user(user_id, new_username, new_role, new_password=None):
+    """
+    Actualiza el nombre de usuario y rol de un usuario existente y, si se indica,
+    su contraseña (guardada como hash).
 
-    conn.commit()
-    conn.close()
+    Returns:
+        bool: True si el usuario existía.
 
-def delete_user(username):
-    """Elimina un usuario de la base de datos por su ID."""
-    conn = connect_db()
-    cursor = conn.cursor()
+    Raises:
+        sqlite3.IntegrityError: Si el nuevo nombre ya lo usa otro usuario.
+    """
+    password_hash = hash_password(new_password) if new_password else None
+    with get_connection() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            UPDATE users
+            SET username = ?, role = ?, password = COALESCE(?, password)
+            WHERE id = ?
+        ''', (new_username, new_role, password_hash, user_id))
+        if cursor.rowcount == 0:
+            return False
+        publish("users", UPDATE, user_id)
+        return True
+
+def delete_user_by_id(user_id):
+    """
+    Elimina un usuario por su id.
 
-    cursor.execute("DELETE FROM users WHERE username = ?", (username,))
+    Returns:
+        bool: True si existía.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+
+        # Los alumnos vinculados a este usuario se quedan sin usuario (las claves foráneas están activas)
+        cursor.execute("UPDATE students SET user_id = NULL WHERE user_id = ?", (user_id,))
+        if cursor.rowcount:
+            publish("students", UPDATE)
+        cursor.execute("DELETE FROM users WHERE id = ?", (user_id,))
+        if cursor.rowcount == 0:
+            return False
+        publish("users", DELETE, user_id)
+        return True
 
-    conn.commit()
-    conn.close()
+def delete_user(username):
+    """Elimina un usuario de la base de datos por su nombre de usuario (ver delete_user_by_id)."""
+    with get_connection() as conn:
+        row = conn.execute("SELECT id FROM users WHERE username = ?", (username,)).fetchone()
+        if row is not None:
+            delete_user_by_id(row[0])
 
 # =============================
 # FUNCIONES PARA LA GESTIÓN DE ESTUDIANTES
@@ -143,75 +357,286 @@ def delete_user(username):
 
 # Insertar estudiante
 def insert_student(name, age, level, user_id=None):
-    """Añade un nuevo alumno a la base de datos"""
-    conn = connect_db()
-    cursor = conn.cursor()
+    """
+    Añade un nuevo alumno a la base de datos.
 
-    cursor.execute('''
-    INSERT INTO students (name, age, level, user_id)
-    VALUES (?, ?, ?, ?)
-    ''', (name, age, level, user_id))
+    Los nombres son únicos sin distinguir mayúsculas: si ya hay un alumno con
+    ese nombre no se inserta nada (lo comprueba el índice único, sin recorrer la tabla).
 
-    conn.commit()
-    conn.close()
+    Returns:
+        int: id del alumno nuevo, o None si el nombre ya existía.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute('''
+        INSERT INTO students (name, age, level, user_id)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT (name COLLATE NOCASE) DO NOTHING
+        ''', (name, age, level, user_id))
+        if cursor.rowcount == 0:
+            return None
+        publish("students", INSERT, cursor.lastrowid)
+        return cursor.lastrowid
+
+def insert_students_bulk(students):
+    """
+    Inserta muchos alumnos de una vez con executemany.
+
+    No abre una transacción propia si ya hay una en curso, así que dentro de un
+    bloque `with get_connection():` varias llamadas se confirman juntas. El
+    índice de búsqueda se actualiza de una vez al final del bloque de filas.
+
+    Args:
+        students (iterable): Tuplas (nombre, edad, nivel). Las que tienen un nombre
+            que ya existe (sin distinguir mayúsculas) se saltan.
+
+    Returns:
+        int: Número de alumnos insertados.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        with deferred_search_index(conn, "students"):
+            cursor.executemany('''
+                INSERT INTO students (name, age, level) VALUES (?, ?, ?)
+                ON CONFLICT (name COLLATE NOCASE) DO NOTHING
+            ''', students)
+        publish("students", INSERT)
+        return cursor.rowcount
 
 # Eliminar un estudiante
-def delete_student(name):
-    """Elimina un alumno de la base de datos por su nombre"""
-    conn = connect_db()
-    cursor = conn.cursor()
+def delete_student_by_id(student_id):
+    """
+    Elimina un alumno por su id, junto con sus pagos y recompensas.
 
-    # Eliminar el alumno de la tabla 'students' utilizando el nombre
-    cursor.execute('''DELETE FROM students WHERE name = ?''', (name,))
+    Returns:
+        bool: True si existía.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+
+        # Con las claves foráneas activas hay que borrar antes sus pagos y recompensas
+        # (en la misma transacción). Antes quedaban huérfanos y ninguna consulta los mostraba.
+        cursor.execute("DELETE FROM payments WHERE student_id = ?", (student_id,))
+        if cursor.rowcount:
+            publish("payments", DELETE)
+        cursor.execute("DELETE FROM rewards WHERE recommender_id = ? OR new_student_id = ?", (student_id, student_id))
+        if cursor.rowcount:
+            publish("rewards", DELETE)
+
+        cursor.execute("DELETE FROM students WHERE id = ?", (student_id,))
+        if cursor.rowcount == 0:
+            return False
+        publish("students", DELETE, student_id)
+        return True
 
-    conn.commit()
-    conn.close()
+def delete_student(name):
+    """Elimina un alumno de la base de datos por su nombre, sin distinguir mayúsculas (ver delete_student_by_id)"""
+    with get_connection() as conn:
+        student_id = _id_by_name(conn.cursor(), "students", name)
+        if student_id is not None:
+            delete_student_by_id(student_id)
 
 # Modificarar un estudiante
+def update_student_by_id(student_id, new_name, new_age, new_level):
+    """
+    Actualiza los datos de un alumno.
+
+    Args:
+        student_id (int): id del alumno.
+        new_name (str): Nuevo nombre del alumno.
+        new_age (int): Nueva edad del alumno.
+        new_level (str): Nuevo nivel asignado.
+
+    Returns:
+        bool: True si el alumno existía.
+
+    Raises:
+        sqlite3.IntegrityError: Si el nuevo nombre ya lo usa otro alumno.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            UPDATE students
+            SET name = ?, age = ?, level = ?
+            WHERE id = ?
+        ''', (new_name, new_age, new_level, student_id))
+        if cursor.rowcount == 0:
+            return False
+        publish("students", UPDATE, student_id)
+        return True
+
 def update_student(old_name, new_name, new_age, new_level):
     """
-    Actualiza los datos de un alumno existente en la base de datos.
+    Actualiza los datos de un alumno buscándolo por su nombre actual, sin
+    distinguir mayúsculas (ver update_student_by_id).
 
     Args:
         old_name (str): Nombre actual del alumno (clave para buscarlo).
         new_name (str): Nuevo nombre del alumno.
         new_age (int): Nueva edad del alumno.
         new_level (str): Nuevo nivel asignado.
+
+    Returns:
+        bool: True si el alumno existía.
     """
-    conn = connect_db()
-    cursor = conn.cursor()
+    with get_connection() as conn:
+        student_id = _id_by_name(conn.cursor(), "students", old_name)
+        if student_id is None:
+            return False
+        return update_student_by_id(student_id, new_name, new_age, new_level)
 
-    cursor.execute('''
-        UPDATE students
-        SET name = ?, age = ?, level = ?
-        WHERE name = ?
-    ''', (new_name, new_age, new_level, old_name))
+# Obtener todos los estudiantes
+@cached("students")
+def fetch_students(offset=0, limit=None):
+    """
+    Obtiene los alumnos desde la base de datos (todos, o un bloque si se indica limit).
+    El resultado se guarda en la caché de db.cache hasta que cambie la tabla.
 
-    conn.commit()
-    conn.close()
+    Returns:
+        list of Student: Alumnos ordenados por id.
+    """
+    with get_connection() as conn:
+        cursor = _typed_cursor(conn, Student)
+        cursor.execute('SELECT id, name, age, level FROM students ORDER BY id LIMIT ? OFFSET ?',
+                       _page_params(offset, limit))
+        return cursor.fetchall()
+
+def student_name_exists(name):
+    """Indica si ya hay un alumno con ese nombre (sin distinguir mayúsculas)"""
+    return _name_exists("students", name)
+
+def fetch_student(student_id):
+    """Devuelve un alumno por su id, con el formato de fetch_students (None si no existe)"""
+    with get_connection() as conn:
+        return _typed_cursor(conn, Student).execute("SELECT id, name, age, level FROM students WHERE id = ?",
+                                                    (student_id,)).fetchone()
+
+def _students_search_query(cursor, text):
+    """Construye la consulta (sin LIMIT) y sus parámetros para search_students"""
+    if _has_search_index(cursor, "students_fts"):
+        query = _fts_query(text)
+        if query is None:
+            return 'SELECT id, name, age, level FROM students ORDER BY id', []
+        return '''
+            SELECT students.id, students.name, students.age, students.level
+            FROM students_fts
+            JOIN students ON students.id = students_fts.rowid
+            WHERE students_fts MATCH ?
+            ORDER BY students_fts.rank, students.id
+        ''', [query]
+    if not text.strip():
+        return 'SELECT id, name, age, level FROM students ORDER BY id', []
+    return '''
+        SELECT id, name, age, level
+        FROM students
+        WHERE name LIKE ? ESCAPE '\\'
+        ORDER BY name, id
+    ''', [_like_pattern(text)]
+
+def search_students(text, offset=0, limit=None):
+    """
+    Busca alumnos por nombre, ordenados por relevancia.
 
-# Obtener todos los estudiantes
-def fetch_students():
-    """Obtiene todos los alumnos desde la base de datos"""
-    conn = connect_db()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM students')
-    students = cursor.fetchall()
-    conn.close()
+    Encuentra palabras que empiecen por lo escrito sin distinguir mayúsculas ni
+    acentos ("inigo per" encuentra a "Íñigo Pérez"). Si el texto está vacío
+    devuelve todos los alumnos, como fetch_students.
+
+    Args:
+        text (str): Texto de búsqueda.
+        offset (int): Número de alumnos que se saltan.
+        limit (int, optional): Número máximo de alumnos; None devuelve todos.
+
+    Returns:
+        list of Student: Alumnos encontrados.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        sql, params = _students_search_query(cursor, text)
+        cursor.row_factory = row_factory(Student)
+        cursor.execute(sql + " LIMIT ? OFFSET ?", params + list(_page_params(offset, limit)))
+        return cursor.fetchall()
+
+# Columnas por las que se pueden ordenar (y paginar por clave) los alumnos; todas tienen índice
+STUDENT_SORT_COLUMNS = {
+    "id": "students.id",
+    "name": "students.name COLLATE NOCASE",
+    "age": "students.age",
+    "level": "students.level",
+}
+
+def fetch_students_after(after=None, limit=100, text="", order_by="name", descending=False):
+    """
+    Recupera la página de alumnos que sigue a la fila after, ordenada en SQL y
+    paginada por clave (ver _keyset): llegar a la última página cuesta lo mismo
+    que ver la primera.
+
+    Args:
+        after (Student, optional): Última fila de la página anterior; None para la primera.
+        limit (int): Tamaño de la página.
+        text (str): Filtro por nombre, como en search_students (aquí no se ordena por relevancia).
+        order_by (str): Columna de ordenación (clave de STUDENT_SORT_COLUMNS).
+        descending (bool): True para orden descendente.
 
-    # Convertimos los resultados en un diccionario
-    return [{"id": student[0], "name": student[1], "age": student[2], "level": student[3]} for student in students]
+    Returns:
+        list of Student: Alumnos de la página.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        sql, params = _students_sorted_query(cursor, text, order_by, descending, after)
+        cursor.row_factory = row_factory(Student)
+        cursor.execute(f"{sql} LIMIT ?", params + [limit])
+        return cursor.fetchall()
+
+def _students_sorted_query(cursor, text, order_by, descending, after=None):
+    """Construye la consulta (sin LIMIT) y sus parámetros para fetch_students_after"""
+    conditions, params = [], []
+    if text:
+        condition, param = _text_condition(cursor, "students_fts", "students.id", "students.name", text)
+        if condition:
+            conditions.append(condition)
+            params.append(param)
+    condition, keyset_params, order = _keyset(STUDENT_SORT_COLUMNS, order_by, descending, "students.id", after)
+    if condition:
+        conditions.append(condition)
+        params += keyset_params
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return f'''
+        SELECT students.id, students.name, students.age, students.level
+        FROM students
+        {where}
+        {order}
+    ''', params
+
+def iter_students(text="", order_by=None, descending=False, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Recorre los alumnos que devolvería search_students(text) leyéndolos del
+    cursor por bloques, sin cargarlos todos en memoria (para exportaciones).
+
+    Args:
+        text (str): Filtro por nombre, como en search_students.
+        order_by (str, optional): Columna de ordenación (clave de STUDENT_SORT_COLUMNS), para exportar en
+            el orden de la tabla (fetch_students_after). Sin ella, por relevancia como search_students.
+        descending (bool): True para orden descendente.
+        batch_size (int): Filas que se leen del cursor en cada bloque.
+
+    Yields:
+        Student: Alumnos encontrados.
+    """
+    if order_by is None:
+        return _iter_query(lambda cursor: _students_search_query(cursor, text), Student, batch_size)
+    return _iter_query(lambda cursor: _students_sorted_query(cursor, text, order_by, descending), Student,
+                       batch_size)
 
 # Obtener todos los estudiantes con detalles del usuario
 def get_students():
-    """Obtiene todos los estudiantes con detalles del usuario asociado"""
-    conn = connect_db()
-    cursor = conn.cursor()
+    """Obtiene todos los estudiantes con detalles del usuario asociado (lista de StudentWithUser)"""
+    with get_connection() as conn:
+        cursor = _typed_cursor(conn, StudentWithUser)
 
-    cursor.execute('SELECT students.id, students.name, students.age, students.level, users.username FROM students LEFT JOIN users ON students.user_id = users.id')
-    students = cursor.fetchall()
+        cursor.execute('SELECT students.id, students.name, students.age, students.level, users.username FROM students LEFT JOIN users ON students.user_id = users.id')
+        students = cursor.fetchall()
 
-    conn.close()
     return students
 
 
@@ -222,71 +647,124 @@ def get_students():
 # Insertar los niveles en la tabla levels
 def init_levels():
     """Inserta los niveles predefinidos si no existen"""
-    conn = connect_db()
-    cursor = conn.cursor()
+    with get_connection() as conn:
+        cursor = conn.cursor()
 
-    levels = ["A1", "A2", "B1", "B2", "C1", "C2",
-              "A1_Ad", "A2_Ad", "B1_Ad", "B2_Ad", "C1_Ad", "C2_Ad"]
+        levels = ["A1", "A2", "B1", "B2", "C1", "C2",
+                  "A1_Ad", "A2_Ad", "B1_Ad", "B2_Ad", "C1_Ad", "C2_Ad"]
 
-    for level in levels:
-        cursor.execute("INSERT OR IGNORE INTO levels (name) VALUES (?)", (level,))
+        cursor.executemany("INSERT INTO levels (name) VALUES (?) ON CONFLICT DO NOTHING",
+                           [(level,) for level in levels])
+        publish("levels", INSERT)
 
-    conn.commit()
-    conn.close()
-
-def fetch_levels():
+@cached("levels")
+def fetch_levels(offset=0, limit=None):
     """
-    Recupera todos los niveles almacenados en la base de datos.
+    Recupera los niveles almacenados en la base de datos.
+
+    Args:
+        offset (int): Número de niveles que se saltan.
+        limit (int, optional): Número máximo de niveles; None devuelve todos.
 
     Returns:
-        list of tuples: Una lista de tuplas que contienen los datos de cada nivel.
+        list of Level: Niveles ordenados por id.
+            Se guarda en la caché de db.cache hasta que cambie la tabla.
     """
-    conn = connect_db()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM levels")
-    levels = cursor.fetchall()
-    conn.close()
+    with get_connection() as conn:
+        cursor = _typed_cursor(conn, Level)
+        cursor.execute("SELECT id, name FROM levels ORDER BY id LIMIT ? OFFSET ?", _page_params(offset, limit))
+        levels = cursor.fetchall()
     return levels
 
+def fetch_level(level_id):
+    """Devuelve un nivel por su id, con el formato de fetch_levels (None si no existe)"""
+    with get_connection() as conn:
+        row = _typed_cursor(conn, Level).execute("SELECT id, name FROM levels WHERE id = ?", (level_id,)).fetchone()
+    return row
+
+def level_name_exists(level_name):
+    """Indica si ya existe un nivel con ese nombre (sin distinguir mayúsculas)"""
+    return _name_exists("levels", level_name)
+
 def insert_level(level_name):
     """
     Inserta un nuevo nivel en la base de datos.
 
     Args:
         level_name (str): El nombre del nivel a insertar (por ejemplo, 'A1', 'B2_Ad').
+
+    Returns:
+        int: id del nivel nuevo, o None si ya existía uno con ese nombre (sin distinguir mayúsculas).
     """
-    conn = connect_db()
-    cursor = conn.cursor()
-    cursor.execute("INSERT INTO levels (name) VALUES (?)", (level_name,))
-    conn.commit()
-    conn.close()
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("INSERT INTO levels (name) VALUES (?) ON CONFLICT DO NOTHING", (level_name,))
+        if cursor.rowcount == 0:
+            return None
+        publish("levels", INSERT, cursor.lastrowid)
+        return cursor.lastrowid
+
+def delete_level_by_id(level_id):
+    """
+    Elimina un nivel por su id.
+
+    Returns:
+        bool: True si existía.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM levels WHERE id = ?", (level_id,))
+        if cursor.rowcount == 0:
+            return False
+        publish("levels", DELETE, level_id)
+        return True
 
 def delete_level(level_name):
     """
     Elimina un nivel específico de la base de datos.
 
     Args:
-        level_name (str): El nombre del nivel que se desea eliminar.
+        level_name (str): El nombre del nivel que se desea eliminar (sin distinguir mayúsculas).
     """
-    conn = connect_db()
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM levels WHERE name = ?", (level_name,))
-    conn.commit()
-    conn.close()
+    with get_connection() as conn:
+        level_id = _id_by_name(conn.cursor(), "levels", level_name)
+        if level_id is not None:
+            delete_level_by_id(level_id)
+
+def update_level_by_id(level_id, new_name):
+    """
+    Cambia el nombre de un nivel.
+
+    Returns:
+        bool: True si el nivel existía.
+
+    Raises:
+        sqlite3.IntegrityError: Si ya hay otro nivel con el nuevo nombre.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("UPDATE levels SET name = ? WHERE id = ?", (new_name, level_id))
+        if cursor.rowcount == 0:
+            return False
+        publish("levels", UPDATE, level_id)
+        return True
 
 def update_level(old_name, new_name):
     """
     Actualiza el nombre de un nivel existente en la base de datos.
 
     Args:
-        old_name (str): El nombre actual del nivel.
+        old_name (str): El nombre actual del nivel (sin distinguir mayúsculas).
         new_name (str): El nuevo nombre que se desea asignar.
+
+    Returns:
+        bool: True si el nivel existía.
     """
-    conn = connect_db()
-    cursor = conn.cursor()
-    cursor.execute("UPDATE levels SET name = ? WHERE name = ?", (new_name, old_name))
-    conn.commit()
-    conn.close()
+    with get_connection() as conn:
+        level_id = _id_by_name(conn.cursor(), "levels", old_name)
+        if level_id is None:
+            return False
+        return update_level_by_id(level_id, new_name)
 
 # ==============================
 # FUNCIONES PARA GESTIÓN DE CLASES
@@ -298,72 +776,179 @@ def insert_class(name, date, professor):
 
     Args:
         name (str): Nombre de la clase.
-        date (str): Fecha de la clase en formato YYYY-MM-DD.
+        date (date | str): Fecha de la clase (texto YYYY-MM-DD).
         professor (str): Nombre del profesor que la imparte.
+
+    Returns:
+        int: id de la clase nueva, o None si ya existía una con ese nombre (sin distinguir mayúsculas).
+
+    Raises:
+        ValueError: Si la fecha no es válida.
     """
-    conn = connect_db()
-    cursor = conn.cursor()
+    date = iso_date(date)
+    with get_connection() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute('''
+                    INSERT INTO classes (name, date, professor)
+                    VALUES (?, ?, ?)
+                    ON CONFLICT (name COLLATE NOCASE) DO NOTHING
+                ''', (name, date, professor))
+        if cursor.rowcount == 0:
+            return None
+        publish("classes", INSERT, cursor.lastrowid)
+        return cursor.lastrowid
+
+_CLASSES_QUERY = "SELECT id, name, date, professor FROM classes ORDER BY id"
+
+def fetch_classes(offset=0, limit=None):
+    """
+    Recupera las clases almacenadas en la base de datos.
+
+    Args:
+        offset (int): Número de clases que se saltan.
+        limit (int, optional): Número máximo de clases; None devuelve todas.
+
+    Returns:
+        list of ClassSession: Clases ordenadas por id.
+    """
+    with get_connection() as conn:
+        cursor = _typed_cursor(conn, ClassSession)
+        cursor.execute(_CLASSES_QUERY + " LIMIT ? OFFSET ?", _page_params(offset, limit))
+        return cursor.fetchall()
+
+def fetch_classes_between(date_from, date_to):
+    """
+    Recupera las clases entre dos fechas (ambas incluidas), con una consulta por
+    rango sobre el índice de fechas.
 
-    cursor.execute('''
-                INSERT INTO classes (name, date, professor)
-                VALUES (?, ?, ?)
-            ''', (name, date, professor))
+    Args:
+        date_from (date | str): Primer día (YYYY-MM-DD).
+        date_to (date | str): Último día (YYYY-MM-DD).
 
-    conn.commit()
-    conn.close()
+    Returns:
+        list of ClassSession: Clases ordenadas por fecha.
 
-def fetch_classes():
+    Raises:
+        ValueError: Si alguna de las fechas no es válida.
     """
-    Recupera todas las clases almacenadas en la base de datos.
+    with get_connection() as conn:
+        cursor = _typed_cursor(conn, ClassSession)
+        cursor.execute('''
+            SELECT id, name, date, professor FROM classes
+            WHERE date BETWEEN ? AND ?
+            ORDER BY date, id
+        ''', (iso_date(date_from), iso_date(date_to)))
+        return cursor.fetchall()
+
+def fetch_classes_this_week(on_date=None):
+    """
+    Recupera las clases de la semana (de lunes a domingo) de una fecha.
+
+    Args:
+        on_date (date | str, optional): Cualquier día de la semana; por defecto, hoy.
 
     Returns:
-        list: Lista de tuplas con los datos de cada clase.
+        list of ClassSession: Clases ordenadas por fecha.
     """
-    conn = connect_db()
-    cursor = conn.cursor()
+    return fetch_classes_between(*week_range(on_date))
+
+def iter_classes(batch_size=EXPORT_BATCH_SIZE):
+    """
+    Recorre todas las clases leyéndolas del cursor por bloques, sin cargarlas
+    todas en memoria.
+
+    Yields:
+        ClassSession: Clases ordenadas por id.
+    """
+    return _iter_query(lambda cursor: (_CLASSES_QUERY, ()), ClassSession, batch_size)
+
+def fetch_class(class_id):
+    """Devuelve una clase por su id, con el formato de fetch_classes (None si no existe)"""
+    with get_connection() as conn:
+        row = _typed_cursor(conn, ClassSession).execute("SELECT id, name, date, professor FROM classes WHERE id = ?",
+                                                        (class_id,)).fetchone()
+    return row
+
+def class_name_exists(name):
+    """Indica si ya existe una clase con ese nombre (sin distinguir mayúsculas)"""
+    return _name_exists("classes", name)
+
+def update_class_by_id(class_id, new_name, new_date, new_professor):
+    """
+    Actualiza los datos de una clase.
+
+    Args:
+        class_id (int): id de la clase.
+        new_name (str): Nuevo nombre de la clase.
+        new_date (date | str): Nueva fecha (YYYY-MM-DD).
+        new_professor (str): Nuevo nombre del profesor.
 
-    cursor.execute('SELECT * FROM classes')
-    classes = cursor.fetchall()
+    Returns:
+        bool: True si la clase existía.
 
-    conn.close()
-    return classes
+    Raises:
+        ValueError: Si la fecha no es válida.
+        sqlite3.IntegrityError: Si el nuevo nombre ya lo usa otra clase.
+    """
+    new_date = iso_date(new_date)
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+                    UPDATE classes
+                    SET name = ?, date = ?, professor = ?
+                    WHERE id = ?
+                ''', (new_name, new_date, new_professor, class_id))
+        if cursor.rowcount == 0:
+            return False
+        publish("classes", UPDATE, class_id)
+        return True
 
 def update_class(old_name, new_name, new_date, new_professor):
     """
-    Actualiza los datos de una clase existente.
+    Actualiza los datos de una clase existente (ver update_class_by_id).
 
     Args:
-        old_name (str): Nombre actual de la clase (para localizarla).
+        old_name (str): Nombre actual de la clase (para localizarla, sin distinguir mayúsculas).
         new_name (str): Nuevo nombre de la clase.
         new_date (str): Nueva fecha.
         new_professor (str): Nuevo nombre del profesor.
+
+    Returns:
+        bool: True si la clase existía.
     """
-    conn = connect_db()
-    cursor = conn.cursor()
+    with get_connection() as conn:
+        class_id = _id_by_name(conn.cursor(), "classes", old_name)
+        if class_id is None:
+            return False
+        return update_class_by_id(class_id, new_name, new_date, new_professor)
 
-    cursor.execute('''
-                UPDATE classes
-                SET name = ?, date = ?, professor = ?
-                WHERE name = ?
-            ''', (new_name, new_date, new_professor, old_name))
+def delete_class_by_id(class_id):
+    """
+    Elimina una clase por su id.
 
-    conn.commit()
-    conn.close()
+    Returns:
+        bool: True si existía.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM classes WHERE id = ?", (class_id,))
+        if cursor.rowcount == 0:
+            return False
+        publish("classes", DELETE, class_id)
+        return True
 
 def delete_class(name):
     """
     Elimina una clase de la base de datos por su nombre.
 
     Args:
-        name (str): Nombre de la clase a eliminar.
+        name (str): Nombre de la clase a eliminar (sin distinguir mayúsculas).
     """
-    conn = connect_db()
-    cursor = conn.cursor()
-
-    cursor.execute('DELETE FROM classes WHERE name = ?', (name,))
-
-    conn.commit()
-    conn.close()
+    with get_connection() as conn:
+        class_id = _id_by_name(conn.cursor(), "classes", name)
+        if class_id is not None:
+            delete_class_by_id(class_id)
 
 # ==============================
 # FUNCIONES PARA GESTIÓN DE PAGOS
@@ -376,40 +961,284 @@ def insert_payment(student_id, amount, date, method=None, notes=None):
     Args:
         student_id (int): ID del alumno que realiza el pago.
         amount (float): Cantidad pagada.
-        date (str): Fecha del pago (formato YYYY-MM-DD).
+        date (date | str): Fecha del pago (formato YYYY-MM-DD).
         method (str, optional): Metodo de pago (efectivo, tarjeta...).
         notes (str, optional): Observaciones adicionales.
+
+    Raises:
+        ValueError: Si la fecha no es válida.
     """
-    conn = connect_db()
-    cursor = conn.cursor()
+    date = iso_date(date)
+    with get_connection() as conn:
+        cursor = conn.cursor()
 
-    cursor.execute('''
-        INSERT INTO payments (student_id, amount, date, method, notes)
-        VALUES (?, ?, ?, ?, ?)
-    ''', (student_id, amount, date, method, notes))
+        cursor.execute('''
+            INSERT INTO payments (student_id, amount, date, method, notes)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (student_id, amount, date, method, notes))
+        publish("payments", INSERT, cursor.lastrowid)
 
-    conn.commit()
-    conn.close()
+def insert_payments_bulk(payments):
+    """
+    Inserta muchos pagos de una vez con executemany (ver insert_students_bulk).
+
+    Args:
+        payments (iterable): Tuplas (student_id, cantidad, fecha, método, notas).
+
+    Returns:
+        int: Número de pagos insertados.
+
+    Raises:
+        ValueError: Si alguna fecha no es válida (no se inserta ningún pago).
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        with deferred_search_index(conn, "payments"), deferred_revenue_summaries(conn):
+            cursor.executemany('''
+                INSERT INTO payments (student_id, amount, date, method, notes)
+                VALUES (?, ?, ?, ?, ?)
+            ''', ((student_id, amount, iso_date(date), method, notes)
+                  for student_id, amount, date, method, notes in payments))
+        publish("payments", INSERT)
+        return cursor.rowcount
 
 def fetch_payments():
     """
     Recupera todos los pagos registrados, junto con el nombre del alumno.
 
     Returns:
-        list of tuples: [(pago_id, nombre_alumno, cantidad, fecha, métod, notas), ...]
+        list of Payment: (id, alumno, cantidad, fecha, método, notas, id del alumno).
     """
-    conn = connect_db()
-    cursor = conn.cursor()
+    with get_connection() as conn:
+        cursor = _typed_cursor(conn, Payment)
+
+        cursor.execute('''
+            SELECT payments.id, students.name, payments.amount, payments.date, payments.method, payments.notes,
+                   payments.student_id
+            FROM payments
+            JOIN students ON payments.student_id = students.id
+        ''')
+
+        payments = cursor.fetchall()
+    return payments
 
-    cursor.execute('''
-        SELECT payments.id, students.name, payments.amount, payments.date, payments.method, payments.notes
+# Columnas por las que se puede ordenar la consulta paginada de pagos
+PAYMENT_ORDER_COLUMNS = {
+    "id": "payments.id",
+    "student": "students.name COLLATE NOCASE",
+    "amount": "payments.amount",
+    "date": "payments.date",
+    "method": "payments.method",
+    "notes": "payments.notes",
+}
+
+def _payment_filters(cursor, student_filter="", notes_filter="", date_range=None):
+    """Construye la cláusula WHERE y sus parámetros para los filtros de pagos"""
+    conditions = []
+    params = []
+    for fts_table, id_column, text_column, text in (
+            ("students_fts", "students.id", "students.name", student_filter),
+            ("payments_fts", "payments.id", "payments.notes", notes_filter)):
+        if text:
+            condition, param = _text_condition(cursor, fts_table, id_column, text_column, text)
+            if condition:
+                conditions.append(condition)
+                params.append(param)
+    if date_range:
+        date_from, date_to = date_range
+        if date_from:
+            conditions.append("payments.date >= ?")
+            params.append(iso_date(date_from))
+        if date_to:
+            conditions.append("payments.date <= ?")
+            params.append(iso_date(date_to))
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return where, params
+
+def _payments_query(cursor, student_filter, notes_filter, date_range, order_by, descending):
+    """Construye la consulta de pagos filtrada y ordenada (sin LIMIT) y sus parámetros"""
+    if order_by not in PAYMENT_ORDER_COLUMNS:
+        raise ValueError(f"Columna de ordenación no válida: {order_by}")
+
+    direction = "DESC" if descending else "ASC"
+    where, params = _payment_filters(cursor, student_filter, notes_filter, date_range)
+    sql = f'''
+        SELECT payments.id, students.name, payments.amount, payments.date, payments.method, payments.notes,
+                   payments.student_id
         FROM payments
         JOIN students ON payments.student_id = students.id
-    ''')
+        {where}
+        ORDER BY {PAYMENT_ORDER_COLUMNS[order_by]} {direction}, payments.id {direction}
+    '''
+    return sql, params
 
-    payments = cursor.fetchall()
-    conn.close()
-    return payments
+def count_payments(student_filter="", notes_filter="", date_range=None):
+    """
+    Cuenta los pagos que cumplen los filtros (mismos argumentos que fetch_payments_page).
+
+    Returns:
+        int: Número de pagos.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        where, params = _payment_filters(cursor, student_filter, notes_filter, date_range)
+        cursor.execute(f'''
+            SELECT COUNT(*)
+            FROM payments
+            JOIN students ON payments.student_id = students.id
+            {where}
+        ''', params)
+        return cursor.fetchone()[0]
+
+def fetch_payments_filtered(student_filter="", notes_filter="", date_range=None, order_by="date",
+                            descending=True, offset=0, limit=None):
+    """
+    Recupera los pagos que cumplen los filtros, ordenados y paginados en SQL, sin contar el total.
+    Recibe los mismos argumentos que fetch_payments_page.
+
+    Returns:
+        list of Payment: Pagos con el mismo formato que fetch_payments.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        sql, params = _payments_query(cursor, student_filter, notes_filter, date_range, order_by, descending)
+        cursor.row_factory = row_factory(Payment)
+        cursor.execute(sql + " LIMIT ? OFFSET ?", params + list(_page_params(offset, limit)))
+        return cursor.fetchall()
+
+def iter_payments_filtered(student_filter="", notes_filter="", date_range=None, order_by="date",
+                           descending=True, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Recorre todos los pagos que cumplen los filtros leyéndolos del cursor por
+    bloques, sin cargarlos todos en memoria (para exportaciones).
+    Los filtros y el orden son los mismos que en fetch_payments_page.
+
+    Yields:
+        Payment: Pagos con el mismo formato que fetch_payments.
+    """
+    return _iter_query(
+        lambda cursor: _payments_query(cursor, student_filter, notes_filter, date_range, order_by, descending),
+        Payment, batch_size)
+
+def fetch_payments_page(student_filter="", notes_filter="", date_range=None, order_by="date",
+                        descending=True, offset=0, limit=100):
+    """
+    Recupera una página de pagos filtrada y ordenada directamente en SQL.
+
+    Args:
+        student_filter (str): Palabras (o inicios de palabra) del nombre del alumno, sin importar acentos.
+        notes_filter (str): Palabras (o inicios de palabra) de las notas.
+        date_range (tuple, optional): (desde, hasta) en formato YYYY-MM-DD, ambos incluidos; cualquiera de los
+            dos puede ser None.
+        order_by (str): Columna de ordenación (clave de PAYMENT_ORDER_COLUMNS).
+        descending (bool): True para orden descendente.
+        offset (int): Número de filas que se saltan.
+        limit (int, optional): Tamaño de la página; None devuelve todas las filas.
+
+    Returns:
+        tuple: (lista de Payment, total de pagos que cumplen los filtros)
+    """
+    with get_connection():  # Misma conexión (y lectura coherente) para la página y el recuento
+        payments = fetch_payments_filtered(student_filter, notes_filter, date_range, order_by, descending,
+                                           offset, limit)
+        total = count_payments(student_filter, notes_filter, date_range)
+
+    return payments, total
+
+# Columnas por las que se pueden paginar por clave los pagos (las que no admiten NULL); todas tienen índice
+PAYMENT_SORT_COLUMNS = {column: PAYMENT_ORDER_COLUMNS[column] for column in ("id", "student", "amount", "date")}
+
+def fetch_payments_after(after=None, limit=100, student_filter="", notes_filter="", date_range=None,
+                         order_by="date", descending=True):
+    """
+    Recupera la página de pagos que sigue a la fila after, filtrada y ordenada en
+    SQL y paginada por clave (ver _keyset): bajar hasta los pagos de hace diez
+    años cuesta lo mismo que ver la primera página, a diferencia de OFFSET.
+
+    Args:
+        after (Payment, optional): Última fila de la página anterior; None para la primera.
+        limit (int): Tamaño de la página.
+        student_filter, notes_filter, date_range: Filtros, como en fetch_payments_page.
+        order_by (str): Columna de ordenación (clave de PAYMENT_SORT_COLUMNS).
+        descending (bool): True para orden descendente (por defecto, los más recientes primero).
+
+    Returns:
+        list of Payment: Pagos de la página, con el mismo formato que fetch_payments.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        where, params = _payment_filters(cursor, student_filter, notes_filter, date_range)
+        condition, keyset_params, order = _keyset(PAYMENT_SORT_COLUMNS, order_by, descending, "payments.id", after)
+        if condition:
+            where = f"{where} AND {condition}" if where else f"WHERE {condition}"
+            params += keyset_params
+
+        cursor.row_factory = row_factory(Payment)
+        cursor.execute(f'''
+            SELECT payments.id, students.name, payments.amount, payments.date, payments.method, payments.notes,
+                   payments.student_id
+            FROM payments
+            JOIN students ON payments.student_id = students.id
+            {where}
+            {order}
+            LIMIT ?
+        ''', params + [limit])
+        return cursor.fetchall()
+
+def fetch_payments_between(date_from, date_to):
+    """
+    Recupera los pagos entre dos fechas (ambas incluidas), de la más antigua a la
+    más reciente. Es una consulta por rango sobre el índice de fechas.
+
+    Args:
+        date_from (date | str): Primer día (YYYY-MM-DD).
+        date_to (date | str): Último día (YYYY-MM-DD).
+
+    Returns:
+        list of Payment: Pagos con el mismo formato que fetch_payments.
+
+    Raises:
+        ValueError: Si alguna de las fechas no es válida.
+    """
+    return fetch_payments_filtered(date_range=(iso_date(date_from), iso_date(date_to)), descending=False)
+
+def payment_totals_by_month(date_from=None, date_to=None):
+    """
+    Número de pagos y suma cobrada de cada mes, calculados en SQL. Las fechas
+    guardadas son YYYY-MM-DD, así que el mes son sus siete primeros caracteres.
+
+    Args:
+        date_from (date | str, optional): Primer día que se cuenta; None, desde el primer pago.
+        date_to (date | str, optional): Último día que se cuenta; None, hasta el último pago.
+
+    Returns:
+        list of MonthlyTotal: (mes YYYY-MM, pagos, total), del mes más antiguo al más reciente.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        where, params = _payment_filters(cursor, date_range=(date_from, date_to))
+        cursor.row_factory = row_factory(MonthlyTotal)
+        cursor.execute(f'''
+            SELECT substr(date, 1, 7) AS month, COUNT(*), SUM(amount)
+            FROM payments
+            {where}
+            GROUP BY month
+            ORDER BY month
+        ''', params)
+        return cursor.fetchall()
+
+def fetch_payment(payment_id):
+    """Devuelve un pago por su id, con el formato de fetch_payments (None si no existe)"""
+    with get_connection() as conn:
+        row = _typed_cursor(conn, Payment).execute('''
+            SELECT payments.id, students.name, payments.amount, payments.date, payments.method, payments.notes,
+                   payments.student_id
+            FROM payments
+            JOIN students ON payments.student_id = students.id
+            WHERE payments.id = ?
+        ''', (payment_id,)).fetchone()
+    return row
 
 def update_payment(payment_id, amount, date, method=None, notes=None):
     """
@@ -418,21 +1247,29 @@ def update_payment(payment_id, amount, date, method=None, notes=None):
     Args:
         payment_id (int): ID del pago a actualizar.
         amount (float): Nueva cantidad pagada.
-        date (str): Nueva fecha del pago.
+        date (date | str): Nueva fecha del pago (YYYY-MM-DD).
         method (str, optional): Nuevo métod de pago.
         notes (str, optional): Nuevas observaciones.
-    """
-    conn = connect_db()
-    cursor = conn.cursor()
 
-    cursor.execute('''
-        UPDATE payments
-        SET amount = ?, date = ?, method = ?, notes = ?
-        WHERE id = ?
-    ''', (amount, date, method, notes, payment_id))
+    Returns:
+        bool: True si el pago existía.
 
-    conn.commit()
-    conn.close()
+    Raises:
+        ValueError: Si la fecha no es válida.
+    """
+    date = iso_date(date)
+    with get_connection() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            UPDATE payments
+            SET amount = ?, date = ?, method = ?, notes = ?
+            WHERE id = ?
+        ''', (amount, date, method, notes, payment_id))
+        if cursor.rowcount == 0:
+            return False
+        publish("payments", UPDATE, payment_id)
+        return True
 
 def delete_payment(payment_id):
     """
@@ -440,14 +1277,18 @@ def delete_payment(payment_id):
 
     Args:
         payment_id (int): ID del pago a eliminar.
-    """
-    conn = connect_db()
-    cursor = conn.cursor()
 
-    cursor.execute('DELETE FROM payments WHERE id = ?', (payment_id,))
+    Returns:
+        bool: True si existía.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
 
-    conn.commit()
-    conn.close()
+        cursor.execute('DELETE FROM payments WHERE id = ?', (payment_id,))
+        if cursor.rowcount == 0:
+            return False
+        publish("payments", DELETE, payment_id)
+        return True
 
 # ==============================
 # FUNCIONES PARA GESTIÓN DE RECOMPENSAS
@@ -457,7 +1298,14 @@ def insert_reward(recommender_id, new_student_id, months_rewarded, date_awarded)
     """
     Inserta una recompensa en la base de datos según la cantidad de meses premiados.
     Asigna automáticamente un nombre simbólico (Eire, Canada, USA).
+
+    Returns:
+        int: id de la recompensa nueva.
+
+    Raises:
+        ValueError: Si la fecha (date_awarded, YYYY-MM-DD) no es válida.
     """
+    date_awarded = iso_date(date_awarded)
     # Determinar nombre de la recompensa simbólica
     if months_rewarded == 1:
         reward_name = "Eire"
@@ -468,48 +1316,205 @@ def insert_reward(recommender_id, new_student_id, months_rewarded, date_awarded)
     else:
         reward_name = f"{months_rewarded} meses"
 
-    conn = connect_db()
-    cursor = conn.cursor()
+    with get_connection() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            INSERT INTO rewards (recommender_id, new_student_id, months_rewarded, date_awarded, reward_name)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (recommender_id, new_student_id, months_rewarded, date_awarded, reward_name))
+        publish("rewards", INSERT, cursor.lastrowid)
+        return cursor.lastrowid
 
-    cursor.execute('''
-        INSERT INTO rewards (recommender_id, new_student_id, months_rewarded, date_awarded, reward_name)
-        VALUES (?, ?, ?, ?, ?)
-    ''', (recommender_id, new_student_id, months_rewarded, date_awarded, reward_name))
+def delete_reward_by_id(reward_id):
+    """
+    Elimina una recompensa por su id.
 
-    conn.commit()
-    conn.close()
+    Returns:
+        bool: True si existía.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM rewards WHERE id = ?", (reward_id,))
+        if cursor.rowcount == 0:
+            return False
+        publish("rewards", DELETE, reward_id)
+        return True
 
 def delete_reward(recommender_name, new_student_name):
-    """Elimina una recompensa según los nombres del recomendador y nuevo alumno"""
-    conn = connect_db()
-    cursor = conn.cursor()
-    cursor.execute('''
-        DELETE FROM rewards
-        WHERE recommender_id = (SELECT id FROM students WHERE name = ?)
-        AND new_student_id = (SELECT id FROM students WHERE name = ?)
-    ''', (recommender_name, new_student_name))
-    conn.commit()
-    conn.close()
-
-def fetch_rewards():
+    """Elimina una recompensa según los nombres del recomendador y nuevo alumno (sin distinguir mayúsculas)"""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        recommender_id = _id_by_name(cursor, "students", recommender_name)
+        new_student_id = _id_by_name(cursor, "students", new_student_name)
+        condition = "recommender_id = ? AND new_student_id = ?"
+        reward_ids = _ids_where(cursor, "rewards", condition, (recommender_id, new_student_id))
+        cursor.execute(f"DELETE FROM rewards WHERE {condition}", (recommender_id, new_student_id))
+        publish_rows("rewards", DELETE, reward_ids)
+
+def fetch_rewards(offset=0, limit=None):
     """
-    Devuelve una lista de recompensas, incluyendo nombres de usuarios y nombre simbólico de la recompensa.
+    Devuelve una lista de recompensas (Reward), incluyendo nombres de usuarios y nombre simbólico de la recompensa.
+    Si se indica limit, devuelve solo ese bloque de recompensas a partir de offset.
     """
-    conn = connect_db()
-    cursor = conn.cursor()
+    with get_connection() as conn:
+        cursor = _typed_cursor(conn, Reward)
+
+        cursor.execute('''
+            SELECT rewards.id, s1.name AS recomendador, s2.name AS nuevo_alumno,
+               rewards.months_rewarded, rewards.date_awarded, rewards.reward_name,
+               rewards.recommender_id, rewards.new_student_id
+            FROM rewards
+            JOIN students s1 ON rewards.recommender_id = s1.id
+            JOIN students s2 ON rewards.new_student_id = s2.id
+            ORDER BY rewards.id
+            LIMIT ? OFFSET ?
+        ''', _page_params(offset, limit))
+
+        results = cursor.fetchall()
+    return results
 
-    cursor.execute('''
+def _reward_filters(cursor, recommender, new_student, reward_name):
+    """Construye las condiciones de los filtros de recompensas y sus parámetros"""
+    conditions = []
+    params = []
+    for fts_table, id_column, text_column, text in (
+            ("students_fts", "s1.id", "s1.name", recommender),
+            ("students_fts", "s2.id", "s2.name", new_student),
+            ("rewards_fts", "rewards.id", "rewards.reward_name", reward_name)):
+        if text:
+            condition, param = _text_condition(cursor, fts_table, id_column, text_column, text)
+            if condition:
+                conditions.append(condition)
+                params.append(param)
+    return conditions, params
+
+def _rewards_search_query(cursor, recommender, new_student, reward_name):
+    """Construye la consulta (sin LIMIT) y sus parámetros para search_rewards"""
+    conditions, params = _reward_filters(cursor, recommender, new_student, reward_name)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    sql = f'''
         SELECT rewards.id, s1.name AS recomendador, s2.name AS nuevo_alumno,
-           rewards.months_rewarded, rewards.date_awarded, rewards.reward_name
+           rewards.months_rewarded, rewards.date_awarded, rewards.reward_name,
+           rewards.recommender_id, rewards.new_student_id
         FROM rewards
         JOIN students s1 ON rewards.recommender_id = s1.id
         JOIN students s2 ON rewards.new_student_id = s2.id
-    ''')
+        {where}
+        ORDER BY rewards.id
+    '''
+    return sql, params
+
+def search_rewards(recommender="", new_student="", reward_name="", offset=0, limit=None):
+    """
+    Busca recompensas por recomendador, nuevo alumno y/o nombre de la recompensa.
+
+    Cada filtro encuentra palabras que empiecen por lo escrito, sin distinguir
+    mayúsculas ni acentos; los filtros vacíos no se aplican.
+
+    Returns:
+        list of Reward: Recompensas con el mismo formato que fetch_rewards.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        sql, params = _rewards_search_query(cursor, recommender, new_student, reward_name)
+        cursor.row_factory = row_factory(Reward)
+        cursor.execute(sql + " LIMIT ? OFFSET ?", params + list(_page_params(offset, limit)))
+        results = cursor.fetchall()
 
-    results = cursor.fetchall()
-    conn.close()
     return results
 
+# Columnas por las que se pueden ordenar (y paginar por clave) las recompensas
+REWARD_SORT_COLUMNS = {
+    "id": "rewards.id",
+    "recommender": "s1.name COLLATE NOCASE",
+    "new_student": "s2.name COLLATE NOCASE",
+    "reward_name": "rewards.reward_name",
+    "months_rewarded": "rewards.months_rewarded",
+    "date_awarded": "rewards.date_awarded",
+}
+
+def fetch_rewards_after(after=None, limit=100, recommender="", new_student="", reward_name="",
+                        order_by="date_awarded", descending=True):
+    """
+    Recupera la página de recompensas que sigue a la fila after, filtrada como
+    search_rewards, ordenada en SQL y paginada por clave (ver _keyset).
+
+    Args:
+        after (Reward, optional): Última fila de la página anterior; None para la primera.
+        limit (int): Tamaño de la página.
+        recommender, new_student, reward_name: Filtros, como en search_rewards.
+        order_by (str): Columna de ordenación (clave de REWARD_SORT_COLUMNS).
+        descending (bool): True para orden descendente (por defecto, las más recientes primero).
+
+    Returns:
+        list of Reward: Recompensas de la página, con el mismo formato que fetch_rewards.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        sql, params = _rewards_sorted_query(cursor, recommender, new_student, reward_name, order_by, descending,
+                                            after)
+        cursor.row_factory = row_factory(Reward)
+        cursor.execute(f"{sql} LIMIT ?", params + [limit])
+        return cursor.fetchall()
+
+def _rewards_sorted_query(cursor, recommender, new_student, reward_name, order_by, descending, after=None):
+    """Construye la consulta (sin LIMIT) y sus parámetros para fetch_rewards_after"""
+    conditions, params = _reward_filters(cursor, recommender, new_student, reward_name)
+    condition, keyset_params, order = _keyset(REWARD_SORT_COLUMNS, order_by, descending, "rewards.id", after)
+    if condition:
+        conditions.append(condition)
+        params += keyset_params
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return f'''
+        SELECT rewards.id, s1.name AS recomendador, s2.name AS nuevo_alumno,
+           rewards.months_rewarded, rewards.date_awarded, rewards.reward_name,
+           rewards.recommender_id, rewards.new_student_id
+        FROM rewards
+        JOIN students s1 ON rewards.recommender_id = s1.id
+        JOIN students s2 ON rewards.new_student_id = s2.id
+        {where}
+        {order}
+    ''', params
+
+def fetch_reward(reward_id):
+    """Devuelve una recompensa por su id, con el formato de fetch_rewards (None si no existe)"""
+    with get_connection() as conn:
+        row = _typed_cursor(conn, Reward).execute('''
+            SELECT rewards.id, s1.name AS recomendador, s2.name AS nuevo_alumno,
+               rewards.months_rewarded, rewards.date_awarded, rewards.reward_name,
+               rewards.recommender_id, rewards.new_student_id
+            FROM rewards
+            JOIN students s1 ON rewards.recommender_id = s1.id
+            JOIN students s2 ON rewards.new_student_id = s2.id
+            WHERE rewards.id = ?
+        ''', (reward_id,)).fetchone()
+    return row
+
+def iter_rewards(recommender="", new_student="", reward_name="", order_by=None, descending=False,
+                 batch_size=EXPORT_BATCH_SIZE):
+    """
+    Recorre las recompensas que cumplen los filtros de search_rewards leyéndolas
+    del cursor por bloques, sin cargarlas todas en memoria (para exportaciones).
+
+    Args:
+        recommender, new_student, reward_name: Filtros, como en search_rewards.
+        order_by (str, optional): Columna de ordenación (clave de REWARD_SORT_COLUMNS), para exportar en
+            el orden de la tabla (fetch_rewards_after). Sin ella, por id como search_rewards.
+        descending (bool): True para orden descendente.
+        batch_size (int): Filas que se leen del cursor en cada bloque.
+
+    Yields:
+        Reward: Recompensas con el mismo formato que fetch_rewards.
+    """
+    if order_by is None:
+        return _iter_query(
+            lambda cursor: _rewards_search_query(cursor, recommender, new_student, reward_name), Reward, batch_size)
+    return _iter_query(
+        lambda cursor: _rewards_sorted_query(cursor, recommender, new_student, reward_name, order_by, descending),
+        Reward, batch_size)
+
 def reward_already_granted(new_student_id):
     """
     Verifica si ya se ha otorgado una recompensa para un nuevo alumno.
@@ -517,63 +1522,96 @@ def reward_already_granted(new_student_id):
     :param new_student_id: ID del nuevo alumno.
     :return: True si ya tiene una recompensa, False en caso contrario.
     """
-    conn = connect_db()
-    cursor = conn.cursor()
-    cursor.execute("SELECT COUNT(*) FROM rewards WHERE new_student_id = ?", (new_student_id,))
-    result = cursor.fetchone()
-    conn.close()
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM rewards WHERE new_student_id = ?", (new_student_id,))
+        result = cursor.fetchone()
     return result[0] > 0
 
+def _bonus_date(on_date):
+    """Fecha de referencia de las consultas de bonos como texto YYYY-MM-DD (por defecto, hoy)"""
+    return iso_date(on_date) if on_date is not None else today()
+
 # Función especial para saber si un estudiante está bajo el amparo de un bono
-def is_student_under_bonus(student_id):
+def is_student_under_bonus(student_id, on_date=None):
     """
     Verifica si el alumno tiene un bono gratuito vigente.
 
+    El bono es del recomendador y cubre desde date_awarded hasta bonus_end (sin
+    incluir). Se tienen en cuenta todas sus recompensas, no solo la primera.
+
     :param student_id: ID del alumno a comprobar.
+    :param on_date: Fecha a comprobar (date, datetime o texto YYYY-MM-DD); por defecto, hoy.
     :return: True si el bono está activo, False si ya terminó o no tiene.
     """
-    conn = connect_db()
-    cursor = conn.cursor()
-
-    cursor.execute('''
-        SELECT date_awarded, months_rewarded
-        FROM rewards
-        WHERE recommender_id = ?
-    ''', (student_id,))
+    day = _bonus_date(on_date)
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT EXISTS (
+                SELECT 1 FROM rewards
+                WHERE recommender_id = ? AND bonus_end > ? AND date_awarded <= ?
+            )
+        ''', (student_id, day, day))
+        result = cursor.fetchone()
+    return result[0] == 1
+
+def students_under_bonus(student_ids=None, on_date=None):
+    """
+    Devuelve de una vez los alumnos con un bono gratuito vigente en una fecha.
 
-    row = cursor.fetchone()
-    conn.close()
+    Es una única consulta por rango sobre el índice de bonus_end, pensada para
+    marcar a muchos alumnos a la vez (por ejemplo, en un desplegable) en lugar
+    de llamar a is_student_under_bonus para cada uno.
 
-    if row:
-        date_awarded_str, months = row
-        date_awarded = datetime.strptime(date_awarded_str, "%Y-%m-%d")
-        end_date = date_awarded + relativedelta(months=months)
-        return datetime.now() < end_date  # True si aún está en periodo de bono
+    Args:
+        student_ids (iterable, optional): Solo interesan estos alumnos. Si es None, todos.
+        on_date (date | datetime | str, optional): Fecha a comprobar; por defecto, hoy.
 
-    return False  # No tiene bono
+    Returns:
+        set: IDs de los alumnos que están en periodo de bono.
+    """
+    day = _bonus_date(on_date)
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT recommender_id FROM rewards
+            WHERE bonus_end > ? AND date_awarded <= ?
+        ''', (day, day))
+        under_bonus = {row[0] for row in cursor.fetchall()}
+
+    if student_ids is not None:
+        under_bonus.intersection_update(student_ids)
+    return under_bonus
 
 # Funcion especial para saber cuando se van acabando los bonos
-def get_students_with_expiring_bonus():
-    """
-    Devuelve una lista de alumnos cuyo bono termina dentro de los próximos 7 días.
+def get_students_with_expiring_bonus(days=7, on_date=None):
     """
-    conn = connect_db()
-    cursor = conn.cursor()
+    Devuelve los alumnos cuyo bono termina dentro de los próximos días.
 
-    cursor.execute('''
-        SELECT s.name, r.date_awarded, r.months_rewarded
-        FROM rewards r
-        JOIN students s ON r.new_student_id = s.id
-    ''')
-    rows = cursor.fetchall()
-    conn.close()
-
-    expiring_soon = []
-    for name, date_awarded_str, months in rows:
-        date_awarded = datetime.strptime(date_awarded_str, "%Y-%m-%d")
-        end_date = date_awarded + relativedelta(months=months)
-        days_left = (end_date - datetime.now()).days
-        if 0 <= days_left <= 7:
-            expiring_soon.append((name, end_date.strftime("%Y-%m-%d"), days_left))
-
-    return expiring_soon
\ No newline at end of file
+    El bono es del recomendador; si tiene varias recompensas vigentes cuenta la
+    que termina más tarde, para no avisar de un bono que sigue cubierto por otra.
+
+    Args:
+        days (int): Días hacia delante que se revisan (7 por defecto).
+        on_date (date | datetime | str, optional): Fecha desde la que se cuenta; por defecto, hoy.
+
+    Returns:
+        list of ExpiringBonus: (nombre, fecha de fin YYYY-MM-DD, días que faltan), de la más próxima a la
+            más lejana.
+    """
+    day = _bonus_date(on_date)
+    with get_connection() as conn:
+        cursor = _typed_cursor(conn, ExpiringBonus)
+        cursor.execute('''
+            SELECT s.name, MAX(r.bonus_end) AS end_date,
+                   CAST(julianday(MAX(r.bonus_end)) - julianday(?) AS INTEGER) AS days_left
+            FROM rewards r
+            JOIN students s ON r.recommender_id = s.id
+            WHERE r.bonus_end > ? AND r.date_awarded <= ?
+            GROUP BY s.id
+            HAVING end_date <= date(?, '+' || ? || ' days')
+            ORDER BY end_date, s.name
+        ''', (day, day, day, day, int(days)))
+        results = cursor.fetchall()
+    return results
@@ -0,0 +1,79 @@
+# ==============================
+# FECHAS
+# ==============================
+# Todas las fechas de la base de datos (pagos, clases y recompensas) se guardan
+# como texto ISO YYYY-MM-DD: ordenan igual que las fechas, las entienden las
+# funciones date() de SQLite y un índice sobre la columna sirve para consultas
+# por rango. Un CHECK en cada tabla rechaza cualquier otro formato (migración 7).
+
+from datetime import date, datetime, timedelta
+
+# Formatos que se aceptaban antes de validar las fechas; solo los usa la migración
+LEGACY_FORMATS = ("%Y/%m/%d", "%d/%m/%Y", "%d-%m-%Y", "%d.%m.%Y", "%d/%m/%y", "%d-%m-%y")
+
+
+def iso_date(value):
+    """
+    Convierte una fecha a su forma canónica YYYY-MM-DD.
+
+    Args:
+        value (date | datetime | str): Fecha; el texto debe estar en formato ISO
+            (YYYY-MM-DD, admitiendo hora detrás, que se descarta).
+
+    Returns:
+        str: La fecha como YYYY-MM-DD.
+
+    Raises:
+        ValueError: Si el texto no es una fecha ISO válida (por ejemplo, 2025-02-30).
+    """
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    text = str(value).strip()
+    try:
+        return date.fromisoformat(text).isoformat()
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(text).date().isoformat()
+    except ValueError:
+        raise ValueError(f"Fecha no válida: '{value}' (se espera YYYY-MM-DD)") from None
+
+
+def parse_legacy_date(text):
+    """
+    Interpreta una fecha guardada antes de validar el formato (ISO, o día/mes/año
+    con / - o .). Devuelve YYYY-MM-DD, o None si no es una fecha.
+    """
+    if text is None:
+        return None
+    try:
+        return iso_date(text)
+    except ValueError:
+        pass
+    for fmt in LEGACY_FORMATS:
+        try:
+            return datetime.strptime(str(text).strip(), fmt).date().isoformat()
+        except ValueError:
+            continue
+    return None
+
+
+def today():
+    """Fecha de hoy como YYYY-MM-DD"""
+    return date.today().isoformat()
+
+
+def week_range(on_date=None):
+    """Lunes y domingo (YYYY-MM-DD) de la semana de la fecha indicada (por defecto, hoy)"""
+    day = date.fromisoformat(iso_date(on_date) if on_date is not None else today())
+    monday = day - timedelta(days=day.weekday())
+    return monday.isoformat(), (monday + timedelta(days=6)).isoformat()
+
+
+def month_range(year, month):
+    """Primer y último día (YYYY-MM-DD) del mes indicado"""
+    first = date(year, month, 1)
+    next_month = date(year + month // 12, month % 12 + 1, 1)
+    return first.isoformat(), (next_month - timedelta(days=1)).isoformat()
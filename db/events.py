@@ -0,0 +1,89 @@
+# ==============================
+# AVISOS DE CAMBIOS EN LOS DATOS
+# ==============================
+# Cada función de escritura de db.database publica un ChangeEvent por fila
+# afectada: tabla, operación e id. Los avisos se entregan al confirmarse la
+# transacción (nunca si se deshace), en el hilo que la confirmó, a las funciones
+# suscritas con subscribe(). La interfaz se suscribe a través de ui/event_bus.py,
+# que los lleva al hilo de la interfaz para que las ventanas abiertas corrijan
+# solo las filas afectadas en lugar de recargar la tabla entera.
+#
+# Este módulo no depende de Qt: la capa de datos se puede usar sin interfaz.
+
+import logging
+import threading
+from typing import NamedTuple, Optional
+from db.cache import invalidate
+from db.connection import on_commit
+
+logger = logging.getLogger(__name__)
+
+INSERT = "insert"
+UPDATE = "update"
+DELETE = "delete"
+RELOAD = "reload"  # Han cambiado todos los datos (por ejemplo, al restaurar un backup)
+
+
+class ChangeEvent(NamedTuple):
+    """Cambio confirmado en la base de datos"""
+    table: Optional[str]  # Tabla afectada; None si son todas
+    operation: str  # INSERT, UPDATE, DELETE o RELOAD
+    key: Optional[int] = None  # id de la fila; None si son varias filas (importaciones, borrados en cascada...)
+
+
+_listeners = []
+_lock = threading.Lock()
+
+
+def subscribe(listener):
+    """
+    Registra una función que recibirá cada ChangeEvent confirmado.
+
+    Args:
+        listener (callable): Recibe el ChangeEvent. Se llama en el hilo que
+            confirmó la transacción, que no tiene por qué ser el de la interfaz.
+    """
+    with _lock:
+        _listeners.append(listener)
+
+
+def unsubscribe(listener):
+    """Deja de avisar a una función registrada con subscribe (si no lo estaba, no hace nada)"""
+    with _lock:
+        if listener in _listeners:
+            _listeners.remove(listener)
+
+
+def _deliver(event):
+    with _lock:
+        listeners = list(_listeners)
+    for listener in listeners:
+        try:
+            listener(event)
+        except Exception:
+            # Los datos ya están guardados: un fallo al avisar no debe llegar a quien escribió
+            logger.exception("Error al avisar del cambio %s", event)
+
+
+def publish(table, operation, key=None):
+    """
+    Avisa de un cambio en la tabla: se invalida ya la caché (db.cache) y el
+    ChangeEvent se entrega a los suscriptores cuando se confirme la transacción.
+
+    Args:
+        table (str): Tabla modificada; None si han cambiado todas.
+        operation (str): INSERT, UPDATE, DELETE o RELOAD.
+        key (int, optional): id de la fila modificada; None si son varias.
+    """
+    if table is None:
+        invalidate()
+    else:
+        invalidate(table)
+    event = ChangeEvent(table, operation, key)
+    on_commit(lambda: _deliver(event))
+
+
+def publish_rows(table, operation, keys):
+    """Publica un cambio por cada id de la lista"""
+    for key in keys:
+        publish(table, operation, key)
@@ -0,0 +1,87 @@
+import csv
+import os
+from db.rows import field
+
+# Cada cuántas filas se informa del progreso y se comprueba si se ha cancelado
+PROGRESS_EVERY = 500
+
+
+class ExportCancelled(Exception):
+    """El usuario canceló la exportación"""
+
+
+def _row_values(row, columns):
+    """Extrae las columnas a exportar de una fila (de db.rows, tupla o diccionario)"""
+    keys = columns if columns is not None else range(len(row))
+    values = (field(row, key) for key in keys)
+    return ["" if value is None else value for value in values]
+
+
+def write_export(path, headers, rows, columns=None, sheet_title="Datos", progress=None, should_cancel=None):
+    """
+    Escribe las filas en un fichero CSV o Excel (.xlsx) según la extensión de la ruta.
+
+    Las filas se consumen una a una desde un iterador (por ejemplo, un cursor de
+    la base de datos), así que nunca se tiene el resultado completo en memoria.
+    El Excel se genera con openpyxl en modo write_only por el mismo motivo.
+
+    Args:
+        path (str): Ruta del fichero de salida (.csv o .xlsx).
+        headers (list): Cabeceras de las columnas.
+        rows (iterable): Filas a exportar.
+        columns (list, optional): Índice o nombre de cada columna exportada dentro de la fila.
+        sheet_title (str): Nombre de la hoja si se exporta a Excel.
+        progress (callable, optional): Recibe el número de filas escritas cada PROGRESS_EVERY filas.
+        should_cancel (callable, optional): Devuelve True si hay que cancelar la exportación.
+
+    Returns:
+        int: Número de filas exportadas.
+
+    Raises:
+        ExportCancelled: Si should_cancel devuelve True. Con esta o cualquier otra excepción, el
+            fichero a medias se borra.
+    """
+    excel = path.lower().endswith(".xlsx")
+    written = 0
+    started = False  # Si ya se ha empezado a escribir el fichero (y hay que borrarlo si algo falla)
+
+    try:
+        if excel:
+            import openpyxl  # Solo se carga cuando de verdad se exporta a Excel
+
+            workbook = openpyxl.Workbook(write_only=True)
+            sheet = workbook.create_sheet(sheet_title)
+            append = sheet.append
+        else:
+            file = open(path, mode='w', newline='', encoding='utf-8')
+            started = True
+            append = csv.writer(file).writerow
+
+        try:
+            append(list(headers))
+            for row in rows:
+                append(_row_values(row, columns))
+                written += 1
+
+                if written % PROGRESS_EVERY == 0:
+                    if should_cancel and should_cancel():
+                        raise ExportCancelled()
+                    if progress:
+                        progress(written)
+
+            if excel:
+                started = True
+                workbook.save(path)
+        finally:
+            if not excel:
+                file.close()
+    except BaseException:
+        # Cancelada o con un error a mitad (de la base de datos, de openpyxl...): no dejamos
+        # un fichero a medias que parezca una exportación completa
+        if started and os.path.exists(path):
+            os.remove(path)
+        raise
+
+    if progress:
+        progress(written)
+    return written
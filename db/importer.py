@@ -0,0 +1,221 @@
+# ==============================
+# IMPORTACIÓN MASIVA DE ALUMNOS Y PAGOS
+# ==============================
+# Lee ficheros CSV o Excel (.xlsx) fila a fila, valida cada fila con las mismas
+# reglas que los formularios de la aplicación y guarda las filas válidas con
+# executemany, por bloques, dentro de una única transacción. Las filas con
+# errores no se importan y se pueden volcar a un informe CSV.
+
+import csv
+from datetime import datetime
+from db.connection import get_connection
+from db.database import fetch_levels, iter_students, insert_students_bulk, insert_payments_bulk
+from db.dates import iso_date
+
+# Filas que se envían a la base de datos en cada executemany
+IMPORT_BATCH_SIZE = 5000
+
+# Nombres de columna aceptados en la cabecera del fichero (en minúsculas) -> campo
+STUDENT_COLUMNS = {
+    "nombre": "name", "name": "name",
+    "edad": "age", "age": "age",
+    "nivel": "level", "level": "level",
+}
+PAYMENT_COLUMNS = {
+    "alumno": "student", "student": "student",
+    "cantidad": "amount", "amount": "amount",
+    "fecha": "date", "date": "date",
+    "método": "method", "metodo": "method", "method": "method",
+    "notas": "notes", "notes": "notes",
+}
+
+
+class ImportFormatError(Exception):
+    """El fichero no se puede leer o le faltan columnas obligatorias"""
+
+
+def _cell_text(value):
+    """Convierte una celda (texto, número, fecha de Excel o None) en texto limpio"""
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d")
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+
+def _raw_rows(path):
+    """Genera las filas del fichero como listas de texto (la primera es la cabecera)"""
+    if path.lower().endswith(".xlsx"):
+        import openpyxl  # Solo se carga cuando de verdad se importa un Excel
+
+        workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)  # Lectura en streaming
+        try:
+            for row in workbook.worksheets[0].iter_rows(values_only=True):
+                yield [_cell_text(value) for value in row]
+        finally:
+            workbook.close()
+    else:
+        with open(path, newline="", encoding="utf-8-sig") as file:
+            for row in csv.reader(file):
+                yield [value.strip() for value in row]
+
+
+def read_rows(path, columns, required):
+    """
+    Lee un fichero CSV o Excel y genera sus filas como diccionarios.
+
+    Args:
+        path (str): Ruta del fichero (.csv o .xlsx).
+        columns (dict): Nombres de columna aceptados -> campo.
+        required (list): Campos que deben aparecer en la cabecera.
+
+    Yields:
+        tuple: (número de línea en el fichero, {campo: texto})
+
+    Raises:
+        ImportFormatError: Si el fichero está vacío o le faltan columnas obligatorias.
+    """
+    rows = _raw_rows(path)
+    header = next(rows, None)
+    if not header:
+        raise ImportFormatError("El fichero está vacío")
+
+    fields = [columns.get(name.strip().lower()) for name in header]
+    missing = [field for field in required if field not in fields]
+    if missing:
+        raise ImportFormatError(f"Faltan columnas obligatorias: {', '.join(missing)}")
+
+    for line, row in enumerate(rows, start=2):
+        if not any(row):
+            continue  # Filas vacías (habituales al final de un Excel)
+        yield line, {field: value for field, value in zip(fields, row) if field}
+
+
+def _validate_student(row, levels, names):
+    """Valida una fila de alumno. Devuelve (tupla para insertar, None) o (None, mensaje de error)"""
+    name, age, level = row.get("name", ""), row.get("age", ""), row.get("level", "")
+    if not name or not age or not level:
+        return None, "Todos los campos son obligatorios"
+    if not age.isdigit() or not (12 <= int(age) <= 120):
+        return None, "La edad debe estar entre 12 y 120"
+    if level not in levels:
+        return None, f"El nivel '{level}' no existe"
+    if name.casefold() in names:
+        return None, f"El alumno '{name}' ya existe"
+    names.add(name.casefold())
+    return (name, int(age), level), None
+
+
+def _validate_payment(row, student_ids):
+    """Valida una fila de pago. Devuelve (tupla para insertar, None) o (None, mensaje de error)"""
+    student, amount, date = row.get("student", ""), row.get("amount", ""), row.get("date", "")
+    if not student or not amount or not date:
+        return None, "Alumno, cantidad y fecha son obligatorios"
+
+    ids = student_ids.get(student.casefold())
+    if not ids:
+        return None, f"El alumno '{student}' no existe"
+    if len(ids) > 1:
+        return None, f"Hay varios alumnos llamados '{student}'"
+
+    amount = amount.replace(",", ".")
+    if not amount.replace('.', '', 1).isdigit() or float(amount) <= 0:
+        return None, "La cantidad debe ser un número positivo"
+    try:
+        date = iso_date(date)  # La misma validación que los formularios y las funciones de escritura
+    except ValueError as e:
+        return None, str(e)
+
+    return (ids[0], float(amount), date, row.get("method") or None, row.get("notes") or None), None
+
+
+def _run_import(rows, validate, insert, dry_run, progress):
+    """Valida las filas y guarda las válidas por bloques en una sola transacción"""
+    result = {"read": 0, "imported": 0, "errors": [], "dry_run": dry_run}
+    batch = []
+
+    with get_connection():  # Todas las inserciones se confirman juntas al final
+        for line, row in rows:
+            result["read"] += 1
+            values, error = validate(row)
+            if error:
+                result["errors"].append((line, error, row))
+            else:
+                batch.append(values)
+
+            if len(batch) == IMPORT_BATCH_SIZE:
+                if not dry_run:
+                    insert(batch)
+                result["imported"] += len(batch)
+                batch = []
+                if progress:
+                    progress(result["read"])
+
+        if batch:
+            if not dry_run:
+                insert(batch)
+            result["imported"] += len(batch)
+
+    if progress:
+        progress(result["read"])
+    return result
+
+
+def import_students(path, dry_run=False, progress=None):
+    """
+    Importa alumnos desde un CSV o Excel con columnas Nombre, Edad y Nivel.
+
+    Se aplican las mismas reglas que en la ventana de alumnos: todos los campos
+    obligatorios, edad entre 12 y 120, nivel existente y sin nombres repetidos
+    (ni con la base de datos ni dentro del propio fichero).
+
+    Args:
+        path (str): Ruta del fichero.
+        dry_run (bool): Si es True solo se valida, sin guardar nada.
+        progress (callable, optional): Recibe el número de filas leídas.
+
+    Returns:
+        dict: {"read", "imported", "errors": [(línea, mensaje, fila)], "dry_run"}
+            ("imported" son las filas que se importarían si dry_run es True).
+    """
+    levels = {level.name for level in fetch_levels()}
+    names = {student.name.casefold() for student in iter_students()}
+    rows = read_rows(path, STUDENT_COLUMNS, ["name", "age", "level"])
+    return _run_import(rows, lambda row: _validate_student(row, levels, names), insert_students_bulk,
+                       dry_run, progress)
+
+
+def import_payments(path, dry_run=False, progress=None):
+    """
+    Importa pagos desde un CSV o Excel con columnas Alumno, Cantidad, Fecha y,
+    opcionalmente, Método y Notas. El alumno se indica por su nombre.
+
+    La cantidad debe ser positiva (se acepta coma decimal) y la fecha ser válida
+    para db.dates.iso_date (YYYY-MM-DD, con hora opcional que se descarta). Al ser pagos históricos no se comprueba el bono actual.
+
+    Args y Returns: como import_students.
+    """
+    student_ids = {}
+    for student in iter_students():
+        student_ids.setdefault(student.name.casefold(), []).append(student.id)
+    rows = read_rows(path, PAYMENT_COLUMNS, ["student", "amount", "date"])
+    return _run_import(rows, lambda row: _validate_payment(row, student_ids), insert_payments_bulk,
+                       dry_run, progress)
+
+
+def write_error_report(path, errors):
+    """
+    Guarda en un CSV las filas que no se pudieron importar y el motivo.
+
+    Args:
+        path (str): Ruta del informe.
+        errors (list): Lista de (línea, mensaje, fila) devuelta por import_students / import_payments.
+    """
+    fields = sorted({field for _, _, row in errors for field in row})
+    with open(path, mode="w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(["Línea", "Error"] + fields)
+        for line, message, row in errors:
+            writer.writerow([line, message] + [row.get(field, "") for field in fields])
@@ -0,0 +1,505 @@
+# ==============================
+# MIGRACIONES DEL ESQUEMA
+# ==============================
+# La versión del esquema se guarda en PRAGMA user_version. Cada migración tiene
+# un número de versión consecutivo y una lista de pasos: sentencias SQL o
+# funciones que reciben la conexión. Solo se avanza hacia delante; nunca se
+# modifica una migración ya publicada, se añade una nueva al final.
+
+import sqlite3
+from contextlib import contextmanager
+from db.auth import hash_plaintext_passwords
+from db.dates import parse_legacy_date
+
+# Tokenizador de búsqueda: ignora mayúsculas y acentos ("Íñigo" se encuentra buscando "inigo")
+FTS_TOKENIZER = "unicode61 remove_diacritics 2"
+
+# Índices de texto completo: (tabla FTS, tabla de origen, columnas indexadas)
+FTS_TABLES = [
+    ("students_fts", "students", ["name"]),
+    ("payments_fts", "payments", ["notes"]),
+    ("rewards_fts", "rewards", ["reward_name"]),
+]
+
+
+def _insert_trigger_sql(fts, table, columns):
+    """SQL del trigger que indexa cada fila nueva de la tabla de origen"""
+    cols = ", ".join(columns)
+    new_values = ", ".join(f"new.{c}" for c in columns)
+    return f"""
+        CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN
+            INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_values});
+        END
+    """
+
+
+@contextmanager
+def deferred_search_index(conn, table):
+    """
+    Durante una inserción masiva en la tabla, indexa las filas nuevas de una sola
+    vez al final en lugar de disparar el trigger FTS fila a fila (varias veces
+    más rápido). Todo ocurre dentro de la misma transacción: si algo falla, el
+    rollback devuelve también el trigger.
+
+    Args:
+        conn (sqlite3.Connection): Conexión en la que se hacen las inserciones.
+        table (str): Tabla de origen (students, payments o rewards).
+    """
+    entry = next(((fts, columns) for fts, source, columns in FTS_TABLES if source == table), None)
+    if entry is None or conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = ?",
+                                     (f"{entry[0]}_ai",)).fetchone() is None:
+        yield  # Sin índice de búsqueda: no hay nada que aplazar
+        return
+
+    fts, columns = entry
+    cols = ", ".join(columns)
+    if not conn.in_transaction:
+        conn.execute("BEGIN")  # El DROP TRIGGER no debe confirmarse por su cuenta
+    last_id = conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()[0]
+    conn.execute(f"DROP TRIGGER {fts}_ai")
+
+    yield
+
+    conn.execute(f"INSERT INTO {fts}(rowid, {cols}) SELECT id, {cols} FROM {table} WHERE id > ?", (last_id,))
+    conn.execute(_insert_trigger_sql(fts, table, columns))
+
+
+def _create_search_index(conn):
+    """
+    Crea las tablas FTS5 (de contenido externo) y los triggers que las mantienen
+    sincronizadas con sus tablas de origen. Si el SQLite instalado no incluye
+    FTS5 no se crea nada y las búsquedas siguen funcionando con LIKE.
+    """
+    try:
+        conn.execute("CREATE VIRTUAL TABLE temp.fts5_check USING fts5(x)")
+        conn.execute("DROP TABLE temp.fts5_check")
+    except sqlite3.OperationalError:
+        return  # Sin soporte de FTS5
+
+    for fts, table, columns in FTS_TABLES:
+        cols = ", ".join(columns)
+        new_values = ", ".join(f"new.{c}" for c in columns)
+        old_values = ", ".join(f"old.{c}" for c in columns)
+
+        conn.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS {fts}
+            USING fts5({cols}, content='{table}', content_rowid='id', tokenize='{FTS_TOKENIZER}')
+        """)
+        conn.execute(_insert_trigger_sql(fts, table, columns))
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN
+                INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_values});
+            END
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {table} BEGIN
+                INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_values});
+                INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_values});
+            END
+        """)
+        # Indexamos las filas que ya existían
+        conn.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+# Fin del bono de una recompensa (sin incluir): date_awarded + months_rewarded
+# meses. Si el día no existe en el mes final se usa su último día (31-ene + 1 mes
+# = 28-feb), igual que relativedelta; date(..., '+N months') de SQLite pasaría al
+# mes siguiente. Es una columna generada: SQLite la mantiene sola al insertar o
+# modificar la recompensa y el índice guarda su valor.
+BONUS_END_SQL = """
+    MIN(date(date_awarded, 'start of month', '+' || months_rewarded || ' months',
+             '+' || (CAST(strftime('%d', date_awarded) AS INTEGER) - 1) || ' days'),
+        date(date_awarded, 'start of month', '+' || (months_rewarded + 1) || ' months', '-1 day'))
+"""
+
+
+def _rename_duplicate_usernames(conn):
+    """
+    Antes de exigir nombres de usuario únicos, renombra los repetidos: el más
+    antiguo conserva el nombre y el resto pasa a llamarse "<nombre>_<id>".
+    """
+    conn.execute("""
+        UPDATE users SET username = username || '_' || id
+        WHERE id NOT IN (SELECT MIN(id) FROM users GROUP BY username)
+    """)
+
+
+def _unique_names(table):
+    """
+    Paso de migración que exige nombres únicos (sin distinguir mayúsculas) en la
+    tabla. Antes renombra los repetidos como _rename_duplicate_usernames. Si la
+    tabla aún no existe no hace nada: create_tables la crea después.
+    """
+    def step(conn):
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone() is None:
+            return
+        if table == "levels":
+            # Los alumnos guardan el nombre del nivel: siguen al nivel que se renombra
+            conn.execute("""
+                UPDATE students SET level = level || '_' || (SELECT id FROM levels WHERE name = students.level)
+                WHERE level IN (SELECT name FROM levels
+                                WHERE id NOT IN (SELECT MIN(id) FROM levels GROUP BY name COLLATE NOCASE))
+            """)
+        conn.execute(f"""
+            UPDATE {table} SET name = name || '_' || id
+            WHERE id NOT IN (SELECT MIN(id) FROM {table} GROUP BY name COLLATE NOCASE)
+        """)
+        conn.execute(f"DROP INDEX IF EXISTS idx_{table}_name")
+        conn.execute(f"CREATE UNIQUE INDEX idx_{table}_name ON {table}(name COLLATE NOCASE)")
+    return step
+
+
+# Columna de fecha (texto YYYY-MM-DD, ver db.dates) de cada tabla
+DATE_COLUMNS = {"payments": "date", "classes": "date", "rewards": "date_awarded"}
+
+
+def _valid_date_sql(column):
+    """
+    Condición SQL que solo cumple una fecha YYYY-MM-DD que existe: date() devuelve
+    NULL si el formato no es ese y, con un modificador, normaliza los días que no
+    existen (2025-02-30 pasa a 2025-03-02), así que solo coincide la fecha válida.
+    """
+    return f"{column} IS date({column}, '+0 days')"
+
+
+def _normalize_dates(conn):
+    """
+    Pasa a YYYY-MM-DD las fechas guardadas en otros formatos (29/02/2024,
+    2024-02-29 10:30...). Si alguna no es una fecha la migración falla indicando
+    qué filas hay que corregir, en lugar de perder el dato.
+    """
+    for table, column in DATE_COLUMNS.items():
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone() is None:
+            continue
+        invalid = []
+        rows = conn.execute(f"SELECT id, {column} FROM {table} WHERE NOT ({_valid_date_sql(column)})").fetchall()
+        for row_id, value in rows:
+            fixed = parse_legacy_date(value)
+            if fixed is None:
+                invalid.append(row_id)
+            else:
+                conn.execute(f"UPDATE {table} SET {column} = ? WHERE id = ?", (fixed, row_id))
+        if invalid:
+            raise MigrationError(f"Fechas no válidas en {table}.{column} (ids {', '.join(map(str, invalid))})")
+
+
+def _delete_orphans(conn):
+    """
+    Borra los pagos y recompensas de alumnos que ya no existen. Antes de activar
+    las claves foráneas, borrar un alumno los dejaba huérfanos (ninguna consulta
+    los mostraba); con ellas activas, copiar la tabla al recrearla (_add_checks)
+    fallaría. Es lo que hace ahora delete_student_by_id al borrar un alumno.
+    """
+    tables = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    if "students" not in tables:
+        return
+    orphan = "{column} IS NOT NULL AND NOT EXISTS (SELECT 1 FROM students WHERE students.id = {column})"
+    if "payments" in tables:
+        conn.execute(f"DELETE FROM payments WHERE {orphan.format(column='student_id')}")
+    if "rewards" in tables:
+        conn.execute(f"DELETE FROM rewards WHERE {orphan.format(column='recommender_id')} "
+                     f"OR {orphan.format(column='new_student_id')}")
+
+
+def _add_checks(table, checks):
+    """
+    Paso de migración que añade restricciones CHECK a una tabla. SQLite no permite
+    añadirlas con ALTER TABLE: se crea la tabla de nuevo con ellas, se copian las
+    filas (con sus ids) y se vuelven a crear sus índices y triggers.
+    """
+    def step(conn):
+        row = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()
+        if row is None:
+            return
+        create_sql = row[0].rstrip()
+        columns_sql = create_sql[create_sql.index("(") + 1:-1].rstrip()
+        constraints = ", ".join(f"CHECK ({check})" for check in checks)
+        # Las columnas generadas (hidden 2 o 3) no se copian: SQLite las calcula
+        columns = ", ".join(name for _, name, *_, hidden in conn.execute(f"PRAGMA table_xinfo({table})")
+                            if hidden == 0)
+        dependents = [sql for (sql,) in conn.execute(
+            "SELECT sql FROM sqlite_master WHERE tbl_name = ? AND type IN ('index', 'trigger') AND sql IS NOT NULL",
+            (table,))]
+        sequence = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,)).fetchone() \
+            if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_sequence'").fetchone() else None
+
+        conn.execute(f"CREATE TABLE {table}_new ({columns_sql},\n    {constraints}\n)")
+        conn.execute(f"INSERT INTO {table}_new ({columns}) SELECT {columns} FROM {table}")
+        conn.execute(f"DROP TABLE {table}")
+        conn.execute(f"ALTER TABLE {table}_new RENAME TO {table}")
+        for sql in dependents:
+            conn.execute(sql)
+        if sequence is not None:
+            # AUTOINCREMENT: no se reutilizan los ids de filas ya borradas
+            conn.execute("UPDATE sqlite_sequence SET seq = ? WHERE name = ?", (sequence[0], table))
+    return step
+
+
+# Tablas resumen de ingresos (db.reports): (tabla, columna clave, expresión de la clave para un pago "p",
+# FROM/WHERE que necesita la expresión). Las de alumno y nivel solo cuentan los pagos de alumnos que existen
+# (como un JOIN con students) y el nivel es el actual del alumno.
+REVENUE_SUMMARIES = [
+    ("revenue_by_month", "month", "substr(p.date, 1, 7)", ""),
+    ("revenue_by_method", "method", "COALESCE(p.method, '')", ""),
+    ("revenue_by_student", "student_id", "students.id", "FROM students WHERE students.id = p.student_id"),
+    ("revenue_by_level", "level", "students.level", "FROM students WHERE students.id = p.student_id"),
+]
+
+# Importe en céntimos: los totales se suman y restan sin errores de redondeo
+_CENTS_SQL = "CAST(round(p.amount * 100) AS INTEGER)"
+
+
+def _add_payment_sql(table, key, expression, source, row):
+    """SQL que suma el pago row (new u old) a su fila de la tabla resumen, creándola si no existe"""
+    select = f"SELECT {expression}, 1, {_CENTS_SQL} {source or 'WHERE true'}".replace("p.", f"{row}.")
+    return f"""
+        INSERT INTO {table} ({key}, payments, total_cents) {select}
+        ON CONFLICT ({key}) DO UPDATE SET payments = payments + 1,
+                                          total_cents = total_cents + excluded.total_cents;
+    """
+
+
+def _remove_payment_sql(table, key, expression, source, row):
+    """SQL que resta el pago row de su fila de la tabla resumen y la borra si se queda sin pagos"""
+    key_value = f"(SELECT {expression} {source})".replace("p.", f"{row}.")
+    cents = _CENTS_SQL.replace("p.", f"{row}.")
+    return f"""
+        UPDATE {table} SET payments = payments - 1, total_cents = total_cents - {cents}
+        WHERE {key} = {key_value};
+        DELETE FROM {table} WHERE {key} = {key_value} AND payments = 0;
+    """
+
+
+def _aggregate_payments_sql(table, key, expression, source, condition):
+    """SQL que suma a la tabla resumen los pagos que cumplen condition, agrupados por su clave"""
+    join = "JOIN students ON students.id = p.student_id" if source else ""
+    return f"""
+        INSERT INTO {table} ({key}, payments, total_cents)
+        SELECT {expression}, COUNT(*), SUM({_CENTS_SQL})
+        FROM payments p {join}
+        WHERE {condition}
+        GROUP BY 1
+        ON CONFLICT ({key}) DO UPDATE SET payments = payments + excluded.payments,
+                                          total_cents = total_cents + excluded.total_cents
+    """
+
+
+def refresh_revenue_summaries(conn):
+    """
+    Recalcula desde cero las tablas resumen de ingresos a partir de los pagos.
+    Los triggers las mantienen al día; esto solo hace falta al crearlas o para
+    repararlas (db.reports.rebuild_summaries).
+    """
+    for summary in REVENUE_SUMMARIES:
+        conn.execute(f"DELETE FROM {summary[0]}")
+        conn.execute(_aggregate_payments_sql(*summary, "true"))
+
+
+@contextmanager
+def deferred_revenue_summaries(conn):
+    """
+    Como deferred_search_index, pero para las tablas resumen de ingresos: durante
+    una inserción masiva de pagos no se dispara el trigger fila a fila y al final
+    se suman los pagos nuevos agrupados, con una consulta por tabla resumen.
+    """
+    row = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = 'payments_revenue_ai'"
+                       ).fetchone()
+    if row is None:
+        yield  # Sin tablas resumen: no hay nada que aplazar
+        return
+
+    if not conn.in_transaction:
+        conn.execute("BEGIN")  # El DROP TRIGGER no debe confirmarse por su cuenta
+    last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM payments").fetchone()[0]
+    conn.execute("DROP TRIGGER payments_revenue_ai")
+
+    yield
+
+    for summary in REVENUE_SUMMARIES:
+        conn.execute(_aggregate_payments_sql(*summary, "p.id > ?"), (last_id,))
+    conn.execute(row[0])
+
+
+def _create_revenue_summaries(conn):
+    """
+    Crea las tablas resumen de ingresos (por mes, método de pago, alumno y nivel)
+    y los triggers que las actualizan con cada alta, cambio o baja de un pago, de
+    modo que los informes leen totales ya calculados en lugar de recorrer todos
+    los pagos. Cambiar de nivel a un alumno (o borrarlo) mueve sus totales.
+    """
+    for table, key, _, _ in REVENUE_SUMMARIES:
+        key_type = "INTEGER" if key == "student_id" else "TEXT"
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                {key} {key_type} PRIMARY KEY,
+                payments INTEGER NOT NULL,
+                total_cents INTEGER NOT NULL
+            ) WITHOUT ROWID
+        """)
+    # Alumnos que más han pagado (revenue_by_student ordenado por total)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_revenue_by_student_total ON revenue_by_student(total_cents)")
+
+    add_new = "".join(_add_payment_sql(*summary, "new") for summary in REVENUE_SUMMARIES)
+    remove_old = "".join(_remove_payment_sql(*summary, "old") for summary in REVENUE_SUMMARIES)
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS payments_revenue_ai AFTER INSERT ON payments BEGIN {add_new} END")
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS payments_revenue_ad AFTER DELETE ON payments BEGIN {remove_old} END")
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS payments_revenue_au
+        AFTER UPDATE OF student_id, amount, date, method ON payments
+        BEGIN {remove_old} {add_new} END
+    """)
+
+    # El total por nivel usa el nivel actual del alumno: al cambiarlo se mueven sus totales de un nivel a otro
+    move_out = """
+        UPDATE revenue_by_level
+        SET payments = payments - (SELECT payments FROM revenue_by_student WHERE student_id = old.id),
+            total_cents = total_cents - (SELECT total_cents FROM revenue_by_student WHERE student_id = old.id)
+        WHERE level = old.level AND EXISTS (SELECT 1 FROM revenue_by_student WHERE student_id = old.id);
+        DELETE FROM revenue_by_level WHERE level = old.level AND payments = 0;
+    """
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS students_revenue_au AFTER UPDATE OF level ON students
+        WHEN old.level IS NOT new.level
+        BEGIN
+            {move_out}
+            INSERT INTO revenue_by_level (level, payments, total_cents)
+            SELECT new.level, payments, total_cents FROM revenue_by_student WHERE student_id = new.id
+            ON CONFLICT (level) DO UPDATE SET payments = payments + excluded.payments,
+                                              total_cents = total_cents + excluded.total_cents;
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS students_revenue_ad AFTER DELETE ON students
+        BEGIN
+            {move_out}
+            DELETE FROM revenue_by_student WHERE student_id = old.id;
+        END
+    """)
+
+    refresh_revenue_summaries(conn)
+
+
+MIGRATIONS = [
+    (1, "Índices para las consultas más frecuentes", [
+        # fetch_payments: JOIN por alumno
+        "CREATE INDEX IF NOT EXISTS idx_payments_student_id ON payments(student_id)",
+        # reward_already_granted / get_students_with_expiring_bonus
+        "CREATE INDEX IF NOT EXISTS idx_rewards_new_student_id ON rewards(new_student_id)",
+        # is_student_under_bonus
+        "CREATE INDEX IF NOT EXISTS idx_rewards_recommender_id ON rewards(recommender_id)",
+        # delete_student / update_student / delete_reward buscan por nombre
+        "CREATE INDEX IF NOT EXISTS idx_students_name ON students(name)",
+        # update_class / delete_class
+        "CREATE INDEX IF NOT EXISTS idx_classes_name ON classes(name)",
+        # delete_user
+        "CREATE INDEX IF NOT EXISTS idx_users_username ON users(username)",
+    ]),
+    (2, "Índice por fecha para la paginación de pagos", [
+        # fetch_payments_page ordena por fecha por defecto
+        "CREATE INDEX IF NOT EXISTS idx_payments_date ON payments(date)",
+    ]),
+    (3, "Búsqueda de texto completo (FTS5) en alumnos, notas de pagos y recompensas", [
+        _create_search_index,
+    ]),
+    (4, "Fecha de fin del bono como columna generada e indexada en rewards", [
+        f"ALTER TABLE rewards ADD COLUMN bonus_end TEXT GENERATED ALWAYS AS ({BONUS_END_SQL}) VIRTUAL",
+        # students_under_bonus / get_students_with_expiring_bonus: bonos vigentes en una fecha,
+        # resueltos solo con el índice (is_student_under_bonus sigue usando idx_rewards_recommender_id)
+        "CREATE INDEX IF NOT EXISTS idx_rewards_bonus_end ON rewards(bonus_end, date_awarded, recommender_id)",
+    ]),
+    (5, "Contraseñas con hash y nombres de usuario únicos", [
+        hash_plaintext_passwords,
+        _rename_duplicate_usernames,
+        # El inicio de sesión busca por nombre de usuario: el índice pasa a ser UNIQUE
+        "DROP INDEX IF EXISTS idx_users_username",
+        "CREATE UNIQUE INDEX idx_users_username ON users(username)",
+    ]),
+    (6, "Nombres únicos (sin distinguir mayúsculas) en alumnos, clases y niveles", [
+        # Los nombres repetidos se detectan con el índice al insertar (ON CONFLICT) en lugar de
+        # recorriendo la tabla, y *_name_exists y las funciones por nombre buscan con él
+        _unique_names("students"),
+        _unique_names("classes"),
+        _unique_names("levels"),
+    ]),
+    (7, "Fechas válidas en formato YYYY-MM-DD en pagos, clases y recompensas", [
+        _normalize_dates,
+        _delete_orphans,  # Antes de recrear las tablas con las claves foráneas activas
+        # Con el formato garantizado, comparar el texto es comparar fechas: los rangos usan el índice
+        _add_checks("payments", [_valid_date_sql("date")]),
+        _add_checks("classes", [_valid_date_sql("date")]),
+        _add_checks("rewards", [_valid_date_sql("date_awarded")]),
+        # fetch_classes_between / fetch_classes_this_week
+        "CREATE INDEX IF NOT EXISTS idx_classes_date ON classes(date)",
+    ]),
+    (8, "Índices para ordenar y paginar por clave pagos, alumnos y recompensas", [
+        # fetch_*_after ordenan por (columna, id): el id (rowid) va implícito al final de cada índice,
+        # así que basta con indexar la columna. Pagos por fecha y alumnos por nombre ya lo tenían.
+        "CREATE INDEX IF NOT EXISTS idx_payments_amount ON payments(amount)",
+        "CREATE INDEX IF NOT EXISTS idx_students_age ON students(age)",
+        "CREATE INDEX IF NOT EXISTS idx_students_level ON students(level)",
+        "CREATE INDEX IF NOT EXISTS idx_rewards_date_awarded ON rewards(date_awarded)",
+        "CREATE INDEX IF NOT EXISTS idx_rewards_months_rewarded ON rewards(months_rewarded)",
+    ]),
+    (9, "Tablas resumen de ingresos mantenidas por triggers para los informes", [
+        _create_revenue_summaries,
+    ]),
+]
+
+
+class MigrationError(Exception):
+    """Error al aplicar una migración del esquema"""
+
+
+def latest_version():
+    """Devuelve la versión del esquema que espera esta versión de la aplicación"""
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+
+def get_schema_version(conn):
+    """Lee la versión actual del esquema (PRAGMA user_version)"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    """
+    Aplica en orden las migraciones pendientes sobre la conexión indicada.
+
+    Cada migración se ejecuta en su propia transacción junto con la
+    actualización de user_version, de modo que un fallo deja la base de datos
+    en la última versión completada.
+
+    Args:
+        conn (sqlite3.Connection): Conexión abierta a la base de datos.
+
+    Returns:
+        list: Versiones aplicadas en esta llamada.
+    """
+    current = get_schema_version(conn)
+    if current > latest_version():
+        raise MigrationError(
+            f"La base de datos está en la versión {current}, más nueva que la soportada ({latest_version()})")
+
+    if conn.in_transaction:
+        conn.commit()  # Cada migración abre su propia transacción
+
+    applied = []
+    for version, description, steps in MIGRATIONS:
+        if version <= current:
+            continue
+
+        try:
+            conn.execute("BEGIN")
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            raise MigrationError(f"Falló la migración {version} ({description}): {e}") from e
+
+        applied.append(version)
+
+    return applied
@@ -0,0 +1,290 @@
+# ==============================
+# MEDICIÓN DE CONSULTAS
+# ==============================
+# Desactivada por defecto: se activa en la sección [profiling] de settings.ini.
+# Con ella activada se cuentan, para cada función pública de db.database y
+# para cada sentencia SQL (agrupadas sin sus valores), las llamadas, el tiempo
+# total y máximo, un histograma de latencias y las filas devueltas. Las
+# sentencias más lentas que slow_query_ms se apuntan en un registro junto con
+# su EXPLAIN QUERY PLAN. Las estadísticas se ven en Herramientas > Estadísticas
+# de consultas (ui/query_stats_window.py).
+#
+# Desactivada no cuesta nada: las funciones no se envuelven y el pool solo
+# comprueba una variable al entregar cada conexión.
+
+import logging
+import re
+import threading
+from datetime import datetime
+from functools import wraps
+from time import perf_counter
+from db.connection import get_connection, set_tracer
+from db.settings import load_profiling, DEFAULT_PROFILING
+
+logger = logging.getLogger(__name__)
+
+# Límites superiores (ms) de los tramos del histograma; el último tramo es "más de 500 ms"
+HISTOGRAM_BOUNDS_MS = (1, 5, 20, 100, 500)
+
+# Sentencias a las que se puede pedir el plan de ejecución
+_EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "REPLACE")
+
+# Valores literales que sqlite3 incrusta en el texto de la sentencia
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?![\w.])")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_sql(sql):
+    """Quita de la sentencia los valores concretos y los espacios sobrantes, para agruparla con las iguales"""
+    sql = _STRING_LITERAL.sub("?", sql)
+    sql = _NUMBER_LITERAL.sub("?", sql)
+    return _SPACES.sub(" ", sql).strip()
+
+
+class CallStats:
+    """Contadores de una función o una sentencia"""
+
+    __slots__ = ("calls", "total", "max", "rows", "histogram")
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0  # segundos
+        self.max = 0.0
+        self.rows = 0
+        self.histogram = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+
+    def add(self, elapsed, rows=None):
+        self.calls += 1
+        self.total += elapsed
+        self.max = max(self.max, elapsed)
+        if rows:
+            self.rows += rows
+        milliseconds = elapsed * 1000
+        for bucket, bound in enumerate(HISTOGRAM_BOUNDS_MS):
+            if milliseconds <= bound:
+                break
+        else:
+            bucket = len(HISTOGRAM_BOUNDS_MS)
+        self.histogram[bucket] += 1
+
+    def as_dict(self, name):
+        return {"name": name, "calls": self.calls, "total_ms": self.total * 1000,
+                "avg_ms": self.total * 1000 / self.calls if self.calls else 0.0,
+                "max_ms": self.max * 1000, "rows": self.rows, "histogram": list(self.histogram)}
+
+
+class QueryProfiler:
+    """
+    Recoge los tiempos de las funciones envueltas y de las sentencias que le pasa
+    el pool de conexiones (db.connection.set_tracer).
+
+    sqlite3 avisa cuando empieza cada sentencia, así que cada una dura hasta que
+    empieza la siguiente en la misma conexión o termina el bloque de conexión
+    (incluida la lectura de sus filas).
+    """
+
+    def __init__(self, slow_query_ms=DEFAULT_PROFILING["slow_query_ms"],
+                 slow_query_log=DEFAULT_PROFILING["slow_query_log"]):
+        self.slow_query_ms = slow_query_ms
+        self.slow_query_log = slow_query_log
+        self.active = True
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._functions = {}  # nombre -> CallStats
+        self._statements = {}  # sentencia normalizada -> CallStats
+        self._plans = {}  # sentencia normalizada -> plan ya calculado
+        self.slow_queries = 0
+
+    # ---------- Funciones ----------
+
+    def wrap(self, name, function):
+        """Devuelve function envuelta para contar sus llamadas, su tiempo y las filas de las listas que devuelve"""
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            stack = self._stack()
+            stack.append(name)
+            start = perf_counter()
+            result = None
+            try:
+                result = function(*args, **kwargs)
+                return result
+            finally:
+                elapsed = perf_counter() - start
+                stack.pop()
+                rows = len(result) if isinstance(result, list) else None
+                with self._lock:
+                    self._functions.setdefault(name, CallStats()).add(elapsed, rows)
+        return wrapper
+
+    def _stack(self):
+        stack = getattr(self._local, "functions", None)
+        if stack is None:
+            stack = self._local.functions = []
+        return stack
+
+    # ---------- Sentencias (llamado por el pool) ----------
+
+    def trace(self, sql):
+        """Callback de set_trace_callback: empieza una sentencia y termina la anterior"""
+        if not self.active or getattr(self._local, "explaining", False):
+            return
+        if sql.startswith("--"):
+            return  # Sentencia interna de un trigger o de una tabla FTS5: cuenta dentro de la que la lanzó
+        now = perf_counter()
+        self._finish_statement(now)
+        stack = self._stack()
+        self._local.statement = (sql, now, stack[0] if stack else None)
+
+    def block_ended(self):
+        """Termina la última sentencia del bloque y apunta las lentas con su plan"""
+        if not self.active or getattr(self._local, "explaining", False):
+            return
+        self._finish_statement(perf_counter())
+        slow = getattr(self._local, "slow", None)
+        if slow:
+            self._local.slow = []
+            self._log_slow(slow)
+
+    def _finish_statement(self, now):
+        current = getattr(self._local, "statement", None)
+        if current is None:
+            return
+        self._local.statement = None
+        sql, start, function = current
+        elapsed = now - start
+        normalized = normalize_sql(sql)
+        with self._lock:
+            self._statements.setdefault(normalized, CallStats()).add(elapsed)
+        if elapsed * 1000 >= self.slow_query_ms:
+            if getattr(self._local, "slow", None) is None:
+                self._local.slow = []
+            self._local.slow.append((sql, normalized, elapsed, function))
+
+    def _explain(self, sql, normalized):
+        """EXPLAIN QUERY PLAN de la sentencia (con sus valores), como árbol de texto; se calcula una vez"""
+        with self._lock:
+            if normalized in self._plans:
+                return self._plans[normalized]
+        if not sql.lstrip().upper().startswith(_EXPLAINABLE):
+            return ""
+        self._local.explaining = True
+        try:
+            with get_connection() as conn:
+                rows = conn.execute("EXPLAIN QUERY PLAN " + sql).fetchall()
+        except Exception as e:
+            return f"(sin plan: {e})"
+        finally:
+            self._local.explaining = False
+
+        depth = {0: 0}
+        lines = []
+        for node, parent, _, detail in rows:
+            depth[node] = depth.get(parent, 0) + 1
+            lines.append("  " * depth[node] + detail)
+        plan = "\n".join(lines)
+        with self._lock:
+            self._plans[normalized] = plan
+        return plan
+
+    def _log_slow(self, slow):
+        entries = []
+        for sql, normalized, elapsed, function in slow:
+            origin = f" en {function}" if function else ""
+            entries.append(f"{datetime.now():%Y-%m-%d %H:%M:%S}  {elapsed * 1000:.1f} ms{origin}\n"
+                           f"{sql.strip()}\n{self._explain(sql, normalized)}\n\n")
+        with self._lock:
+            self.slow_queries += len(entries)
+            try:
+                with open(self.slow_query_log, "a", encoding="utf-8") as log:
+                    log.writelines(entries)
+            except OSError:
+                logger.exception("No se pudo escribir en el registro de consultas lentas %s", self.slow_query_log)
+
+    # ---------- Resultados ----------
+
+    def snapshot(self):
+        """
+        Devuelve las estadísticas recogidas hasta ahora.
+
+        Returns:
+            dict: {"functions": [...], "statements": [...], "slow_queries": int}, con las
+                listas ordenadas por tiempo total (mayor primero). Cada elemento tiene name,
+                calls, total_ms, avg_ms, max_ms, rows e histogram (llamadas por tramo).
+        """
+        with self._lock:
+            functions = [stats.as_dict(name) for name, stats in self._functions.items()]
+            statements = [stats.as_dict(sql) for sql, stats in self._statements.items()]
+            slow_queries = self.slow_queries
+        key = lambda item: item["total_ms"]
+        return {"functions": sorted(functions, key=key, reverse=True),
+                "statements": sorted(statements, key=key, reverse=True),
+                "slow_queries": slow_queries}
+
+    def reset(self):
+        """Pone a cero los contadores (el registro de consultas lentas se conserva)"""
+        with self._lock:
+            self._functions.clear()
+            self._statements.clear()
+            self.slow_queries = 0
+
+
+# Medidor activo; None mientras la medición está desactivada
+_profiler = None
+_originals = []  # (módulo, nombre, función sin envolver), para desactivarla
+
+
+def enable_profiling(slow_query_ms=DEFAULT_PROFILING["slow_query_ms"],
+                     slow_query_log=DEFAULT_PROFILING["slow_query_log"], modules=None):
+    """
+    Activa la medición: envuelve las funciones públicas de los módulos indicados
+    (por defecto db.database) y pide al pool que le pase cada sentencia.
+
+    Hay que llamarla al arrancar, antes de importar las ventanas: quien ya haya
+    hecho `from db.database import ...` conserva la función sin envolver.
+
+    Returns:
+        QueryProfiler: El medidor activo.
+    """
+    global _profiler
+    if _profiler is not None:
+        return _profiler
+    if modules is None:
+        import db.database
+        modules = [db.database]
+
+    profiler = QueryProfiler(slow_query_ms, slow_query_log)
+    for module in modules:
+        for name, value in list(vars(module).items()):
+            if (callable(value) and not name.startswith("_") and getattr(value, "__module__", None) == module.__name__
+                    and not isinstance(value, type)):
+                _originals.append((module, name, value))
+                setattr(module, name, profiler.wrap(name, value))
+    set_tracer(profiler)
+    _profiler = profiler
+    return profiler
+
+
+def disable_profiling():
+    """Desactiva la medición y devuelve a los módulos sus funciones sin envolver"""
+    global _profiler
+    if _profiler is not None:
+        _profiler.active = False
+        set_tracer(None)
+        _profiler = None
+    while _originals:
+        module, name, function = _originals.pop()
+        setattr(module, name, function)
+
+
+def enable_profiling_from_settings(path=None):
+    """Activa la medición si así lo indica la sección [profiling] de settings.ini; devuelve si está activa"""
+    settings = load_profiling() if path is None else load_profiling(path)
+    if settings["enabled"]:
+        enable_profiling(settings["slow_query_ms"], settings["slow_query_log"])
+    return _profiler is not None
+
+
+def get_profiler():
+    """Devuelve el medidor activo, o None si la medición está desactivada"""
+    return _profiler
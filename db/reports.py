@@ -0,0 +1,109 @@
+# ==============================
+# INFORMES DE INGRESOS
+# ==============================
+# Los informes leen las tablas resumen (por mes, método de pago, nivel y alumno)
+# que crean las migraciones y mantienen al día los triggers de payments y
+# students: abrir un informe lee unas pocas filas ya sumadas, sin recorrer
+# todos los pagos. Los importes se guardan en céntimos y se devuelven en euros.
+
+from db.connection import get_connection
+from db.migrations import refresh_revenue_summaries
+from db.rows import Revenue, row_factory
+
+# Texto de los pagos sin método en el informe por método
+NO_METHOD = "Sin indicar"
+
+
+def _revenue(sql, params=()):
+    """Ejecuta una consulta de las tablas resumen y devuelve sus filas como Revenue"""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = row_factory(Revenue)
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def revenue_by_month(offset=0, limit=None):
+    """
+    Ingresos de cada mes, del más reciente al más antiguo.
+
+    Args:
+        offset (int): Número de meses que se saltan.
+        limit (int, optional): Número máximo de meses; None devuelve todos.
+
+    Returns:
+        list of Revenue: (mes YYYY-MM, pagos, total).
+    """
+    return _revenue('''
+        SELECT month, payments, total_cents / 100.0 FROM revenue_by_month
+        ORDER BY month DESC
+        LIMIT ? OFFSET ?
+    ''', (-1 if limit is None else limit, offset))
+
+
+def revenue_by_method(offset=0, limit=None):
+    """
+    Ingresos por método de pago, del que más ingresa al que menos.
+
+    Returns:
+        list of Revenue: (método, pagos, total); los pagos sin método aparecen como NO_METHOD.
+    """
+    return _revenue('''
+        SELECT COALESCE(NULLIF(method, ''), ?), payments, total_cents / 100.0 FROM revenue_by_method
+        ORDER BY total_cents DESC, method
+        LIMIT ? OFFSET ?
+    ''', (NO_METHOD, -1 if limit is None else limit, offset))
+
+
+def revenue_by_level(offset=0, limit=None):
+    """
+    Ingresos por nivel (el nivel actual de cada alumno), del que más ingresa al que menos.
+
+    Returns:
+        list of Revenue: (nivel, pagos, total).
+    """
+    return _revenue('''
+        SELECT level, payments, total_cents / 100.0 FROM revenue_by_level
+        ORDER BY total_cents DESC, level
+        LIMIT ? OFFSET ?
+    ''', (-1 if limit is None else limit, offset))
+
+
+def revenue_by_student(offset=0, limit=None):
+    """
+    Ingresos por alumno, del que más ha pagado al que menos (con el índice por total).
+
+    Returns:
+        list of Revenue: (nombre del alumno, pagos, total).
+    """
+    return _revenue('''
+        SELECT students.name, r.payments, r.total_cents / 100.0
+        FROM revenue_by_student r
+        JOIN students ON students.id = r.student_id
+        ORDER BY r.total_cents DESC, r.student_id
+        LIMIT ? OFFSET ?
+    ''', (-1 if limit is None else limit, offset))
+
+
+def revenue_totals():
+    """
+    Número de pagos e ingresos totales, sumando el resumen por meses (una fila
+    por mes, no por pago).
+
+    Returns:
+        tuple: (pagos, total en euros).
+    """
+    with get_connection() as conn:
+        payments, cents = conn.execute(
+            "SELECT COALESCE(SUM(payments), 0), COALESCE(SUM(total_cents), 0) FROM revenue_by_month").fetchone()
+    return payments, cents / 100
+
+
+def rebuild_summaries():
+    """
+    Recalcula las tablas resumen desde los pagos. Los triggers las mantienen al
+    día; sirve para repararlas si se modificaron los pagos sin ellos (por
+    ejemplo, con otra herramienta que desactive los triggers).
+    """
+    with get_connection() as conn:
+        refresh_revenue_summaries(conn)
@@ -0,0 +1,114 @@
+# ==============================
+# FILAS CON TIPO
+# ==============================
+# Las consultas de db.database devuelven sus filas como NamedTuple: se leen por
+# nombre (payment.amount) o por posición (payment[2]) y ocupan lo mismo que una
+# tupla, sin el diccionario de cada fila (__slots__ vacío). Las crea
+# directamente el cursor con row_factory, sin pasar por una tupla intermedia.
+
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+
+class User(NamedTuple):
+    id: int
+    username: str
+    password: str  # hash (db.auth)
+    role: str
+
+
+class Student(NamedTuple):
+    id: int
+    name: str
+    age: int
+    level: str
+
+
+class StudentWithUser(NamedTuple):
+    """Alumno junto con el nombre del usuario vinculado (get_students)"""
+    id: int
+    name: str
+    age: int
+    level: str
+    username: Optional[str]
+
+
+class Level(NamedTuple):
+    id: int
+    name: str
+
+
+class ClassSession(NamedTuple):
+    id: int
+    name: str
+    date: str
+    professor: str
+
+
+class Payment(NamedTuple):
+    """Pago con el nombre del alumno, tal y como se muestra en la tabla de pagos"""
+    id: int
+    student: str
+    amount: float
+    date: str
+    method: Optional[str]
+    notes: Optional[str]
+    student_id: int
+
+
+class Reward(NamedTuple):
+    """Recompensa con los nombres del recomendador y del alumno nuevo"""
+    id: int
+    recommender: str
+    new_student: str
+    months_rewarded: int
+    date_awarded: str
+    reward_name: str
+    recommender_id: int
+    new_student_id: int
+
+
+class ExpiringBonus(NamedTuple):
+    """Bono que termina pronto (get_students_with_expiring_bonus)"""
+    name: str
+    end_date: str
+    days_left: int
+
+
+class MonthlyTotal(NamedTuple):
+    """Pagos de un mes (payment_totals_by_month)"""
+    month: str  # YYYY-MM
+    payments: int
+    total: float
+
+
+class Revenue(NamedTuple):
+    """Fila de un informe de ingresos (db.reports): un mes, método de pago, nivel o alumno"""
+    key: str
+    payments: int
+    total: float
+
+
+@lru_cache(maxsize=None)
+def row_factory(row_type):
+    """
+    Devuelve un row_factory de sqlite3 que crea cada fila como row_type.
+
+    Args:
+        row_type (type): NamedTuple con un campo por columna de la consulta, en orden.
+
+    Returns:
+        callable: Función (cursor, fila) para asignar a cursor.row_factory.
+    """
+    make = row_type._make
+    return lambda cursor, row: make(row)
+
+
+def field(row, column):
+    """
+    Valor de una columna de la fila: por posición (int) o por nombre (str). Sirve
+    para las filas de este módulo, tuplas y diccionarios.
+    """
+    if isinstance(column, str) and not isinstance(row, dict):
+        return getattr(row, column)
+    return row[column]
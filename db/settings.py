@@ -0,0 +1,144 @@
+# ==============================
+# PERFIL DE CONFIGURACIÓN DE SQLITE
+# ==============================
+# PRAGMAs que se aplican a cada conexión nueva. Los valores por defecto se
+# pueden cambiar en la sección [sqlite] del fichero settings.ini:
+#
+#   [sqlite]
+#   synchronous = FULL
+#   cache_size = -64000
+#
+# La sección [profiling] activa la medición de consultas (db/profiling.py) y
+# [database] indica dónde está la base de datos (db/connection.py).
+
+import configparser
+import os
+import re
+
+# Carpeta del proyecto: las rutas por defecto no dependen de desde dónde se lance la aplicación
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Fichero de configuración de la aplicación
+SETTINGS_PATH = os.path.join(PROJECT_DIR, 'settings.ini')
+
+# Perfil por defecto (el orden importa: busy_timeout antes de cambiar el modo del journal)
+DEFAULT_PRAGMAS = {
+    "busy_timeout": "5000",       # ms que se espera a que otra conexión libere el bloqueo
+    "journal_mode": "WAL",        # Los lectores no bloquean al escritor ni al revés
+    "synchronous": "NORMAL",      # Con WAL, sin fsync en cada commit (sigue siendo seguro ante cierres)
+    "cache_size": "-16000",       # Caché de páginas de unos 16 MB (negativo = KB)
+    "mmap_size": "67108864",      # Lectura del fichero mapeado en memoria (64 MB)
+    "temp_store": "MEMORY",       # Tablas temporales y ordenaciones en memoria
+    "foreign_keys": "ON",         # Respetar las claves foráneas del esquema
+}
+
+# Medición de consultas: desactivada salvo que se active en [profiling]
+DEFAULT_PROFILING = {
+    "enabled": False,
+    "slow_query_ms": 100.0,                    # Sentencias más lentas que esto van al registro
+    "slow_query_log": "db/slow_queries.log",   # Registro de consultas lentas con su plan de ejecución
+}
+
+# Los PRAGMAs no admiten parámetros (?), así que solo se aceptan valores simples
+_VALUE_PATTERN = re.compile(r"^-?[A-Za-z0-9_]+$")
+
+
+def load_pragmas(path=SETTINGS_PATH):
+    """
+    Devuelve el perfil de PRAGMAs: los valores por defecto sobrescritos por los del fichero.
+
+    Args:
+        path (str): Ruta del fichero de configuración (si no existe se usan los valores por defecto).
+
+    Returns:
+        dict: {nombre del PRAGMA: valor}
+
+    Raises:
+        ValueError: Si el fichero contiene un PRAGMA desconocido o un valor no válido.
+    """
+    pragmas = dict(DEFAULT_PRAGMAS)
+
+    parser = configparser.ConfigParser()
+    parser.read(path, encoding="utf-8")
+    if parser.has_section("sqlite"):
+        for name, value in parser.items("sqlite"):
+            if name not in DEFAULT_PRAGMAS:
+                raise ValueError(f"PRAGMA no soportado en {path}: {name}")
+            pragmas[name] = value.strip()
+
+    for name, value in pragmas.items():
+        if not _VALUE_PATTERN.match(value):
+            raise ValueError(f"Valor no válido para el PRAGMA {name}: {value}")
+    return pragmas
+
+
+def apply_pragmas(conn, pragmas):
+    """
+    Aplica un perfil de PRAGMAs a una conexión recién abierta.
+
+    Args:
+        conn (sqlite3.Connection): Conexión sin transacciones abiertas.
+        pragmas (dict): {nombre del PRAGMA: valor}, por ejemplo el de load_pragmas().
+    """
+    for name, value in pragmas.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+
+
+def load_profiling(path=SETTINGS_PATH):
+    """
+    Devuelve la configuración de la medición de consultas (sección [profiling]).
+
+    Args:
+        path (str): Ruta del fichero de configuración (si no existe se usan los valores por defecto).
+
+    Returns:
+        dict: {"enabled": bool, "slow_query_ms": float, "slow_query_log": str}
+
+    Raises:
+        ValueError: Si algún valor no es válido.
+    """
+    profiling = dict(DEFAULT_PROFILING)
+
+    parser = configparser.ConfigParser()
+    parser.read(path, encoding="utf-8")
+    if parser.has_section("profiling"):
+        section = parser["profiling"]
+        for name in section:
+            if name not in DEFAULT_PROFILING:
+                raise ValueError(f"Opción no soportada en [profiling] de {path}: {name}")
+        profiling["enabled"] = section.getboolean("enabled", profiling["enabled"])
+        profiling["slow_query_ms"] = section.getfloat("slow_query_ms", profiling["slow_query_ms"])
+        profiling["slow_query_log"] = section.get("slow_query_log", profiling["slow_query_log"]).strip()
+    return profiling
+
+
+def load_database_path(path=SETTINGS_PATH):
+    """
+    Devuelve la ubicación de la base de datos de la sección [database] (opción path).
+
+    Las rutas relativas se toman desde la carpeta del fichero de configuración;
+    ':memory:' y las URIs de SQLite (file:...) se devuelven tal cual.
+
+    Args:
+        path (str): Ruta del fichero de configuración.
+
+    Returns:
+        str: Ubicación configurada, o None si no se indica ninguna.
+
+    Raises:
+        ValueError: Si la sección contiene una opción desconocida.
+    """
+    parser = configparser.ConfigParser()
+    parser.read(path, encoding="utf-8")
+    if not parser.has_section("database"):
+        return None
+    section = parser["database"]
+    for name in section:
+        if name != "path":
+            raise ValueError(f"Opción no soportada en [database] de {path}: {name}")
+    location = section.get("path", "").strip()
+    if not location:
+        return None
+    if location == ":memory:" or location.startswith("file:"):
+        return location
+    return os.path.join(os.path.dirname(os.path.abspath(path)), os.path.expanduser(location))
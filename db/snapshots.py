@@ -0,0 +1,241 @@
+# ==============================
+# INSTANTÁNEAS CON ALMACENAMIENTO DEDUPLICADO
+# ==============================
+# Cada instantánea es una copia coherente de la base de datos (hecha con
+# db.backup) troceada en bloques de tamaño fijo. Los bloques se guardan
+# comprimidos y con su hash SHA-256 como nombre, así que un bloque que no ha
+# cambiado desde la instantánea anterior no se vuelve a escribir: cada copia
+# solo ocupa en disco lo que ha cambiado. Un manifiesto JSON por instantánea
+# lista sus bloques en orden.
+#
+# Lo que se deduplica es el espacio en disco, no el trabajo: cada instantánea
+# copia la base de datos entera a un fichero temporal y la lee y calcula el hash
+# de todos sus bloques, así que su tiempo crece con el tamaño de la base de datos.
+#
+#   backups/
+#   ├── chunks/ab/ab12...   # Bloques comprimidos (zlib), compartidos entre instantáneas
+#   └── snapshots/20261018-120000-000000.json
+
+import hashlib
+import json
+import os
+import tempfile
+import zlib
+from datetime import datetime
+from db.backup import backup_database, restore_database, BackupError, temp_path_next_to
+from db.connection import get_pool
+
+# Tamaño de cada bloque (16 páginas de 4 KB)
+CHUNK_SIZE = 64 * 1024
+
+# Cuántas instantáneas se conservan: la última de cada una de las N horas, días y semanas más recientes
+RETENTION = {"hourly": 24, "daily": 7, "weekly": 4}
+
+# Formato del identificador (y nombre de fichero) de cada instantánea
+SNAPSHOT_ID_FORMAT = "%Y%m%d-%H%M%S-%f"
+
+
+def default_store():
+    """
+    Carpeta de instantáneas por defecto: 'backups' junto al fichero de la base de
+    datos (en la carpeta temporal del sistema si la base de datos está en memoria).
+    """
+    path = get_pool().file_path
+    if path is None:
+        return os.path.join(tempfile.gettempdir(), "el_escondite_ingles_backups")
+    return os.path.join(os.path.dirname(path), "backups")
+
+
+def _chunk_path(store, digest):
+    return os.path.join(store, "chunks", digest[:2], digest)
+
+
+def _manifest_path(store, snapshot_id):
+    return os.path.join(store, "snapshots", f"{snapshot_id}.json")
+
+
+def _write_atomic(path, data):
+    """Escribe un fichero de forma que nunca quede a medias con su nombre definitivo"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp = f"{path}.tmp"
+    with open(temp, "wb") as file:
+        file.write(data)
+    os.replace(temp, path)
+
+
+def take_snapshot(store=None, progress=None, now=None):
+    """
+    Crea una instantánea de la base de datos en uso, guardando solo los bloques nuevos.
+
+    Se copia y se lee la base de datos entera (ver la cabecera del módulo): lo que
+    ahorra es escribir en disco los bloques que ya guardó una instantánea anterior.
+
+    Args:
+        store (str, optional): Carpeta de instantáneas (por defecto, default_store()).
+        progress (callable, optional): Recibe (páginas copiadas, páginas totales) durante la copia.
+        now (datetime, optional): Fecha de la instantánea (para pruebas).
+
+    Returns:
+        dict: Manifiesto de la instantánea (id, created, size, chunks, new_chunks).
+    """
+    store = store or default_store()
+    now = now or datetime.now()
+    os.makedirs(store, exist_ok=True)
+
+    temp = temp_path_next_to(os.path.join(store, "snapshot.db"))
+    try:
+        backup_database(temp, compress=False, progress=progress)  # Copia coherente y verificada
+
+        chunks = []
+        new_chunks = 0
+        with open(temp, "rb") as file:
+            while True:
+                data = file.read(CHUNK_SIZE)
+                if not data:
+                    break
+                digest = hashlib.sha256(data).hexdigest()
+                path = _chunk_path(store, digest)
+                if not os.path.exists(path):
+                    _write_atomic(path, zlib.compress(data))
+                    new_chunks += 1
+                chunks.append(digest)
+        size = os.path.getsize(temp)
+    finally:
+        if os.path.exists(temp):
+            os.remove(temp)
+
+    manifest = {
+        "id": now.strftime(SNAPSHOT_ID_FORMAT),
+        "created": now.isoformat(timespec="seconds"),
+        "size": size,
+        "chunk_size": CHUNK_SIZE,
+        "chunks": chunks,
+        "new_chunks": new_chunks,
+    }
+    # El manifiesto se escribe el último: hasta entonces la instantánea no existe
+    _write_atomic(_manifest_path(store, manifest["id"]), json.dumps(manifest).encode("utf-8"))
+    return manifest
+
+
+def list_snapshots(store=None):
+    """
+    Devuelve los manifiestos de las instantáneas disponibles, de la más reciente a la más antigua.
+
+    Returns:
+        list of dict: Manifiestos (ver take_snapshot).
+    """
+    folder = os.path.join(store or default_store(), "snapshots")
+    if not os.path.isdir(folder):
+        return []
+
+    snapshots = []
+    for name in os.listdir(folder):
+        if name.endswith(".json"):
+            with open(os.path.join(folder, name), encoding="utf-8") as file:
+                snapshots.append(json.load(file))
+    return sorted(snapshots, key=lambda snapshot: snapshot["id"], reverse=True)
+
+
+def restore_snapshot(snapshot_id, store=None, progress=None):
+    """
+    Restaura la base de datos en uso al estado de una instantánea, sin reiniciar.
+
+    Args:
+        snapshot_id (str): Identificador de la instantánea.
+        store (str, optional): Carpeta de instantáneas.
+        progress (callable, optional): Recibe (páginas copiadas, páginas totales) durante la restauración.
+
+    Raises:
+        BackupError: Si falta algún bloque o la copia reconstruida está dañada.
+    """
+    store = store or default_store()
+    try:
+        with open(_manifest_path(store, snapshot_id), encoding="utf-8") as file:
+            manifest = json.load(file)
+    except FileNotFoundError as e:
+        raise BackupError(f"No existe la instantánea {snapshot_id}") from e
+
+    temp = temp_path_next_to(os.path.join(store, "restore.db"))
+    try:
+        with open(temp, "wb") as output:
+            for digest in manifest["chunks"]:
+                try:
+                    with open(_chunk_path(store, digest), "rb") as chunk:
+                        output.write(zlib.decompress(chunk.read()))
+                except (OSError, zlib.error) as e:
+                    raise BackupError(f"Falta o está dañado el bloque {digest}") from e
+
+        restore_database(temp, progress=progress)  # Verifica la copia antes de sustituir nada
+    finally:
+        if os.path.exists(temp):
+            os.remove(temp)
+
+
+def _period(created, tier):
+    """Periodo (hora, día o semana ISO) al que pertenece una fecha"""
+    if tier == "hourly":
+        return created.strftime("%Y-%m-%d %H")
+    if tier == "daily":
+        return created.date()
+    return tuple(created.isocalendar()[:2])
+
+
+def snapshots_to_keep(dates, policy=RETENTION):
+    """
+    Aplica la política de retención: para cada nivel (horas, días, semanas) se
+    conserva la instantánea más reciente de cada uno de los N últimos periodos
+    que tienen alguna.
+
+    Args:
+        dates (list of datetime): Fechas de las instantáneas.
+        policy (dict): Número de periodos que se conservan por nivel.
+
+    Returns:
+        set of datetime: Fechas de las instantáneas que se conservan.
+    """
+    keep = set()
+    newest_first = sorted(dates, reverse=True)
+    for tier, count in policy.items():
+        periods = []
+        for created in newest_first:
+            period = _period(created, tier)
+            if period in periods:
+                continue  # Ya tenemos la más reciente de ese periodo
+            if len(periods) == count:
+                break
+            periods.append(period)
+            keep.add(created)
+    return keep
+
+
+def apply_retention(store=None, policy=RETENTION):
+    """
+    Borra las instantáneas que no cubre la política de retención y los bloques
+    que ya no usa ninguna instantánea.
+
+    Returns:
+        list: Identificadores de las instantáneas borradas.
+    """
+    store = store or default_store()
+    snapshots = list_snapshots(store)
+    dates = {snapshot["id"]: datetime.strptime(snapshot["id"], SNAPSHOT_ID_FORMAT) for snapshot in snapshots}
+    keep = snapshots_to_keep(list(dates.values()), policy)
+
+    removed = []
+    used = set()
+    for snapshot in snapshots:
+        if dates[snapshot["id"]] in keep:
+            used.update(snapshot["chunks"])
+        else:
+            os.remove(_manifest_path(store, snapshot["id"]))
+            removed.append(snapshot["id"])
+
+    # Recogida de bloques huérfanos
+    chunks_folder = os.path.join(store, "chunks")
+    if removed and os.path.isdir(chunks_folder):
+        for prefix in os.listdir(chunks_folder):
+            for digest in os.listdir(os.path.join(chunks_folder, prefix)):
+                if digest not in used:
+                    os.remove(os.path.join(chunks_folder, prefix, digest))
+
+    return removed
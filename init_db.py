@@ -1,5 +1,8 @@
+import argparse
 import sqlite3
+from db.connection import configure_pool
 from db.database import connect_db  # Asegúrate de que esta función esté definida correctamente en db/database.py
+from db.auth import hash_password  # La contraseña se guarda como hash, nunca en claro
 
 def create_table():
     """Crea la tabla users si no existe."""
@@ -33,7 +36,7 @@ def create_admin_user():
         cursor.execute('''
         INSERT INTO users (username, password, role)
         VALUES (?, ?, ?)
-        ''', ('admin', 'admin', 'admin'))  # Definir 'admin' como el rol
+        ''', ('admin', hash_password('admin'), 'admin'))  # Definir 'admin' como el rol
         conn.commit()  # Guardamos los cambios
         print("Usuario admin creado.")
     else:
@@ -43,5 +46,8 @@ def create_admin_user():
 
 # Llamamos a la función para crear la tabla y luego al usuario admin
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Crea la tabla de usuarios y el usuario admin")
+    parser.add_argument("--db", help="Base de datos (por defecto, ESCONDITE_DB, settings.ini o db/el_escondite_ingles.db)")
+    configure_pool(parser.parse_args().db)
     create_table()  # Crear la tabla si no existe
     create_admin_user()  # Crear el usuario admin
\ No newline at end of file
@@ -1,17 +1,106 @@
+import os
 import sys
-from PySide2.QtWidgets import QApplication
-from ui.login_window import LoginWindow
-from db.database import create_tables, init_levels
+import time
+from contextlib import contextmanager
 
-if __name__ == "__main__":
-    # Crear las tablas si no existen
-    create_tables()
+_START = time.perf_counter()  # Referencia para medir el arranque (--profile-startup)
+
+
+class StartupProfile:
+    """Tiempos de cada fase del arranque; solo se muestran con --profile-startup"""
+
+    def __init__(self, enabled):
+        self.enabled = enabled
+        self.phases = []  # (fase, segundos)
+
+    @contextmanager
+    def phase(self, name):
+        """Mide lo que tarda el bloque y lo guarda con el nombre indicado"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - start))
+
+    def report(self):
+        """Imprime el tiempo de cada fase y el total desde que se empezó a ejecutar main.py"""
+        print("Arranque de la aplicación:")
+        for name, seconds in self.phases:
+            print(f"  {name:<32} {seconds * 1000:8.1f} ms")
+        print(f"  {'Total hasta ver el login':<32} {(time.perf_counter() - _START) * 1000:8.1f} ms")
+
+
+def pop_option(argv, name):
+    """
+    Quita de argv la opción `name VALOR` o `name=VALOR` (antes de pasárselo a Qt).
+
+    Returns:
+        str: El valor de la opción, o None si no aparece.
+    """
+    for index, arg in enumerate(argv):
+        if arg == name and index + 1 < len(argv):
+            value = argv[index + 1]
+            del argv[index:index + 2]
+            return value
+        if arg.startswith(name + "="):
+            del argv[index]
+            return arg[len(name) + 1:]
+    return None
+
+
+def main(argv):
+    profile = StartupProfile("--profile-startup" in argv)
+    argv = [arg for arg in argv if arg != "--profile-startup"]
 
-    # Llmamos a la función para insertar los niveles
-    init_levels()
+    # --db RUTA (o ':memory:', o una URI file:...): base de datos que se usa, por encima de
+    # ESCONDITE_DB y de settings.ini. Se resuelve antes de cambiar de carpeta.
+    from db.connection import configure_pool, resolve_db_path
+    db_path = resolve_db_path(pop_option(argv, "--db"))
+    # Los iconos y la hoja de estilos se cargan con rutas relativas a la carpeta del proyecto
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
 
-    app = QApplication(sys.argv)
-    with open("resources/styles.qss", "r") as f:app.setStyleSheet(f.read()) # Cargar y aplicar estilo desde models/style.qss
-    login_window = LoginWindow() # Inicializamos la ventana de login
-    login_window.show()
-    sys.exit(app.exec_())
\ No newline at end of file
+    with profile.phase("Importar Qt"):
+        from PySide2.QtCore import QTimer
+        from PySide2.QtWidgets import QApplication
+
+    with profile.phase("Esquema de la base de datos"):
+        pool = configure_pool(db_path)
+        from db.profiling import enable_profiling_from_settings
+        enable_profiling_from_settings()  # Antes de importar las ventanas, para que usen las funciones medidas
+        from db.database import ensure_schema
+        from db.connection import close_pool
+        # Crea las tablas, migra e inserta los niveles solo si user_version no está al día
+        ensure_schema()
+
+    with profile.phase("Crear QApplication"):
+        app = QApplication(argv)
+        from ui.db_executor import stop_executor
+        app.aboutToQuit.connect(stop_executor)  # Primero el hilo de consultas, que usa el pool
+        app.aboutToQuit.connect(close_pool)  # Cerramos las conexiones abiertas al salir
+
+    with profile.phase("Programar instantáneas"):
+        from ui.backup_worker import SnapshotScheduler
+        snapshot_scheduler = SnapshotScheduler(parent=app)  # Instantáneas cada hora (almacenamiento deduplicado)
+        if not pool.in_memory:  # Una base de datos en memoria se pierde al salir: no hay nada que guardar
+            snapshot_scheduler.start()
+
+    with profile.phase("Hoja de estilos"):
+        with open("resources/styles.qss", "r") as f:app.setStyleSheet(f.read()) # Cargar y aplicar estilo desde models/style.qss
+
+    with profile.phase("Ventana de login"):
+        from ui.login_window import LoginWindow
+        login_window = LoginWindow() # Inicializamos la ventana de login
+        login_window.show()
+
+    if profile.enabled:
+        # Se informa en el primer ciclo del bucle de eventos, con la ventana ya mostrada
+        def finish():
+            profile.report()
+            app.quit()
+        QTimer.singleShot(0, finish)
+
+    return app.exec_()
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
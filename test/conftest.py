@@ -0,0 +1,63 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+from db.connection import configure_pool, close_pool, DB_ENV_VAR, MEMORY
+from db.backup import copy_database
+
+# ----------------------------- #
+#   Bases de datos de prueba    #
+# ----------------------------- #
+
+@pytest.fixture(scope="session", autouse=True)
+def isolated_database(tmp_path_factory):
+    """
+    Ninguna prueba toca la base de datos real: mientras duran las pruebas,
+    ESCONDITE_DB apunta a un fichero temporal, que es el que abre el pool si
+    una prueba no configura el suyo.
+    """
+    previous = os.environ.get(DB_ENV_VAR)
+    os.environ[DB_ENV_VAR] = str(tmp_path_factory.mktemp("default") / "default.db")
+    close_pool()
+    yield
+    close_pool()
+    if previous is None:
+        del os.environ[DB_ENV_VAR]
+    else:
+        os.environ[DB_ENV_VAR] = previous
+
+@pytest.fixture(scope="session")
+def template_database(tmp_path_factory):
+    """Plantilla con el esquema al día y los niveles por defecto, creada una sola vez"""
+    from db.database import create_tables, init_levels
+
+    path = str(tmp_path_factory.mktemp("template") / "template.db")
+    configure_pool(path)
+    try:
+        create_tables()
+        init_levels()
+    finally:
+        close_pool()
+    return path
+
+@pytest.fixture
+def make_database(template_database, tmp_path):
+    """
+    Fábrica de bases de datos de prueba: make_database() configura el pool con
+    una copia de la plantilla (hecha con la API de backup) y la devuelve. Por
+    defecto la copia está en memoria; con un nombre, en un fichero de tmp_path
+    (para pruebas que lo necesitan, como las de varios hilos o las copias de
+    seguridad). El pool se cierra al terminar la prueba.
+    """
+    def make(name=None, template=template_database):
+        pool = configure_pool(MEMORY if name is None else str(tmp_path / name))
+        copy_database(template)
+        return pool
+
+    yield make
+    close_pool()
+
+@pytest.fixture
+def db(make_database):
+    """Base de datos en memoria con el esquema al día y los niveles por defecto (copia de la plantilla)"""
+    make_database()
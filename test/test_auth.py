@@ -0,0 +1,87 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import sqlite3
+import pytest
+from db import auth
+from db.auth import hash_password, verify_password, needs_rehash, authenticate
+from db.connection import get_connection
+from db.database import insert_user, update_user, fetch_users
+from db.migrations import migrate, get_schema_version
+
+# ----------------------------- #
+#     TEST: Autenticación       #
+# ----------------------------- #
+
+@pytest.mark.parametrize("algorithm", ["scrypt", "pbkdf2_sha256"])
+def test_hash_and_verify(algorithm, monkeypatch):
+    """El hash lleva sal aleatoria y solo acepta la contraseña correcta"""
+    monkeypatch.setattr(auth, "PBKDF2_ITERATIONS", 1000)  # Rápido para la prueba
+    first, second = hash_password("secreta", algorithm), hash_password("secreta", algorithm)
+    assert first != second and first.startswith(algorithm + "$")
+    assert verify_password("secreta", first) and not verify_password("Secreta", first)
+
+def test_plaintext_value_is_never_accepted(db):
+    """Un valor guardado que no es un hash no sirve como contraseña, aunque coincida"""
+    assert not verify_password("admin", "admin") and not verify_password("", None)
+    with get_connection() as conn:
+        conn.execute("INSERT INTO users (username, password, role) VALUES ('viejo', 'clave', 'admin')")
+    assert authenticate("viejo", "clave") is None
+
+def test_login_and_password_changes(db):
+    """Una sola consulta por nombre; editar sin contraseña conserva la actual y los nombres son únicos"""
+    insert_user("ana", "clave", "admin")
+    assert authenticate("ana", "clave") == ("ana", "admin")
+    assert authenticate("ana", "otra") is None
+    assert authenticate("nadie", "clave") is None
+
+    user_id = fetch_users()[0][0]
+    update_user(user_id, "ana", "user")
+    assert authenticate("ana", "clave") == ("ana", "user")
+    update_user(user_id, "ana", "user", "nueva")
+    assert authenticate("ana", "clave") is None and authenticate("ana", "nueva") == ("ana", "user")
+
+    with pytest.raises(sqlite3.IntegrityError):
+        insert_user("ana", "x", "user")
+
+def test_plaintext_passwords_are_migrated(tmp_path, make_database):
+    """La migración convierte las contraseñas en claro y separa los nombres repetidos"""
+    conn = sqlite3.connect(str(tmp_path / "old.db"))
+    conn.executescript('''
+        CREATE TABLE users (id INTEGER PRIMARY KEY, username TEXT, password TEXT, role TEXT);
+        CREATE TABLE students (id INTEGER PRIMARY KEY, name TEXT, age INTEGER, level TEXT, user_id INTEGER);
+        CREATE TABLE classes (id INTEGER PRIMARY KEY, name TEXT, date TEXT, professor TEXT);
+        CREATE TABLE payments (id INTEGER PRIMARY KEY, student_id INTEGER, amount REAL, date TEXT,
+                               method TEXT, notes TEXT);
+        CREATE TABLE rewards (id INTEGER PRIMARY KEY, recommender_id INTEGER, new_student_id INTEGER,
+                              reward_name TEXT, months_rewarded INTEGER, date_awarded TEXT);
+        INSERT INTO users (username, password, role) VALUES ('admin', 'admin', 'admin'), ('admin', 'otra', 'user'),
+                                                            ('sinclave', NULL, 'user'), ('vacia', '', 'user');
+    ''')
+    conn.execute("PRAGMA user_version = 4")
+    migrate(conn)
+    assert get_schema_version(conn) >= 5
+
+    rows = conn.execute("SELECT username, password FROM users ORDER BY id").fetchall()
+    assert [name for name, _ in rows] == ["admin", "admin_2", "sinclave", "vacia"]
+    assert verify_password("admin", rows[0][1]) and not needs_rehash(rows[0][1])
+    # Sin contraseña no se calcula el hash de la cadena vacía: esos usuarios no pueden entrar
+    assert [password for _, password in rows[2:]] == [None, ""]
+    conn.close()
+
+    make_database(template=str(tmp_path / "old.db"))
+    assert authenticate("admin", "admin") == ("admin", "admin")
+    assert authenticate("sinclave", "") is None and authenticate("vacia", "") is None
+
+def test_old_hashes_are_upgraded_on_login(db, monkeypatch):
+    """Al endurecer los parámetros, el hash se recalcula en el siguiente inicio de sesión"""
+    insert_user("luis", "clave", "user")
+    monkeypatch.setattr(auth, "SCRYPT_PARAMS", {"n": 2 ** 15, "r": 8, "p": 1})
+    with get_connection() as conn:
+        stored = conn.execute("SELECT password FROM users").fetchone()[0]
+    assert needs_rehash(stored)
+
+    assert authenticate("luis", "clave") == ("luis", "user")
+    with get_connection() as conn:
+        stored = conn.execute("SELECT password FROM users").fetchone()[0]
+    assert stored.startswith("scrypt$32768$") and not needs_rehash(stored)
@@ -0,0 +1,77 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import sqlite3
+import pytest
+from db.connection import configure_pool, close_pool, get_connection
+from db import migrations
+from db.backup import backup_database, restore_database, BackupError
+from db.migrations import get_schema_version, latest_version
+
+# ----------------------------- #
+#   TEST: Copias de seguridad   #
+# ----------------------------- #
+
+@pytest.fixture
+def live_db(tmp_path):
+    """Base de datos temporal servida por el pool global durante la prueba"""
+    path = str(tmp_path / "live.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE notas (id INTEGER PRIMARY KEY, texto TEXT)")
+    conn.executemany("INSERT INTO notas (texto) VALUES (?)", [(f"nota {i}" * 50,) for i in range(500)])
+    conn.commit()
+    conn.close()
+
+    configure_pool(path)
+    yield path
+    close_pool()  # El siguiente uso vuelve a abrir el pool con la ruta por defecto
+
+def _count(conn):
+    return conn.execute("SELECT COUNT(*) FROM notas").fetchone()[0]
+
+@pytest.mark.parametrize("name", ["copia.db", "copia.db.gz"])
+def test_backup_and_restore(live_db, tmp_path, name):
+    """La copia se hace por pasos, se puede comprimir y se restaura sin reiniciar"""
+    backup_path = str(tmp_path / name)
+    steps = []
+    backup_database(backup_path, progress=lambda done, total: steps.append((done, total)), pages=5)
+    assert len(steps) > 1 and steps[-1][0] == steps[-1][1], "La copia debe avanzar por pasos hasta el final"
+
+    with get_connection() as conn:
+        conn.execute("DELETE FROM notas")
+    restore_database(backup_path)
+
+    with get_connection() as conn:
+        assert _count(conn) == 500, "La conexión del pool debe ver los datos restaurados"
+
+def test_damaged_backup_is_rejected(live_db, tmp_path):
+    """Un backup que no es una base de datos válida no toca la base de datos actual"""
+    backup_path = tmp_path / "roto.db"
+    backup_path.write_bytes(b"esto no es una base de datos" * 100)
+
+    with pytest.raises(BackupError):
+        restore_database(str(backup_path))
+    with get_connection() as conn:
+        assert _count(conn) == 500
+
+def test_failed_migration_keeps_live_database(live_db, tmp_path, monkeypatch):
+    """Si el backup no se puede actualizar al esquema actual, la base de datos en uso queda intacta"""
+    backup_path = str(tmp_path / "antigua.db")
+    backup_database(backup_path)
+    with get_connection() as conn:
+        conn.execute("INSERT INTO notas (texto) VALUES ('posterior al backup')")
+        version = get_schema_version(conn)
+
+    broken = migrations.MIGRATIONS + [(latest_version() + 1, "Migración rota", ["SELECT * FROM no_existe"])]
+    monkeypatch.setattr(migrations, "MIGRATIONS", broken)
+    with pytest.raises(BackupError, match="Migración rota"):
+        restore_database(backup_path)
+
+    with get_connection() as conn:
+        assert _count(conn) == 501, "No se ha copiado nada sobre la base de datos en uso"
+        assert get_schema_version(conn) == version
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert tables == {"notas"}
+    leftovers = [name for name in os.listdir(tmp_path) if not name.startswith(("antigua.db", "live.db"))]
+    assert leftovers == [], "La copia temporal se borra"
+
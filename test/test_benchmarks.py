@@ -0,0 +1,57 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from db.connection import configure_pool, close_pool, get_connection
+from benchmarks.dataset import generate_dataset, student_name
+from benchmarks.bench_database import CASES, missing_cases, run_size, compare
+
+# ---------------------------------- #
+#   TEST: Pruebas de rendimiento     #
+# ---------------------------------- #
+
+def _generate(path, size, seed=0):
+    configure_pool(str(path))
+    try:
+        info = generate_dataset(size, seed)
+        with get_connection() as conn:
+            rows = {table: conn.execute(f"SELECT * FROM {table} ORDER BY id").fetchall()
+                    for table in ("students", "classes", "payments", "rewards")}
+    finally:
+        close_pool()
+    return info, rows
+
+def test_dataset_is_deterministic(tmp_path):
+    """Con la misma semilla se generan los mismos datos, y los nombres se pueden calcular por id"""
+    info, rows = _generate(tmp_path / "a.db", 500)
+    _, same = _generate(tmp_path / "b.db", 500)
+    _, other = _generate(tmp_path / "c.db", 500, seed=1)
+
+    assert rows == same
+    assert rows["payments"] != other["payments"]
+    assert (info.payments, info.students, info.rewards) == (500, 50, len(rows["rewards"]))
+    assert rows["students"][9][1] == student_name(10)
+    assert any(recommender == new_student - 1 for _, recommender, new_student, *_ in rows["rewards"]), \
+        "Hay cadenas de recomendaciones"
+    years = {payment[3][:4] for payment in rows["payments"]}
+    assert len(years) > 3, "Los pagos se reparten en varios años"
+
+def test_every_public_function_is_benchmarked():
+    """Cada función pública de db.database tiene su prueba de rendimiento (o un motivo para no tenerla)"""
+    assert missing_cases() == []
+
+def test_all_cases_run_on_a_small_dataset(tmp_path):
+    """Todas las pruebas se ejecutan sin errores y la comparación detecta las más lentas"""
+    result = run_size(200, repeat=2, budget=0.1, data_dir=str(tmp_path), report=lambda line: None)
+
+    assert set(result["functions"]) == set(CASES)
+    assert result["dataset"]["payments"] == 200
+    assert result["functions"]["fetch_payments"]["rows"] == 200
+    assert os.path.exists(tmp_path / "dataset_200_s0.db"), "La base de datos generada se guarda para reutilizarla"
+    assert run_size(200, repeat=1, data_dir=str(tmp_path), cases=["fetch_students"],
+                    report=lambda line: None)["dataset"]["generate_s"] is None
+
+    previous = {"results": {"200": result}}
+    slower = {"results": {"200": {"functions": {
+        name: dict(timing, median_ms=timing["median_ms"] * (3 if name == "fetch_payments" else 1))
+        for name, timing in result["functions"].items()}}}}
+    assert [name for _, name, *_ in compare(previous, slower)] == ["fetch_payments"]
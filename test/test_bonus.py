@@ -0,0 +1,54 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+from db.connection import get_connection
+from db.database import (insert_student, fetch_students, insert_reward, is_student_under_bonus,
+                         students_under_bonus, get_students_with_expiring_bonus)
+
+# ----------------------------- #
+#       TEST: Bonos             #
+# ----------------------------- #
+
+@pytest.fixture
+def students(db):
+    """Base de datos en memoria con cuatro alumnos; devuelve {nombre: id}"""
+    for name in ("Ana", "Berta", "Carlos", "Dani"):
+        insert_student(name, 30, "A1")
+    return {s.name: s.id for s in fetch_students()}
+
+def _bonus_end(reward_id):
+    with get_connection() as conn:
+        return conn.execute("SELECT bonus_end FROM rewards WHERE id = ?", (reward_id,)).fetchone()[0]
+
+def test_bonus_end_is_stored_and_updated(students):
+    """bonus_end se calcula al insertar y al cambiar la fecha o los meses (fin de mes como relativedelta)"""
+    insert_reward(students["Ana"], students["Berta"], 1, "2025-01-31")
+    assert _bonus_end(1) == "2025-02-28"
+
+    with get_connection() as conn:
+        conn.execute("UPDATE rewards SET months_rewarded = 6, date_awarded = '2024-08-31' WHERE id = 1")
+    assert _bonus_end(1) == "2025-02-28"
+
+def test_under_bonus_uses_every_reward(students):
+    """Cuenta cualquier recompensa vigente del recomendador, no solo la primera"""
+    insert_reward(students["Ana"], students["Berta"], 1, "2025-01-10")   # Ya terminada el 1 de abril
+    insert_reward(students["Ana"], students["Carlos"], 3, "2025-03-15")  # Vigente hasta el 15 de junio
+    insert_reward(students["Dani"], students["Berta"], 1, "2025-05-01")  # Aún no ha empezado el 1 de abril
+
+    assert is_student_under_bonus(students["Ana"], on_date="2025-04-01") is True
+    assert is_student_under_bonus(students["Ana"], on_date="2025-06-15") is False
+    assert is_student_under_bonus(students["Dani"], on_date="2025-04-01") is False
+
+    assert students_under_bonus(on_date="2025-05-10") == {students["Ana"], students["Dani"]}
+    assert students_under_bonus([students["Dani"], students["Berta"]], on_date="2025-05-10") == {students["Dani"]}
+
+def test_expiring_bonuses(students):
+    """Solo avisa de los bonos que terminan en los próximos días, usando la última fecha de fin de cada alumno"""
+    insert_reward(students["Ana"], students["Berta"], 1, "2025-03-05")    # Termina el 5 de abril
+    insert_reward(students["Ana"], students["Carlos"], 3, "2025-03-20")   # ...pero sigue cubierta hasta junio
+    insert_reward(students["Dani"], students["Carlos"], 1, "2025-03-03")  # Termina el 3 de abril
+    insert_reward(students["Carlos"], students["Berta"], 1, "2025-03-30") # Termina el 30 de abril
+
+    assert get_students_with_expiring_bonus(on_date="2025-04-01") == [("Dani", "2025-04-03", 2)]
+    assert [name for name, _, _ in get_students_with_expiring_bonus(days=30, on_date="2025-04-01")] == ["Dani", "Carlos"]
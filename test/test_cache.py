@@ -0,0 +1,42 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+from db.connection import get_connection
+from db.database import insert_student, fetch_students, fetch_levels, insert_level
+from db.cache import cache_stats
+
+# ----------------------------- #
+#   TEST: Caché de referencia   #
+# ----------------------------- #
+
+def _counts():
+    stats = cache_stats()
+    return stats["hits"], stats["misses"]
+
+def test_reads_are_cached_until_the_table_changes(db):
+    """La segunda lectura sale de la caché; escribir en la tabla la invalida solo a ella"""
+    fetch_students(), fetch_levels()
+    hits, misses = _counts()
+
+    fetch_students(), fetch_levels()
+    assert _counts() == (hits + 2, misses)
+
+    insert_student("Cacheado", 30, "A1")
+    assert [s.name for s in fetch_students()] == ["Cacheado"]
+    fetch_levels()
+    assert _counts() == (hits + 3, misses + 1), "Insertar un alumno no debe invalidar los niveles"
+
+def test_transaction_sees_its_changes_and_rollback_discards_them(db):
+    """Dentro de la transacción se leen los cambios propios; si se deshace, la caché no los conserva"""
+    with pytest.raises(RuntimeError):
+        with get_connection():
+            insert_level("Z9")
+            assert "Z9" in [level[1] for level in fetch_levels()]
+            raise RuntimeError("deshacer")
+    assert "Z9" not in [level[1] for level in fetch_levels()]
+
+def test_returned_lists_are_copies(db):
+    """Modificar la lista devuelta no altera lo guardado en la caché"""
+    fetch_levels().clear()
+    assert len(fetch_levels()) == 12
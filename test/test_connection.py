@@ -0,0 +1,133 @@
+import sys
+import os
+import threading
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import sqlite3
+import pytest
+from db.connection import ConnectionPool, resolve_db_path, DB_PATH, DB_ENV_VAR, MEMORY
+from db.database import connect_db, fetch_levels, insert_level
+
+# ----------------------------- #
+#    TEST: Pool de conexiones   #
+# ----------------------------- #
+
+def test_pool_reuses_connection(tmp_path):
+    """Dos operaciones seguidas deben reutilizar la misma conexión"""
+    pool = ConnectionPool(str(tmp_path / "pool.db"), size=2)
+
+    with pool.connection() as conn:
+        first = conn
+    with pool.connection() as conn:
+        second = conn
+
+    assert first is second, "El pool no reutilizó la conexión"
+    pool.close()
+
+def test_nested_blocks_share_transaction(tmp_path):
+    """Los bloques anidados usan la misma conexión y un error deshace todo"""
+    pool = ConnectionPool(str(tmp_path / "pool.db"))
+    with pool.connection() as conn:
+        conn.execute("CREATE TABLE t (x INTEGER)")
+
+    with pytest.raises(RuntimeError):
+        with pool.connection() as outer:
+            outer.execute("INSERT INTO t VALUES (1)")
+            with pool.connection() as inner:
+                assert inner is outer
+                inner.execute("INSERT INTO t VALUES (2)")
+            raise RuntimeError("fallo provocado")
+
+    with pool.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0
+    pool.close()
+
+def test_broken_connection_is_replaced(tmp_path):
+    """Una conexión ociosa cerrada por fuera no se vuelve a entregar"""
+    pool = ConnectionPool(str(tmp_path / "pool.db"))
+    with pool.connection() as conn:
+        broken = conn
+    broken.close()
+
+    with pool.connection() as conn:
+        assert conn is not broken
+        assert conn.execute("SELECT 1").fetchone()[0] == 1
+    pool.close()
+
+def test_threads_get_their_own_connection(tmp_path):
+    """Cada hilo trabaja con su propia conexión mientras la tiene en uso"""
+    pool = ConnectionPool(str(tmp_path / "pool.db"))
+    seen = []
+
+    with pool.connection() as main_conn:
+        def worker():
+            with pool.connection() as conn:
+                seen.append(conn)
+        thread = threading.Thread(target=worker)
+        thread.start()
+        thread.join()
+
+    assert seen and seen[0] is not main_conn
+    pool.close()
+
+def test_closed_pool_rejects_requests(tmp_path):
+    """Tras cerrar el pool no se entregan más conexiones"""
+    pool = ConnectionPool(str(tmp_path / "pool.db"))
+    with pool.connection():
+        pass
+    pool.close()
+
+    assert pool.idle_count() == 0
+    with pytest.raises(sqlite3.ProgrammingError):
+        with pool.connection():
+            pass
+
+def test_database_location_priority(tmp_path, monkeypatch):
+    """Manda la ruta indicada (--db), luego ESCONDITE_DB, luego [database] de settings.ini y por último DB_PATH"""
+    settings = tmp_path / "settings.ini"
+    settings.write_text("[database]\npath = datos/academia.db\n", encoding="utf-8")
+    monkeypatch.setenv(DB_ENV_VAR, "entorno.db")
+
+    assert resolve_db_path("cli.db", str(settings)) == os.path.abspath("cli.db")
+    assert resolve_db_path(MEMORY, str(settings)) == MEMORY
+    assert resolve_db_path(settings_path=str(settings)) == os.path.abspath("entorno.db")
+    monkeypatch.delenv(DB_ENV_VAR)
+    assert resolve_db_path(settings_path=str(settings)) == str(tmp_path / "datos" / "academia.db"), \
+        "Relativa a la carpeta de settings.ini"
+    settings.write_text("[database]\n", encoding="utf-8")
+    assert resolve_db_path(settings_path=str(settings)) == DB_PATH and os.path.isabs(DB_PATH)
+
+def test_memory_database_is_shared_by_the_pool(tmp_path):
+    """Con ':memory:' todas las conexiones del pool ven la misma base de datos, que desaparece al cerrarlo"""
+    pool = ConnectionPool(MEMORY)
+    other = ConnectionPool(MEMORY)
+    assert pool.in_memory and pool.file_path is None
+    with pool.connection() as conn:
+        conn.execute("CREATE TABLE notas (texto TEXT)")
+        conn.execute("INSERT INTO notas VALUES ('hola')")
+
+    seen = []
+    thread = threading.Thread(target=lambda: seen.append(
+        pool.open_connection().execute("SELECT texto FROM notas").fetchall()))
+    thread.start()
+    thread.join()
+    assert seen == [[("hola",)]]
+    with other.connection() as conn:
+        assert conn.execute("SELECT name FROM sqlite_master").fetchall() == [], "Cada pool tiene la suya"
+    pool.close()
+    other.close()
+
+    uri = ConnectionPool(f"file:{tmp_path / 'uri.db'}?cache=shared")
+    assert not uri.in_memory and uri.file_path == str(tmp_path / "uri.db")
+    uri.close()
+
+def test_databases_are_cloned_from_the_template(make_database):
+    """La fábrica de pruebas copia la plantilla: cada copia empieza igual y no afecta a las demás"""
+    make_database()
+    insert_level("Z9")
+    assert len(fetch_levels()) == 13
+    assert connect_db().execute("SELECT COUNT(*) FROM levels").fetchone()[0] == 13, \
+        "connect_db abre la base de datos del pool"
+
+    pool = make_database("copia.db")
+    assert pool.file_path.endswith("copia.db")
+    assert len(fetch_levels()) == 12
@@ -1,13 +1,34 @@
 import sys
 import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from db.database import (connect_db, insert_student, fetch_students, delete_student, insert_level, fetch_levels,
-                         delete_level, update_level, insert_payment, fetch_payments, delete_payment, insert_user,
+import sqlite3
+import pytest
+from db.connection import configure_pool, close_pool
+from db.backup import copy_database
+from db.database import (insert_student, fetch_students, delete_student, insert_level, fetch_levels,
+                         delete_level, update_level, insert_payment, fetch_payments, fetch_payments_page,
+                         delete_payment, insert_user, search_students, search_rewards,
                          fetch_users, delete_user, insert_reward, fetch_rewards, reward_already_granted,
-                         is_student_under_bonus, get_students_with_expiring_bonus)
+                         is_student_under_bonus, get_students_with_expiring_bonus, update_student_by_id,
+                         delete_student_by_id, update_level_by_id, delete_level_by_id, fetch_payments_between,
+                         payment_totals_by_month, insert_class, fetch_classes_between, fetch_classes_this_week,
+                         delete_class_by_id, fetch_payments_after, fetch_students_after, fetch_rewards_after,
+                         iter_students, iter_rewards, fetch_payments_filtered)
+from db.connection import get_connection
+from db.rows import Reward
+from db.auth import verify_password
 from datetime import datetime
 from dateutil.relativedelta import relativedelta
 
+@pytest.fixture(scope="module", autouse=True)
+def database(template_database, tmp_path_factory):
+    """Las pruebas del módulo comparten una copia de la plantilla, nunca la base de datos real"""
+    configure_pool(str(tmp_path_factory.mktemp("database") / "database.db"))
+    copy_database(template_database)
+    create_bonus_students()
+    yield
+    close_pool()
+
 # ----------------------------- #
 #       TEST: Estudiantes      #
 # ----------------------------- #
@@ -20,12 +41,12 @@ def test_insert_fetch_delete_student():
 
     insert_student(name, age, level)
     students = fetch_students()
-    found = any(s["name"] == name and s["age"] == age and s["level"] == level for s in students)
+    found = any(s.name == name and s.age == age and s.level == level for s in students)
     assert found, "El alumno no fue encontrado en la base de datos"
 
     delete_student(name)
     students = fetch_students()
-    found = any(s["name"] == name for s in students)
+    found = any(s.name == name for s in students)
     assert not found, "El alumno no fue eliminado correctamente"
 
 # -------------------------- #
@@ -58,7 +79,7 @@ def test_insert_fetch_delete_payment():
     name = "Pago Tester"
     insert_student(name, 30, "B1")
     students = fetch_students()
-    student_id = next(s["id"] for s in students if s["name"] == name)
+    student_id = next(s.id for s in students if s.name == name)
 
     insert_payment(student_id, 99.9, "2025-05-21", "tarjeta", "test pago")
     pagos = fetch_payments()
@@ -74,6 +95,62 @@ def test_insert_fetch_delete_payment():
 
     delete_student(name)  # Limpieza
 
+def test_fetch_payments_page_filters_and_paginates():
+    """Verifica el filtrado, la ordenación y la paginación de pagos en SQL"""
+    name = "Pago Paginado Tester"
+    insert_student(name, 30, "B1")
+    student_id = next(s.id for s in fetch_students() if s.name == name)
+
+    for day in range(1, 6):
+        insert_payment(student_id, 10.0 * day, f"2025-01-0{day}", "efectivo", "nota_paginada" if day % 2 else "otra")
+
+    # Limitamos a las fechas del test para no contar pagos que hayan dejado otras pruebas
+    january = ("2025-01-01", "2025-01-05")
+    pagos, total = fetch_payments_page(student_filter="paginado tester", date_range=january, order_by="date",
+                                       descending=False, offset=0, limit=2)
+    assert total == 5, "El total filtrado no es correcto"
+    assert [p[3] for p in pagos] == ["2025-01-01", "2025-01-02"], "La primera página no es correcta"
+
+    pagos, _ = fetch_payments_page(student_filter="paginado tester", date_range=january, order_by="date",
+                                   descending=False, offset=4, limit=2)
+    assert [p[3] for p in pagos] == ["2025-01-05"], "La última página no es correcta"
+
+    # El guion bajo se busca literalmente, no como comodín
+    pagos, total = fetch_payments_page(student_filter="paginado tester", notes_filter="_paginada",
+                                       date_range=january, limit=None)
+    assert total == 3 and len(pagos) == 3, "El filtro por notas no es correcto"
+
+    pagos, total = fetch_payments_page(student_filter="paginado tester", date_range=("2025-01-02", "2025-01-03"))
+    assert total == 2, "El filtro por fechas no es correcto"
+
+    for pago in fetch_payments_page(student_filter="paginado tester", date_range=january, limit=None)[0]:
+        delete_payment(pago[0])
+    delete_student(name)  # Limpieza
+
+def test_full_text_search():
+    """Verifica la búsqueda por prefijo, sin acentos y por varios campos"""
+    insert_student("Íñigo Pérez Búsqueda", 30, "B1")
+    insert_student("Inés Búsqueda", 25, "A2")
+    students = fetch_students()
+    inigo_id = next(s.id for s in students if s.name == "Íñigo Pérez Búsqueda")
+    ines_id = next(s.id for s in students if s.name == "Inés Búsqueda")
+
+    found = [s.name for s in search_students("inigo per")]
+    assert found == ["Íñigo Pérez Búsqueda"], "La búsqueda sin acentos y por prefijo falló"
+
+    found = {s.name for s in search_students("BUSQUEDA")}
+    assert found == {"Íñigo Pérez Búsqueda", "Inés Búsqueda"}, "La búsqueda no encontró a todos los alumnos"
+
+    insert_reward(inigo_id, ines_id, 6, "2025-01-01")
+    rewards = search_rewards(recommender="iñigo", new_student="ines", reward_name="us")
+    assert [(r[1], r[2]) for r in rewards] == [("Íñigo Pérez Búsqueda", "Inés Búsqueda")], \
+        "La búsqueda de recompensas falló"
+    assert search_rewards(reward_name="eire", new_student="ines") == []
+
+    delete_student("Íñigo Pérez Búsqueda")
+    delete_student("Inés Búsqueda")
+    assert search_students("inigo busqueda") == [], "El índice de búsqueda no se actualizó al borrar"
+
 # -------------------------- #
 #       TEST: Usuarios       #
 # -------------------------- #
@@ -86,8 +163,9 @@ def test_insert_fetch_delete_user():
 
     insert_user(username, password, role)
     users = fetch_users()
-    found = any(u[1] == username and u[2] == password and u[3] == role for u in users)
+    found = any(u[1] == username and verify_password(password, u[2]) and u[3] == role for u in users)
     assert found, "El usuario no fue insertado correctamente"
+    assert all(u[2] != password for u in users), "La contraseña no debe guardarse en claro"
 
     delete_user(username)
     users = fetch_users()
@@ -107,8 +185,8 @@ def test_insert_fetch_reward():
     insert_student(new_student, 22, "B2")
 
     students = fetch_students()
-    r_id = next(s["id"] for s in students if s["name"] == recommender)
-    n_id = next(s["id"] for s in students if s["name"] == new_student)
+    r_id = next(s.id for s in students if s.name == recommender)
+    n_id = next(s.id for s in students if s.name == new_student)
 
     insert_reward(r_id, n_id, 3, datetime.now().strftime("%Y-%m-%d"))
 
@@ -118,7 +196,11 @@ def test_insert_fetch_reward():
 
     assert reward_already_granted(n_id), "La verificación de bono activo falló"
 
-    # No se elimina recompensa aquí porque no implementamos delete_reward
+    # Las filas llevan los ids además de los nombres que se muestran
+    reward = next(r for r in rewards if r.new_student == new_student)
+    assert (reward.recommender_id, reward.new_student_id, reward.reward_name) == (r_id, n_id, "Canada")
+    assert isinstance(reward, Reward) and not hasattr(reward, "__dict__"), "Las filas no deben tener diccionario"
+
     delete_student(recommender)
     delete_student(new_student)
 
@@ -128,7 +210,7 @@ def test_insert_fetch_reward():
 
 # ---------- CONFIGURACIÓN DEL MÓDULO DE PRUEBAS DE BONIFICACIONES ----------
 
-def setup_module(module):
+def create_bonus_students():
     """Prepara datos para probar bonificaciones según tu lógica actual."""
     # Insertamos tres estudiantes
     insert_student("AlumnoBonoActivo", 20, "B2")
@@ -136,9 +218,9 @@ def setup_module(module):
     insert_student("AlumnoBonoPorExpirar", 22, "B2")
 
     students = fetch_students()
-    bono_activo_id = next(s["id"] for s in students if s["name"] == "AlumnoBonoActivo")
-    sin_bono_id = next(s["id"] for s in students if s["name"] == "AlumnoSinBono")
-    expira_id = next(s["id"] for s in students if s["name"] == "AlumnoBonoPorExpirar")
+    bono_activo_id = next(s.id for s in students if s.name == "AlumnoBonoActivo")
+    sin_bono_id = next(s.id for s in students if s.name == "AlumnoSinBono")
+    expira_id = next(s.id for s in students if s.name == "AlumnoBonoPorExpirar")
 
     hoy = datetime.now().strftime("%Y-%m-%d")
     fecha_1_mes_atras = (datetime.now() - relativedelta(months=1)).strftime("%Y-%m-%d")
@@ -151,52 +233,158 @@ def setup_module(module):
 
     # AlumnoSinBono no ha recomendado a nadie → No tiene bono
 
-def teardown_module(module):
-    """Elimina los estudiantes de prueba después del test"""
-    conn = connect_db()
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM rewards WHERE 1=1")
-    cursor.execute("DELETE FROM students WHERE name IN (?, ?, ?)",
-                   ("AlumnoBonoActivo", "AlumnoSinBono", "AlumnoBonoPorExpirar"))
-    conn.commit()
-    conn.close()
-
 # ---------- TEST DE BONIFICACIONES ----------
 
 def test_is_student_under_bonus_true():
     """Debe detectar que 'AlumnoBonoActivo' tiene un bono activo como recomendador"""
     students = fetch_students()
-    student = next(s for s in students if s["name"] == "AlumnoBonoActivo")
-    assert is_student_under_bonus(student["id"]) is True
+    student = next(s for s in students if s.name == "AlumnoBonoActivo")
+    assert is_student_under_bonus(student.id) is True
 
 def test_is_student_under_bonus_false():
     """Debe detectar que 'AlumnoSinBono' NO tiene bono (no recomendó a nadie)"""
     students = fetch_students()
-    student = next(s for s in students if s["name"] == "AlumnoSinBono")
-    assert is_student_under_bonus(student["id"]) is False
+    student = next(s for s in students if s.name == "AlumnoSinBono")
+    assert is_student_under_bonus(student.id) is False
+
+def test_expiring_bonus_lists_recommenders():
+    """Los avisos de bonos son de los recomendadores, con su fecha de fin y los días que faltan"""
+    with get_connection() as conn:
+        end_date = conn.execute('''
+            SELECT r.bonus_end FROM rewards r JOIN students s ON s.id = r.recommender_id
+            WHERE s.name = 'AlumnoBonoActivo'
+        ''').fetchone()[0]
+
+    expiring = get_students_with_expiring_bonus(days=400)
+    assert [bonus.name for bonus in expiring] == ["AlumnoBonoActivo"], \
+        "Ni el alumno recomendado ni un bono ya terminado generan aviso"
+    assert expiring[0].end_date == end_date
+    assert expiring[0].days_left == (datetime.fromisoformat(end_date).date() - datetime.now().date()).days
+    assert get_students_with_expiring_bonus(days=7) == []
 
 # ------------------------------ #
 #     TEST: Casos Negativos      #
 # ------------------------------ #
 
 def test_insert_duplicate_student():
-    """Verifica que se puedan insertar duplicados (si no se controla en BBDD)"""
+    """Los nombres de alumno son únicos sin distinguir mayúsculas: el duplicado no se inserta"""
     name = "EstudianteDuplicado"
-    insert_student(name, 18, "A1")
-    insert_student(name, 18, "A1")  # Se permite duplicar por backend
+    student_id = insert_student(name, 18, "A1")
+    assert student_id is not None
+    assert insert_student(name.upper(), 19, "B1") is None, "Se insertó un nombre repetido"
+
+    ocurrencias = [s for s in fetch_students() if s.name.lower() == name.lower()]
+    assert [(s.id, s.age) for s in ocurrencias] == [(student_id, 18)]
 
-    estudiantes = fetch_students()
-    ocurrencias = [s for s in estudiantes if s["name"] == name]
-    assert len(ocurrencias) >= 2, "No se permitió insertar duplicado (aunque debería)"
+    with pytest.raises(sqlite3.IntegrityError):
+        update_student_by_id(insert_student("OtroEstudiante", 20, "A1"), name, 20, "A1")
 
     # Limpieza
-    for s in ocurrencias:
-        delete_student(s["name"])
+    delete_student("otroestudiante")
+    delete_student(name)
+
+def test_id_based_crud():
+    """Las funciones por id editan y borran exactamente la fila indicada"""
+    student_id = insert_student("EstudiantePorId", 30, "A1")
+    assert update_student_by_id(student_id, "EstudiantePorId2", 31, "B2")
+    assert next(s for s in fetch_students() if s.id == student_id).name == "EstudiantePorId2"
+    assert delete_student_by_id(student_id)
+    assert not delete_student_by_id(student_id), "El alumno ya no existe"
+    assert not update_student_by_id(student_id, "Nadie", 1, "A1")
+
+    level_id = insert_level("NivelPorId")
+    assert insert_level("nivelporid") is None
+    assert update_level_by_id(level_id, "NivelPorId2")
+    assert (level_id, "NivelPorId2") in fetch_levels()
+    assert delete_level_by_id(level_id)
+    assert (level_id, "NivelPorId2") not in fetch_levels()
+
+def test_date_range_queries():
+    """Verifica las consultas por rango de fechas y que las fechas se validen al guardar"""
+    insert_student("Fechas Tester", 30, "B1")
+    student_id = next(s.id for s in fetch_students() if s.name == "Fechas Tester")
+
+    insert_payment(student_id, 10, "2031-01-31", "efectivo")
+    insert_payment(student_id, 20, datetime(2031, 2, 1, 9, 30), "efectivo")  # Se guarda solo el día
+    insert_payment(student_id, 30, "2031-02-28", "tarjeta")
+
+    assert [(p.date, p.amount) for p in fetch_payments_between("2031-02-01", "2031-02-28")] == [
+        ("2031-02-01", 20), ("2031-02-28", 30)]
+    totals = payment_totals_by_month("2031-01-01", "2031-12-31")
+    assert [tuple(t) for t in totals] == [("2031-01", 1, 10), ("2031-02", 2, 50)]
+    assert totals[1].total == 50
+
+    # Fechas que no existen o en otro formato: se rechazan antes de llegar a la base de datos
+    for bad_date in ("2031-02-29", "01/03/2031", ""):
+        with pytest.raises(ValueError):
+            insert_payment(student_id, 10, bad_date)
+    # Y el CHECK de la tabla impide guardarlas aunque se salte la validación
+    with pytest.raises(sqlite3.IntegrityError), get_connection() as conn:
+        conn.execute("INSERT INTO payments (student_id, amount, date) VALUES (?, 10, '2031-02-29')", (student_id,))
+
+    monday = insert_class("Clase Lunes Tester", "2031-03-03", "Mary")
+    sunday = insert_class("Clase Domingo Tester", "2031-03-09", "John")
+    next_week = insert_class("Clase Siguiente Tester", "2031-03-10", "Mary")
+    assert [c.id for c in fetch_classes_this_week("2031-03-05")] == [monday, sunday]
+    assert [c.name for c in fetch_classes_between("2031-03-09", "2031-03-10")] == [
+        "Clase Domingo Tester", "Clase Siguiente Tester"]
+
+    for class_id in (monday, sunday, next_week):
+        delete_class_by_id(class_id)
+    delete_student_by_id(student_id)  # También borra sus pagos
+
+def test_keyset_pagination():
+    """Las páginas por clave recorren todas las filas en orden, sin repetir ni saltarse ninguna"""
+    names = [f"Keyset Tester {i}" for i in range(7)]
+    ids = [insert_student(name, 20 + i % 3, "B1") for i, name in enumerate(names)]
+    for i, student_id in enumerate(ids):
+        insert_payment(student_id, 10 * (i % 3 + 1), "2032-01-01" if i < 4 else "2032-01-02")
+
+    def walk(fetch, **kwargs):
+        rows, after = [], None
+        while True:
+            page = fetch(after, 2, **kwargs)
+            if not page:
+                return rows
+            rows += page
+            after = page[-1]
+
+    payments = walk(fetch_payments_after, student_filter="keyset tester")
+    assert [(p.date, p.id) for p in payments] == sorted(((p.date, p.id) for p in payments), reverse=True)
+    assert sorted(p.student for p in payments) == sorted(names)
+
+    payments = walk(fetch_payments_after, student_filter="keyset tester", order_by="amount", descending=False)
+    assert [(p.amount, p.id) for p in payments] == sorted((p.amount, p.id) for p in payments)
+    assert len(payments) == 7
+    # La tabla paginada por desplazamiento y la paginada por clave ordenan igual por alumno
+    payments = walk(fetch_payments_after, student_filter="keyset tester", order_by="student", descending=False)
+    assert fetch_payments_filtered(student_filter="keyset tester", order_by="student", descending=False) == payments
+
+    students = walk(fetch_students_after, text="keyset tester", order_by="age", descending=True)
+    assert [(s.age, s.id) for s in students] == sorted(((s.age, s.id) for s in students), reverse=True)
+    assert [s.name for s in walk(fetch_students_after, text="keyset tester")] == sorted(names)
+    # Las exportaciones recorren los alumnos en el mismo orden que la tabla
+    assert list(iter_students("keyset tester", order_by="age", descending=True, batch_size=3)) == students
+
+    insert_reward(ids[0], ids[1], 1, "2032-01-05")
+    insert_reward(ids[2], ids[3], 3, "2032-01-03")
+    rewards = walk(fetch_rewards_after, recommender="keyset tester")
+    assert [r.date_awarded for r in rewards] == ["2032-01-05", "2032-01-03"]
+    rewards = walk(fetch_rewards_after, recommender="keyset tester", order_by="months_rewarded", descending=True)
+    assert [r.months_rewarded for r in rewards] == [3, 1]
+    assert list(iter_rewards(recommender="keyset tester", order_by="months_rewarded", descending=True,
+                             batch_size=1)) == rewards
+
+    with pytest.raises(ValueError):
+        fetch_payments_after(order_by="notes")  # Admite NULL: no se puede paginar por clave
+
+    for student_id in ids:
+        delete_student_by_id(student_id)  # También borra sus pagos y recompensas
 
 def test_insert_invalid_payment_amount():
     """Verifica que no se inserte un pago con cantidad negativa"""
     insert_student("EstudiantePagoInvalido", 25, "B1")
-    student_id = next(s["id"] for s in fetch_students() if s["name"] == "EstudiantePagoInvalido")
+    student_id = next(s.id for s in fetch_students() if s.name == "EstudiantePagoInvalido")
 
     try:
         insert_payment(student_id, -50, "2025-05-21", "efectivo", "Cantidad negativa")
@@ -211,8 +399,8 @@ def test_insert_reward_twice_for_same_student():
     insert_student("RecomendadorX", 30, "C1")
     insert_student("AlumnoNuevoX", 18, "A2")
 
-    r_id = next(s["id"] for s in fetch_students() if s["name"] == "RecomendadorX")
-    n_id = next(s["id"] for s in fetch_students() if s["name"] == "AlumnoNuevoX")
+    r_id = next(s.id for s in fetch_students() if s.name == "RecomendadorX")
+    n_id = next(s.id for s in fetch_students() if s.name == "AlumnoNuevoX")
 
     insert_reward(r_id, n_id, 3, datetime.now().strftime("%Y-%m-%d"))
     already_granted = reward_already_granted(n_id)
@@ -0,0 +1,73 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import threading
+import pytest
+
+pytest.importorskip("PySide2")
+from PySide2.QtCore import QCoreApplication, QElapsedTimer
+from PySide2.QtWidgets import QApplication
+from ui.db_executor import DatabaseExecutor
+from ui.table_model import SqlTableModel
+
+# ----------------------------- #
+#  TEST: Ejecutor de consultas  #
+# ----------------------------- #
+
+@pytest.fixture
+def executor():
+    QApplication.instance() or QApplication(["test", "-platform", "offscreen"])
+    worker = DatabaseExecutor()
+    yield worker
+    worker.stop()
+
+def _wait_until(condition, timeout_ms=2000):
+    """Procesa eventos (donde llegan los resultados) hasta que se cumpla la condición"""
+    timer = QElapsedTimer()
+    timer.start()
+    while not condition() and timer.elapsed() < timeout_ms:
+        QCoreApplication.processEvents()
+    return condition()
+
+def test_results_arrive_on_the_gui_thread_and_stale_requests_are_dropped(executor):
+    """Los resultados llegan al hilo de la interfaz; una petición sustituida por otra con la misma clave no"""
+    gate = threading.Event()
+    results, threads = [], []
+
+    executor.submit(gate.wait, key="bloqueo")  # Mantiene ocupado el hilo mientras se encargan las demás
+    for text in ["a", "an", "ana"]:
+        executor.submit(str.upper, text, key="busqueda",
+                        on_result=lambda value: (results.append(value),
+                                                 threads.append(threading.current_thread())))
+    errors = []
+    executor.submit(int, "no es un número", on_error=errors.append)
+    gate.set()
+
+    assert _wait_until(lambda: results and errors)
+    assert results == ["ANA"], "Solo se entrega la última búsqueda"
+    assert threads == [threading.main_thread()]
+    assert isinstance(errors[0], ValueError)
+
+def test_errors_without_handler_are_logged(executor, caplog):
+    """Si una consulta falla y nadie recoge el error, queda en el registro con su traza"""
+    request = executor.submit(int, "no es un número")
+    assert _wait_until(lambda: request.done)
+    assert [record.levelname for record in caplog.records] == ["ERROR"]
+    assert isinstance(caplog.records[0].exc_info[1], ValueError)
+
+def test_model_loads_pages_in_the_executor(executor):
+    """Con ejecutor, el modelo conserva las filas anteriores hasta que llega el bloque nuevo"""
+    rows = [(i, f"Alumno {i}") for i in range(30)]
+    model = SqlTableModel(["Nombre"], lambda offset, limit: rows[offset:offset + limit], columns=[1],
+                          batch_size=10, executor=executor)
+    states = []
+    model.loading_changed.connect(states.append)
+
+    model.refresh()
+    assert model.rowCount() == 0 and model.is_loading()
+    assert _wait_until(lambda: model.rowCount() == 10)
+
+    model.refresh(lambda offset, limit: rows[:3][offset:offset + limit])
+    assert model.rowCount() == 10, "Las filas anteriores se ven mientras se carga la consulta nueva"
+    assert _wait_until(lambda: model.rowCount() == 3 and not model.is_loading())
+    assert states == [True, False, True, False]
@@ -0,0 +1,72 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+from db.connection import get_connection
+from db.database import (insert_student, update_student, delete_student, insert_payment, update_payment,
+                         delete_payment, update_user, update_level, update_class)
+from db.events import subscribe, unsubscribe, ChangeEvent, INSERT, UPDATE, DELETE
+
+# ----------------------------- #
+#   TEST: Avisos de cambios     #
+# ----------------------------- #
+
+@pytest.fixture
+def events(db):
+    """Base de datos en memoria y lista con los avisos recibidos"""
+    received = []
+    subscribe(received.append)
+    yield received
+    unsubscribe(received.append)
+
+def test_changes_are_published_with_their_ids(events):
+    """Cada escritura avisa de la tabla, la operación y el id de la fila, aunque se busque por nombre"""
+    events.clear()
+    insert_student("Avisado", 30, "A1")
+    student_id = events[-1].key
+    insert_payment(student_id, 50, "2025-01-10")
+    update_student("Avisado", "Avisado Renombrado", 31, "A2")
+    assert events == [ChangeEvent("students", INSERT, student_id), ChangeEvent("payments", INSERT, 1),
+                      ChangeEvent("students", UPDATE, student_id)]
+
+    events.clear()
+    delete_student("Avisado Renombrado")
+    assert ChangeEvent("students", DELETE, student_id) in events
+    assert ChangeEvent("payments", DELETE, None) in events, "Los pagos borrados en cascada se avisan en bloque"
+
+    events.clear()
+    assert delete_payment(1) is False and update_payment(1, 10, "2025-01-11") is False
+    assert update_user(999, "nadie", "user") is False and update_student("Nadie", "Nadie", 30, "A1") is False
+    assert update_level("Nivel Inexistente", "Otro") is False
+    assert update_class("Nadie", "Nadie", "2025-01-11", "X") is False
+    assert events == [], "Si no había ninguna fila, no se avisa de nada"
+
+def test_events_wait_for_commit_and_are_dropped_on_rollback(events):
+    """Los avisos se entregan al confirmar la transacción más externa; si se deshace, no se entregan"""
+    events.clear()
+    with get_connection():
+        insert_student("Pendiente", 30, "A1")
+        assert events == []
+    assert [event.operation for event in events] == [INSERT]
+
+    events.clear()
+    with pytest.raises(RuntimeError):
+        with get_connection():
+            insert_student("Deshecho", 30, "A1")
+            raise RuntimeError("deshacer")
+    assert events == []
+
+def test_failing_listener_is_logged_and_others_still_receive(events, caplog):
+    """Si un suscriptor falla, se registra el error y el resto recibe el aviso igualmente"""
+    def failing(event):
+        raise RuntimeError("suscriptor roto")
+
+    events.clear()
+    subscribe(failing)
+    try:
+        insert_student("Aviso Con Fallo", 30, "A1")
+    finally:
+        unsubscribe(failing)
+    assert [event.operation for event in events] == [INSERT]
+    assert any(record.exc_info and "suscriptor roto" in str(record.exc_info[1])
+               for record in caplog.records if record.name == "db.events")
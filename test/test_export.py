@@ -0,0 +1,85 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import csv
+import sqlite3
+import pytest
+from db.export import write_export, ExportCancelled, PROGRESS_EVERY
+from db.database import (insert_student, fetch_students, delete_student, insert_payment, delete_payment,
+                         iter_payments_filtered, fetch_payments_filtered, iter_students)
+
+# ----------------------------- #
+#       TEST: Exportaciones      #
+# ----------------------------- #
+
+ROWS = [{"id": i, "name": f"Alumno {i}", "age": None if i % 2 else 20} for i in range(1, 1201)]
+
+def test_write_csv_streams_rows(tmp_path):
+    """El CSV incluye cabecera, solo las columnas pedidas y los None como texto vacío"""
+    path = str(tmp_path / "alumnos.csv")
+    progress = []
+    written = write_export(path, ["Nombre", "Edad"], iter(ROWS), columns=["name", "age"], progress=progress.append)
+
+    assert written == len(ROWS)
+    assert progress[-1] == len(ROWS) and len(progress) == len(ROWS) // PROGRESS_EVERY + 1
+    with open(path, newline='', encoding='utf-8') as file:
+        lines = list(csv.reader(file))
+    assert lines[0] == ["Nombre", "Edad"]
+    assert lines[1] == ["Alumno 1", ""] and lines[2] == ["Alumno 2", "20"]
+    assert len(lines) == len(ROWS) + 1
+
+def test_write_excel_write_only(tmp_path):
+    """El Excel generado en modo write_only se puede abrir con todas las filas"""
+    openpyxl = pytest.importorskip("openpyxl")
+    path = str(tmp_path / "alumnos.xlsx")
+    write_export(path, ["Nombre"], iter(ROWS), columns=["name"], sheet_title="Alumnos")
+
+    sheet = openpyxl.load_workbook(path, read_only=True)["Alumnos"]
+    values = [row[0] for row in sheet.iter_rows(values_only=True)]
+    assert values[0] == "Nombre" and values[-1] == "Alumno 1200" and len(values) == len(ROWS) + 1
+
+def test_cancelled_export_removes_file(tmp_path):
+    """Si se cancela, se detiene la lectura y no queda el fichero a medias"""
+    path = str(tmp_path / "alumnos.csv")
+    consumed = []
+
+    def rows():
+        for row in ROWS:
+            consumed.append(row)
+            yield row
+
+    with pytest.raises(ExportCancelled):
+        write_export(path, ["Nombre"], rows(), columns=["name"], should_cancel=lambda: True)
+    assert not os.path.exists(path)
+    assert len(consumed) == PROGRESS_EVERY, "Debe parar en el primer bloque"
+
+def test_failed_export_removes_file(tmp_path):
+    """Si la lectura falla a mitad (por ejemplo, un error de la base de datos), no queda un fichero truncado"""
+    path = str(tmp_path / "alumnos.csv")
+
+    def rows():
+        yield from ROWS[:10]
+        raise sqlite3.OperationalError("disk I/O error")
+
+    with pytest.raises(sqlite3.OperationalError):
+        write_export(path, ["Nombre"], rows(), columns=["name"])
+    assert not os.path.exists(path)
+
+def test_iterators_match_filtered_queries(db):
+    """Los iteradores por bloques devuelven lo mismo que las consultas filtradas"""
+    name = "Exportacion Streaming Tester"
+    insert_student(name, 40, "C1")
+    student_id = next(s.id for s in fetch_students() if s.name == name)
+    for day in range(1, 8):
+        insert_payment(student_id, 5.0 * day, f"2025-02-0{day}", "efectivo", "exportada")
+
+    filters = {"student_filter": "streaming tester", "date_range": ("2025-02-01", "2025-02-07")}
+    streamed = list(iter_payments_filtered(**filters, batch_size=3))
+    assert streamed == fetch_payments_filtered(**filters)
+    assert len(streamed) == 7
+    assert {(payment.student, payment.student_id) for payment in streamed} == {(name, student_id)}
+    assert [s.name for s in iter_students("streaming tester", batch_size=2)] == [name]
+
+    for payment in streamed:
+        delete_payment(payment[0])
+    delete_student(name)  # Limpieza
@@ -0,0 +1,73 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import csv
+import pytest
+from db.database import fetch_students, search_students, fetch_payments_page
+from db.importer import import_students, import_payments, write_error_report, ImportFormatError
+
+# ----------------------------- #
+#   TEST: Importación masiva    #
+# ----------------------------- #
+
+def _write_csv(path, rows):
+    with open(path, mode="w", newline="", encoding="utf-8") as file:
+        csv.writer(file).writerows(rows)
+    return str(path)
+
+def test_import_students_validates_rows(db, tmp_path):
+    """Las filas inválidas se descartan; el modo prueba no guarda nada"""
+    path = _write_csv(tmp_path / "alumnos.csv", [
+        ["Nombre", "Edad", "Nivel"],
+        ["Íñigo Importado", "30", "B1"],
+        ["Ana Importada", "8", "A1"],        # Edad fuera de rango
+        ["Luis Importado", "25", "Z9"],      # Nivel inexistente
+        ["íñigo importado", "31", "B2"],     # Repetido dentro del fichero
+        ["", "", ""],                        # Fila vacía: se ignora
+        ["Marta Importada", "40", "C1"],
+    ])
+
+    result = import_students(path, dry_run=True)
+    assert (result["read"], result["imported"]) == (5, 2)
+    assert [line for line, _, _ in result["errors"]] == [3, 4, 5]
+    assert fetch_students() == [], "El modo prueba no debe guardar nada"
+
+    result = import_students(path)
+    assert sorted(s.name for s in fetch_students()) == ["Marta Importada", "Íñigo Importado"]
+    assert [s.name for s in search_students("inigo")] == ["Íñigo Importado"], "El índice de búsqueda no se actualizó"
+
+    report = tmp_path / "errores.csv"
+    write_error_report(str(report), result["errors"])
+    with open(report, newline="", encoding="utf-8") as file:
+        lines = list(csv.reader(file))
+    assert lines[0][:2] == ["Línea", "Error"] and len(lines) == 4
+
+def test_import_payments_from_excel(db, tmp_path):
+    """Los pagos de un Excel se asocian al alumno por su nombre y se validan cantidad y fecha"""
+    openpyxl = pytest.importorskip("openpyxl")
+    import_students(_write_csv(tmp_path / "alumnos.csv", [["Nombre", "Edad", "Nivel"], ["Pagador Excel", "20", "A2"]]))
+
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(["Alumno", "Cantidad", "Fecha", "Método", "Notas"])
+    for day in range(1, 21):
+        sheet.append(["Pagador Excel", 10 * day, f"2025-03-{day:02d}", "tarjeta", f"importado {day}"])
+    sheet.append(["Pagador Excel", 7, "2025-04-01 10:30:00", None, "con hora"])  # Se guarda como 2025-04-01
+    sheet.append(["Pagador Excel", -5, "2025-03-01", None, None])      # Cantidad negativa
+    sheet.append(["Pagador Excel", "12,5", "2025-02-30", None, None])  # Fecha inexistente
+    sheet.append(["Desconocido", 5, "2025-03-01", None, None])         # Alumno inexistente
+    path = str(tmp_path / "pagos.xlsx")
+    workbook.save(path)
+
+    result = import_payments(path)
+    assert result["imported"] == 21 and len(result["errors"]) == 3
+    assert "2025-02-30" in result["errors"][1][1], "El mismo mensaje que db.dates.iso_date"
+    payments, total = fetch_payments_page(notes_filter="importado", limit=None)
+    assert total == 20 and payments[0][1] == "Pagador Excel"
+    assert fetch_payments_page(notes_filter="con hora")[0][0].date == "2025-04-01"
+
+def test_missing_columns_are_reported(db, tmp_path):
+    """Un fichero sin las columnas obligatorias no se importa"""
+    path = _write_csv(tmp_path / "pagos.csv", [["Alumno", "Fecha"], ["Alguien", "2025-01-01"]])
+    with pytest.raises(ImportFormatError):
+        import_payments(path)
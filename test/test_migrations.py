@@ -0,0 +1,196 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import sqlite3
+import pytest
+from db import migrations
+from db.migrations import migrate, get_schema_version, latest_version, MigrationError
+
+# ----------------------------- #
+#      TEST: Migraciones        #
+# ----------------------------- #
+
+def _base_schema(conn):
+    """Crea las tablas tal y como estaban antes de la primera migración"""
+    conn.executescript('''
+        CREATE TABLE users (id INTEGER PRIMARY KEY, username TEXT, password TEXT, role TEXT);
+        CREATE TABLE students (id INTEGER PRIMARY KEY, name TEXT, age INTEGER, level TEXT, user_id INTEGER);
+        CREATE TABLE classes (id INTEGER PRIMARY KEY, name TEXT, date TEXT, professor TEXT);
+        CREATE TABLE payments (id INTEGER PRIMARY KEY, student_id INTEGER, amount REAL, date TEXT,
+                               method TEXT, notes TEXT);
+        CREATE TABLE rewards (id INTEGER PRIMARY KEY, recommender_id INTEGER, new_student_id INTEGER,
+                              reward_name TEXT, months_rewarded INTEGER, date_awarded TEXT);
+    ''')
+
+def test_migrate_upgrades_to_latest(tmp_path):
+    """Una base de datos antigua se actualiza a la última versión con sus índices"""
+    conn = sqlite3.connect(str(tmp_path / "old.db"))
+    _base_schema(conn)
+    assert get_schema_version(conn) == 0
+
+    applied = migrate(conn)
+    assert applied and applied[-1] == latest_version()
+    assert get_schema_version(conn) == latest_version()
+
+    indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert "idx_payments_student_id" in indexes
+    assert "idx_rewards_recommender_id" in indexes
+
+    # Volver a ejecutar no aplica nada
+    assert migrate(conn) == []
+    conn.close()
+
+def test_duplicate_names_are_renamed(tmp_path):
+    """Antes de exigir nombres únicos, los repetidos (sin distinguir mayúsculas) se renombran"""
+    conn = sqlite3.connect(str(tmp_path / "dup.db"))
+    _base_schema(conn)
+    conn.executescript('''
+        CREATE TABLE levels (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL UNIQUE);
+        INSERT INTO levels (name) VALUES ('B1'), ('b1');
+        INSERT INTO students (name, age, level) VALUES ('Ana', 20, 'B1'), ('ANA', 30, 'b1');
+        INSERT INTO classes (name, date, professor) VALUES ('Clase', '2025-01-01', 'Mary');
+    ''')
+    migrate(conn)
+
+    assert conn.execute("SELECT name, level FROM students ORDER BY id").fetchall() == [("Ana", "B1"),
+                                                                                      ("ANA_2", "b1_2")]
+    assert conn.execute("SELECT name FROM levels ORDER BY id").fetchall() == [("B1",), ("b1_2",)]
+    with pytest.raises(sqlite3.IntegrityError):
+        conn.execute("INSERT INTO classes (name, date, professor) VALUES ('CLASE', '2025-01-02', 'John')")
+    conn.close()
+
+def test_dates_are_normalized(tmp_path):
+    """Las fechas antiguas pasan a YYYY-MM-DD y después solo se admiten fechas válidas"""
+    conn = sqlite3.connect(str(tmp_path / "dates.db"))
+    _base_schema(conn)
+    conn.executescript('''
+        INSERT INTO students (name, age, level) VALUES ('Ana', 20, 'B1');
+        INSERT INTO payments (student_id, amount, date, notes) VALUES (1, 50, '21/05/2025', 'mayo'),
+                                                                     (1, 60, '2025-06-01 10:30:00', NULL);
+        INSERT INTO classes (name, date, professor) VALUES ('Clase', '2025/01/07', 'Mary');
+        INSERT INTO rewards (recommender_id, new_student_id, reward_name, months_rewarded, date_awarded)
+            VALUES (1, 1, 'Eire', 1, '31-01-2025');
+    ''')
+    migrate(conn)
+
+    assert conn.execute("SELECT date FROM payments ORDER BY id").fetchall() == [("2025-05-21",), ("2025-06-01",)]
+    assert conn.execute("SELECT date FROM classes").fetchone() == ("2025-01-07",)
+    assert conn.execute("SELECT date_awarded, bonus_end FROM rewards").fetchone() == ("2025-01-31", "2025-02-28")
+    # La tabla se recreó con sus índices y su índice de búsqueda
+    assert conn.execute("SELECT rowid FROM payments_fts WHERE payments_fts MATCH 'mayo'").fetchall() == [(1,)]
+    indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {"idx_payments_date", "idx_rewards_bonus_end", "idx_classes_date"} <= indexes
+
+    for bad_date in ("2025-02-30", "21/05/2025", "2025-5-1"):
+        with pytest.raises(sqlite3.IntegrityError):
+            conn.execute("INSERT INTO payments (student_id, amount, date) VALUES (1, 10, ?)", (bad_date,))
+    conn.close()
+
+def test_revenue_summaries_include_existing_payments(tmp_path):
+    """Las tablas resumen de ingresos se crean con los pagos que ya había"""
+    conn = sqlite3.connect(str(tmp_path / "revenue.db"))
+    _base_schema(conn)
+    conn.executescript('''
+        INSERT INTO students (name, age, level) VALUES ('Ana', 20, 'B1'), ('Luis', 30, 'C1');
+        INSERT INTO payments (student_id, amount, date, method) VALUES (1, 50, '2025-05-21', 'tarjeta'),
+                                                                       (1, 10.5, '2025-05-30', NULL),
+                                                                       (2, 99, '2025-06-01', NULL);
+    ''')
+    migrate(conn)
+
+    assert conn.execute("SELECT * FROM revenue_by_month").fetchall() == [("2025-05", 2, 6050), ("2025-06", 1, 9900)]
+    assert conn.execute("SELECT * FROM revenue_by_level").fetchall() == [("B1", 2, 6050), ("C1", 1, 9900)]
+    assert conn.execute("SELECT * FROM revenue_by_method").fetchall() == [("", 2, 10950), ("tarjeta", 1, 5000)]
+    assert conn.execute("SELECT * FROM revenue_by_student").fetchall() == [(1, 2, 6050), (2, 1, 9900)]
+    conn.close()
+
+def test_orphan_rows_do_not_block_the_migration(tmp_path):
+    """
+    Los pagos y recompensas de alumnos borrados (antes de las claves foráneas) se
+    eliminan, y la base de datos se actualiza aunque las claves foráneas estén activas
+    """
+    conn = sqlite3.connect(str(tmp_path / "orphans.db"))
+    conn.execute("PRAGMA foreign_keys = ON")  # Como en la aplicación (db/settings.py)
+    conn.executescript('''
+        CREATE TABLE users (id INTEGER PRIMARY KEY, username TEXT, password TEXT, role TEXT);
+        CREATE TABLE students (id INTEGER PRIMARY KEY, name TEXT, age INTEGER, level TEXT, user_id INTEGER,
+                               FOREIGN KEY(user_id) REFERENCES users(id));
+        CREATE TABLE classes (id INTEGER PRIMARY KEY, name TEXT, date TEXT, professor TEXT);
+        CREATE TABLE payments (id INTEGER PRIMARY KEY, student_id INTEGER, amount REAL, date TEXT,
+                               method TEXT, notes TEXT, FOREIGN KEY(student_id) REFERENCES students(id));
+        CREATE TABLE rewards (id INTEGER PRIMARY KEY, recommender_id INTEGER, new_student_id INTEGER,
+                              reward_name TEXT, months_rewarded INTEGER, date_awarded TEXT,
+                              FOREIGN KEY (recommender_id) REFERENCES students(id),
+                              FOREIGN KEY (new_student_id) REFERENCES students(id));
+        INSERT INTO students (name, age, level) VALUES ('Ana', 20, 'B1'), ('Borrado', 30, 'B1');
+        INSERT INTO payments (student_id, amount, date) VALUES (1, 50, '2025-05-21'), (2, 60, '2025-05-22');
+        INSERT INTO rewards (recommender_id, new_student_id, reward_name, months_rewarded, date_awarded)
+            VALUES (1, 2, 'Eire', 1, '2025-01-31'), (2, 1, 'Eire', 1, '2025-02-01');
+    ''')
+    # Así borraba los alumnos la versión original de delete_student
+    conn.execute("PRAGMA foreign_keys = OFF")
+    conn.execute("DELETE FROM students WHERE id = 2")
+    conn.commit()
+    conn.execute("PRAGMA foreign_keys = ON")
+
+    migrate(conn)
+
+    assert get_schema_version(conn) == latest_version()
+    assert conn.execute("SELECT id, student_id FROM payments").fetchall() == [(1, 1)]
+    assert conn.execute("SELECT COUNT(*) FROM rewards").fetchone() == (0,)
+    assert conn.execute("PRAGMA foreign_key_check").fetchall() == []
+    assert conn.execute("SELECT * FROM revenue_by_month").fetchall() == [("2025-05", 1, 5000)]
+    conn.close()
+
+def test_invalid_dates_stop_the_migration(tmp_path):
+    """Si una fecha no se puede interpretar, la migración falla indicando la fila"""
+    conn = sqlite3.connect(str(tmp_path / "bad_dates.db"))
+    _base_schema(conn)
+    conn.execute("INSERT INTO classes (name, date, professor) VALUES ('Clase', 'el lunes', 'Mary')")
+    with pytest.raises(MigrationError, match=r"classes\.date \(ids 1\)"):
+        migrate(conn)
+    assert conn.execute("SELECT date FROM classes").fetchone() == ("el lunes",)
+    conn.close()
+
+def test_failed_migration_keeps_previous_version(tmp_path, monkeypatch):
+    """Si una migración falla, se deshace y la versión no avanza"""
+    conn = sqlite3.connect(str(tmp_path / "fail.db"))
+    _base_schema(conn)
+    migrate(conn)
+    version = get_schema_version(conn)
+
+    broken = migrations.MIGRATIONS + [
+        (version + 1, "Migración rota", ["CREATE TABLE extra (x INTEGER)", "SELECT * FROM no_existe"]),
+    ]
+    monkeypatch.setattr(migrations, "MIGRATIONS", broken)
+
+    with pytest.raises(MigrationError):
+        migrate(conn)
+    assert get_schema_version(conn) == version
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert "extra" not in tables
+    conn.close()
+
+def test_newer_database_is_rejected(tmp_path):
+    """No se puede abrir una base de datos creada por una versión más nueva"""
+    conn = sqlite3.connect(str(tmp_path / "new.db"))
+    conn.execute(f"PRAGMA user_version = {latest_version() + 1}")
+    with pytest.raises(MigrationError):
+        migrate(conn)
+    conn.close()
+
+def test_ensure_schema_only_runs_when_outdated(tmp_path):
+    """Al arrancar solo se prepara el esquema si user_version no está al día"""
+    from db.connection import configure_pool, close_pool
+    from db.database import ensure_schema, fetch_levels, delete_level
+
+    configure_pool(str(tmp_path / "startup.db"))
+    try:
+        assert ensure_schema() is True
+        assert len(fetch_levels()) == 12
+
+        delete_level("C2_Ad")
+        assert ensure_schema() is False
+        assert "C2_Ad" not in [level[1] for level in fetch_levels()], "Los niveles borrados no deben volver"
+    finally:
+        close_pool()
@@ -0,0 +1,64 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+import db.database as database
+from db.profiling import enable_profiling, disable_profiling, enable_profiling_from_settings, normalize_sql
+
+# ----------------------------- #
+#  TEST: Medición de consultas  #
+# ----------------------------- #
+
+@pytest.fixture(autouse=True)
+def profiling_off():
+    """La medición se desactiva al terminar cada prueba"""
+    yield
+    disable_profiling()
+
+def test_statements_are_grouped_without_their_values():
+    """Las sentencias que solo se diferencian en los valores cuentan como la misma"""
+    assert normalize_sql("SELECT * FROM t WHERE a = 1.5 AND b = 'x''y'\n   LIMIT 10") == \
+        "SELECT * FROM t WHERE a = ? AND b = ? LIMIT ?"
+    assert normalize_sql("SELECT id2 FROM t2") == "SELECT id2 FROM t2", "Los números dentro de nombres se conservan"
+
+def test_functions_and_statements_are_measured(db, tmp_path):
+    """Se cuentan llamadas y filas por función y por sentencia, y las lentas se guardan con su plan"""
+    original = database.fetch_levels
+    log = tmp_path / "lentas.log"
+    profiler = enable_profiling(slow_query_ms=0, slow_query_log=str(log))
+    database.insert_student("Medido", 30, "A1")
+    database.insert_student("Medida", 31, "A2")
+    database.fetch_payments_page(student_filter="medid")
+
+    snapshot = profiler.snapshot()
+    functions = {item["name"]: item for item in snapshot["functions"]}
+    assert functions["insert_student"]["calls"] == 2
+    assert functions["fetch_payments_filtered"]["calls"] == 1, "Las llamadas internas también se miden"
+    statements = [item["name"] for item in snapshot["statements"]]
+    assert ("INSERT INTO students (name, age, level, user_id) VALUES (?, ?, ?, NULL) "
+            "ON CONFLICT (name COLLATE NOCASE) DO NOTHING") in statements
+    assert sum(item["calls"] for item in snapshot["statements"]) == sum(
+        sum(item["histogram"]) for item in snapshot["statements"])
+    assert "SEARCH" in log.read_text(encoding="utf-8") or "SCAN" in log.read_text(encoding="utf-8")
+
+    disable_profiling()
+    assert database.fetch_levels is original
+
+def test_profiling_is_off_unless_enabled_in_settings(db, tmp_path):
+    """Sin [profiling] enabled = true no se envuelve nada"""
+    original = database.fetch_levels
+    settings = tmp_path / "settings.ini"
+    settings.write_text("[profiling]\nslow_query_ms = 50\n", encoding="utf-8")
+    assert not enable_profiling_from_settings(str(settings))
+    assert database.fetch_levels is original
+
+    settings.write_text("[profiling]\nenabled = true\nslow_query_log = lentas.log\n", encoding="utf-8")
+    assert enable_profiling_from_settings(str(settings))
+    assert database.fetch_levels is not original
+
+def test_unwritable_slow_query_log_is_reported(db, tmp_path, caplog):
+    """Si no se puede escribir el registro de consultas lentas, se avisa en el log y la consulta sigue"""
+    enable_profiling(slow_query_ms=0, slow_query_log=str(tmp_path))  # Es un directorio
+    database.insert_student("Sin Registro", 30, "A1")
+    assert any(s.name == "Sin Registro" for s in database.fetch_students())
+    assert any(record.name == "db.profiling" and record.exc_info for record in caplog.records)
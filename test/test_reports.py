@@ -0,0 +1,88 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+from db.connection import get_connection
+from db.database import (insert_student, insert_payment, insert_payments_bulk, update_payment, delete_payment,
+                         update_student_by_id, delete_student_by_id)
+from db.reports import (revenue_by_month, revenue_by_method, revenue_by_level, revenue_by_student, revenue_totals,
+                        rebuild_summaries, NO_METHOD)
+
+# ----------------------------- #
+#   TEST: Informes de ingresos  #
+# ----------------------------- #
+
+pytestmark = pytest.mark.usefixtures("db")
+
+def _student(name, level):
+    insert_student(name, 20, level)
+    with get_connection() as conn:
+        return conn.execute("SELECT id FROM students WHERE name = ?", (name,)).fetchone()[0]
+
+def _from_payments(key_sql):
+    """Lo que deberían contener los informes, agrupando directamente los pagos"""
+    with get_connection() as conn:
+        rows = conn.execute(f'''
+            SELECT {key_sql}, COUNT(*), SUM(p.amount)
+            FROM payments p JOIN students s ON s.id = p.student_id
+            GROUP BY 1
+        ''').fetchall()
+    return {key: (count, round(total, 2)) for key, count, total in rows}
+
+def _as_dict(report):
+    return {row.key: (row.payments, row.total) for row in report}
+
+def _check_summaries():
+    assert _as_dict(revenue_by_month()) == _from_payments("substr(p.date, 1, 7)")
+    assert _as_dict(revenue_by_method()) == _from_payments(f"COALESCE(NULLIF(p.method, ''), '{NO_METHOD}')")
+    assert _as_dict(revenue_by_level()) == _from_payments("s.level")
+    assert _as_dict(revenue_by_student()) == _from_payments("s.name")
+
+def test_summaries_follow_payment_changes():
+    """Los triggers mantienen los totales al insertar, modificar y borrar pagos"""
+    ana, luis = _student("Ana", "B1"), _student("Luis", "C1")
+    insert_payment(ana, 50.10, "2025-01-15", "efectivo")
+    insert_payment(ana, 60.20, "2025-02-01", "tarjeta")
+    insert_payment(luis, 0.10, "2025-01-20")
+    insert_payments_bulk([(luis, 0.20, "2025-02-03", "tarjeta", None), (ana, 70, "2025-03-01", "efectivo", None)])
+    _check_summaries()
+    assert revenue_by_month()[0].key == "2025-03"  # Del mes más reciente al más antiguo
+    assert revenue_by_month(limit=1, offset=1)[0].key == "2025-02"
+    assert revenue_by_student()[0].key == "Ana"  # Del alumno que más ha pagado al que menos
+    assert revenue_totals() == (5, 180.6)
+
+    with get_connection() as conn:
+        first_id = conn.execute("SELECT MIN(id) FROM payments").fetchone()[0]
+    update_payment(first_id, 10, "2025-03-31", "tarjeta")
+    _check_summaries()
+    delete_payment(first_id)
+    _check_summaries()
+    # Un mes que se queda sin pagos desaparece del informe
+    delete_payment(first_id + 2)
+    assert "2025-01" not in _as_dict(revenue_by_month())
+    _check_summaries()
+
+def test_summaries_follow_student_changes():
+    """Cambiar de nivel a un alumno mueve sus totales; borrarlo los quita"""
+    ana, luis = _student("Ana", "B1"), _student("Luis", "B1")
+    insert_payment(ana, 40, "2025-01-15")
+    insert_payment(luis, 25, "2025-01-16")
+
+    update_student_by_id(ana, "Ana", 20, "C1")
+    assert _as_dict(revenue_by_level()) == {"B1": (1, 25.0), "C1": (1, 40.0)}
+    _check_summaries()
+
+    delete_student_by_id(luis)
+    assert _as_dict(revenue_by_level()) == {"C1": (1, 40.0)}
+    _check_summaries()
+
+def test_rebuild_matches_triggers():
+    """Recalcular las tablas resumen da lo mismo que lo que han ido sumando los triggers"""
+    ana = _student("Ana", "B1")
+    insert_payments_bulk([(ana, 12.34, f"2025-{month:02d}-01", "bizum", None) for month in range(1, 13)])
+    before = [revenue_by_month(), revenue_by_method(), revenue_by_level(), revenue_by_student()]
+    with get_connection() as conn:
+        conn.execute("DELETE FROM revenue_by_month")
+    rebuild_summaries()
+    assert [revenue_by_month(), revenue_by_method(), revenue_by_level(), revenue_by_student()] == before
+    assert revenue_totals() == (12, 148.08)
@@ -0,0 +1,49 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+from db.connection import ConnectionPool
+from db.settings import load_pragmas, DEFAULT_PRAGMAS
+
+# ----------------------------- #
+#    TEST: Perfil de PRAGMAs    #
+# ----------------------------- #
+
+def test_settings_file_overrides_defaults(tmp_path):
+    """Los valores de settings.ini sustituyen a los del perfil por defecto"""
+    settings = tmp_path / "settings.ini"
+    settings.write_text("[sqlite]\nsynchronous = FULL\n", encoding="utf-8")
+
+    pragmas = load_pragmas(str(settings))
+    assert pragmas["synchronous"] == "FULL"
+    assert pragmas["journal_mode"] == DEFAULT_PRAGMAS["journal_mode"]
+    assert load_pragmas(str(tmp_path / "no_existe.ini")) == DEFAULT_PRAGMAS
+
+@pytest.mark.parametrize("line", ["journal_size = 10", "synchronous = OFF; DROP TABLE users"])
+def test_invalid_settings_are_rejected(tmp_path, line):
+    """Solo se aceptan PRAGMAs conocidos con valores simples"""
+    settings = tmp_path / "settings.ini"
+    settings.write_text(f"[sqlite]\n{line}\n", encoding="utf-8")
+    with pytest.raises(ValueError):
+        load_pragmas(str(settings))
+
+def test_pool_connections_use_profile(tmp_path):
+    """Las conexiones del pool usan WAL: se puede leer mientras otra conexión escribe"""
+    pool = ConnectionPool(str(tmp_path / "wal.db"), pragmas=DEFAULT_PRAGMAS)
+    with pool.connection() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA foreign_keys").fetchone()[0] == 1
+        conn.execute("CREATE TABLE t (x INTEGER)")
+        conn.execute("INSERT INTO t VALUES (1)")
+
+    writer = pool.acquire()
+    writer.execute("BEGIN IMMEDIATE")
+    writer.execute("INSERT INTO t VALUES (2)")
+
+    reader = pool.acquire()
+    assert reader.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 1, "El lector no debe esperar al escritor"
+
+    writer.rollback()
+    pool.release(writer)
+    pool.release(reader)
+    pool.close()
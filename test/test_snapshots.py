@@ -0,0 +1,68 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import sqlite3
+from datetime import datetime, timedelta
+import pytest
+from db.connection import configure_pool, close_pool, get_connection
+from db.snapshots import take_snapshot, list_snapshots, restore_snapshot, apply_retention, snapshots_to_keep
+
+# ----------------------------- #
+#     TEST: Instantáneas      #
+# ----------------------------- #
+
+@pytest.fixture
+def live_db(tmp_path):
+    """Base de datos temporal servida por el pool global durante la prueba"""
+    path = str(tmp_path / "live.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE notas (id INTEGER PRIMARY KEY, texto TEXT)")
+    conn.executemany("INSERT INTO notas (texto) VALUES (?)", [(f"nota {i} " * 40,) for i in range(2000)])
+    conn.commit()
+    conn.close()
+
+    configure_pool(path)
+    yield path
+    close_pool()
+
+def test_snapshots_only_store_changed_chunks(live_db, tmp_path):
+    """La segunda instantánea solo escribe los bloques que han cambiado y ambas se pueden restaurar"""
+    store = str(tmp_path / "backups")
+    first = take_snapshot(store, now=datetime(2025, 3, 1, 10))
+    assert first["new_chunks"] == len(first["chunks"]) > 2
+
+    with get_connection() as conn:
+        conn.execute("UPDATE notas SET texto = 'cambiada' WHERE id = 1")
+    second = take_snapshot(store, now=datetime(2025, 3, 1, 11))
+    assert 0 < second["new_chunks"] < len(second["chunks"]), "Los bloques sin cambios deben reutilizarse"
+    assert [s["id"] for s in list_snapshots(store)] == [second["id"], first["id"]]
+
+    restore_snapshot(first["id"], store)
+    with get_connection() as conn:
+        assert conn.execute("SELECT texto FROM notas WHERE id = 1").fetchone()[0].startswith("nota 0")
+
+def test_retention_policy():
+    """Se conserva la última instantánea de cada una de las últimas horas, días y semanas"""
+    start = datetime(2025, 3, 3, 0, 30)  # Lunes
+    dates = [start + timedelta(hours=h) for h in range(24 * 14)]  # Dos semanas, una por hora
+    keep = snapshots_to_keep(dates, {"hourly": 3, "daily": 2, "weekly": 2})
+
+    newest = dates[-1]
+    expected = {newest, newest - timedelta(hours=1), newest - timedelta(hours=2),  # Últimas 3 horas
+                newest - timedelta(hours=24),  # Última del día anterior
+                datetime(2025, 3, 9, 23, 30)}  # Última de la semana anterior
+    assert keep == expected
+
+def test_apply_retention_removes_orphan_chunks(live_db, tmp_path):
+    """Al borrar instantáneas antiguas también se borran los bloques que ya nadie usa"""
+    store = str(tmp_path / "backups")
+    take_snapshot(store, now=datetime(2025, 3, 1, 10))
+    with get_connection() as conn:
+        conn.execute("UPDATE notas SET texto = 'cambiada' WHERE id = 1")
+    latest = take_snapshot(store, now=datetime(2025, 3, 1, 11))
+
+    removed = apply_retention(store, {"hourly": 1})
+    assert len(removed) == 1 and [s["id"] for s in list_snapshots(store)] == [latest["id"]]
+
+    chunk_files = {name for _, _, files in os.walk(os.path.join(store, "chunks")) for name in files}
+    assert chunk_files == set(latest["chunks"])
@@ -0,0 +1,131 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+
+pytest.importorskip("PySide2")
+from ui.table_model import SqlTableModel
+
+# ----------------------------- #
+#    TEST: Modelo de tablas     #
+# ----------------------------- #
+
+ROWS = [(i, f"Alumno {i}", 20 + i % 5) for i in range(1, 26)]
+
+def _fetch_page(offset, limit):
+    """Simula una consulta paginada a la base de datos"""
+    return ROWS[offset:offset + limit]
+
+def test_model_fetches_rows_in_batches():
+    """El modelo solo carga un bloque cada vez que se le pide"""
+    model = SqlTableModel(["Nombre", "Edad"], _fetch_page, columns=[1, 2], batch_size=10)
+    assert model.rowCount() == 0 and model.canFetchMore()
+
+    model.fetchMore()
+    assert model.rowCount() == 10
+    assert model.data(model.index(0, 0)) == "Alumno 1"
+    assert model.row_data(0)[0] == 1, "La fila original debe conservar el ID oculto"
+
+    model.fetch_all()
+    assert model.rowCount() == len(ROWS)
+    assert not model.canFetchMore()
+
+def test_refresh_starts_again():
+    """Al refrescar se descartan las filas y se carga de nuevo el primer bloque"""
+    model = SqlTableModel(["Nombre"], _fetch_page, columns=[1], batch_size=10)
+    model.fetch_all()
+    model.refresh(lambda offset, limit: ROWS[:3][offset:offset + limit])
+    assert model.rowCount() == 3
+    assert not model.canFetchMore()
+
+def test_reload_only_touches_changed_rows():
+    """Al recargar se avisa solo de las filas que cambian y se añaden o quitan las del final"""
+    rows = list(ROWS[:15])
+    model = SqlTableModel(["Nombre"], lambda offset, limit: rows[offset:offset + limit], columns=[1], batch_size=10)
+    model.fetch_all()
+    changed, resets = [], []
+    model.dataChanged.connect(lambda first, last: changed.append(first.row()))
+    model.modelReset.connect(lambda: resets.append(True))
+
+    rows[3] = (4, "Alumno renombrado", 20)
+    rows.append((99, "Alumno nuevo", 30))
+    model.reload()
+    assert changed == [3] and not resets
+    assert model.rowCount() == 15 and model.data(model.index(3, 0)) == "Alumno renombrado"
+    model.fetch_all()  # La fila nueva queda más allá de lo cargado: llega con el siguiente bloque
+    assert model.rowCount() == 16
+
+    del rows[10:]
+    model.reload()
+    assert model.rowCount() == 10 and not resets
+
+def test_apply_change_patches_single_rows():
+    """Modificar o borrar una fila cargada solo toca esa fila; un alta recarga lo cargado"""
+    from db.events import ChangeEvent, INSERT, UPDATE, DELETE
+    rows = list(ROWS[:15])
+    model = SqlTableModel(["Nombre"], lambda offset, limit: rows[offset:offset + limit], columns=[1], batch_size=10)
+    model.fetch_all()
+    changed, resets = [], []
+    model.dataChanged.connect(lambda first, last: changed.append(first.row()))
+    model.modelReset.connect(lambda: resets.append(True))
+
+    model.apply_change(ChangeEvent("students", UPDATE, 5), lambda key: (key, "Alumno cambiado", 40))
+    assert changed == [4] and model.data(model.index(4, 0)) == "Alumno cambiado"
+
+    model.apply_change(ChangeEvent("students", DELETE, 2), lambda key: pytest.fail("No hace falta leerla"))
+    assert model.rowCount() == 14 and model.row_data(1)[0] == 3
+
+    rows[:] = [(0, "Alumno primero", 20)] + rows
+    model.apply_change(ChangeEvent("students", INSERT, 0), lambda key: None)
+    assert model.row_data(0)[0] == 0 and not resets
+
+def test_keyset_model_pages_from_last_row_and_sorts():
+    """Con orden, cada bloque se pide a partir de la última fila cargada y la cabecera ordena en la consulta"""
+    from PySide2.QtCore import Qt
+    calls = []
+
+    def fetch_after(after, limit, order_by, descending):
+        calls.append((after, order_by, descending))
+        rows = sorted(ROWS, key=lambda row: (row[order_by], row[0]), reverse=descending)
+        start = rows.index(after) + 1 if after is not None else 0
+        return rows[start:start + limit]
+
+    model = SqlTableModel(["Nombre", "Edad"], fetch_after, columns=[1, 2], batch_size=10, order=(2, False),
+                          sort_columns=[2])
+    model.fetch_all()
+    assert model.rowCount() == len(ROWS)
+    assert [call[0] for call in calls] == [None, model.row_data(9), model.row_data(19)]
+    assert model.row_data(0) == (5, "Alumno 5", 20)
+
+    model.sort(0, Qt.AscendingOrder)  # El nombre no se puede ordenar: no cambia nada
+    assert model.order == (2, False) and len(calls) == 3
+
+    model.sort(1, Qt.DescendingOrder)  # Edad, de mayor a menor: se vuelve a empezar
+    assert model.order == (2, True) and calls[-1] == (None, 2, True)
+    assert model.rowCount() == 10 and model.row_data(0) == (24, "Alumno 24", 24)
+
+@pytest.mark.parametrize("new_date", ["2020-01-01", "2030-01-01"])
+def test_keyset_model_reloads_when_the_sort_value_changes(new_date):
+    """
+    Si cambia la fecha de la última fila cargada (de la que parte el siguiente bloque),
+    no se parchea en su sitio: se recarga, y al seguir bajando no faltan ni se repiten filas
+    """
+    from db.events import ChangeEvent, UPDATE
+    dates = {1: "2025-05-05", 2: "2025-05-04", 3: "2025-05-03", 4: "2025-05-02", 5: "2025-05-01"}
+
+    def fetch_after(after, limit, order_by, descending):
+        rows = sorted(((key, date) for key, date in dates.items()), key=lambda row: (row[1], row[0]), reverse=True)
+        if after is not None:
+            rows = [row for row in rows if (row[1], row[0]) < (after[1], after[0])]
+        return rows[:limit]
+
+    model = SqlTableModel(["Fecha"], fetch_after, columns=[1], batch_size=2, order=(1, True), sort_columns=[1])
+    model.fetchMore()
+    assert [model.row_data(row)[0] for row in range(model.rowCount())] == [1, 2]
+
+    dates[2] = new_date
+    model.apply_change(ChangeEvent("payments", UPDATE, 2), lambda key: (key, dates[key]))
+    model.fetch_all()
+    expected = [key for key, _ in sorted(dates.items(), key=lambda item: (item[1], item[0]), reverse=True)]
+    assert [model.row_data(row)[0] for row in range(model.rowCount())] == expected
+
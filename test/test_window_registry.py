@@ -0,0 +1,71 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+
+pytest.importorskip("PySide2")
+from PySide2.QtWidgets import QApplication, QWidget
+from db.connection import configure_pool, close_pool
+from db.database import create_tables, insert_class, insert_student
+from ui.window_registry import WindowRegistry
+
+# ----------------------------- #
+#   TEST: Registro de ventanas  #
+# ----------------------------- #
+
+created = []
+
+class FakeWindow(QWidget):
+    """Ventana mínima que cuenta cuántas veces se crea y se recarga"""
+    WATCHED_TABLES = ("classes",)
+
+    def __init__(self):
+        super().__init__()
+        created.append(self)
+        self.reloads = 0
+        self.changes = []
+
+    def reload_data(self):
+        self.reloads += 1
+
+    def apply_change(self, event):
+        self.changes.append(event)
+
+@pytest.fixture
+def app(tmp_path):
+    application = QApplication.instance() or QApplication(["test", "-platform", "offscreen"])
+    configure_pool(str(tmp_path / "windows.db"))
+    create_tables()
+    yield application
+    close_pool()
+
+def test_window_is_reused_and_reloaded_only_after_changes(app):
+    """Reabrir una ventana reutiliza la instancia y solo recarga si cambió alguna de sus tablas"""
+    registry = WindowRegistry()
+    window = registry.show("classes", FakeWindow)
+    window.close()
+
+    assert registry.show("classes", FakeWindow) is window and len(created) == 1
+    assert window.reloads == 0, "Sin cambios no hay nada que recargar"
+
+    registry.close_all()
+    insert_student("Otro", 30, "A1")  # Escribir en otra tabla no afecta
+    insert_class("Conversación", "2025-01-01", "Ana")
+    registry.show("classes", FakeWindow)
+    assert window.reloads == 1 and window.isVisible()
+    registry.detach()
+
+def test_visible_windows_receive_row_changes(app):
+    """Las ventanas visibles reciben los cambios de sus tablas uno a uno; las ocultas se recargan al reabrirlas"""
+    registry = WindowRegistry()
+    window = registry.show("classes", FakeWindow)
+    insert_student("Ajeno", 30, "A1")
+    insert_class("Gramática", "2025-02-01", "Luis")
+    assert [(event.table, event.operation) for event in window.changes] == [("classes", "insert")]
+
+    window.close()
+    insert_class("Fonética", "2025-02-02", "Luis")
+    assert len(window.changes) == 1, "Una ventana oculta no recibe cambios"
+    registry.show("classes", FakeWindow)
+    assert window.reloads == 1
+    registry.detach()
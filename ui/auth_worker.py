@@ -0,0 +1,22 @@
+from PySide2.QtCore import QThread, Signal
+from db.auth import authenticate
+
+
+class AuthWorker(QThread):
+    """Hilo que comprueba las credenciales (db.auth) para que el hash costoso no congele la ventana"""
+
+    succeeded = Signal(object)  # (username, role), o None si las credenciales no son válidas
+    failed = Signal(str)  # Mensaje de error (por ejemplo, base de datos inaccesible)
+
+    def __init__(self, username, password, parent=None):
+        super().__init__(parent)
+        self.username = username
+        self.password = password
+
+    def run(self):
+        try:
+            user = authenticate(self.username, self.password)
+        except Exception as e:
+            self.failed.emit(str(e))
+        else:
+            self.succeeded.emit(user)
@@ -0,0 +1,121 @@
+import logging
+from PySide2.QtCore import Qt, QObject, QThread, QTimer, Signal
+from PySide2.QtWidgets import QProgressDialog, QMessageBox
+
+# Cada cuánto se hace una instantánea automática (1 hora)
+SNAPSHOT_INTERVAL_MS = 60 * 60 * 1000
+
+logger = logging.getLogger(__name__)
+
+
+class BackupWorker(QThread):
+    """
+    Hilo que ejecuta una copia o restauración (db.backup) sin bloquear la interfaz.
+    """
+
+    progress = Signal(int, int)  # (páginas copiadas, páginas totales)
+    succeeded = Signal()
+    failed = Signal(str)  # Mensaje de error
+
+    def __init__(self, task, parent=None):
+        """
+        Args:
+            task (callable): Función que recibe el callback de progreso, por ejemplo
+                lambda progress: backup_database(ruta, progress=progress).
+        """
+        super().__init__(parent)
+        self.task = task
+
+    def run(self):
+        try:
+            self.task(self.progress.emit)
+        except Exception as e:
+            self.failed.emit(str(e))
+        else:
+            self.succeeded.emit()
+
+
+def start_backup_task(parent, title, label, task, on_success):
+    """
+    Lanza una copia o restauración en segundo plano con una barra de progreso.
+
+    Args:
+        parent (QWidget): Ventana desde la que se lanza.
+        title (str): Título del diálogo de progreso y de los mensajes.
+        label (str): Texto que se muestra mientras se copia.
+        task (callable): Función que recibe el callback de progreso.
+        on_success (callable): Se llama en el hilo de la interfaz al terminar bien.
+
+    Returns:
+        BackupWorker: El hilo lanzado.
+    """
+    dialog = QProgressDialog(label, None, 0, 0, parent)  # Sin botón de cancelar
+    dialog.setWindowTitle(title)
+    dialog.setWindowModality(Qt.WindowModal)
+    dialog.setMinimumDuration(0)
+    dialog.setAutoClose(False)
+    dialog.setAutoReset(False)
+
+    worker = BackupWorker(task, parent)
+
+    def on_progress(done, total):
+        dialog.setMaximum(total)
+        dialog.setValue(done)
+
+    def on_succeeded():
+        dialog.close()
+        on_success()
+
+    def on_failed(message):
+        dialog.close()
+        QMessageBox.critical(parent, title, f"No se pudo completar la operación:\n{message}")
+
+    worker.progress.connect(on_progress)
+    worker.succeeded.connect(on_succeeded)
+    worker.failed.connect(on_failed)
+    worker.finished.connect(worker.deleteLater)
+
+    parent._backup_worker = worker  # Mantiene viva la referencia mientras dura la copia
+    worker.start()
+    dialog.show()
+    return worker
+
+
+class SnapshotScheduler(QObject):
+    """
+    Programa instantáneas periódicas (db.snapshots, con almacenamiento deduplicado) en
+    segundo plano y aplica la política de retención después de cada una.
+    """
+
+    def __init__(self, interval_ms=SNAPSHOT_INTERVAL_MS, store=None, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.worker = None
+        self.timer = QTimer(self)
+        self.timer.setInterval(interval_ms)
+        self.timer.timeout.connect(self.run_now)
+
+    def start(self):
+        """Empieza a contar; la primera instantánea se hace al cumplirse el primer intervalo"""
+        self.timer.start()
+
+    def stop(self):
+        self.timer.stop()
+
+    def run_now(self):
+        """Lanza una instantánea, salvo que todavía haya otra en marcha"""
+        if self.worker is not None:
+            if self.worker.isRunning():
+                return
+            self.worker.deleteLater()  # El hilo de la instantánea anterior ya terminó
+
+        from db.snapshots import take_snapshot, apply_retention  # Se carga con la primera instantánea
+
+        def task(progress):
+            take_snapshot(self.store, progress=progress)
+            apply_retention(self.store)
+
+        self.worker = BackupWorker(task, self)
+        # No hay ninguna ventana que muestre el error: se deja en el registro (logging)
+        self.worker.failed.connect(lambda message: logger.error("Error en la copia automática: %s", message))
+        self.worker.start()
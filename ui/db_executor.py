@@ -0,0 +1,140 @@
+import logging
+import queue
+import threading
+from PySide2.QtCore import QThread, Signal, Slot
+
+logger = logging.getLogger(__name__)
+
+
+class DbRequest:
+    """
+    Consulta encargada al ejecutor. Hace de future: su resultado (o su error) se
+    entrega a los callbacks en el hilo de la interfaz, salvo que se cancele antes.
+    """
+
+    def __init__(self, function, args, kwargs, on_result, on_error, key):
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+        self.on_result = on_result
+        self.on_error = on_error
+        self.key = key
+        self.cancelled = False
+        self.done = False
+
+    def cancel(self):
+        """Si aún no ha empezado no se ejecuta; si ya ha empezado, su resultado se descarta"""
+        self.cancelled = True
+
+
+class DatabaseExecutor(QThread):
+    """
+    Hilo dedicado a las consultas de la interfaz, para que una tabla grande o un
+    disco lento no congelen las ventanas.
+
+    Las peticiones se atienden en orden desde una cola. Cada una puede llevar una
+    clave: al encargar otra con la misma clave, la anterior se cancela (por
+    ejemplo, la búsqueda de una tecla que ya se ha seguido escribiendo). El hilo
+    usa su propia conexión del pool (db.connection).
+    """
+
+    completed = Signal(object)  # DbRequest terminada (se emite desde el hilo de la base de datos)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._requests = queue.Queue()
+        self._latest = {}  # clave -> última petición encargada con esa clave
+        self._lock = threading.Lock()
+        self.completed.connect(self._deliver)  # Este objeto vive en el hilo de la interfaz: llega encolada
+
+    def submit(self, function, *args, on_result=None, on_error=None, key=None, **kwargs):
+        """
+        Encarga function(*args, **kwargs) al hilo de la base de datos.
+
+        Args:
+            function (callable): Consulta que se ejecuta en el hilo.
+            on_result (callable, optional): Recibe el resultado en el hilo de la interfaz.
+            on_error (callable, optional): Recibe la excepción si la consulta falla. Sin él, el error
+                se registra con logging.
+            key (hashable, optional): Las peticiones con la misma clave se sustituyen entre sí.
+
+        Returns:
+            DbRequest: La petición, por si se quiere cancelar.
+        """
+        request = DbRequest(function, args, kwargs, on_result, on_error, key)
+        if key is not None:
+            with self._lock:
+                previous = self._latest.get(key)
+                self._latest[key] = request
+            if previous is not None:
+                previous.cancel()
+        if not self.isRunning():
+            self.start()
+        self._requests.put(request)
+        return request
+
+    def cancel(self, key):
+        """Cancela la petición pendiente con esa clave, si la hay"""
+        with self._lock:
+            request = self._latest.pop(key, None)
+        if request is not None:
+            request.cancel()
+
+    def run(self):
+        while True:
+            request = self._requests.get()
+            if request is None:
+                return  # stop()
+            if request.cancelled:
+                continue
+            try:
+                request.result = request.function(*request.args, **request.kwargs)
+                request.error = None
+            except Exception as e:
+                request.result, request.error = None, e
+            self.completed.emit(request)
+
+    @Slot(object)
+    def _deliver(self, request):
+        request.done = True
+        if request.key is not None:
+            with self._lock:
+                if self._latest.get(request.key) is request:
+                    del self._latest[request.key]
+        if request.cancelled:
+            return
+        if request.error is not None:
+            if request.on_error is not None:
+                request.on_error(request.error)
+            else:
+                logger.error("Error en una consulta en segundo plano", exc_info=request.error)
+        elif request.on_result is not None:
+            request.on_result(request.result)
+
+    def stop(self):
+        """Termina el hilo después de la petición en curso (las pendientes se descartan)"""
+        if self.isRunning():
+            while True:
+                try:
+                    self._requests.get_nowait()
+                except queue.Empty:
+                    break
+            self._requests.put(None)
+            self.wait()
+
+
+_executor = None
+
+
+def db_executor():
+    """Devuelve el ejecutor de consultas de la aplicación; se crea la primera vez que se usa"""
+    global _executor
+    if _executor is None:
+        _executor = DatabaseExecutor()
+    return _executor
+
+
+def stop_executor():
+    """Para el hilo de consultas (al salir de la aplicación, antes de cerrar el pool)"""
+    if _executor is not None:
+        _executor.stop()
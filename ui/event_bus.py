@@ -0,0 +1,35 @@
+from PySide2.QtCore import QObject, Signal, Slot
+from db.events import subscribe
+
+
+class DatabaseEvents(QObject):
+    """
+    Lleva a la interfaz los avisos de cambios de db.events.
+
+    Los avisos llegan en el hilo que confirmó la transacción (por ejemplo, el de
+    una importación). Se reenvían con una señal propia que Qt encola hacia el hilo
+    de este objeto, así que `changed` siempre se emite en el hilo de la interfaz.
+    """
+
+    changed = Signal(object)  # ChangeEvent
+    _published = Signal(object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._published.connect(self._forward)
+        subscribe(self._published.emit)
+
+    @Slot(object)
+    def _forward(self, event):
+        self.changed.emit(event)
+
+
+_bus = None
+
+
+def database_events():
+    """Devuelve el bus de avisos de la aplicación; se crea (en el hilo de la interfaz) la primera vez"""
+    global _bus
+    if _bus is None:
+        _bus = DatabaseEvents()
+    return _bus
@@ -0,0 +1,100 @@
+from PySide2.QtCore import Qt, QThread, Signal
+from PySide2.QtWidgets import QProgressDialog, QMessageBox
+from db.export import write_export, ExportCancelled
+
+
+class ExportWorker(QThread):
+    """
+    Hilo que vuelca una consulta a un fichero CSV o Excel sin bloquear la interfaz.
+
+    Las filas se leen de la base de datos dentro del propio hilo (con su propia
+    conexión del pool) y se escriben según llegan.
+    """
+
+    progress = Signal(int)  # Filas escritas hasta el momento
+    succeeded = Signal(int)  # Total de filas exportadas
+    failed = Signal(str)  # Mensaje de error
+    cancelled = Signal()
+
+    def __init__(self, path, headers, make_rows, columns=None, sheet_title="Datos", parent=None):
+        """
+        Args:
+            path (str): Ruta del fichero de salida (.csv o .xlsx).
+            headers (list): Cabeceras de las columnas.
+            make_rows (callable): Devuelve el iterador de filas; se llama ya dentro del hilo.
+            columns (list, optional): Índice o clave de cada columna exportada dentro de la fila.
+            sheet_title (str): Nombre de la hoja si se exporta a Excel.
+        """
+        super().__init__(parent)
+        self.path = path
+        self.headers = headers
+        self.make_rows = make_rows
+        self.columns = columns
+        self.sheet_title = sheet_title
+        self._cancel_requested = False
+
+    def cancel(self):
+        """Pide al hilo que pare en cuanto termine el bloque de filas actual"""
+        self._cancel_requested = True
+
+    def run(self):
+        try:
+            written = write_export(self.path, self.headers, self.make_rows(), self.columns, self.sheet_title,
+                                   progress=self.progress.emit, should_cancel=lambda: self._cancel_requested)
+        except ExportCancelled:
+            self.cancelled.emit()
+        except Exception as e:
+            self.failed.emit(str(e))
+        else:
+            self.succeeded.emit(written)
+
+
+def start_export(parent, path, headers, make_rows, columns=None, total=None, sheet_title="Datos"):
+    """
+    Lanza la exportación en segundo plano mostrando una barra de progreso con botón de cancelar.
+
+    Args:
+        parent (QWidget): Ventana desde la que se exporta.
+        path (str): Ruta del fichero de salida (.csv o .xlsx).
+        headers (list): Cabeceras de las columnas.
+        make_rows (callable): Devuelve el iterador de filas (por ejemplo, lambda: iter_students(texto)).
+        columns (list, optional): Índice o clave de cada columna exportada dentro de la fila.
+        total (int, optional): Número de filas esperado; si no se conoce, la barra queda indeterminada.
+        sheet_title (str): Nombre de la hoja si se exporta a Excel.
+
+    Returns:
+        ExportWorker: El hilo lanzado.
+    """
+    dialog = QProgressDialog("Exportando...", "Cancelar", 0, total or 0, parent)
+    dialog.setWindowTitle("Exportar")
+    dialog.setWindowModality(Qt.WindowModal)
+    dialog.setMinimumDuration(0)
+    dialog.setAutoClose(False)
+    dialog.setAutoReset(False)
+
+    worker = ExportWorker(path, headers, make_rows, columns, sheet_title, parent)
+
+    def on_progress(written):
+        if total:
+            dialog.setValue(min(written, total))
+        dialog.setLabelText(f"Exportando... {written} filas")
+
+    def on_succeeded(written):
+        dialog.close()
+        QMessageBox.information(parent, "Éxito", f"Se han exportado {written} filas a:\n{path}")
+
+    def on_failed(message):
+        dialog.close()
+        QMessageBox.critical(parent, "Error al exportar", f"No se pudo exportar el archivo:\n{message}")
+
+    worker.progress.connect(on_progress)
+    worker.succeeded.connect(on_succeeded)
+    worker.failed.connect(on_failed)
+    worker.cancelled.connect(dialog.close)
+    worker.finished.connect(worker.deleteLater)
+    dialog.canceled.connect(worker.cancel)
+
+    parent._export_worker = worker  # Mantiene viva la referencia mientras dura la exportación
+    worker.start()
+    dialog.show()
+    return worker
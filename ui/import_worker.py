@@ -0,0 +1,105 @@
+from PySide2.QtCore import Qt, QThread, Signal
+from PySide2.QtWidgets import QProgressDialog, QMessageBox, QFileDialog
+from db.importer import write_error_report
+
+
+class ImportWorker(QThread):
+    """Hilo que ejecuta una importación masiva (db.importer) sin bloquear la interfaz"""
+
+    progress = Signal(int)  # Filas leídas hasta el momento
+    succeeded = Signal(object)  # Resultado de la importación
+    failed = Signal(str)  # Mensaje de error
+
+    def __init__(self, import_function, path, dry_run, parent=None):
+        """
+        Args:
+            import_function (callable): import_students o import_payments.
+            path (str): Fichero a importar.
+            dry_run (bool): Solo comprobar, sin guardar nada.
+        """
+        super().__init__(parent)
+        self.import_function = import_function
+        self.path = path
+        self.dry_run = dry_run
+
+    def run(self):
+        try:
+            result = self.import_function(self.path, dry_run=self.dry_run, progress=self.progress.emit)
+        except Exception as e:
+            self.failed.emit(str(e))
+        else:
+            self.succeeded.emit(result)
+
+
+def ask_import(parent, title, import_function, on_imported=None):
+    """
+    Pide el fichero a importar y si solo se quiere comprobar, y lanza la importación
+    en segundo plano. Al terminar muestra un resumen y ofrece guardar el informe de errores.
+
+    Args:
+        parent (QWidget): Ventana desde la que se importa.
+        title (str): Título de los diálogos (por ejemplo, "Importar alumnos").
+        import_function (callable): import_students o import_payments.
+        on_imported (callable, optional): Se llama tras una importación real. Las ventanas abiertas
+            no lo necesitan: reciben el aviso de cambio de la base de datos (ui/event_bus.py).
+    """
+    path, _ = QFileDialog.getOpenFileName(parent, title, "", "Ficheros CSV o Excel (*.csv *.xlsx)")
+    if not path:
+        return  # Cancelado por el usuario
+
+    question = QMessageBox(parent)
+    question.setWindowTitle(title)
+    question.setText("¿Quieres importar el fichero o solo comprobar si tiene errores?")
+    import_button = question.addButton("Importar", QMessageBox.AcceptRole)
+    check_button = question.addButton("Solo comprobar", QMessageBox.ActionRole)
+    question.addButton("Cancelar", QMessageBox.RejectRole)
+    question.exec_()
+    if question.clickedButton() not in (import_button, check_button):
+        return
+    dry_run = question.clickedButton() is check_button
+
+    dialog = QProgressDialog("Leyendo el fichero...", None, 0, 0, parent)  # Sin botón de cancelar
+    dialog.setWindowTitle(title)
+    dialog.setWindowModality(Qt.WindowModal)
+    dialog.setMinimumDuration(0)
+    dialog.setAutoClose(False)
+    dialog.setAutoReset(False)
+
+    worker = ImportWorker(import_function, path, dry_run, parent)
+
+    def on_succeeded(result):
+        dialog.close()
+        if result["dry_run"]:
+            summary = f"Comprobación terminada: se importarían {result['imported']} de {result['read']} filas."
+        else:
+            summary = f"Se han importado {result['imported']} de {result['read']} filas."
+            if on_imported is not None:
+                on_imported()
+
+        errors = result["errors"]
+        if not errors:
+            QMessageBox.information(parent, title, summary)
+            return
+
+        save = QMessageBox.question(parent, title,
+                                    f"{summary}\n{len(errors)} filas tienen errores y no se importan.\n"
+                                    "¿Quieres guardar el informe de errores?",
+                                    QMessageBox.Yes | QMessageBox.No)
+        if save == QMessageBox.Yes:
+            report, _ = QFileDialog.getSaveFileName(parent, "Guardar informe de errores", "errores_importacion.csv",
+                                                    "CSV Files (*.csv)")
+            if report:
+                write_error_report(report, errors)
+
+    def on_failed(message):
+        dialog.close()
+        QMessageBox.critical(parent, title, f"No se pudo importar el fichero:\n{message}")
+
+    worker.progress.connect(lambda read: dialog.setLabelText(f"Leyendo el fichero... {read} filas"))
+    worker.succeeded.connect(on_succeeded)
+    worker.failed.connect(on_failed)
+    worker.finished.connect(worker.deleteLater)
+
+    parent._import_worker = worker  # Mantiene viva la referencia mientras dura la importación
+    worker.start()
+    dialog.show()
@@ -1,6 +1,6 @@
 from PySide2.QtGui import QIcon
 from PySide2.QtWidgets import QWidget, QLineEdit, QVBoxLayout, QLabel, QPushButton, QMessageBox, QHBoxLayout
-from db.database import connect_db
+from ui.auth_worker import AuthWorker
 
 class LoginWindow(QWidget):
     def __init__(self):
@@ -9,6 +9,7 @@ class LoginWindow(QWidget):
         self.setWindowTitle('Login')
         self.setWindowIcon(QIcon("resources/el_escondite_ingles.bmp"))
         self.setGeometry(100, 100, 400, 300)
+        self.auth_worker = None  # Hilo que comprueba las credenciales
 
         # Creamos el layout vertical donde se ubicarán los elementos de la interfaz
         self.layout = QVBoxLayout()
@@ -52,33 +53,51 @@ class LoginWindow(QWidget):
         self.setLayout(self.layout)
 
     def authenticate(self):
-        """Este metodo se ejecuta cuando el usuario hace clic en el botón de login"""
+        """
+        Este metodo se ejecuta cuando el usuario hace clic en el botón de login.
+        Las credenciales se comprueban en un hilo aparte (el hash de la contraseña
+        es costoso a propósito) y la ventana sigue respondiendo mientras tanto.
+        """
+        if self.auth_worker is not None:
+            return  # Ya hay una comprobación en curso
+
         username = self.username.text()  # Obtenemos el texto del campo de nombre de usuario
         password = self.password.text()  # Obtenemos el texto del campo de contraseña
 
-        # Verificamos las credenciales llamando a la base de datos
-        if self.check_credentials(username, password):
+        self.set_busy(True)
+        self.auth_worker = AuthWorker(username, password, self)
+        self.auth_worker.succeeded.connect(self.on_authenticated)
+        self.auth_worker.failed.connect(self.on_authentication_error)
+        self.auth_worker.finished.connect(self.on_worker_finished)
+        self.auth_worker.start()
+
+    def set_busy(self, busy):
+        """Bloquea el formulario mientras se comprueban las credenciales"""
+        self.username.setEnabled(not busy)
+        self.password.setEnabled(not busy)
+        self.login_button.setEnabled(not busy)
+        self.login_button.setText('Comprobando...' if busy else 'Iniciar sesión')
+
+    def on_authenticated(self, user):
+        """Recibe (username, role) si las credenciales son correctas, o None"""
+        if user:
             # Si las credenciales son correctas, mostramos la ventana principal
             from ui.main_window import MainWindow  # Importamos MainWindow solo cuando sea necesario para evitar importaciones circulares
-            username, role = self.check_credentials(username, password)
+            username, role = user
             self.main_window = MainWindow(username, role)  # Creamos la ventana principal
             self.main_window.show()  # Mostramos la ventana principal
             self.close()  # Cerramos la ventana de login
         else:
             # Si las credenciales son incorrectas, mostramos un mensaje de error
+            self.set_busy(False)
+            self.password.clear()
             QMessageBox.warning(self, 'Error', 'Usuario o contraseña incorrectos')
 
-    def check_credentials(self, username, password):
-        """Verifica si el nombre de usuario y la contraseña existen en la base de datos"""
-        conn = connect_db()  # Conectamos a la base de datos
-        cursor = conn.cursor()
-
-        # Realizamos una consulta para verificar si existe un usuario con el nombre y la contraseña proporcionados
-        cursor.execute('SELECT username, role FROM users WHERE username = ? AND password = ?', (username, password))
-        user = cursor.fetchone()  # Si encontramos un usuario, obtenemos los datos del mismo
-
-        # Cerramos la conexión a la base de datos
-        conn.close()
+    def on_authentication_error(self, message):
+        """La comprobación no se pudo hacer (por ejemplo, la base de datos no está disponible)"""
+        self.set_busy(False)
+        QMessageBox.critical(self, 'Error', f'No se pudo iniciar sesión:\n{message}')
 
-        # Devuelve (username, role) si existe, sino None
-        return user
\ No newline at end of file
+    def on_worker_finished(self):
+        self.auth_worker.deleteLater()
+        self.auth_worker = None
@@ -1,16 +1,12 @@
 from PySide2.QtWidgets import (QMainWindow, QPushButton, QVBoxLayout, QWidget, QLabel, QMessageBox, QFileDialog,
                                QFrame, QGroupBox, QHBoxLayout)
 from PySide2.QtGui import QFont, QPixmap, QIcon
-from ui.manage_students_window import ManageStudentsWindow  # Importamos la nueva ventana para gestionar alumnos
 from ui.login_window import LoginWindow
-from ui.manage_levels_window import ManageLevelsWindow
-from ui.manage_classes_window import ManageClassesWindow
-from ui.manage_payments_window import ManagePaymentsWindow
-from ui.manage_rewards_window import ManageRewardsWindow
-from ui.manage_users_window import ManageUsersWindow
-import shutil
-import sys
-import subprocess
+from ui.backup_worker import start_backup_task
+from ui.window_registry import WindowRegistry
+
+# Las ventanas de gestión (y lo que importan: exportación, importación, copias...)
+# se importan la primera vez que se abren, no al arrancar la aplicación
 
 class MainWindow(QMainWindow):
     def __init__(self, username=None, role="user"):
@@ -20,6 +16,7 @@ class MainWindow(QMainWindow):
         self.setWindowTitle("Ventana Principal")  # Título de la ventana
         self.setWindowIcon(QIcon("resources/el_escondite_ingles.bmp"))
         self.setGeometry(100, 100, 800, 600)  # Tamaño y posición de la ventana
+        self.windows = WindowRegistry()  # Una sola instancia de cada ventana de gestión
         self.init_ui()  # Inicializamos la interfaz gráfica
 
     def init_ui(self):
@@ -80,6 +77,10 @@ class MainWindow(QMainWindow):
         self.rewards_button.clicked.connect(self.manage_rewards)
         gestion_layout.addWidget(self.rewards_button)
 
+        self.reports_button = QPushButton("Informes de Ingresos")
+        self.reports_button.clicked.connect(self.show_reports)
+        gestion_layout.addWidget(self.reports_button)
+
         gestion_group.setLayout(gestion_layout)
         self.layout.addWidget(gestion_group)
 
@@ -101,10 +102,18 @@ class MainWindow(QMainWindow):
         self.restore_button.clicked.connect(self.restore_database)
         tools_layout.addWidget(self.restore_button)
 
+        self.snapshots_button = QPushButton("Copias Automáticas (Historial)")
+        self.snapshots_button.clicked.connect(self.manage_snapshots)
+        tools_layout.addWidget(self.snapshots_button)
+
         self.users_button = QPushButton("Gestionar Usuarios de la Aplicación")
         self.users_button.clicked.connect(self.manage_users)
         tools_layout.addWidget(self.users_button)
 
+        self.query_stats_button = QPushButton("Estadísticas de Consultas")
+        self.query_stats_button.clicked.connect(self.show_query_stats)
+        tools_layout.addWidget(self.query_stats_button)
+
         tools_group.setLayout(tools_layout)
         self.layout.addWidget(tools_group)
 
@@ -126,51 +135,62 @@ class MainWindow(QMainWindow):
 
     def manage_students(self):
         """Abre la ventana para gestionar los alumnos"""
-        self.manage_students_window = ManageStudentsWindow()  # Abrimos la ventana para gestionar alumnos
-        self.manage_students_window.show() # Mostramos la ventana de gestión de alumnos
+        from ui.manage_students_window import ManageStudentsWindow
+        self.windows.show("students", ManageStudentsWindow)  # Si ya existe, se reutiliza y se trae al frente
 
     def manage_classes(self):
         """Abre la ventana para gestionar las clases"""
-        self.manage_classes_window = ManageClassesWindow() # Abrimos la ventana para gestionar clases
-        self.manage_classes_window.show() # Mostramos la ventana de gestión de clases
+        from ui.manage_classes_window import ManageClassesWindow
+        self.windows.show("classes", ManageClassesWindow)
 
     def manage_levels(self):
         """Abre la ventana para gestionar los niveles"""
-        self.manage_levels_window = ManageLevelsWindow()  # Creamos una instancia de la ventana de gestión de niveles
-        self.manage_levels_window.show()  # Mostramos la ventana de gestión de niveles
+        from ui.manage_levels_window import ManageLevelsWindow
+        self.windows.show("levels", ManageLevelsWindow)
 
     def manage_payments(self):
         """Abre la ventana para gestionar los pagos"""
-        self.manage_payments_window = ManagePaymentsWindow() # Creamos una instancia de la ventana de gestión de pagos
-        self.manage_payments_window.show() # Mostramos la ventana de gestión de pagos
+        from ui.manage_payments_window import ManagePaymentsWindow
+        self.windows.show("payments", ManagePaymentsWindow)
 
     def manage_rewards(self):
         """Abre la ventana de gestión de recompensas"""
-        self.manage_rewards_window = ManageRewardsWindow()
-        self.manage_rewards_window.show()
+        from ui.manage_rewards_window import ManageRewardsWindow
+        self.windows.show("rewards", ManageRewardsWindow)
+
+    def show_reports(self):
+        """Abre los informes de ingresos"""
+        from ui.reports_window import ReportsWindow
+        self.windows.show("reports", ReportsWindow)
 
     def backup_database(self):
-        """Muestra un aviso y permite guardar una copia de la base de datos forzando la extensión .db"""
+        """Muestra un aviso y permite guardar una copia de la base de datos (.db, o .db.gz comprimida)"""
         confirm = QMessageBox.question(self, "Confirmar Backup", "¿Deseas guardar una copia de seguridad de la base de datos?",
             QMessageBox.Yes | QMessageBox.No)
 
         if confirm == QMessageBox.Yes:
-            path, _ = QFileDialog.getSaveFileName(self, "Guardar Backup", "", "Archivos de Base de Datos (*.db)")
+            path, selected_filter = QFileDialog.getSaveFileName(
+                self, "Guardar Backup", "", "Archivos de Base de Datos (*.db);;Backup comprimido (*.db.gz)")
             if path:
-                # Forzar extensión .db si no está incluida
-                if not path.lower().endswith(".db"):
+                # Forzar la extensión según el tipo elegido
+                if selected_filter.startswith("Backup comprimido") and not path.lower().endswith(".db.gz"):
+                    path += ".db.gz"
+                elif not path.lower().endswith((".db", ".db.gz")):
                     path += ".db"
 
-                try:
-                    shutil.copyfile("db/el_escondite_ingles.db", path)
-                    QMessageBox.information(self, "Backup creado", f"Backup guardado correctamente en:\n{path}")
-                except Exception as e:
-                    QMessageBox.critical(self, "Error", f"No se pudo guardar el backup:\n{str(e)}")
+                from db.backup import backup_database as make_backup
+
+                # La copia se hace en segundo plano mientras la aplicación sigue usando la base de datos
+                start_backup_task(
+                    self, "Backup", "Copiando la base de datos...",
+                    lambda progress: make_backup(path, progress=progress),
+                    lambda: QMessageBox.information(self, "Backup creado",
+                                                    f"Backup guardado y verificado correctamente en:\n{path}"))
 
     def restore_database(self):
-        """Restaura la base de datos desde un archivo .db seleccionado por el usuario"""
+        """Restaura la base de datos desde un archivo .db (o .db.gz) seleccionado por el usuario"""
         path, _ = QFileDialog.getOpenFileName(self, "Selecciona el archivo de backup", "",
-                                              "Archivos de base de datos (*.db)")
+                                              "Archivos de base de datos (*.db *.db.gz)")
         if not path:
             return  # Cancelado
 
@@ -182,26 +202,38 @@ class MainWindow(QMainWindow):
         )
 
         if confirm == QMessageBox.Yes:
-            try:
-                shutil.copyfile(path, "db/el_escondite_ingles.db")
-                QMessageBox.information(self, "Restauración Completa",
-                                        "La base de datos fue restaurada correctamente.\nLa aplicación se reiniciará.")
+            from db.backup import restore_database as restore_backup
 
-                # Reiniciar aplicación
-                python = sys.executable
-                subprocess.Popen([python] + sys.argv)
-                sys.exit(0)
+            self.close_management_windows()  # Para que nadie siga trabajando con los datos anteriores
+            start_backup_task(
+                self, "Restauración", "Restaurando la base de datos...",
+                lambda progress: restore_backup(path, progress=progress),
+                lambda: QMessageBox.information(self, "Restauración Completa",
+                                                "La base de datos fue restaurada correctamente."))
 
-            except Exception as e:
-                QMessageBox.critical(self, "Error", f"No se pudo restaurar la base de datos:\n{str(e)}")
+    def manage_snapshots(self):
+        """Abre el historial de instantáneas automáticas para restaurar cualquiera de ellas"""
+        from ui.snapshots_window import SnapshotsWindow
+        self.windows.show("snapshots", lambda: SnapshotsWindow(before_restore=self.close_management_windows))
+
+    def close_management_windows(self):
+        """Cierra las ventanas de gestión abiertas (al volver a abrirlas se cargan los datos actuales)"""
+        self.windows.close_all(keep=("snapshots",))  # Desde el historial se lanza la restauración
 
     def manage_users(self):
         """Abre la ventana para gestionar los usuarios"""
-        self.manage_users_window = ManageUsersWindow()
-        self.manage_users_window.show()
+        from ui.manage_users_window import ManageUsersWindow
+        self.windows.show("users", ManageUsersWindow)
+
+    def show_query_stats(self):
+        """Abre la ventana con los tiempos medidos de las consultas (db/profiling.py)"""
+        from ui.query_stats_window import QueryStatsWindow
+        self.windows.show("query_stats", QueryStatsWindow)
 
     def logout(self):
         """Se desloguea de la app"""
+        self.windows.close_all()  # Ninguna ventana de gestión queda abierta para el siguiente usuario
+        self.windows.detach()
         self.close()  # Cerramos la ventana principal
         self.open_login_window()  # Llamamos a la función que abre la ventana de login
 
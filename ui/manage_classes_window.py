@@ -1,9 +1,14 @@
+import sqlite3
 from PySide2.QtGui import QIcon
-from PySide2.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem, QPushButton,
-                               QLineEdit, QMessageBox, QHeaderView, QAbstractScrollArea, QAbstractItemView, QLabel)
-from db.database import insert_class, fetch_classes, update_class, delete_class
+from PySide2.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QTableView, QPushButton, QLineEdit, QMessageBox, QLabel
+from db.database import insert_class, fetch_classes, fetch_class, update_class_by_id, delete_class_by_id
+from ui.table_model import SqlTableModel, configure_table_view, selected_row_data, loading_label
+from ui.db_executor import db_executor
+from db.dates import iso_date
 
 class ManageClassesWindow(QWidget):
+    WATCHED_TABLES = ("classes",)  # Ver ui/window_registry.py
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Gestionar Clases")  # Establece el título de la ventana
@@ -35,19 +40,15 @@ class ManageClassesWindow(QWidget):
         # ------------------------------------------------------
 
         # ---------- TABLA DE CLASES ----------
-        self.table = QTableWidget()
-        self.table.setColumnCount(3)
-        self.table.setHorizontalHeaderLabels(["Nombre", "Fecha", "Profesor"])
-
-        self.table.setSizeAdjustPolicy(QAbstractScrollArea.AdjustToContents)
-        self.table.setHorizontalScrollMode(QAbstractItemView.ScrollPerPixel)
-        self.table.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
-
-        header = self.table.horizontalHeader()
-        header.setSectionResizeMode(QHeaderView.Stretch)
-        header.setStretchLastSection(True)
+        # Fila de la base de datos: (id, nombre, fecha, profesor)
+        self.model = SqlTableModel(["Nombre", "Fecha", "Profesor"], fetch_classes,
+                                   columns=["name", "date", "professor"], executor=db_executor())
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        configure_table_view(self.table)
 
         self.layout.addWidget(self.table)
+        self.layout.addWidget(loading_label(self.model))  # Visible mientras se leen filas en segundo plano
         # -------------------------------------
 
         # ---------- FORMULARIO DE ENTRADA ----------
@@ -92,13 +93,15 @@ class ManageClassesWindow(QWidget):
 
     def load_classes(self):
         """Carga las clases desde la base de datos y actualiza la tabla."""
-        self.table.setRowCount(0)  # Limpia la tabla
-        classes = fetch_classes()  # Obtiene la lista de clases
-        for row, c in enumerate(classes):
-            self.table.insertRow(row)  # Añade una nueva fila
-            self.table.setItem(row, 0, QTableWidgetItem(c[1]))  # Nombre
-            self.table.setItem(row, 1, QTableWidgetItem(c[2]))  # Fecha
-            self.table.setItem(row, 2, QTableWidgetItem(c[3]))  # Profesor
+        self.model.refresh()  # El modelo pide las clases a la base de datos por bloques
+
+    def reload_data(self):
+        """Actualiza solo las filas que han cambiado, conservando la selección"""
+        self.model.reload()
+
+    def apply_change(self, event):
+        """Corrige solo la fila que ha cambiado (ver ui/window_registry.py)"""
+        self.model.apply_change(event, fetch_class)
 
     def add_class(self):
         """Añade una nueva clase a la base de datos con los datos introducidos."""
@@ -111,20 +114,23 @@ class ManageClassesWindow(QWidget):
             QMessageBox.warning(self, "Error", "Todos los campos son obligatorios.")  # Mostramos error
             return  # Cancelamos si falta algún campo
 
-        # Validación: evitar clases duplicadas por nombre (ignorando mayúsculas/minúsculas)
-        existing_names = [self.table.item(row, 0).text().lower() for row in range(self.table.rowCount())]
-        if name.lower() in existing_names:
-            QMessageBox.warning(self, "Error", f"La clase '{name}' ya existe.")  # Error si el nombre ya está en uso
+        # Validación: la fecha debe existir y estar en formato YYYY-MM-DD
+        try:
+            date = iso_date(date)
+        except ValueError:
+            QMessageBox.warning(self, "Error", "La fecha debe estar en formato YYYY-MM-DD.")
             return
 
-        insert_class(name, date, professor)  # Insertamos la clase en la base de datos
-        self.clear_fields()  # Limpiamos los campos de entrada
-        self.load_classes()  # Recargamos la tabla para mostrar la nueva clase
+        # Los nombres son únicos (ignorando mayúsculas/minúsculas): si ya existe, no se inserta nada
+        if insert_class(name, date, professor) is None:
+            QMessageBox.warning(self, "Error", f"La clase '{name}' ya existe.")  # Error si el nombre ya está en uso
+            return
+        self.clear_fields()  # Limpiamos los campos de entrada (la tabla se actualiza con el aviso de cambio)
 
     def edit_class(self):
         """Edita una clase seleccionada con los nuevos datos introducidos."""
-        row = self.table.currentRow()  # Obtenemos la fila seleccionada en la tabla
-        if row == -1:
+        selected = selected_row_data(self.table)  # Obtenemos la fila seleccionada en la tabla
+        if selected is None:
             QMessageBox.warning(self, "Error","Selecciona una clase para editar.")  # Mostramos error si no hay selección
             return
 
@@ -137,25 +143,28 @@ class ManageClassesWindow(QWidget):
             QMessageBox.warning(self, "Error", "Todos los campos son obligatorios.")  # Mostramos error
             return
 
-        old_name = self.table.item(row, 0).text()  # Nombre anterior de la clase (de la tabla)
+        # Validación: la fecha debe existir y estar en formato YYYY-MM-DD
+        try:
+            new_date = iso_date(new_date)
+        except ValueError:
+            QMessageBox.warning(self, "Error", "La fecha debe estar en formato YYYY-MM-DD.")
+            return
 
-        # Validación: si cambió el nombre, asegurarnos de que no esté duplicado
-        if new_name.lower() != old_name.lower():
-            existing_names = [self.table.item(r, 0).text().lower() for r in range(self.table.rowCount())]
-            if new_name.lower() in existing_names:
-                QMessageBox.warning(self, "Error", f"La clase '{new_name}' ya existe.")  # Mostramos error si ya existe
-                return
+        class_id = selected.id  # id de la clase (de la tabla)
 
-        update_class(old_name, new_name, new_date, new_professor)  # Actualizamos los datos en la base de datos
+        try:
+            update_class_by_id(class_id, new_name, new_date, new_professor)  # Actualizamos la base de datos
+        except sqlite3.IntegrityError:
+            QMessageBox.warning(self, "Error", f"La clase '{new_name}' ya existe.")  # Mostramos error si ya existe
+            return
         self.clear_fields()  # Limpiamos los campos
-        self.load_classes()  # Recargamos la tabla con los cambios
 
     def delete_class(self):
         """Elimina la clase seleccionada de la base de datos con confirmación y manejo de errores."""
-        selected = self.table.currentRow()  # Fila seleccionada
+        selected = selected_row_data(self.table)  # Fila seleccionada
 
-        if selected != -1:
-            name = self.table.item(selected, 0).text()  # Nombre de la clase a eliminar
+        if selected is not None:
+            class_id, name = selected.id, selected.name  # Clase a eliminar
 
             # Confirmación del usuario
             confirm = QMessageBox.question(
@@ -167,8 +176,7 @@ class ManageClassesWindow(QWidget):
 
             if confirm == QMessageBox.Yes:
                 try:
-                    delete_class(name)  # Intentamos eliminar de la base de datos
-                    self.load_classes()  # Recargamos la tabla
+                    delete_class_by_id(class_id)  # Intentamos eliminar de la base de datos
                     QMessageBox.information(self, "Clase eliminada",
                                             f"La clase '{name}' ha sido eliminada correctamente.")
                 except Exception as e:
@@ -1,10 +1,13 @@
+import sqlite3
 from PySide2.QtGui import QIcon
-from PySide2.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem, QPushButton,
-                               QLineEdit,
-                               QMessageBox, QHeaderView, QAbstractScrollArea, QAbstractItemView, QLabel)
-from db.database import fetch_levels, insert_level, delete_level, update_level
+from PySide2.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QTableView, QPushButton, QLineEdit, QMessageBox, QLabel
+from db.database import fetch_levels, fetch_level, insert_level, delete_level_by_id, update_level_by_id
+from ui.table_model import SqlTableModel, configure_table_view, selected_row_data, loading_label
+from ui.db_executor import db_executor
 
 class ManageLevelsWindow(QWidget):
+    WATCHED_TABLES = ("levels",)  # Ver ui/window_registry.py
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Gestionar Niveles")  # Título de la ventana
@@ -36,18 +39,14 @@ class ManageLevelsWindow(QWidget):
         # -----------------------------------------------------
 
         # ---------- TABLA DE NIVELES ----------
-        self.table = QTableWidget()
-        self.table.setColumnCount(1)  # Solo una columna: nombre del nivel
-        self.table.setHorizontalHeaderLabels(["Nivel"])
-        self.table.setSizeAdjustPolicy(QAbstractScrollArea.AdjustToContents)
-        self.table.setHorizontalScrollMode(QAbstractItemView.ScrollPerPixel)
-        self.table.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
-
-        header = self.table.horizontalHeader()
-        header.setSectionResizeMode(QHeaderView.Stretch)
-        header.setStretchLastSection(True)
+        self.model = SqlTableModel(["Nivel"], fetch_levels, columns=["name"],  # Solo una columna: nombre del nivel
+                                   executor=db_executor())
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        configure_table_view(self.table)
 
         self.layout.addWidget(self.table)
+        self.layout.addWidget(loading_label(self.model))  # Visible mientras se leen filas en segundo plano
         # --------------------------------------
 
         # ---------- FORMULARIO + BOTONES ----------
@@ -77,11 +76,15 @@ class ManageLevelsWindow(QWidget):
 
     def load_levels(self):
         """Carga los niveles desde la base de datos y los muestra en la tabla"""
-        self.table.setRowCount(0)  # Limpiamos la tabla antes de llenarla
-        levels = fetch_levels()  # Obtenemos los niveles desde la base de datos
-        for row, level in enumerate(levels):
-            self.table.insertRow(row)  # Insertamos una nueva fila
-            self.table.setItem(row, 0, QTableWidgetItem(level[1]))  # Mostramos el nombre del nivel
+        self.model.refresh()  # El modelo pide los niveles a la base de datos por bloques
+
+    def reload_data(self):
+        """Actualiza solo las filas que han cambiado, conservando la selección"""
+        self.model.reload()
+
+    def apply_change(self, event):
+        """Corrige solo la fila que ha cambiado (ver ui/window_registry.py)"""
+        self.model.apply_change(event, fetch_level)
 
     def add_level(self):
         """Añade un nuevo nivel a la base de datos"""
@@ -92,22 +95,18 @@ class ManageLevelsWindow(QWidget):
             QMessageBox.warning(self, "Error", "El campo de nivel no puede estar vacío.")  # Mostramos error
             return  # Salimos del metodo si no hay texto
 
-        # Validación: evitar duplicados (comparando con todos los valores actuales de la tabla)
-        existing_levels = [self.table.item(row, 0).text().lower() for row in range(self.table.rowCount())]
-        if level_name.lower() in existing_levels:
+        # Validación: evitar duplicados (la base de datos no inserta un nombre repetido)
+        if insert_level(level_name) is None:
             QMessageBox.warning(self, "Error", f"El nivel '{level_name}' ya existe.")  # Mostramos error si ya existe
             return  # Cancelamos la acción
-
-        insert_level(level_name)  # Insertamos el nuevo nivel en la base de datos
-        self.level_input.clear()  # Limpiamos el campo de texto
-        self.load_levels()  # Recargamos la tabla para mostrar el nuevo nivel
+        self.level_input.clear()  # Limpiamos el campo de texto (la tabla se actualiza con el aviso de cambio)
 
     def delete_level(self):
         """Borra el nivel seleccionado de la tabla y base de datos con confirmación y control de errores"""
-        selected = self.table.currentRow()  # Obtenemos la fila seleccionada
+        selected = selected_row_data(self.table)  # Obtenemos la fila seleccionada
 
-        if selected != -1:
-            level_name = self.table.item(selected, 0).text()  # Nombre del nivel
+        if selected is not None:
+            level_id, level_name = selected.id, selected.name  # id y nombre del nivel
 
             # Confirmación del usuario
             confirm = QMessageBox.question(
@@ -119,8 +118,7 @@ class ManageLevelsWindow(QWidget):
 
             if confirm == QMessageBox.Yes:
                 try:
-                    delete_level(level_name)  # Intentamos eliminar
-                    self.load_levels()  # Recargamos la tabla
+                    delete_level_by_id(level_id)  # Intentamos eliminar
                     QMessageBox.information(self, "Nivel eliminado",
                                             f"El nivel '{level_name}' ha sido eliminado correctamente.")
                 except Exception as e:
@@ -130,11 +128,11 @@ class ManageLevelsWindow(QWidget):
 
     def edit_level(self):
         """Edita el nombre del nivel seleccionado con validación"""
-        selected = self.table.currentRow()  # Obtenemos la fila actualmente seleccionada de la tabla
+        selected = selected_row_data(self.table)  # Obtenemos la fila actualmente seleccionada de la tabla
         new_name = self.level_input.text().strip()  # Obtenemos el nuevo nombre que el usuario ingresó
 
         # Validación: debe haber una fila seleccionada
-        if selected == -1:
+        if selected is None:
             QMessageBox.warning(self, "Error", "Selecciona un nivel para editar.")  # Si no hay selección, avisamos
             return
 
@@ -143,15 +141,12 @@ class ManageLevelsWindow(QWidget):
             QMessageBox.warning(self, "Error", "El campo de nivel no puede estar vacío.")  # Mostramos error
             return
 
-        old_name = self.table.item(selected, 0).text()  # Obtenemos el nombre actual del nivel seleccionado
-
-        # Validación: si el nombre cambió, asegurarnos de que no haya duplicados
-        if new_name.lower() != old_name.lower():
-            existing_levels = [self.table.item(row, 0).text().lower() for row in range(self.table.rowCount())]
-            if new_name.lower() in existing_levels:
-                QMessageBox.warning(self, "Error", f"El nivel '{new_name}' ya existe.")  # Mostramos error si existe
-                return
+        level_id = selected.id  # Obtenemos el id del nivel seleccionado
 
-        update_level(old_name, new_name)  # Actualizamos el nivel en la base de datos
-        self.level_input.clear()          # Limpiamos el campo de texto
-        self.load_levels()                # Recargamos la tabla con el cambio actualizado
\ No newline at end of file
+        # Validación: el índice único rechaza un nombre que ya usa otro nivel
+        try:
+            update_level_by_id(level_id, new_name)  # Actualizamos el nivel en la base de datos
+        except sqlite3.IntegrityError:
+            QMessageBox.warning(self, "Error", f"El nivel '{new_name}' ya existe.")  # Mostramos error si existe
+            return
+        self.level_input.clear()          # Limpiamos el campo de texto
\ No newline at end of file
@@ -1,18 +1,32 @@
 from PySide2.QtGui import QIcon
-from PySide2.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem, QPushButton,
-                               QLineEdit,
-                               QMessageBox, QHeaderView, QAbstractScrollArea, QAbstractItemView, QComboBox, QFileDialog,
-                               QLabel)
-from db.database import fetch_payments, insert_payment, update_payment, delete_payment
+from PySide2.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QTableView, QPushButton, QLineEdit, QMessageBox,
+                               QComboBox, QFileDialog, QLabel)
+from PySide2.QtCore import QTimer
+from db.database import fetch_payments_after, iter_payments_filtered, count_payments, insert_payment, update_payment, delete_payment
+from db.database import PAYMENT_SORT_COLUMNS
+from db.database import fetch_payment  # Para corregir solo la fila de un pago modificado
+from db.events import UPDATE
 from db.database import fetch_students  # Necesario para obtener ID de alumnos
-from db.database import is_student_under_bonus # Necesario para saber si un estudiante tiene un bono activo
-import csv
-import openpyxl
+from db.database import is_student_under_bonus, students_under_bonus # Necesario para saber si un estudiante tiene un bono activo
+from ui.table_model import (SqlTableModel, configure_table_view, enable_sorting, selected_row_data, loading_label,
+                            SEARCH_DELAY_MS)
+from ui.db_executor import db_executor
+from ui.export_worker import start_export
+from ui.import_worker import ask_import
+from db.importer import import_payments
+from db.dates import iso_date
+
+# Campos de db.rows.Payment que se muestran (y se exportan), en orden
+PAYMENT_COLUMNS = ["id", "student", "amount", "date", "method", "notes"]
 
 
 class ManagePaymentsWindow(QWidget):
+    # Pagos, más alumnos y recompensas para el combo (nombres y marca de bono)
+    WATCHED_TABLES = ("payments", "students", "rewards")
+
     def __init__(self):
         super().__init__()
+        self.active_filters = {}  # Filtros con los que se cargó la tabla
         self.setWindowTitle("Gestionar Pagos")  # Título de la ventana
         self.setWindowIcon(QIcon("resources/el_escondite_ingles.bmp"))
         self.setGeometry(100, 100, 1400, 800)     # Tamaño y posición
@@ -44,14 +58,20 @@ class ManagePaymentsWindow(QWidget):
         # ---------- FILTROS DE BÚSQUEDA ----------
         search_layout = QHBoxLayout()
 
+        # Temporizador para no consultar la base de datos en cada pulsación
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DELAY_MS)
+        self.search_timer.timeout.connect(self.apply_filters)
+
         self.search_student_input = QLineEdit()
         self.search_student_input.setPlaceholderText("Buscar por alumno")
-        self.search_student_input.textChanged.connect(self.load_payments)
+        self.search_student_input.textChanged.connect(self.search_timer.start)
         search_layout.addWidget(self.search_student_input)
 
         self.search_notes_input = QLineEdit()
         self.search_notes_input.setPlaceholderText("Buscar por notas")
-        self.search_notes_input.textChanged.connect(self.load_payments)
+        self.search_notes_input.textChanged.connect(self.search_timer.start)
         search_layout.addWidget(self.search_notes_input)
 
         clear_filters_button = QPushButton("Limpiar Filtros")
@@ -62,21 +82,23 @@ class ManagePaymentsWindow(QWidget):
         # ------------------------------------------
 
         # ---------- TABLA DE PAGOS ----------
-        self.table = QTableWidget()
-        self.table.setColumnCount(6)
-        self.table.setHorizontalHeaderLabels(["ID", "Alumno", "Cantidad", "Fecha", "Método", "Notas"])
-
-        self.table.setSizeAdjustPolicy(QAbstractScrollArea.AdjustToContents)
-        self.table.setHorizontalScrollMode(QAbstractItemView.ScrollPerPixel)
-        self.table.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
-
-        header = self.table.horizontalHeader()
-        header.setSectionResizeMode(QHeaderView.Stretch)
-        header.setStretchLastSection(True)
+        # El modelo pide a la base de datos solo los bloques de pagos que se van viendo, a partir del último
+        # cargado (keyset); pulsando la cabecera se ordena en SQL (de inicio, los más recientes primero)
+        self.model = SqlTableModel(["ID", "Alumno", "Cantidad", "Fecha", "Método", "Notas"], self.fetch_payments_block,
+                                   columns=PAYMENT_COLUMNS, key_column="id", executor=db_executor(),
+                                   order=("date", True), sort_columns=PAYMENT_SORT_COLUMNS)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        configure_table_view(self.table)
+        enable_sorting(self.table)
 
         self.layout.addWidget(self.table)
+        self.layout.addWidget(loading_label(self.model))  # Visible mientras se leen filas en segundo plano
         # -----------------------------------
 
+        self.count_label = QLabel()  # Número de pagos que cumplen los filtros
+        self.layout.addWidget(self.count_label)
+
         # ---------- FORMULARIO DE ENTRADA ----------
         form_layout = QHBoxLayout()
 
@@ -132,6 +154,10 @@ class ManagePaymentsWindow(QWidget):
         self.export_excel_button.clicked.connect(self.export_to_excel)
         export_layout.addWidget(self.export_excel_button)
 
+        self.import_button = QPushButton("Importar Pagos")
+        self.import_button.clicked.connect(self.import_from_file)
+        export_layout.addWidget(self.import_button)
+
         self.layout.addLayout(export_layout)
         # ---------------------------------
 
@@ -142,38 +168,69 @@ class ManagePaymentsWindow(QWidget):
         """Limpia los campos de búsqueda y recarga la tabla sin filtros"""
         self.search_student_input.clear()
         self.search_notes_input.clear()
+        self.apply_filters()
+
+    def apply_filters(self):
+        """Recarga la tabla con los filtros actuales"""
+        self.search_timer.stop()
         self.load_payments()
 
     def load_students(self):
-        """Carga los alumnos en el combobox"""
+        """Carga los alumnos en el combobox, marcando los que están en periodo de bono"""
         self.student_combo.clear()
         self.student_combo.addItem("Selecciona alumno", None)
+        under_bonus = students_under_bonus()  # Una sola consulta para todos los alumnos
         for student in fetch_students():
-            label = f"{student['name']} (ID: {student['id']})"
-            self.student_combo.addItem(label, student["id"])
+            label = f"{student.name} (ID: {student.id})"
+            if student.id in under_bonus:
+                label += " - en bono"
+            self.student_combo.addItem(label, student.id)
+
+    def current_filters(self):
+        """Devuelve los filtros de búsqueda escritos por el usuario"""
+        return {
+            "student_filter": self.search_student_input.text().strip(),
+            "notes_filter": self.search_notes_input.text().strip(),
+        }
+
+    def fetch_payments_block(self, after, limit, order_by, descending):
+        """Devuelve el bloque de pagos filtrados que sigue a la fila after, para el modelo de la tabla"""
+        return fetch_payments_after(after, limit, **self.active_filters, order_by=order_by, descending=descending)
 
     def load_payments(self):
-        """Carga los pagos desde la base de datos y los muestra en la tabla, aplicando filtros si es necesario"""
-        student_filter = self.search_student_input.text().lower()
-        notes_filter = self.search_notes_input.text().lower()
-
-        self.table.setRowCount(0)
-        payments = fetch_payments()  # [(id, alumno, cantidad, fecha, metodo, notas), ...]
-
-        for payment in payments:
-            student_name = payment[1].lower()
-            notes = (payment[5] or "").lower()  # Por si es None
-
-            # Aplicar filtros
-            if student_filter and student_filter not in student_name:
-                continue
-            if notes_filter and notes_filter not in notes:
-                continue
-
-            row = self.table.rowCount()
-            self.table.insertRow(row)
-            for col, value in enumerate(payment):
-                self.table.setItem(row, col, QTableWidgetItem(str(value)))
+        """Recarga los pagos, filtrados y ordenados por la base de datos"""
+        # Fijamos los filtros para que los bloques siguientes usen la misma consulta
+        self.active_filters = self.current_filters()
+        self.update_count()
+        self.model.refresh()
+
+    def update_count(self):
+        """Muestra cuántos pagos cumplen los filtros con los que se cargó la tabla (se cuentan en segundo plano)"""
+        db_executor().submit(count_payments, **self.active_filters, key=(self, "count"),
+                             on_result=lambda total: self.count_label.setText(f"{total} pagos encontrados"))
+
+    def reload_students(self):
+        """Vuelve a cargar el combo de alumnos sin perder el alumno seleccionado"""
+        student_id = self.student_combo.currentData()
+        self.load_students()
+        self.student_combo.setCurrentIndex(max(self.student_combo.findData(student_id), 0))
+
+    def reload_data(self):
+        """Actualiza el combo de alumnos, el total y las filas que han cambiado, con los mismos filtros"""
+        self.reload_students()
+        self.update_count()
+        self.model.reload()
+
+    def apply_change(self, event):
+        """Aplica un cambio de la base de datos mientras la ventana está abierta (ver ui/window_registry.py)"""
+        if event.table == "payments":
+            self.model.apply_change(event, fetch_payment)  # Solo la fila del pago
+            if event.operation != UPDATE:
+                self.update_count()
+        elif event.table == "rewards":
+            self.reload_students()  # Puede cambiar qué alumnos están en bono
+        else:
+            self.reload_data()  # Nombres de alumnos en el combo y en la tabla
 
     def add_payment(self):
         """Añade un nuevo pago"""
@@ -198,23 +255,29 @@ class ManagePaymentsWindow(QWidget):
             QMessageBox.warning(self, "Error", "La cantidad debe ser un número positivo.")
             return
 
+        # Validación: la fecha debe existir y estar en formato YYYY-MM-DD
+        try:
+            date = iso_date(date)
+        except ValueError:
+            QMessageBox.warning(self, "Error", "La fecha debe estar en formato YYYY-MM-DD.")
+            return
+
         # Validación: Revisar si el alumno tiene un bono gratuito activo
         if is_student_under_bonus(student_id):
             QMessageBox.warning(self, "Error", "Este alumno está actualmente en periodo de bono gratuito.")
             return
 
-        insert_payment(student_id, float(amount), date, method, notes)
-        self.load_payments()
+        insert_payment(student_id, float(amount), date, method, notes)  # La tabla se actualiza con el aviso de cambio
         self.clear_fields()
 
     def edit_payment(self):
         """Edita el pago seleccionado"""
-        row = self.table.currentRow()  # Obtenemos la fila seleccionada en la tabla
-        if row == -1:
+        selected = selected_row_data(self.table)  # Obtenemos la fila seleccionada en la tabla
+        if selected is None:
             QMessageBox.warning(self, "Error", "Selecciona un pago para editar.")  # Si no hay selección, mostramos error
             return
 
-        payment_id = int(self.table.item(row, 0).text())  # Obtenemos el ID del pago seleccionado
+        payment_id = selected.id  # Obtenemos el ID del pago seleccionado
         amount = self.amount_input.text().strip()  # Obtenemos la nueva cantidad
         date = self.date_input.text().strip()  # Obtenemos la nueva fecha
         method = self.method_input.text().strip()  # Nuevo metodo (opcional)
@@ -230,19 +293,25 @@ class ManagePaymentsWindow(QWidget):
             QMessageBox.warning(self, "Error", "La cantidad debe ser un número positivo.")  # Mostramos error
             return
 
-        update_payment(payment_id, float(amount), date, method, notes)  # Actualizamos el pago en la base de datos
-        self.load_payments()  # Recargamos la tabla
+        # Validación: la fecha debe existir y estar en formato YYYY-MM-DD
+        try:
+            date = iso_date(date)
+        except ValueError:
+            QMessageBox.warning(self, "Error", "La fecha debe estar en formato YYYY-MM-DD.")
+            return
+
+        update_payment(payment_id, float(amount), date, method, notes)  # Actualizamos el pago (y su fila en la tabla)
         self.clear_fields()  # Limpiamos los campos de entrada
 
     def delete_payment(self):
         """Elimina el pago seleccionado con confirmación y manejo de errores"""
-        row = self.table.currentRow()
+        selected = selected_row_data(self.table)
 
-        if row == -1:
+        if selected is None:
             QMessageBox.warning(self, "Error", "Selecciona un pago para eliminar.")
             return
 
-        payment_id = int(self.table.item(row, 0).text())
+        payment_id = selected.id
 
         # Confirmación del usuario
         confirm = QMessageBox.question(
@@ -255,7 +324,6 @@ class ManagePaymentsWindow(QWidget):
         if confirm == QMessageBox.Yes:
             try:
                 delete_payment(payment_id)
-                self.load_payments()
                 self.clear_fields()
                 QMessageBox.information(self, "Pago eliminado",
                                         f"El pago con ID {payment_id} ha sido eliminado correctamente.")
@@ -271,7 +339,7 @@ class ManagePaymentsWindow(QWidget):
         self.notes_input.clear()
 
     def export_to_csv(self):
-        """Exporta los pagos a un archivo CSV"""
+        """Exporta a un archivo CSV todos los pagos que cumplen los filtros"""
         # Abrir diálogo para elegir dónde guardar el archivo
         path, _ = QFileDialog.getSaveFileName(self, "Guardar como CSV", "pagos.csv", "CSV Files (*.csv)")
         if not path:
@@ -281,19 +349,10 @@ class ManagePaymentsWindow(QWidget):
         if not path.endswith(".csv"):
             path += ".csv"
 
-        with open(path, mode='w', newline='', encoding='utf-8') as file:
-            writer = csv.writer(file)
-            writer.writerow(["ID", "Alumno", "Cantidad", "Fecha", "Método", "Notas"])
-
-            for row in range(self.table.rowCount()):
-                row_data = [self.table.item(row, col).text() if self.table.item(row, col) else "" for col in
-                            range(self.table.columnCount())]
-                writer.writerow(row_data)
-
-        QMessageBox.information(self, "Éxito", f"Archivo CSV exportado correctamente:\n{path}")
+        self.start_payments_export(path)
 
     def export_to_excel(self):
-         """Exporta los pagos a un archivo Excel (.xlsx) usando openpyxl"""
+         """Exporta a un archivo Excel (.xlsx) todos los pagos que cumplen los filtros"""
          # Abrir diálogo para elegir dónde guardar el archivo
          path, _ = QFileDialog.getSaveFileName(self, "Guardar como Excel", "pagos.xlsx", "Archivos Excel (*.xlsx)")
          if not path:
@@ -303,20 +362,17 @@ class ManagePaymentsWindow(QWidget):
          if not path.endswith(".xlsx"):
              path += ".xlsx"
 
-         workbook = openpyxl.Workbook()
-         sheet = workbook.active
-         sheet.title = "Pagos"
-
-         # Escribir cabeceras
-         headers = ["ID", "Alumno", "Cantidad", "Fecha", "Método", "Notas"]
-         for col, header in enumerate(headers, start=1):
-             sheet.cell(row=1, column=col, value=header)
+         self.start_payments_export(path)
 
-        # Escribir datos de la tabla
-         for row in range(self.table.rowCount()):
-             for col in range(self.table.columnCount()):
-                 item = self.table.item(row, col)
-                 sheet.cell(row=row + 2, column=col + 1, value=item.text() if item else "") # +2 porque empieza en fila 2
+    def start_payments_export(self, path):
+        """Vuelca en segundo plano los pagos de la consulta actual, no solo la página visible, en el orden de la tabla"""
+        filters = dict(self.active_filters)
+        order_by, descending = self.model.order
+        start_export(self, path, ["ID", "Alumno", "Cantidad", "Fecha", "Método", "Notas"],
+                     lambda: iter_payments_filtered(**filters, order_by=order_by, descending=descending),
+                     columns=PAYMENT_COLUMNS,
+                     total=count_payments(**filters), sheet_title="Pagos")
 
-         workbook.save(path)
-         QMessageBox.information(self, "Éxito", f"Archivo Excel exportado correctamente:\n{path}")
\ No newline at end of file
+    def import_from_file(self):
+        """Importa pagos desde un CSV o Excel con columnas Alumno, Cantidad, Fecha y, opcionalmente, Método y Notas"""
+        ask_import(self, "Importar pagos", import_payments)
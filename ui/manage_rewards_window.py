@@ -1,20 +1,26 @@
 from PySide2.QtGui import QIcon
-from PySide2.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem, QPushButton,
-                               QMessageBox,
-                               QLabel, QHeaderView, QComboBox, QLineEdit, QFileDialog, QAbstractScrollArea)
-from PySide2.QtCore import Qt
-from datetime import datetime
-from db.database import fetch_rewards, fetch_students, insert_reward, reward_already_granted
+from PySide2.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QTableView, QPushButton, QMessageBox, QLabel,
+                               QComboBox, QLineEdit, QFileDialog)
+from PySide2.QtCore import QTimer
+from db.database import fetch_rewards_after, iter_rewards, fetch_students, insert_reward, reward_already_granted
+from db.database import REWARD_SORT_COLUMNS
 from db.database import get_students_with_expiring_bonus # Para saber próximas finalizaciones de bonos
-import csv
-import openpyxl
+from db.database import fetch_reward, delete_reward_by_id
+from ui.table_model import (SqlTableModel, configure_table_view, enable_sorting, selected_row_data, loading_label,
+                            SEARCH_DELAY_MS)
+from ui.db_executor import db_executor
+from ui.export_worker import start_export
+from db.dates import iso_date
 
 class ManageRewardsWindow(QWidget):
+    WATCHED_TABLES = ("rewards", "students")  # La tabla y los dos combos de alumnos
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Recompensas por Recomendación")  # Título de la ventana
         self.setWindowIcon(QIcon("resources/el_escondite_ingles.bmp"))
         self.setGeometry(100, 100, 1200, 800)  # Tamaño de la ventana
+        self.active_filters = {}  # Filtros con los que se cargó la tabla
         self.init_ui()  # Cargar interfaz
 
     def init_ui(self):
@@ -43,19 +49,25 @@ class ManageRewardsWindow(QWidget):
         # ---------- FILTROS DE BÚSQUEDA ----------
         filter_layout = QHBoxLayout()
 
+        # Temporizador para no consultar la base de datos en cada pulsación
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DELAY_MS)
+        self.search_timer.timeout.connect(self.load_rewards)
+
         self.search_recommender = QLineEdit()
         self.search_recommender.setPlaceholderText("Buscar por recomendador")
-        self.search_recommender.textChanged.connect(self.load_rewards)
+        self.search_recommender.textChanged.connect(self.search_timer.start)
         filter_layout.addWidget(self.search_recommender)
 
         self.search_new_student = QLineEdit()
         self.search_new_student.setPlaceholderText("Buscar por nuevo alumno")
-        self.search_new_student.textChanged.connect(self.load_rewards)
+        self.search_new_student.textChanged.connect(self.search_timer.start)
         filter_layout.addWidget(self.search_new_student)
 
         self.search_reward_name = QLineEdit()
         self.search_reward_name.setPlaceholderText("Buscar por nombre de recompensa")
-        self.search_reward_name.textChanged.connect(self.load_rewards)
+        self.search_reward_name.textChanged.connect(self.search_timer.start)
         filter_layout.addWidget(self.search_reward_name)
 
         clear_filter_button = QPushButton("Limpiar Filtros")
@@ -66,21 +78,21 @@ class ManageRewardsWindow(QWidget):
         # ------------------------------------------
 
         # ---------- TABLA DE RECOMPENSAS ----------
-        self.table = QTableWidget()
-        self.table.setColumnCount(5)
-        self.table.setHorizontalHeaderLabels([
+        # Cada fila es un db.rows.Reward; se cargan por bloques (keyset), de la más reciente a la más antigua,
+        # y se ordenan en SQL al pulsar la cabecera
+        self.model = SqlTableModel([
             "Recomendador", "Alumno nuevo", "Nombre de la recompensa",
             "Meses de recompensa", "Fecha de inicio bono"
-        ])
-        self.table.setSizeAdjustPolicy(QAbstractScrollArea.AdjustToContents)
-        self.table.setHorizontalScrollMode(QTableWidget.ScrollPerPixel)
-        self.table.setVerticalScrollMode(QTableWidget.ScrollPerPixel)
+        ], fetch_rewards_after, columns=["recommender", "new_student", "reward_name", "months_rewarded", "date_awarded"],
+           key_column="id", executor=db_executor(), order=("date_awarded", True), sort_columns=REWARD_SORT_COLUMNS)
 
-        header = self.table.horizontalHeader()
-        header.setSectionResizeMode(QHeaderView.Stretch)
-        header.setStretchLastSection(True)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        configure_table_view(self.table)
+        enable_sorting(self.table)
 
         self.layout.addWidget(self.table)
+        self.layout.addWidget(loading_label(self.model))  # Visible mientras se leen filas en segundo plano
         # ------------------------------------------
 
         # ---------- FORMULARIO DE INSERCIÓN ----------
@@ -154,34 +166,37 @@ class ManageRewardsWindow(QWidget):
         self.recommender_combo.clear()
         self.new_student_combo.clear()
         for student in students:
-            label = f"{student['name']} (ID: {student['id']})"
-            self.recommender_combo.addItem(label, student["id"])
-            self.new_student_combo.addItem(label, student["id"])
+            label = f"{student.name} (ID: {student.id})"
+            self.recommender_combo.addItem(label, student.id)
+            self.new_student_combo.addItem(label, student.id)
 
     def load_rewards(self):
-        """Carga las recompensas desde la base de datos y las muestra en la tabla"""
-        self.table.setRowCount(0)  # Limpiar tabla
-        rewards = fetch_rewards()  # Obtener recompensas
-
-        # Aplicar filtros
-        filter_recommender = self.search_recommender.text().lower()
-        filter_new_student = self.search_new_student.text().lower()
-        filter_reward_name = self.search_reward_name.text().lower()
-
-        for row_data in rewards:
-            recomendador, nuevo_alumno, nombre_recompensa = row_data[1], row_data[2], row_data[5]
-            if (filter_recommender and filter_recommender not in recomendador.lower()) or \
-               (filter_new_student and filter_new_student not in nuevo_alumno.lower()) or \
-               (filter_reward_name and filter_reward_name not in nombre_recompensa.lower()):
-                continue
-
-            row = self.table.rowCount()
-            self.table.insertRow(row)
-            self.table.setItem(row, 0, QTableWidgetItem(recomendador))
-            self.table.setItem(row, 1, QTableWidgetItem(nuevo_alumno))
-            self.table.setItem(row, 2, QTableWidgetItem(nombre_recompensa))
-            self.table.setItem(row, 3, QTableWidgetItem(str(row_data[3])))
-            self.table.setItem(row, 4, QTableWidgetItem(row_data[4]))
+        """Recarga las recompensas que cumplen los filtros de búsqueda y las muestra en la tabla"""
+        self.search_timer.stop()
+        filters = {
+            "recommender": self.search_recommender.text().strip(),
+            "new_student": self.search_new_student.text().strip(),
+            "reward_name": self.search_reward_name.text().strip(),
+        }
+        self.active_filters = filters  # Los usan las exportaciones
+        self.model.refresh(lambda after, limit, order_by, descending:
+                           fetch_rewards_after(after, limit, **filters, order_by=order_by, descending=descending))
+
+    def reload_data(self):
+        """Actualiza los combos de alumnos y las filas que han cambiado, con los mismos filtros"""
+        recommender_id = self.recommender_combo.currentData()
+        new_student_id = self.new_student_combo.currentData()
+        self.load_students()
+        self.recommender_combo.setCurrentIndex(max(self.recommender_combo.findData(recommender_id), 0))
+        self.new_student_combo.setCurrentIndex(max(self.new_student_combo.findData(new_student_id), 0))
+        self.model.reload()
+
+    def apply_change(self, event):
+        """Aplica un cambio de la base de datos mientras la ventana está abierta (ver ui/window_registry.py)"""
+        if event.table == "rewards":
+            self.model.apply_change(event, fetch_reward)
+        else:
+            self.reload_data()  # Un alumno renombrado o borrado cambia los combos y las filas en que aparece
 
     def add_reward(self):
         """Añade una nueva recompensa con validaciones"""
@@ -216,7 +231,7 @@ class ManageRewardsWindow(QWidget):
 
         # Validar formato de fecha
         try:
-            datetime.strptime(date_awarded, "%Y-%m-%d")
+            date_awarded = iso_date(date_awarded)
         except ValueError:
             QMessageBox.warning(self, "Error", "La fecha debe estar en formato YYYY-MM-DD.")
             return
@@ -225,34 +240,29 @@ class ManageRewardsWindow(QWidget):
 
         QMessageBox.information(self, "Éxito", "Recompensa añadida correctamente.")
 
-        # Recargar tabla y limpiar campos
-        self.load_rewards()
+        # La tabla se actualiza con el aviso de cambio: solo hay que limpiar los campos
         self.months_input.clear()
         self.date_input.clear()
 
     def delete_reward(self):
         """Elimina la recompensa seleccionada"""
-        selected = self.table.currentRow()
-        if selected == -1:
+        selected = selected_row_data(self.table)
+        if selected is None:
             QMessageBox.warning(self, "Error", "Selecciona una recompensa para eliminar.")
             return
 
-        recommender = self.table.item(selected, 0).text()
-        new_student = self.table.item(selected, 1).text()
 
         confirm = QMessageBox.question(
             self,
             "Confirmar Borrado",
-            f"¿Estás seguro de borrar la recompensa de '{recommender}' a '{new_student}'?",
+            f"¿Estás seguro de borrar la recompensa de '{selected.recommender}' a '{selected.new_student}'?",
             QMessageBox.Yes | QMessageBox.No
         )
 
         if confirm == QMessageBox.Yes:
             try:
-                from db.database import delete_reward  # Asegúrate de que existe esta función
-                delete_reward(recommender, new_student)
+                delete_reward_by_id(selected.id)
                 QMessageBox.information(self, "Éxito", "Recompensa eliminada correctamente.")
-                self.load_rewards()
             except Exception as e:
                 QMessageBox.critical(self, "Error", f"No se pudo eliminar la recompensa:\n{e}")
 
@@ -264,8 +274,13 @@ class ManageRewardsWindow(QWidget):
         self.load_rewards()
 
     def show_expiring_alerts(self):
-        """Muestra una alerta con los alumnos cuyo bono está por terminar"""
-        expiring = get_students_with_expiring_bonus()
+        """Busca en segundo plano los alumnos cuyo bono está por terminar y los muestra en una alerta"""
+        db_executor().submit(get_students_with_expiring_bonus, key=(self, "expiring"),
+                             on_result=self.show_expiring_result,
+                             on_error=lambda e: QMessageBox.critical(self, "Error", f"No se pudieron consultar los bonos:\n{e}"))
+
+    def show_expiring_result(self, expiring):
+        """Muestra la alerta con los bonos que terminan pronto (resultado de show_expiring_alerts)"""
         if not expiring:
             QMessageBox.information(self, "Sin alertas", "No hay bonos que finalicen en los próximos 7 días.")
             return
@@ -277,7 +292,7 @@ class ManageRewardsWindow(QWidget):
         QMessageBox.information(self, "Bonos por finalizar", message)
 
     def export_to_csv(self):
-        """Exporta las reconpensas a un archivo CSV"""
+        """Exporta a un archivo CSV las recompensas que cumplen los filtros"""
         # Abrir diálogo para elegir dónde guardar el archivo
         path, _ = QFileDialog.getSaveFileName(self, "Guardar como CSV", "recompensas.csv", "CSV Files (*.csv)")
         if not path:
@@ -287,19 +302,10 @@ class ManageRewardsWindow(QWidget):
         if not path.endswith(".csv"):
             path += ".csv"
 
-        with open(path, mode='w', newline='', encoding='utf-8') as file:
-            writer = csv.writer(file)
-            writer.writerow(["Recomendador", "Alumno nuevo", "Nombre de la recompensa", "Meses de recompensa", "Fecha de inicio bono"])
-
-            for row in range(self.table.rowCount()):
-                row_data = [self.table.item(row, col).text() if self.table.item(row, col) else "" for col in
-                            range(self.table.columnCount())]
-                writer.writerow(row_data)
-
-        QMessageBox.information(self, "Éxito", f"Archivo CSV exportado correctamente:\n{path}")
+        self.start_rewards_export(path)
 
     def export_to_excel(self):
-         """Exporta las recompensas a un archivo Excel (.xlsx) usando openpyxl"""
+         """Exporta a un archivo Excel (.xlsx) las recompensas que cumplen los filtros"""
          # Abrir diálogo para elegir dónde guardar el archivo
          path, _ = QFileDialog.getSaveFileName(self, "Guardar como Excel", "recompensas.xlsx", "Archivos Excel (*.xlsx)")
          if not path:
@@ -309,20 +315,12 @@ class ManageRewardsWindow(QWidget):
          if not path.endswith(".xlsx"):
              path += ".xlsx"
 
-         workbook = openpyxl.Workbook()
-         sheet = workbook.active
-         sheet.title = "Recompensas"
-
-         # Escribir cabeceras
-         headers = ["Recomendador", "Alumno nuevo", "Nombre de la recompensa", "Meses de recompensa", "Fecha de inicio bono"]
-         for col, header in enumerate(headers, start=1):
-             sheet.cell(row=1, column=col, value=header)
-
-        # Escribir datos de la tabla
-         for row in range(self.table.rowCount()):
-             for col in range(self.table.columnCount()):
-                 item = self.table.item(row, col)
-                 sheet.cell(row=row + 2, column=col + 1, value=item.text() if item else "") # +2 porque empieza en fila 2
+         self.start_rewards_export(path)
 
-         workbook.save(path)
-         QMessageBox.information(self, "Éxito", f"Archivo Excel exportado correctamente:\n{path}")
\ No newline at end of file
+    def start_rewards_export(self, path):
+        """Vuelca en segundo plano las recompensas de los filtros con los que se cargó la tabla"""
+        filters = dict(self.active_filters)
+        order_by, descending = self.model.order
+        start_export(self, path, self.model.headers,
+                     lambda: iter_rewards(**filters, order_by=order_by, descending=descending),
+                     columns=self.model.columns, sheet_title="Recompensas")
@@ -1,17 +1,28 @@
+import sqlite3
 from PySide2.QtGui import QIcon
-from PySide2.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem, QPushButton,
-                               QLineEdit, QMessageBox, QHeaderView, QAbstractScrollArea, QComboBox, QFileDialog, QLabel)
-from db.database import insert_student, fetch_students, delete_student, update_student
+from PySide2.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QTableView, QPushButton, QLineEdit, QMessageBox,
+                               QComboBox, QFileDialog, QLabel)
+from PySide2.QtCore import QTimer
+from db.database import (insert_student, fetch_students_after, iter_students, delete_student_by_id,
+                         update_student_by_id, STUDENT_SORT_COLUMNS)
 from db.database import fetch_levels # Necesario para el como de niveles de alumnos
-import csv
-import openpyxl
+from db.database import fetch_student
+from ui.table_model import (SqlTableModel, configure_table_view, enable_sorting, selected_row_data, loading_label,
+                            SEARCH_DELAY_MS)
+from ui.db_executor import db_executor
+from ui.export_worker import start_export
+from ui.import_worker import ask_import
+from db.importer import import_students
 
 class ManageStudentsWindow(QWidget):
+    WATCHED_TABLES = ("students", "levels")  # La tabla y el combo de niveles
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Gestionar Alumnos")  # Establece el título de la ventana
         self.setWindowIcon(QIcon("resources/el_escondite_ingles.bmp"))
         self.setGeometry(100, 100, 900, 900)      # Tamaño y posición de la ventana
+        self.search_text = ""                     # Búsqueda con la que se cargó la tabla
         self.init_ui()                            # Carga los componentes gráficos
 
     def init_ui(self):
@@ -38,9 +49,16 @@ class ManageStudentsWindow(QWidget):
 
         # Campo de búsqueda y botón limpiar
         search_layout = QHBoxLayout()
+
+        # Temporizador para no consultar la base de datos en cada pulsación
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DELAY_MS)
+        self.search_timer.timeout.connect(self.filter_students)
+
         self.search_input = QLineEdit()
         self.search_input.setPlaceholderText("Buscar alumno por nombre...")
-        self.search_input.textChanged.connect(self.filter_students)
+        self.search_input.textChanged.connect(self.search_timer.start)
         search_layout.addWidget(self.search_input)
 
         self.clear_search_button = QPushButton("Limpiar filtro")
@@ -49,17 +67,17 @@ class ManageStudentsWindow(QWidget):
 
         self.layout.addLayout(search_layout)
 
-        # Tabla
-        self.table = QTableWidget()
-        self.table.setColumnCount(3)
-        self.table.setHorizontalHeaderLabels(["Nombre", "Edad", "Nivel"])
-        self.table.setSizeAdjustPolicy(QAbstractScrollArea.AdjustToContents)
-        self.table.setHorizontalScrollMode(QTableWidget.ScrollPerPixel)
-        self.table.setVerticalScrollMode(QTableWidget.ScrollPerPixel)
-        header = self.table.horizontalHeader()
-        header.setSectionResizeMode(QHeaderView.Stretch)
-        header.setStretchLastSection(True)
+        # Tabla: el modelo carga por bloques (keyset) los alumnos que devuelve la búsqueda, ordenados en SQL
+        # por la columna cuya cabecera se pulse (de inicio, por nombre)
+        self.model = SqlTableModel(["Nombre", "Edad", "Nivel"], fetch_students_after, columns=["name", "age", "level"],
+                                   key_column="id", executor=db_executor(), order=("name", False),
+                                   sort_columns=STUDENT_SORT_COLUMNS)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        configure_table_view(self.table)
+        enable_sorting(self.table)
         self.layout.addWidget(self.table)
+        self.layout.addWidget(loading_label(self.model))  # Visible mientras se leen filas en segundo plano
 
         # Formulario de entrada
         form_layout = QHBoxLayout()
@@ -102,6 +120,10 @@ class ManageStudentsWindow(QWidget):
         self.export_excel_button.clicked.connect(self.export_to_excel)
         export_layout.addWidget(self.export_excel_button)
 
+        self.import_button = QPushButton("Importar Alumnos")
+        self.import_button.clicked.connect(self.import_from_file)
+        export_layout.addWidget(self.import_button)
+
         self.layout.addLayout(export_layout)
         self.setLayout(self.layout)
 
@@ -117,27 +139,35 @@ class ManageStudentsWindow(QWidget):
         self.level_combo.clear()
         levels = fetch_levels()
         for level in levels:
-            self.level_combo.addItem(level[1])
+            self.level_combo.addItem(level.name)
 
-    def load_students(self, filter_text=""):
+    def load_students(self):
         """
-        Carga los alumnos desde la base de datos y los muestra en la tabla.
-        Si se pasa un filtro, solo muestra los alumnos cuyo nombre lo contenga.
+        Recarga los alumnos desde la base de datos y los muestra en la tabla.
+        Si hay texto en el buscador, solo muestra los alumnos cuyo nombre coincida.
         """
-        self.table.setRowCount(0)  # Limpiamos la tabla antes de llenarla
-        students = fetch_students()         # Obtenemos todos los alumnos
+        search_text = self.search_input.text().strip()
+        self.search_text = search_text  # La usan las exportaciones
+        self.model.refresh(lambda after, limit, order_by, descending:
+                           fetch_students_after(after, limit, search_text, order_by, descending))
 
-        # Si hay texto en el filtro, aplicamos búsqueda por nombre
-        if filter_text:
-            filter_text = filter_text.lower()
-            students = [s for s in students if filter_text in s["name"].lower()]
+    def reload_levels(self):
+        """Vuelve a cargar el combo de niveles sin perder el nivel seleccionado"""
+        level = self.level_combo.currentText()
+        self.load_levels_into_combo()
+        self.level_combo.setCurrentText(level)
 
-        # Llenamos la tabla con los datos (filtrados o completos)
-        for row, student in enumerate(students):
-            self.table.insertRow(row)
-            self.table.setItem(row, 0, QTableWidgetItem(student["name"]))
-            self.table.setItem(row, 1, QTableWidgetItem(str(student["age"])))
-            self.table.setItem(row, 2, QTableWidgetItem(student["level"]))
+    def reload_data(self):
+        """Actualiza el combo de niveles y las filas que han cambiado, con la misma búsqueda"""
+        self.reload_levels()
+        self.model.reload()
+
+    def apply_change(self, event):
+        """Aplica un cambio de la base de datos mientras la ventana está abierta (ver ui/window_registry.py)"""
+        if event.table == "students":
+            self.model.apply_change(event, fetch_student)
+        else:
+            self.reload_levels()
 
     def add_student(self):
         """Añade un nuevo alumno usando los campos de texto"""
@@ -155,31 +185,28 @@ class ManageStudentsWindow(QWidget):
             QMessageBox.warning(self, "Error", "La edad debe estar entre 12 y 120.")
             return
 
-        # Validación: no permitir duplicados por nombre
-        existing_names = [self.table.item(row, 0).text().lower() for row in range(self.table.rowCount())]
-        if name.lower() in existing_names:
+        # Si pasa todas las validaciones, insertamos y limpiamos campos (la tabla se actualiza con el
+        # aviso de cambio). Los duplicados por nombre no se insertan.
+        if insert_student(name, int(age), level) is None:
             QMessageBox.warning(self, "Error", f"El alumno '{name}' ya existe.")
             return
-
-        # Si pasa todas las validaciones, insertamos y limpiamos campos
-        insert_student(name, int(age), level)
-        self.load_students()
         self.name_input.clear()
         self.age_input.clear()
         self.level_combo.setCurrentIndex(0)
 
     def edit_student(self):
         """Edita un alumno seleccionado usando los nuevos datos de los campos"""
-        selected = self.table.currentRow()
-        if selected != -1:
+        selected = selected_row_data(self.table)
+        if selected is not None:
             name = self.name_input.text().strip()
             age = self.age_input.text().strip()
             level = self.level_combo.currentText()
-            old_name = self.table.item(selected, 0).text()  # Nombre original
-
             if name and age.isdigit() and level:
-                update_student(old_name, name, int(age), level)
-                self.load_students()
+                try:
+                    update_student_by_id(selected.id, name, int(age), level)
+                except sqlite3.IntegrityError:
+                    QMessageBox.warning(self, "Error", f"El alumno '{name}' ya existe.")
+                    return
                 self.name_input.clear()
                 self.age_input.clear()
                 self.level_combo.setCurrentIndex(0)
@@ -190,45 +217,40 @@ class ManageStudentsWindow(QWidget):
 
     def delete_student(self):
         """Elimina el alumno seleccionado de la tabla y la base de datos con validaciones"""
-        selected = self.table.currentRow()
+        selected = selected_row_data(self.table)
 
-        if selected == -1:
+        if selected is None:
             QMessageBox.warning(self, "Error", "Selecciona un alumno para borrar.")
             return
 
-        name = self.table.item(selected, 0).text()
+        name = selected.name
 
         # Confirmación antes de borrar
         confirm = QMessageBox.question(
             self,
             "Confirmar borrado",
-            f"¿Estás seguro de que deseas eliminar al alumno '{name}'?",
+            f"¿Estás seguro de que deseas eliminar al alumno '{name}'?\n"
+            "También se borrarán sus pagos y recompensas.",
             QMessageBox.Yes | QMessageBox.No
         )
 
         if confirm == QMessageBox.Yes:
             try:
-                delete_student(name)
-                self.load_students()
+                delete_student_by_id(selected.id)
                 QMessageBox.information(self, "Alumno eliminado", f"'{name}' ha sido eliminado correctamente.")
             except Exception as e:
                 QMessageBox.critical(self, "Error al borrar", f"No se pudo borrar al alumno:\n{str(e)}")
 
     def filter_students(self):
         """
-        Se llama automáticamente cada vez que el usuario escribe en el campo de búsqueda.
-        Actualiza la tabla para mostrar solo los alumnos que coincidan con el texto.
+        Se llama automáticamente cuando el usuario deja de escribir en el campo de búsqueda.
+        Busca en el índice de texto completo: por inicio de palabra y sin tener en cuenta acentos.
         """
-        search_text = self.search_input.text()  # Obtenemos el texto de búsqueda
-        self.load_students(search_text)  # Recargamos la tabla con el filtro aplicado
-
-    def filter_students(self):
-        """Filtra la tabla de alumnos por nombre"""
-        search_text = self.search_input.text()
-        self.load_students(search_text)
+        self.search_timer.stop()
+        self.load_students()  # Recargamos la tabla con el filtro aplicado
 
     def export_to_csv(self):
-          """Exporta los alumnos a un archivo CSV"""
+          """Exporta a un archivo CSV los alumnos que cumplen el filtro de búsqueda"""
           # Abrir diálogo para elegir dónde guardar el archivo
           path, _ = QFileDialog.getSaveFileName(self, "Guardar como CSV", "alumnos.csv", "CSV Files (*.csv)")
           if not path:
@@ -238,16 +260,10 @@ class ManageStudentsWindow(QWidget):
           if not path.endswith(".csv"):
               path += ".csv"
 
-          with open(path, mode='w', newline='', encoding='utf-8') as file:
-            writer = csv.writer(file)
-            writer.writerow([self.table.horizontalHeaderItem(i).text() for i in range(self.table.columnCount())])
-            for row in range(self.table.rowCount()):
-                 writer.writerow([self.table.item(row, col).text() for col in range(self.table.columnCount())])
-
-          QMessageBox.information(self, "Exportación exitosa", f"Datos exportados a:{path}")
+          self.start_students_export(path)
 
     def export_to_excel(self):
-         """Exporta los alumnos a un archivo Excel (.xlsx) usando openpyxl"""
+         """Exporta a un archivo Excel (.xlsx) los alumnos que cumplen el filtro de búsqueda"""
          # Abrir diálogo para elegir dónde guardar el archivo
          path, _ = QFileDialog.getSaveFileName(self, "Guardar como Excel", "alumnos.xlsx", "Archivos Excel (*.xlsx)")
          if not path:
@@ -257,21 +273,16 @@ class ManageStudentsWindow(QWidget):
          if not path.endswith(".xlsx"):
              path += ".xlsx"
 
-         workbook = openpyxl.Workbook()
-         sheet = workbook.active
-         sheet.title = "Alumnos"
-
-         # Escribir cabeceras
-         headers = ["Nombre", "Edad", "Nivel"]
-         for col, header in enumerate(headers, start=1):  # Empieza en columna 1
-             sheet.cell(row=1, column=col, value=header)
+         self.start_students_export(path)
 
-        # Escribir datos de la tabla
-         for row in range(self.table.rowCount()):
-             for col in range(self.table.columnCount()):
-                item = self.table.item(row, col)
-                if item:
-                    sheet.cell(row=row + 2, column=col + 1, value=item.text())  # +2 porque empieza en fila 2
+    def start_students_export(self, path):
+        """Vuelca en segundo plano los alumnos de la búsqueda con la que se cargó la tabla, en el orden de la tabla"""
+        search_text = self.search_text
+        order_by, descending = self.model.order
+        start_export(self, path, self.model.headers,
+                     lambda: iter_students(search_text, order_by=order_by, descending=descending),
+                     columns=self.model.columns, sheet_title="Alumnos")
 
-         workbook.save(path)
-         QMessageBox.information(self, "Éxito", f"Archivo Excel exportado correctamente:\n{path}")
+    def import_from_file(self):
+        """Importa alumnos desde un CSV o Excel con columnas Nombre, Edad y Nivel"""
+        ask_import(self, "Importar alumnos", import_students)
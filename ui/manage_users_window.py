@@ -1,9 +1,14 @@
+import sqlite3
 from PySide2.QtGui import QIcon
-from PySide2.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem, QPushButton,
-                               QLineEdit, QMessageBox, QComboBox, QHeaderView, QAbstractScrollArea, QLabel)
-from db.database import fetch_users, insert_user, delete_user, update_user
+from PySide2.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QTableView, QPushButton, QLineEdit, QMessageBox,
+                               QComboBox, QLabel)
+from db.database import fetch_users, fetch_user, insert_user, delete_user_by_id, update_user
+from ui.table_model import SqlTableModel, configure_table_view, selected_row_data, loading_label
+from ui.db_executor import db_executor
 
 class ManageUsersWindow(QWidget):
+    WATCHED_TABLES = ("users",)  # Ver ui/window_registry.py
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Gestionar Usuarios")
@@ -35,14 +40,14 @@ class ManageUsersWindow(QWidget):
         # ------------------------------------------------
 
         # ---------- TABLA DE USUARIOS ----------
-        self.table = QTableWidget()
-        self.table.setColumnCount(3)
-        self.table.setHorizontalHeaderLabels(["Usuario", "Rol", "Contraseña"])
-        self.table.setSizeAdjustPolicy(QAbstractScrollArea.AdjustToContents)
-        self.table.setHorizontalScrollMode(QTableWidget.ScrollPerPixel)
-        self.table.setVerticalScrollMode(QTableWidget.ScrollPerPixel)
-        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        # Fila de la base de datos: (id, usuario, hash de la contraseña, rol); el hash no se muestra
+        self.model = SqlTableModel(["Usuario", "Rol"], fetch_users, columns=["username", "role"],
+                                   executor=db_executor())
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        configure_table_view(self.table)
         self.layout.addWidget(self.table)
+        self.layout.addWidget(loading_label(self.model))  # Visible mientras se leen filas en segundo plano
         # ----------------------------------------
 
         # ---------- FORMULARIO DE ENTRADA ----------
@@ -87,13 +92,15 @@ class ManageUsersWindow(QWidget):
 
     def load_users(self):
         """Carga todos los usuarios desde la base de datos en la tabla"""
-        self.table.setRowCount(0)
-        users = fetch_users()
-        for row, user in enumerate(users):
-            self.table.insertRow(row)
-            self.table.setItem(row, 0, QTableWidgetItem(user[1]))
-            self.table.setItem(row, 1, QTableWidgetItem(user[3]))
-            self.table.setItem(row, 2, QTableWidgetItem(user[2]))  # Mostrar contraseña en plano solo si es necesario
+        self.model.refresh()
+
+    def reload_data(self):
+        """Actualiza solo las filas que han cambiado, conservando la selección"""
+        self.model.reload()
+
+    def apply_change(self, event):
+        """Corrige solo la fila que ha cambiado (ver ui/window_registry.py)"""
+        self.model.apply_change(event, fetch_user)
 
     def add_user(self):
         """Añade un nuevo usuario"""
@@ -105,44 +112,50 @@ class ManageUsersWindow(QWidget):
             QMessageBox.warning(self, "Error", "Usuario y contraseña son obligatorios.")
             return
 
-        insert_user(username, password, role)
-        self.load_users()
-        self.username_input.clear()
+        try:
+            insert_user(username, password, role)
+        except sqlite3.IntegrityError:
+            QMessageBox.warning(self, "Error", f"El usuario '{username}' ya existe.")
+            return
+        self.username_input.clear()  # La tabla se actualiza con el aviso de cambio
         self.password_input.clear()
         self.role_combo.setCurrentIndex(0)
 
     def edit_user(self):
         """Edita un usuario seleccionado"""
-        selected = self.table.currentRow()
-        if selected == -1:
+        selected = selected_row_data(self.table)
+        if selected is None:
             QMessageBox.warning(self, "Error", "Selecciona un usuario para editar.")
             return
 
-        old_username = self.table.item(selected, 0).text()
+        user_id = selected.id
         username = self.username_input.text().strip()
         password = self.password_input.text().strip()
         role = self.role_combo.currentText()
 
-        if not username or not password:
-            QMessageBox.warning(self, "Error", "Usuario y contraseña son obligatorios.")
+        # La contraseña es opcional al editar: si se deja vacía se conserva la actual
+        if not username:
+            QMessageBox.warning(self, "Error", "El nombre de usuario es obligatorio.")
             return
 
-        update_user(old_username, username, password, role)
-        self.load_users()
+        try:
+            update_user(user_id, username, role, password or None)
+        except sqlite3.IntegrityError:
+            QMessageBox.warning(self, "Error", f"El usuario '{username}' ya existe.")
+            return
         self.username_input.clear()
         self.password_input.clear()
         self.role_combo.setCurrentIndex(0)
 
     def delete_user(self):
         """Elimina el usuario seleccionado"""
-        selected = self.table.currentRow()
-        if selected == -1:
+        selected = selected_row_data(self.table)
+        if selected is None:
             QMessageBox.warning(self, "Error", "Selecciona un usuario para eliminar.")
             return
 
-        username = self.table.item(selected, 0).text()
+        username = selected.username
         confirm = QMessageBox.question(self, "Confirmar", f"¿Estás seguro de eliminar al usuario '{username}'?",
                                        QMessageBox.Yes | QMessageBox.No)
         if confirm == QMessageBox.Yes:
-            delete_user(username)
-            self.load_users()
\ No newline at end of file
+            delete_user_by_id(selected.id)
\ No newline at end of file
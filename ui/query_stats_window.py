@@ -0,0 +1,129 @@
+import os
+from PySide2.QtGui import QIcon
+from PySide2.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem, QPushButton,
+                               QLabel, QAbstractItemView, QHeaderView, QTabWidget, QPlainTextEdit)
+from db.profiling import get_profiler, HISTOGRAM_BOUNDS_MS
+
+# Cabeceras de los tramos del histograma: ≤1 ms, ≤5 ms... y >500 ms
+HISTOGRAM_HEADERS = [f"≤{bound} ms" for bound in HISTOGRAM_BOUNDS_MS] + [f">{HISTOGRAM_BOUNDS_MS[-1]} ms"]
+
+# Últimos caracteres del registro de consultas lentas que se muestran
+SLOW_LOG_TAIL = 200000
+
+
+class QueryStatsWindow(QWidget):
+    """Muestra lo que ha medido db.profiling: funciones, sentencias SQL y consultas lentas"""
+
+    def __init__(self):
+        super().__init__()
+        self.setWindowTitle("Estadísticas de consultas")
+        self.setWindowIcon(QIcon("resources/el_escondite_ingles.bmp"))
+        self.setGeometry(100, 100, 1200, 700)
+        self.init_ui()
+
+    def init_ui(self):
+        """Configura los elementos visuales de la ventana"""
+        self.layout = QVBoxLayout()
+
+        title = QLabel("Estadísticas de consultas a la base de datos")
+        title.setStyleSheet("font-size: 20px; font-weight: bold; color: #4B0082;")
+        self.layout.addWidget(title)
+
+        self.status_label = QLabel()
+        self.status_label.setWordWrap(True)
+        self.layout.addWidget(self.status_label)
+
+        # ---------- PESTAÑAS ----------
+        self.tabs = QTabWidget()
+        self.functions_table = self.create_table("Función")
+        self.statements_table = self.create_table("Sentencia SQL")
+        self.slow_log = QPlainTextEdit()
+        self.slow_log.setReadOnly(True)
+        self.tabs.addTab(self.functions_table, "Funciones")
+        self.tabs.addTab(self.statements_table, "Sentencias SQL")
+        self.tabs.addTab(self.slow_log, "Consultas lentas")
+        self.layout.addWidget(self.tabs)
+
+        # ---------- BOTONES ----------
+        button_layout = QHBoxLayout()
+
+        self.refresh_button = QPushButton("Actualizar")
+        self.refresh_button.clicked.connect(self.load_stats)
+        button_layout.addWidget(self.refresh_button)
+
+        self.reset_button = QPushButton("Poner a cero")
+        self.reset_button.clicked.connect(self.reset_stats)
+        button_layout.addWidget(self.reset_button)
+
+        self.layout.addLayout(button_layout)
+        self.setLayout(self.layout)
+
+        self.load_stats()
+
+    def create_table(self, name_header):
+        """Crea una tabla de estadísticas (nombre, contadores y un tramo del histograma por columna)"""
+        table = QTableWidget()
+        headers = [name_header, "Llamadas", "Total (ms)", "Media (ms)", "Máx. (ms)", "Filas"] + HISTOGRAM_HEADERS
+        table.setColumnCount(len(headers))
+        table.setHorizontalHeaderLabels(headers)
+        table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        table.verticalHeader().setVisible(False)
+        table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        return table
+
+    def fill_table(self, table, stats, show_rows=True):
+        """Vuelca en la tabla las estadísticas (ya ordenadas por tiempo total)"""
+        table.setRowCount(len(stats))
+        for row, item in enumerate(stats):
+            name = QTableWidgetItem(item["name"])
+            name.setToolTip(item["name"])
+            table.setItem(row, 0, name)
+            values = [item["calls"], f"{item['total_ms']:.1f}", f"{item['avg_ms']:.2f}", f"{item['max_ms']:.1f}",
+                      item["rows"] if show_rows else "—"] + item["histogram"]
+            for column, value in enumerate(values, start=1):
+                table.setItem(row, column, QTableWidgetItem(str(value)))
+
+    def load_stats(self):
+        """Lee las estadísticas del medidor activo y el final del registro de consultas lentas"""
+        profiler = get_profiler()
+        if profiler is None:
+            self.status_label.setText("La medición de consultas está desactivada. Para activarla, pon "
+                                      "'enabled = true' en la sección [profiling] de settings.ini y reinicia "
+                                      "la aplicación.")
+            self.fill_table(self.functions_table, [])
+            self.fill_table(self.statements_table, [])
+            self.slow_log.clear()
+            self.reset_button.setEnabled(False)
+            return
+
+        snapshot = profiler.snapshot()
+        self.status_label.setText(
+            f"Medición activa. Las sentencias de más de {profiler.slow_query_ms:g} ms se guardan con su plan de "
+            f"ejecución en {profiler.slow_query_log} ({snapshot['slow_queries']} desde que se puso a cero).")
+        self.fill_table(self.functions_table, snapshot["functions"])
+        # sqlite3 no informa de las filas de cada sentencia: solo se cuentan por función
+        self.fill_table(self.statements_table, snapshot["statements"], show_rows=False)
+        self.slow_log.setPlainText(self.read_slow_log(profiler.slow_query_log))
+        self.reset_button.setEnabled(True)
+
+    @staticmethod
+    def read_slow_log(path):
+        """Devuelve el final del registro de consultas lentas (vacío si aún no existe)"""
+        if not os.path.exists(path):
+            return ""
+        with open(path, encoding="utf-8", errors="replace") as log:  # Se puede empezar a mitad de carácter
+            log.seek(max(os.path.getsize(path) - SLOW_LOG_TAIL, 0))
+            return log.read()
+
+    def reset_stats(self):
+        """Pone los contadores a cero para medir a partir de ahora"""
+        profiler = get_profiler()
+        if profiler is not None:
+            profiler.reset()
+        self.load_stats()
+
+    def reload_data(self):
+        """Al volver a abrir la ventana se muestran las estadísticas actuales"""
+        self.load_stats()
@@ -0,0 +1,86 @@
+from PySide2.QtGui import QIcon
+from PySide2.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QTableView, QPushButton, QLabel, QTabWidget
+from db.reports import revenue_by_month, revenue_by_method, revenue_by_level, revenue_by_student, revenue_totals
+from ui.table_model import SqlTableModel, configure_table_view, loading_label
+from ui.db_executor import db_executor
+
+# Pestañas del informe: (título, cabecera de la clave, consulta de db.reports)
+REPORTS = [
+    ("Por mes", "Mes", revenue_by_month),
+    ("Por método de pago", "Método", revenue_by_method),
+    ("Por nivel", "Nivel", revenue_by_level),
+    ("Por alumno", "Alumno", revenue_by_student),
+]
+
+
+class ReportsWindow(QWidget):
+    """Informes de ingresos, leídos de las tablas resumen que mantienen los triggers (db/reports.py)"""
+
+    WATCHED_TABLES = ("payments", "students")  # Ver ui/window_registry.py
+
+    def __init__(self):
+        super().__init__()
+        self.setWindowTitle("Informes")
+        self.setWindowIcon(QIcon("resources/el_escondite_ingles.bmp"))
+        self.setGeometry(100, 100, 800, 600)
+        self.init_ui()
+
+    def init_ui(self):
+        """Configura los elementos visuales de la ventana"""
+        self.layout = QVBoxLayout()
+
+        title = QLabel("Informes de ingresos")
+        title.setStyleSheet("font-size: 20px; font-weight: bold; color: #4B0082;")
+        self.layout.addWidget(title)
+
+        self.totals_label = QLabel()
+        self.layout.addWidget(self.totals_label)
+
+        # ---------- PESTAÑAS ----------
+        self.tabs = QTabWidget()
+        self.models = []
+        for tab_title, key_header, fetch_page in REPORTS:
+            model = SqlTableModel([key_header, "Pagos", "Total (€)"], fetch_page,
+                                  columns=["key", "payments", "total"], executor=db_executor())
+            table = QTableView()
+            table.setModel(model)
+            configure_table_view(table)
+
+            page = QWidget()
+            page_layout = QVBoxLayout(page)
+            page_layout.addWidget(table)
+            page_layout.addWidget(loading_label(model))  # Visible mientras se leen filas en segundo plano
+            self.tabs.addTab(page, tab_title)
+            self.models.append(model)
+        self.layout.addWidget(self.tabs)
+
+        # ---------- BOTONES ----------
+        button_layout = QHBoxLayout()
+
+        self.refresh_button = QPushButton("Actualizar")
+        self.refresh_button.clicked.connect(self.reload_data)
+        button_layout.addWidget(self.refresh_button)
+
+        self.layout.addLayout(button_layout)
+        self.setLayout(self.layout)
+
+        self.show_totals()
+
+    def show_totals(self):
+        """Muestra el número de pagos y los ingresos totales"""
+        payments, total = revenue_totals()
+        self.totals_label.setText(f"Total: {total:.2f} € en {payments} pagos")
+
+    def reload_data(self):
+        """Vuelve a leer los informes, conservando la selección de cada tabla"""
+        for model in self.models:
+            model.reload()
+        self.show_totals()
+
+    def apply_change(self, event):
+        """
+        Cualquier cambio en un pago o alumno puede mover varias filas de cada informe
+        (ver ui/window_registry.py); como los informes son pocas filas ya sumadas, se
+        vuelven a leer enteros.
+        """
+        self.reload_data()
@@ -0,0 +1,109 @@
+from datetime import datetime
+from PySide2.QtGui import QIcon
+from PySide2.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem, QPushButton,
+                               QMessageBox, QLabel, QAbstractItemView, QHeaderView)
+from db.snapshots import list_snapshots, take_snapshot, restore_snapshot, apply_retention
+from ui.backup_worker import start_backup_task
+
+
+class SnapshotsWindow(QWidget):
+    """Lista las instantáneas automáticas y permite restaurar cualquiera de ellas"""
+
+    def __init__(self, store=None, before_restore=None):
+        """
+        Args:
+            store (str, optional): Carpeta de instantáneas (por defecto, la de la base de datos).
+            before_restore (callable, optional): Se llama antes de restaurar (por ejemplo, para cerrar otras ventanas).
+        """
+        super().__init__()
+        self.store = store
+        self.before_restore = before_restore
+        self.snapshots = []
+        self.setWindowTitle("Copias Automáticas")
+        self.setWindowIcon(QIcon("resources/el_escondite_ingles.bmp"))
+        self.setGeometry(100, 100, 600, 500)
+        self.init_ui()
+
+    def init_ui(self):
+        """Configura los elementos visuales de la ventana"""
+        self.layout = QVBoxLayout()
+
+        title = QLabel("Instantáneas de la base de datos")
+        title.setStyleSheet("font-size: 20px; font-weight: bold; color: #4B0082;")
+        self.layout.addWidget(title)
+
+        # ---------- TABLA DE INSTANTÁNEAS ----------
+        self.table = QTableWidget()
+        self.table.setColumnCount(3)
+        self.table.setHorizontalHeaderLabels(["Fecha", "Tamaño", "Datos nuevos"])
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.layout.addWidget(self.table)
+
+        # ---------- BOTONES ----------
+        button_layout = QHBoxLayout()
+
+        self.snapshot_button = QPushButton("Crear instantánea ahora")
+        self.snapshot_button.clicked.connect(self.create_snapshot)
+        button_layout.addWidget(self.snapshot_button)
+
+        self.restore_button = QPushButton("Restaurar seleccionada")
+        self.restore_button.clicked.connect(self.restore_selected)
+        button_layout.addWidget(self.restore_button)
+
+        self.layout.addLayout(button_layout)
+        self.setLayout(self.layout)
+
+        self.load_snapshots()
+
+    def load_snapshots(self):
+        """Carga la lista de instantáneas, de la más reciente a la más antigua"""
+        self.snapshots = list_snapshots(self.store)
+        self.table.setRowCount(len(self.snapshots))
+        for row, snapshot in enumerate(self.snapshots):
+            created = datetime.fromisoformat(snapshot["created"]).strftime("%d/%m/%Y %H:%M:%S")
+            new_data = snapshot["new_chunks"] * snapshot["chunk_size"]
+            self.table.setItem(row, 0, QTableWidgetItem(created))
+            self.table.setItem(row, 1, QTableWidgetItem(f"{snapshot['size'] / 1024:.0f} KB"))
+            self.table.setItem(row, 2, QTableWidgetItem(f"≤ {new_data / 1024:.0f} KB"))
+
+    def reload_data(self):
+        """Al volver a abrir la ventana se relee la lista (puede haber instantáneas programadas nuevas)"""
+        self.load_snapshots()
+
+    def create_snapshot(self):
+        """Hace una instantánea en este momento (además de las programadas)"""
+        def task(progress):
+            take_snapshot(self.store, progress=progress)
+            apply_retention(self.store)
+
+        start_backup_task(self, "Instantánea", "Copiando la base de datos...", task, self.load_snapshots)
+
+    def restore_selected(self):
+        """Restaura la base de datos al estado de la instantánea seleccionada"""
+        row = self.table.currentRow()
+        if row < 0:
+            QMessageBox.warning(self, "Error", "Selecciona una instantánea para restaurar.")
+            return
+
+        snapshot = self.snapshots[row]
+        confirm = QMessageBox.question(
+            self,
+            "Confirmar Restauración",
+            f"La base de datos volverá al estado del {self.table.item(row, 0).text()}.\n¿Quieres continuar?",
+            QMessageBox.Yes | QMessageBox.No
+        )
+        if confirm != QMessageBox.Yes:
+            return
+
+        if self.before_restore:
+            self.before_restore()
+
+        start_backup_task(
+            self, "Restauración", "Restaurando la base de datos...",
+            lambda progress: restore_snapshot(snapshot["id"], self.store, progress=progress),
+            lambda: QMessageBox.information(self, "Restauración Completa",
+                                            "La base de datos fue restaurada correctamente."))
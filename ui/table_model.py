@@ -0,0 +1,342 @@
+from PySide2.QtCore import Qt, QAbstractTableModel, QModelIndex, QSortFilterProxyModel, Signal
+from PySide2.QtWidgets import QAbstractItemView, QAbstractScrollArea, QHeaderView, QLabel
+from db.events import INSERT, DELETE
+from db.rows import field
+
+BATCH_SIZE = 200  # Filas que se piden a la base de datos en cada bloque
+SEARCH_DELAY_MS = 300  # Espera tras la última tecla antes de lanzar una búsqueda
+
+
+class SqlTableModel(QAbstractTableModel):
+    """
+    Modelo de tabla que carga las filas de la base de datos por bloques.
+
+    La vista solo pide un bloque nuevo (fetchMore) cuando el usuario llega al
+    final de lo ya cargado, así que abrir una tabla con miles de filas no
+    obliga a leerlas ni a crear un widget por celda.
+
+    Con un ejecutor (ui/db_executor.py) las consultas se hacen en su hilo y las
+    filas se añaden al llegar; mientras tanto se siguen viendo las anteriores.
+
+    Con un orden (order) el modelo pagina por clave: cada bloque se pide a partir
+    de la última fila cargada en lugar de con OFFSET, así que bajar mucho en la
+    tabla no hace cada bloque más lento, y las columnas de sort_columns se ordenan
+    en la base de datos al pulsar su cabecera (ver enable_sorting).
+    """
+
+    loading_changed = Signal(bool)  # True mientras hay una consulta en curso
+    load_failed = Signal(str)  # Mensaje de error de una consulta en segundo plano
+
+    def __init__(self, headers, fetch_page, columns=None, batch_size=BATCH_SIZE, key_column=0, executor=None,
+                 order=None, sort_columns=(), parent=None):
+        """
+        Args:
+            headers (list): Títulos de las columnas visibles.
+            fetch_page (callable): Función (offset, limit) que devuelve una lista de filas. Con order, función
+                (after, limit, order_by, descending), donde after es la última fila cargada o None (db.database
+                fetch_*_after).
+            columns (list, optional): Índice o nombre de cada columna visible dentro de la fila (db.rows.field).
+                Por defecto se muestran las columnas de la fila en orden.
+            batch_size (int): Número de filas por bloque.
+            key_column (int or str): Índice o nombre del id dentro de la fila (para apply_change).
+            executor (DatabaseExecutor, optional): Hilo en el que se hacen las consultas.
+                Sin él se hacen en el momento, en el hilo de la interfaz.
+            order (tuple, optional): (columna, descendente) inicial; activa la paginación por clave.
+            sort_columns (iterable): Columnas (de columns) que se pueden ordenar pulsando la cabecera.
+        """
+        super().__init__(parent)
+        self.headers = list(headers)
+        self.fetch_page = fetch_page
+        self.columns = list(columns) if columns is not None else list(range(len(self.headers)))
+        self.batch_size = batch_size
+        self.key_column = key_column
+        self.executor = executor
+        self.order = order
+        self.sort_columns = set(sort_columns)
+        self._rows = []
+        self._exhausted = False
+        self._loading = False
+
+    # ---------- Interfaz de QAbstractTableModel ----------
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.headers)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role not in (Qt.DisplayRole, Qt.ToolTipRole):
+            return None
+        value = field(self._rows[index.row()], self.columns[index.column()])
+        return "" if value is None else str(value)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self.headers[section]
+        return str(section + 1)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self._exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self._exhausted or self._loading:
+            return
+        self._run(self._page_query(len(self._rows), self.batch_size), self._append_batch)
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        """Ordena en la base de datos por la columna indicada, si es una de sort_columns"""
+        if self.order is None or self.columns[column] not in self.sort_columns:
+            return
+        self.order = (self.columns[column], order == Qt.DescendingOrder)
+        self.refresh()
+
+    def _page_query(self, start, limit):
+        """
+        Devuelve la consulta del bloque de limit filas que empieza en la posición
+        start: con OFFSET, o a partir de la fila anterior si hay orden (keyset).
+        """
+        fetch_page = self.fetch_page
+        if self.order is None:
+            return lambda: fetch_page(start, limit)
+        after = self._rows[start - 1] if start else None
+        order_by, descending = self.order
+        return lambda: fetch_page(after, limit, order_by, descending)
+
+    def _append_batch(self, batch):
+        if len(batch) < self.batch_size:
+            self._exhausted = True  # No quedan más filas en la base de datos
+        if not batch:
+            return
+
+        first = len(self._rows)
+        self.beginInsertRows(QModelIndex(), first, first + len(batch) - 1)
+        self._rows.extend(batch)
+        self.endInsertRows()
+
+    # ---------- Consultas en segundo plano ----------
+
+    def _set_loading(self, loading):
+        if loading != self._loading:
+            self._loading = loading
+            self.loading_changed.emit(loading)
+
+    def _run(self, query, on_result):
+        """
+        Hace la consulta en el ejecutor y pasa el resultado a on_result (o las dos
+        cosas en el momento si no hay ejecutor). Cada consulta del modelo sustituye
+        a la anterior que no haya terminado: una búsqueda nueva deja sin efecto la
+        de la tecla anterior o el bloque que se estaba pidiendo.
+        """
+        if self.executor is None:
+            on_result(query())
+            return
+
+        def finished(result):
+            self._set_loading(False)
+            on_result(result)
+
+        def failed(error):
+            self._set_loading(False)
+            self.load_failed.emit(str(error))
+
+        self._set_loading(True)
+        self.executor.submit(query, on_result=finished, on_error=failed, key=self)
+
+    def is_loading(self):
+        """Indica si hay una consulta del modelo en curso en el ejecutor"""
+        return self._loading
+
+    # ---------- Utilidades ----------
+
+    def refresh(self, fetch_page=None):
+        """
+        Descarta las filas cargadas y vuelve a empezar (opcionalmente con otra consulta).
+        Con ejecutor, las filas anteriores se ven hasta que llega el primer bloque.
+        """
+        if fetch_page is not None:
+            self.fetch_page = fetch_page
+        self._run(self._page_query(0, self.batch_size), self._replace_rows)
+
+    def _replace_rows(self, batch):
+        self.beginResetModel()
+        self._rows = []
+        self._exhausted = False
+        self.endResetModel()
+        self._append_batch(batch)
+
+    def reload(self):
+        """
+        Vuelve a leer las filas ya cargadas con la misma consulta y solo avisa a la
+        vista de las que han cambiado. A diferencia de refresh, se conservan la
+        selección y la posición del scroll.
+        """
+        count = max(len(self._rows), self.batch_size)
+        self._run(self._page_query(0, count), lambda fresh: self._merge_rows(fresh, count))
+
+    def _merge_rows(self, fresh, count):
+        """Sustituye las filas cargadas por las leídas de nuevo, avisando solo de las diferencias"""
+        common = min(len(self._rows), len(fresh))
+
+        last_column = len(self.headers) - 1
+        for row in range(common):
+            if fresh[row] != self._rows[row]:
+                self._rows[row] = fresh[row]
+                self.dataChanged.emit(self.index(row, 0), self.index(row, last_column))
+
+        if len(fresh) > common:
+            self.beginInsertRows(QModelIndex(), common, len(fresh) - 1)
+            self._rows.extend(fresh[common:])
+            self.endInsertRows()
+        elif len(self._rows) > common:
+            self.beginRemoveRows(QModelIndex(), common, len(self._rows) - 1)
+            del self._rows[common:]
+            self.endRemoveRows()
+
+        self._exhausted = len(fresh) < count
+
+    def find_row(self, key):
+        """Devuelve la posición de la fila cargada con ese id, o None si no está cargada"""
+        for row, data in enumerate(self._rows):
+            if field(data, self.key_column) == key:
+                return row
+        return None
+
+    def apply_change(self, event, fetch_row):
+        """
+        Aplica a las filas cargadas un cambio avisado por la base de datos (db.events).
+
+        Modificar o borrar una fila concreta solo toca esa fila. Las altas (cuyo
+        sitio depende del orden de la consulta), los cambios en varias filas a la
+        vez y, con orden (keyset), los cambios en la columna de ordenación se
+        resuelven con reload().
+
+        Args:
+            event (ChangeEvent): Cambio confirmado en la tabla que muestra el modelo.
+            fetch_row (callable): Lee por su id la fila actualizada, con el formato de fetch_page.
+        """
+        if event.key is None or event.operation == INSERT:
+            self.reload()
+            return
+
+        if self.find_row(event.key) is None:
+            return  # No está cargada: ya aparecerá (o no) al llegar a ella
+        if event.operation == DELETE:
+            self._patch_row(event.key, None)
+        elif self.executor is None:
+            self._patch_row(event.key, fetch_row(event.key))
+        else:
+            # Clave propia: no debe cancelar la carga de un bloque ni la de otra fila
+            self.executor.submit(fetch_row, event.key, key=(self, event.key),
+                                 on_result=lambda fresh: self._patch_row(event.key, fresh))
+
+    def _patch_row(self, key, fresh):
+        """Sustituye la fila con ese id por fresh, o la quita si fresh es None"""
+        row = self.find_row(key)
+        if row is None:
+            return
+        if fresh is None:
+            self.beginRemoveRows(QModelIndex(), row, row)
+            del self._rows[row]
+            self.endRemoveRows()
+        elif self.order is not None and field(fresh, self.order[0]) != field(self._rows[row], self.order[0]):
+            # Ha cambiado el valor por el que se ordena: la fila cambia de sitio y, si era la
+            # última cargada, el siguiente bloque (que empieza tras ella) saltaría o repetiría filas
+            self.reload()
+        else:
+            self._rows[row] = fresh
+            self.dataChanged.emit(self.index(row, 0), self.index(row, len(self.headers) - 1))
+
+    def fetch_all(self):
+        """Carga en el momento todas las filas pendientes, también si el modelo tiene ejecutor"""
+        while not self._exhausted:
+            self._append_batch(self._page_query(len(self._rows), self.batch_size)())
+
+    def row_data(self, row):
+        """Devuelve la fila original (con columnas ocultas como el ID)"""
+        return self._rows[row]
+
+
+def configure_table_view(view):
+    """Aplica a un QTableView la configuración común de las ventanas de gestión"""
+    view.setSizeAdjustPolicy(QAbstractScrollArea.AdjustToContents)
+    view.setHorizontalScrollMode(QAbstractItemView.ScrollPerPixel)
+    view.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+    view.setSelectionBehavior(QAbstractItemView.SelectRows)
+    view.setSelectionMode(QAbstractItemView.SingleSelection)
+    view.setEditTriggers(QAbstractItemView.NoEditTriggers)
+    view.verticalHeader().setVisible(False)
+
+    header = view.horizontalHeader()
+    header.setSectionResizeMode(QHeaderView.Stretch)
+    header.setStretchLastSection(True)
+
+
+def enable_sorting(view):
+    """
+    Permite ordenar la tabla pulsando la cabecera de las columnas que el modelo
+    (SqlTableModel con order) puede ordenar en la base de datos. La flecha de la
+    cabecera empieza en el orden del modelo; pulsar una columna que no se puede
+    ordenar no cambia nada.
+    """
+    model = view.model()
+    header = view.horizontalHeader()
+
+    def show_current_order():
+        order_by, descending = model.order
+        section = model.columns.index(order_by) if order_by in model.columns else -1
+        header.blockSignals(True)
+        header.setSortIndicator(section, Qt.DescendingOrder if descending else Qt.AscendingOrder)
+        header.blockSignals(False)
+
+    def sort_indicator_changed(section, order):
+        if model.columns[section] in model.sort_columns:
+            model.sort(section, order)
+        else:
+            show_current_order()
+
+    header.setSectionsClickable(True)
+    header.setSortIndicatorShown(True)
+    show_current_order()
+    header.sortIndicatorChanged.connect(sort_indicator_changed)
+
+
+def loading_label(model):
+    """
+    Crea la etiqueta que avisa de que el modelo está cargando filas en segundo
+    plano (o de que la consulta ha fallado). Está oculta mientras no hay nada que decir.
+    """
+    label = QLabel("Cargando...")
+    label.setStyleSheet("color: #4B0082; font-style: italic;")
+    label.setVisible(model.is_loading())
+
+    def loading_changed(loading):
+        label.setText("Cargando...")
+        label.setVisible(loading)
+
+    def load_failed(message):
+        label.setText(f"No se pudieron cargar los datos: {message}")
+        label.setVisible(True)
+
+    model.loading_changed.connect(loading_changed)
+    model.load_failed.connect(load_failed)
+    return label
+
+
+def selected_row_data(view):
+    """
+    Devuelve la fila original seleccionada en la vista, o None si no hay selección.
+    Traduce el índice a través del proxy de filtrado si lo hay.
+    """
+    index = view.currentIndex()
+    if not index.isValid():
+        return None
+
+    model = view.model()
+    if isinstance(model, QSortFilterProxyModel):
+        index = model.mapToSource(index)
+        model = model.sourceModel()
+    return model.row_data(index.row())
+
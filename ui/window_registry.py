@@ -0,0 +1,85 @@
+from db.cache import table_versions
+from ui.event_bus import database_events
+
+
+class WindowRegistry:
+    """
+    Guarda una única instancia de cada ventana de gestión.
+
+    Al volver a abrir una ventana se muestra la misma instancia (sin reconstruir
+    los widgets ni volver a leer el logo) y solo se recarga si alguna de las
+    tablas que muestra ha cambiado desde la última vez que se abrió. Para ello
+    cada ventana declara WATCHED_TABLES y un método reload_data().
+
+    Mientras una ventana está visible, los cambios en sus tablas se le pasan uno
+    a uno (ui/event_bus.py) a su método apply_change(event), que solo corrige las
+    filas afectadas, aunque el cambio se haya hecho desde otra ventana.
+    """
+
+    def __init__(self):
+        self._windows = {}  # clave -> ventana
+        self._seen = {}  # clave -> versiones de sus tablas la última vez que se mostró
+        database_events().changed.connect(self.dispatch)
+
+    def show(self, key, factory):
+        """
+        Muestra la ventana indicada, creándola la primera vez.
+
+        Args:
+            key (str): Identificador de la ventana (por ejemplo, "payments").
+            factory (callable): Crea la ventana si todavía no existe.
+
+        Returns:
+            QWidget: La ventana mostrada.
+        """
+        window = self._windows.get(key)
+        tables = None
+        if window is None:
+            tables = getattr(factory, "WATCHED_TABLES", None)
+            seen = table_versions(tables) if tables is not None else None  # Antes de cargar los datos
+            window = factory()
+            self._windows[key] = window
+        else:
+            tables = getattr(window, "WATCHED_TABLES", None)
+            seen = table_versions(tables) if tables is not None else None
+            if tables is None or seen != self._seen.get(key):
+                window.reload_data()  # Algo cambió mientras estaba cerrada
+
+        self._seen[key] = seen
+        window.show()
+        window.raise_()  # Si ya estaba abierta, la trae al frente
+        window.activateWindow()
+        return window
+
+    def dispatch(self, event):
+        """Pasa un cambio confirmado (ChangeEvent) a las ventanas visibles que muestran esa tabla"""
+        for key, window in self._windows.items():
+            tables = getattr(window, "WATCHED_TABLES", None)
+            if tables is None or not window.isVisible():
+                continue  # Las ocultas se ponen al día al volver a mostrarse
+            if event.table is None:
+                window.reload_data()
+            elif event.table in tables:
+                window.apply_change(event)
+            else:
+                continue
+            self._seen[key] = table_versions(tables)  # Ya está al día: no hace falta recargar al reabrirla
+
+    def detach(self):
+        """Deja de recibir cambios (al cerrar la sesión, para que no se queden vivas las ventanas)"""
+        database_events().changed.disconnect(self.dispatch)
+
+    def get(self, key):
+        """Devuelve la ventana ya creada con esa clave, o None"""
+        return self._windows.get(key)
+
+    def close_all(self, keep=()):
+        """
+        Cierra (oculta) las ventanas abiertas; se reutilizan al volver a abrirlas.
+
+        Args:
+            keep (iterable): Claves de las ventanas que se dejan abiertas.
+        """
+        for key, window in self._windows.items():
+            if key not in keep:
+                window.close()